@@ -0,0 +1,415 @@
+#!/usr/bin/env python
+"""Usage: python compile_consent_theory.py [-o <kernel file>|--output=<kernel file>] [--check] <theory file>
+
+Compiles the definition of an ethical action (the formula labelled ethical_action_definition) in the given theory
+file (in TPTP format, e.g. naive_consent_theory.tptp, or Prover 9's, e.g. naive_consent_theory.in) into a decision
+table over its inputs (whether consent for the action was asked for, whether consent was given, whether the action
+was done, and whether the person doing it is the person it is done to), and writes it as a Python module (by default,
+naive_consent_theory_kernel.py, alongside this program) for naive_consent_theory.py to decide ethical actions with,
+in one lookup each.
+
+Usage examples:
+
+   Compile the definition of an ethical action in naive_consent_theory.tptp into naive_consent_theory_kernel.py:
+
+       python compile_consent_theory.py naive_consent_theory.tptp
+
+
+   Check that naive_consent_theory_kernel.py is up to date with the definition in naive_consent_theory.in, without
+   writing it (exiting with status 1 if it isn't):
+
+       python compile_consent_theory.py --check naive_consent_theory.in
+"""
+
+import getopt
+import os
+import re
+import sys
+
+default_kernel_filename = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'naive_consent_theory_kernel.py')
+
+# The inputs of the decision table, in the order of their bits in its index, with the atoms (a predicate, and which
+# of the defined atom's arguments it takes, in order) deciding them.
+kernel_inputs = ['asked', 'consents', 'did', 'same']
+kernel_input_atoms = {('ask_for_consent', (0, 1, 2)): 'asked',
+                      ('consents', (1, 0, 2)): 'consents',
+                      ('do', (0, 1, 2)): 'did',
+                      ('=', (0, 1)): 'same',
+                      ('=', (1, 0)): 'same'}
+kernel_input_descriptions = {'asked': ("not asked", "asked"),
+                             'consents': ("no consent", "consents"),
+                             'did': ("not done", "done"),
+                             'same': ("to another person", "to themself")}
+
+# The name of the defined predicate, and the label of its definition.
+defined_predicate = 'ethical'
+definition_label = 'ethical_action_definition'
+
+# The tokens of formulas, in TPTP format or Prover 9's (longest first, where one is a prefix of another).
+token_pattern = re.compile(r"<=>|<->|=>|->|<=|<-|!=|[-~&|!?():,\[\]=]|[A-Za-z_$][A-Za-z0-9_$]*|'[^']*'")
+negations = ['~', '-']
+equivalences = ['<=>', '<->']
+implications = ['=>', '->']
+reverse_implications = ['<=', '<-']
+
+
+def usage():
+    """ Displays the usage information for this program. """
+    sys.stdout.write("Usage: python compile_consent_theory.py [-o <kernel file>|--output=<kernel file>] [--check] ")
+    sys.stdout.write("<theory file>\n")
+# end def
+
+
+def get_definition_text(text, tptp = True):
+    """ Returns the formula labelled ethical_action_definition in the given theory text (in TPTP format, or otherwise
+        Prover 9's), with its comments removed, or None if there isn't one.
+    """
+    # Remove the comments, and split the text into statements.
+    text = re.sub(r"%[^\n]*", "", text)
+    for statement in re.split(r"\.(?=\s|$)", text):
+        if tptp:
+            match = re.match(r"\s*fof\s*\(\s*" + definition_label + r"\s*,\s*\w+\s*,(.*)\)\s*$", statement, re.S)
+            if match:
+                return match.group(1)
+            # end if
+        else:
+            match = re.match(r"(.*)#\s*label\s*\(\s*" + definition_label + r"\s*\)", statement, re.S)
+            if match:
+                # Skip the start of the list the formula is in, if it's the first in it.
+                return re.sub(r"^\s*formulas\s*\(\s*\w+\s*\)\s*\.", "", match.group(1))
+            # end if
+        # end if
+    # end for
+    return None
+# end def
+
+
+def parse_term(tokens, position):
+    """ Parses the term starting at the given position in the given tokens, returning it (as a (name, arguments)
+        tuple) and the position after it.
+    """
+    name = tokens[position]
+    if not re.match(r"[A-Za-z_$']", name):
+        raise ValueError("Expected a term, but got '%s'." % name)
+    # end if
+    position += 1
+    arguments = []
+    if position < len(tokens) and tokens[position] == '(':
+        while True:
+            argument, position = parse_term(tokens, position + 1)
+            arguments.append(argument)
+            if tokens[position] == ')':
+                break
+            # end if
+            expect_token(tokens, position, ',')
+        # end while
+        position += 1
+    # end if
+    return (name, tuple(arguments)), position
+# end def
+
+
+def expect_token(tokens, position, token):
+    """ Checks the token at the given position is the given one, raising a ValueError if it isn't. """
+    if position >= len(tokens):
+        raise ValueError("Expected '%s', but got the end of the formula." % token)
+    elif tokens[position] != token:
+        raise ValueError("Expected '%s', but got '%s'." % (token, tokens[position]))
+    # end if
+# end def
+
+
+def parse_unitary_formula(tokens, position):
+    """ Parses the negation, quantified formula, bracketed formula or atom starting at the given position in the given
+        tokens, returning it (as a tuple starting with its connective) and the position after it.
+    """
+    if position >= len(tokens):
+        raise ValueError("Expected a formula, but got the end of the formula.")
+    # end if
+    token = tokens[position]
+    if token in negations:
+        formula, position = parse_unitary_formula(tokens, position + 1)
+        return ('not', formula), position
+    elif token in ['!', '?']:
+        # A TPTP quantified formula: ! [A, B]: formula.
+        expect_token(tokens, position + 1, '[')
+        variables = []
+        position += 2
+        while True:
+            variables.append(tokens[position])
+            if tokens[position + 1] == ']':
+                break
+            # end if
+            expect_token(tokens, position + 1, ',')
+            position += 2
+        # end while
+        expect_token(tokens, position + 2, ':')
+        formula, position = parse_unitary_formula(tokens, position + 3)
+        return ({'!': 'all', '?': 'exists'}[token], tuple(variables), formula), position
+    elif token in ['all', 'exists'] and position + 1 < len(tokens) and re.match(r"[A-Za-z_$]", tokens[position + 1]):
+        # A Prover 9 quantified formula: all A formula.
+        variable = tokens[position + 1]
+        formula, position = parse_unitary_formula(tokens, position + 2)
+        return (token, (variable,), formula), position
+    elif token == '(':
+        formula, position = parse_formula(tokens, position + 1)
+        expect_token(tokens, position, ')')
+        return formula, position + 1
+    # end if
+
+    # An atom, or an equation between two terms.
+    term, position = parse_term(tokens, position)
+    if position < len(tokens) and tokens[position] in ['=', '!=']:
+        operator = tokens[position]
+        other_term, position = parse_term(tokens, position + 1)
+        if operator == '!=':
+            return ('not', ('atom', '=', (term, other_term))), position
+        # end if
+        return ('atom', '=', (term, other_term)), position
+    # end if
+    return ('atom', term[0], term[1]), position
+# end def
+
+
+def parse_formula(tokens, position):
+    """ Parses the formula starting at the given position in the given tokens, returning it (as a tuple starting with
+        its connective) and the position after it. Conjunctions bind tighter than disjunctions, which bind tighter
+        than implications, which bind tighter than equivalences.
+    """
+    levels = [('and', ['&']), ('or', ['|'])]
+
+    def parse_level(position, level):
+        """ Parses the conjunction or disjunction (at the given level), starting at the given position. """
+        if level < 0:
+            return parse_unitary_formula(tokens, position)
+        # end if
+        connective, operators = levels[level]
+        formula, position = parse_level(position, level - 1)
+        formulas = [formula]
+        while position < len(tokens) and tokens[position] in operators:
+            formula, position = parse_level(position + 1, level - 1)
+            formulas.append(formula)
+        # end while
+        if len(formulas) == 1:
+            return formulas[0], position
+        # end if
+        return (connective, tuple(formulas)), position
+    # end def
+
+    formula, position = parse_level(position, len(levels) - 1)
+    if position < len(tokens) and tokens[position] in implications + reverse_implications:
+        operator = tokens[position]
+        other_formula, position = parse_level(position + 1, len(levels) - 1)
+        if operator in implications:
+            formula = ('or', (('not', formula), other_formula))
+        else:
+            formula = ('or', (formula, ('not', other_formula)))
+        # end if
+    # end if
+    if position < len(tokens) and tokens[position] in equivalences:
+        other_formula, position = parse_formula(tokens, position + 1)
+        formula = ('iff', formula, other_formula)
+    # end if
+    return formula, position
+# end def
+
+
+def parse_definition(text):
+    """ Parses the given definition of an ethical action, returning the variables of its defined atom (e.g.
+        ethical(A, B, X)), and the formula defining it.
+    """
+    tokens = token_pattern.findall(text)
+    formula, position = parse_formula(tokens, 0)
+    if position != len(tokens):
+        raise ValueError("Unexpected '%s' after the definition." % tokens[position])
+    # end if
+
+    # Skip any universal quantifiers around the definition (free variables are universal in Prover 9).
+    while formula[0] == 'all':
+        formula = formula[2]
+    # end while
+    if formula[0] != 'iff' or formula[1][0] != 'atom' or formula[1][1] != defined_predicate:
+        raise ValueError("The definition isn't of the form %s(A, B, X) <-> formula." % defined_predicate)
+    # end if
+    variables = [name for (name, arguments) in formula[1][2]]
+    if len(variables) != 3 or len(set(variables)) != 3 or \
+       len([arguments for (name, arguments) in formula[1][2] if len(arguments) > 0]) > 0:
+        raise ValueError("The defined atom's arguments aren't three different variables.")
+    # end if
+    return variables, formula[2]
+# end def
+
+
+def evaluate_formula(formula, variables, inputs):
+    """ Evaluates the given formula over the given variables (those of the defined atom), with the given values of the
+        decision table's inputs (a dictionary of them by name), raising a ValueError for any part of the formula that
+        doesn't depend on the inputs alone.
+    """
+    connective = formula[0]
+    if connective == 'not':
+        return not evaluate_formula(formula[1], variables, inputs)
+    elif connective == 'and':
+        return all([evaluate_formula(subformula, variables, inputs) for subformula in formula[1]])
+    elif connective == 'or':
+        return any([evaluate_formula(subformula, variables, inputs) for subformula in formula[1]])
+    elif connective == 'iff':
+        return evaluate_formula(formula[1], variables, inputs) == evaluate_formula(formula[2], variables, inputs)
+    elif connective in ['all', 'exists']:
+        raise ValueError("Quantifiers inside the definition can't be compiled.")
+    # end if
+
+    # Find which of the defined atom's arguments the atom takes, and so which input it is.
+    predicate, arguments = formula[1], formula[2]
+    positions = []
+    for (name, subterms) in arguments:
+        if name not in variables or len(subterms) > 0:
+            raise ValueError("The atom %s(...) takes '%s', which isn't one of the defined atom's arguments." % \
+                             (predicate, name))
+        # end if
+        positions.append(variables.index(name))
+    # end for
+    if predicate == '=' and positions[0] == positions[1]:
+        return True
+    # end if
+    if (predicate, tuple(positions)) not in kernel_input_atoms:
+        raise ValueError("The atom %s(%s) isn't one of the decision table's inputs." % \
+                         (predicate, ', '.join([name for (name, subterms) in arguments])))
+    # end if
+    return inputs[kernel_input_atoms[(predicate, tuple(positions))]]
+# end def
+
+
+def compile_definition(text, tptp = True):
+    """ Compiles the definition of an ethical action in the given theory text (in TPTP format, or otherwise Prover
+        9's) into a decision table: a tuple of whether an action is ethical for each combination of the inputs, indexed
+        by the sum of their bits (the first input being the lowest bit, i.e. asked + 2 * consents + 4 * did +
+        8 * same). Raises a ValueError if the definition can't be found, parsed or compiled.
+    """
+    definition = get_definition_text(text, tptp)
+    if definition is None:
+        raise ValueError("No formula labelled %s was found." % definition_label)
+    # end if
+    variables, formula = parse_definition(definition)
+
+    table = []
+    for index in range(2 ** len(kernel_inputs)):
+        inputs = dict([(name, bool(index >> bit & 1)) for (bit, name) in enumerate(kernel_inputs)])
+        table.append(evaluate_formula(formula, variables, inputs))
+    # end for
+    return tuple(table)
+# end def
+
+
+def compile_theory_file(theory_filename):
+    """ Compiles the definition of an ethical action in the given theory file (in TPTP format if it ends in .tptp,
+        or otherwise Prover 9's) into a decision table (see compile_definition).
+    """
+    with open(theory_filename, 'r') as theory_file:
+        text = theory_file.read()
+    # end with
+    return compile_definition(text, theory_filename.endswith('.tptp'))
+# end def
+
+
+def format_kernel(table, theory_filename):
+    """ Returns the text of the Python module holding the given decision table, compiled from the given theory file.
+    """
+    source = os.path.basename(theory_filename)
+    lines = ["# Generated by compile_consent_theory.py from the definition of an ethical action in %s." % source,
+             "#",
+             "# Don't edit this file; edit the definition, and compile it again:",
+             "#",
+             "#     python compile_consent_theory.py %s" % source,
+             "",
+             "# Whether an action is ethical, for each combination of whether consent for it was asked for, whether",
+             "# consent was given, whether it was done, and whether it was done to the person doing it, indexed by",
+             "# asked + 2 * consents + 4 * did + 8 * same.",
+             "ETHICAL_ACTION_TABLE = ("]
+    for (index, ethical) in enumerate(table):
+        descriptions = [kernel_input_descriptions[name][index >> bit & 1] for (bit, name) in enumerate(kernel_inputs)]
+        lines.append("    %-6s  # %2s: %s" % (str(ethical) + ",", index, ", ".join(descriptions)))
+    # end for
+    lines.append(")")
+    return "\n".join(lines) + "\n"
+# end def
+
+
+def main(argv):
+    """ Handles command-line input and compiles the given theory file.
+    """
+    # Set defaults for the command line arguments to read in.
+    kernel_filename = default_kernel_filename
+    check = False
+
+    # Try to parse the given command-line options.
+    try:
+        options, args = getopt.getopt(argv, 'o:', ['output=', 'check'])
+    except getopt.GetoptError:
+        # The given options are incorrect.
+        usage()
+        sys.stdout.write("\nERROR: Invalid command line options given. Exiting.\n")
+        sys.exit(2)
+    # end try
+
+    # Interpret the parsed command-line options.
+    for opt, arg in options:
+        if opt in ('-o', '--output'):
+            kernel_filename = arg
+        elif opt == '--check':
+            check = True
+        # end if
+    # end for
+    if len(args) != 1:
+        usage()
+        sys.stdout.write("\nERROR: No theory file given. Exiting.\n")
+        sys.exit(2)
+    # end if
+    theory_filename = args[0]
+    if not os.path.exists(theory_filename):
+        sys.stdout.write("\nERROR: Theory file '%s' does not exist. Exiting.\n" % theory_filename)
+        sys.exit(2)
+    # end if
+
+    # Compile the definition.
+    try:
+        table = compile_theory_file(theory_filename)
+    except (ValueError, IndexError) as e:
+        # (An IndexError comes of a formula ending too soon.)
+        sys.stdout.write("\nERROR: Can't compile the definition of an ethical action in '%s': %s Exiting.\n" % \
+                         (theory_filename, e))
+        sys.exit(2)
+    # end try
+    kernel = format_kernel(table, theory_filename)
+
+    if check:
+        # Compare the compiled table with the kernel file's.
+        try:
+            with open(kernel_filename, 'r') as kernel_file:
+                kernel_text = kernel_file.read()
+            # end with
+            namespace = {}
+            exec(kernel_text, namespace)
+            up_to_date = namespace.get('ETHICAL_ACTION_TABLE') == table
+        except (IOError, SyntaxError):
+            up_to_date = False
+        # end try
+        if not up_to_date:
+            sys.stdout.write("'%s' is not up to date with the definition of an ethical action in '%s'.\n" % \
+                             (kernel_filename, theory_filename))
+            sys.exit(1)
+        # end if
+        sys.stdout.write("'%s' is up to date with the definition of an ethical action in '%s'.\n" % \
+                         (kernel_filename, theory_filename))
+        return
+    # end if
+
+    with open(kernel_filename, 'w') as kernel_file:
+        kernel_file.write(kernel)
+    # end with
+    sys.stdout.write("Compiled the definition of an ethical action in '%s' into '%s'.\n" % \
+                     (theory_filename, kernel_filename))
+# end def
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
+# end if
@@ -31,9 +31,9 @@
 # Expected output from a test suite run:
 #
 # $ ./naive_consent_theory.py
-# ................................
+# ........................................
 # ----------------------------------------------------------------------
-# Ran 32 tests in 0.001s
+# Ran 40 tests in 0.001s
 #
 # OK
 #
@@ -44,15 +44,55 @@
 #          The test suite has small modifications to catch issues that are not
 #          present in the functional version, and you should look out for these
 #          kind of issues if you make modifications.
+#
+#          The decision itself is not written by hand, though:
+#          is_ethical_action looks it up in the table in
+#          naive_consent_theory_kernel.py, which is compiled from the formal
+#          definition of an ethical action by compile_consent_theory.py. To
+#          check the table still matches both functional versions, run it with
+#          --check once on each of them:
+#
+#            python compile_consent_theory.py --check naive_consent_theory.tptp
+#            python compile_consent_theory.py --check naive_consent_theory.in
+#
+# Deciding ethical actions in batches (get_consent_columns and
+# are_ethical_actions) needs NumPy; the rest of this module doesn't.
 
+import random
 import unittest
+from array import array
+
+from naive_consent_theory_kernel import ETHICAL_ACTION_TABLE
 
 try:
-    from typing import Dict, List, Tuple  # noqa: F401
+    from typing import Any, Dict, List, Optional, Tuple  # noqa: F401
 except:
     pass
 # end try
 
+try:
+    import numpy
+except ImportError:
+    # NumPy is only needed for deciding ethical actions in batches.
+    numpy = None
+# end try
+
+
+# The array type code of unsigned 64-bit integers: 'L' where that's 64-bit
+# (as on most 64-bit platforms, though not Windows), or else 'Q' where the
+# array module has it (from Python 3.3). Where neither is, it's None, and a
+# ConsentLedger keeps the pairs of ids in a list of ints instead.
+if array('L').itemsize >= 8:
+    ledger_pair_typecode = 'L'  # type: Optional[str]
+else:
+    try:
+        array('Q')
+        ledger_pair_typecode = 'Q'
+    except ValueError:
+        ledger_pair_typecode = None
+    # end try
+# end if
+
 
 # Modelling of consent theory.
 
@@ -108,42 +148,549 @@ class Person:
         # type: (str, str) -> bool
         return (personAsking, action) in self.asked_for_consent
     # end def
+
+    def facts(self):
+        """Returns the facts about this person, as (kind, other person's name,
+           action) tuples, with the kinds of fact of ConsentLedger.
+        """
+        # type: () -> List[Tuple[int, str, str]]
+        return [(kind, otherName, action)
+                for (kind, facts) in
+                [(ConsentLedger.ASKED_FOR_CONSENT, self.asked_for_consent),
+                 (ConsentLedger.CONSENTED, self.consented),
+                 (ConsentLedger.ACTION, self.actions)]
+                for ((otherName, action), holds) in facts.items() if holds]
+    # end def
+# end class
+
+
+class SlottedPerson(object):
+    """Variant of Person for many people, most of whom take part in few
+       actions. It has the same methods and attributes, but no per-instance
+       __dict__, and allocates each of its dicts of facts only when it's
+       first used (reading a fact doesn't use it).
+    """
+
+    __slots__ = ('name', 'lazyActions', 'lazyAskedForConsent',
+                 'lazyConsented')
+
+    def __init__(self, name):
+        # type: (str) -> None
+        self.name = name  # type: str
+
+        self.lazyActions = None          # type: Optional[Dict[Tuple[str, str], bool]]
+        self.lazyAskedForConsent = None  # type: Optional[Dict[Tuple[str, str], bool]]
+        self.lazyConsented = None        # type: Optional[Dict[Tuple[str, str], bool]]
+    # end def
+
+    @property
+    def actions(self):
+        # type: () -> Dict[Tuple[str, str], bool]
+        if self.lazyActions is None:
+            self.lazyActions = {}
+        # end if
+        return self.lazyActions
+    # end def
+
+    @property
+    def asked_for_consent(self):
+        # type: () -> Dict[Tuple[str, str], bool]
+        if self.lazyAskedForConsent is None:
+            self.lazyAskedForConsent = {}
+        # end if
+        return self.lazyAskedForConsent
+    # end def
+
+    @property
+    def consented(self):
+        # type: () -> Dict[Tuple[str, str], bool]
+        if self.lazyConsented is None:
+            self.lazyConsented = {}
+        # end if
+        return self.lazyConsented
+    # end def
+
+    def consent_requested_by(self, personAsking, action):
+        # type: (str, str) -> None
+        self.asked_for_consent[(personAsking, action)] = True
+    # end def
+
+    def consents(self, personAsking, action):
+        """ This is a consent-positive model: only 'yes' counts as consent.
+            The absence of a 'no' does not grant consent.
+        """
+        # type: (str, str) -> bool
+        return self.lazyConsented is not None and \
+               self.lazyConsented.get((personAsking, action), False)
+    # end def
+
+    def does_not_consent(self, personAsking, action):
+        # type: (str, str) -> None
+        self.consented[(personAsking, action)] = False
+    # end def
+    revoke_consent = does_not_consent
+
+    def do(self, personAffected, action):
+        # type: (str, str) -> None
+        self.actions[(personAffected, action)] = True
+    # end def
+
+    def did(self, personAffected, action):
+        # type: (str, str) -> bool
+        return self.lazyActions is not None and \
+               (personAffected, action) in self.lazyActions
+    # end def
+
+    def give_consent(self, personAsking, action):
+        # type: (str, str) -> None
+        self.consented[(personAsking, action)] = True
+    # end def
+
+    def was_asked_for_consent(self, personAsking, action):
+        # type: (str, str) -> bool
+        return self.lazyAskedForConsent is not None and \
+               (personAsking, action) in self.lazyAskedForConsent
+    # end def
+
+    def facts(self):
+        # type: () -> List[Tuple[int, str, str]]
+        return [(kind, otherName, action)
+                for (kind, facts) in
+                [(ConsentLedger.ASKED_FOR_CONSENT, self.lazyAskedForConsent),
+                 (ConsentLedger.CONSENTED, self.lazyConsented),
+                 (ConsentLedger.ACTION, self.lazyActions)]
+                if facts is not None
+                for ((otherName, action), holds) in facts.items() if holds]
+    # end def
+# end class
+
+
+class ConsentLedger:
+    """Compact store of the consent facts of many people.
+
+       Person and action names are interned to integer ids. Each fact (that a
+       person was asked by another for consent for an action, that they
+       consent to another doing it, or that they did it to another) is held
+       in an open-addressed hash set of two arrays: one of the two people's
+       ids, and one of the action's id and the kind of fact. That takes 12
+       bytes per slot, rather than the tuples, strings and dict entries of a
+       Person's facts. (Where the array module has no 64-bit unsigned type,
+       the pairs of ids are held in a list instead; see ledger_pair_typecode.)
+
+       ledger.person(name) returns a view of the named person's facts, with
+       the methods of a Person.
+    """
+
+    # The kinds of fact (the lowest two bits of a slot in self.facts, which
+    # are 0 for a removed fact).
+    ASKED_FOR_CONSENT = 1
+    CONSENTED = 2
+    ACTION = 3
+
+    def __init__(self, capacity=8):
+        # type: (int) -> None
+        self.personIds = {}    # type: Dict[str, int]
+        self.personNames = []  # type: List[str]
+        self.actionIds = {}    # type: Dict[str, int]
+        self.actionNames = []  # type: List[str]
+
+        self.factCount = 0     # type: int
+        self.usedSlots = 0     # type: int
+        self.allocate(capacity)
+    # end def
+
+    def allocate(self, capacity):
+        """Allocate empty slots for facts, as many as the given power of two.
+        """
+        # type: (int) -> None
+        self.capacity = capacity
+        self.shift = 64 - (capacity.bit_length() - 1)
+        # The ids of the person the fact is about (in the high 32 bits) and
+        # the other person (in the low 32 bits) of each slot.
+        if ledger_pair_typecode is None:
+            self.pairs = [0] * capacity
+        else:
+            self.pairs = array(ledger_pair_typecode, [0]) * capacity
+        # end if
+        # The id of the action, plus one (above the lowest two bits), and the
+        # kind of fact (in them) of each slot, or 0 if it's empty.
+        self.facts = array('I', [0]) * capacity
+        self.usedSlots = 0
+    # end def
+
+    def intern_person(self, name):
+        "Returns the id of the named person, giving them one if need be."
+        # type: (str) -> int
+        personId = self.personIds.get(name)
+        if personId is None:
+            personId = len(self.personNames)
+            self.personIds[name] = personId
+            self.personNames.append(name)
+        # end if
+        return personId
+    # end def
+
+    def intern_action(self, action):
+        "Returns the id of the given action, giving it one if need be."
+        # type: (str) -> int
+        actionId = self.actionIds.get(action)
+        if actionId is None:
+            actionId = len(self.actionNames)
+            self.actionIds[action] = actionId
+            self.actionNames.append(action)
+        # end if
+        return actionId
+    # end def
+
+    def find_slot(self, pair, fact):
+        """Returns the slot holding the given fact (as its pair and fact
+           values), or if there's none, the slot to add it in, and whether
+           it's held there.
+        """
+        # type: (int, int) -> Tuple[int, bool]
+        mask = self.capacity - 1
+        slot = (((pair ^ (fact << 40)) * 0x9E3779B97F4A7C15) &
+                0xFFFFFFFFFFFFFFFF) >> self.shift
+        freeSlot = None
+        while True:
+            slotFact = self.facts[slot]
+            if slotFact == 0:
+                # An empty slot ends the search.
+                if freeSlot is None:
+                    freeSlot = slot
+                # end if
+                return (freeSlot, False)
+            elif slotFact == fact and self.pairs[slot] == pair:
+                return (slot, True)
+            elif slotFact & 3 == 0 and freeSlot is None:
+                # A removed fact's slot can be reused.
+                freeSlot = slot
+            # end if
+            slot = (slot + 1) & mask
+        # end while
+    # end def
+
+    def add(self, kind, name, otherName, action):
+        """Record the given kind of fact about the named person, the other
+           named person and the given action.
+        """
+        # type: (int, str, str, str) -> None
+        pair = (self.intern_person(name) << 32) | self.intern_person(otherName)
+        fact = ((self.intern_action(action) + 1) << 2) | kind
+        (slot, held) = self.find_slot(pair, fact)
+        if held:
+            return
+        # end if
+        if self.facts[slot] == 0:
+            # (Reusing a removed fact's slot doesn't use another.)
+            self.usedSlots += 1
+        # end if
+        self.pairs[slot] = pair
+        self.facts[slot] = fact
+        self.factCount += 1
+
+        # Keep at least a third of the slots empty, so searches end soon.
+        if self.usedSlots * 3 > self.capacity * 2:
+            self.rehash()
+        # end if
+    # end def
+
+    def remove(self, kind, name, otherName, action):
+        """Forget the given kind of fact about the named person, the other
+           named person and the given action, if it was recorded.
+        """
+        # type: (int, str, str, str) -> None
+        slot = self.find(kind, name, otherName, action)
+        if slot is not None:
+            # Leave the slot used, so searches carry on past it.
+            self.facts[slot] &= ~3
+            self.factCount -= 1
+        # end if
+    # end def
+
+    def find(self, kind, name, otherName, action):
+        """Returns the slot holding the given kind of fact about the named
+           person, the other named person and the given action, or None if it
+           isn't recorded.
+        """
+        # type: (int, str, str, str) -> Optional[int]
+        personId = self.personIds.get(name)
+        otherId = self.personIds.get(otherName)
+        actionId = self.actionIds.get(action)
+        if personId is None or otherId is None or actionId is None:
+            return None
+        # end if
+        (slot, held) = self.find_slot((personId << 32) | otherId,
+                                      ((actionId + 1) << 2) | kind)
+        if held:
+            return slot
+        # end if
+        return None
+    # end def
+
+    def holds(self, kind, name, otherName, action):
+        """Returns whether the given kind of fact about the named person, the
+           other named person and the given action is recorded.
+        """
+        # type: (int, str, str, str) -> bool
+        return self.find(kind, name, otherName, action) is not None
+    # end def
+
+    def rehash(self):
+        """Move the facts into new slots, twice as many unless most of the
+           used ones are for removed facts.
+        """
+        # type: () -> None
+        pairs = self.pairs
+        facts = self.facts
+        if self.factCount * 3 > self.capacity:
+            self.allocate(self.capacity * 2)
+        else:
+            self.allocate(self.capacity)
+        # end if
+        for (pair, fact) in zip(pairs, facts):
+            if fact & 3 != 0:
+                (slot, held) = self.find_slot(pair, fact)
+                self.pairs[slot] = pair
+                self.facts[slot] = fact
+                self.usedSlots += 1
+            # end if
+        # end for
+    # end def
+
+    def facts_about(self, name):
+        """Returns the facts about the named person, as (kind, other person's
+           name, action) tuples. (This looks through every slot.)
+        """
+        # type: (str) -> List[Tuple[int, str, str]]
+        personId = self.personIds.get(name)
+        if personId is None:
+            return []
+        # end if
+        return [(fact & 3, self.personNames[pair & 0xFFFFFFFF],
+                 self.actionNames[(fact >> 2) - 1])
+                for (pair, fact) in zip(self.pairs, self.facts)
+                if fact & 3 != 0 and pair >> 32 == personId]
+    # end def
+
+    def __len__(self):
+        # type: () -> int
+        return self.factCount
+    # end def
+
+    def person(self, name):
+        "Returns a view of the named person's facts, with Person's methods."
+        # type: (str) -> LedgerPerson
+        return LedgerPerson(self, name)
+    # end def
+# end class
+
+
+class LedgerPerson(object):
+    """A view of a person's facts in a ConsentLedger, with the methods of a
+       Person (see those for what they do).
+    """
+
+    __slots__ = ('ledger', 'name')
+
+    def __init__(self, ledger, name):
+        # type: (ConsentLedger, str) -> None
+        self.ledger = ledger  # type: ConsentLedger
+        self.name = name      # type: str
+    # end def
+
+    def __eq__(self, other):
+        # type: (object) -> bool
+        return isinstance(other, LedgerPerson) and \
+            other.ledger is self.ledger and other.name == self.name
+    # end def
+
+    def __ne__(self, other):
+        # type: (object) -> bool
+        return not self == other
+    # end def
+
+    def __hash__(self):
+        # type: () -> int
+        return hash(self.name)
+    # end def
+
+    def consent_requested_by(self, personAsking, action):
+        # type: (str, str) -> None
+        self.ledger.add(ConsentLedger.ASKED_FOR_CONSENT, self.name,
+                        personAsking, action)
+    # end def
+
+    def consents(self, personAsking, action):
+        # type: (str, str) -> bool
+        return self.ledger.holds(ConsentLedger.CONSENTED, self.name,
+                                 personAsking, action)
+    # end def
+
+    def does_not_consent(self, personAsking, action):
+        # type: (str, str) -> None
+        self.ledger.remove(ConsentLedger.CONSENTED, self.name, personAsking,
+                           action)
+    # end def
+    revoke_consent = does_not_consent
+
+    def do(self, personAffected, action):
+        # type: (str, str) -> None
+        self.ledger.add(ConsentLedger.ACTION, self.name, personAffected,
+                        action)
+    # end def
+
+    def did(self, personAffected, action):
+        # type: (str, str) -> bool
+        return self.ledger.holds(ConsentLedger.ACTION, self.name,
+                                 personAffected, action)
+    # end def
+
+    def give_consent(self, personAsking, action):
+        # type: (str, str) -> None
+        self.ledger.add(ConsentLedger.CONSENTED, self.name, personAsking,
+                        action)
+    # end def
+
+    def was_asked_for_consent(self, personAsking, action):
+        # type: (str, str) -> bool
+        return self.ledger.holds(ConsentLedger.ASKED_FOR_CONSENT, self.name,
+                                 personAsking, action)
+    # end def
+
+    def facts(self):
+        # type: () -> List[Tuple[int, str, str]]
+        return self.ledger.facts_about(self.name)
+    # end def
 # end class
 
 
 def is_ethical_action(personA, personB, action):
     """Decide whether the given action between the given person or people is
        ethical.
+
+       The decision is looked up in ETHICAL_ACTION_TABLE (compiled from the
+       formal definition of an ethical action), indexed by whether consent
+       was asked for, whether it was given, whether the action was done, and
+       whether it was done to the person doing it.
     """
     # type: (Person, Person, str) -> bool
     aName = personA.name
     bName = personB.name
-    # It is ethical to ask for consent,
-    # get consent for that action,
-    # and then either do, or do not do that action.
-    if (personB.was_asked_for_consent(aName, action) and
-        personB.consents(aName, action) and
-        (personA.did(bName, action) or
-         (not personA.did(bName, action)))):
-        return True
-    # end if
+    return ETHICAL_ACTION_TABLE[personB.was_asked_for_consent(aName, action) +
+                                2 * personB.consents(aName, action) +
+                                4 * personA.did(bName, action) +
+                                8 * (personA == personB)]
+# end def
+
+
+# The most (actor, target, action) triples to hold the consent state of in full
+# columns (see get_consent_columns), of a byte each.
+dense_consent_column_limit = 2 ** 26
 
-    # It is ethical to ask for consent,
-    # not get consent for that action,
-    # and then not do that action.
-    if (personB.was_asked_for_consent(aName, action) and
-        ((not personB.consents(aName, action)) and
-         (not personA.did(bName, action)))):
-        return True
-    # end if
 
-    # It is ethical to do - or not do - an action to yourself.
-    if personA == personB:
-        return True
+def get_consent_columns(people, actions, dense=None):
+    """Gather the consent state of the given people into columns, for deciding
+       ethical actions between them in batches (see are_ethical_actions).
+
+       People and actions are given ids by their positions in the given
+       lists, and each (actor, target, action) triple by its key, (actor *
+       people + target) * actions + action. The 'facts' column holds the bits
+       of which facts hold for each triple: that the actor asked the target
+       for consent for the action (1), that the target consents to it (2),
+       and that the actor did it to the target (4). If dense (by default, if
+       there are no more than dense_consent_column_limit triples), it holds
+       them for every key; otherwise, it holds them for the sorted keys in the
+       'keys' column, of the triples any fact holds for. Facts about anyone or
+       any action not in the lists are left out.
+    """
+    # type: (List[Person], List[str], bool) -> Dict[str, Any]
+    if numpy is None:
+        raise ImportError("Deciding ethical actions in batches needs NumPy.")
+    # end if
+    personIds = dict([(person.name, personId)
+                      for (personId, person) in enumerate(people)])
+    actionIds = dict([(action, actionId)
+                      for (actionId, action) in enumerate(actions)])
+
+    # Gather the facts (through each person's facts method, so any model of
+    # people will do), as keys and their bits, and whether the person is the
+    # actor or the target of the triple.
+    factBits = {ConsentLedger.ASKED_FOR_CONSENT: (1, False),
+                ConsentLedger.CONSENTED: (2, False),
+                ConsentLedger.ACTION: (4, True)}
+    keys = []  # type: List[int]
+    bits = []  # type: List[int]
+    for (personId, person) in enumerate(people):
+        for (kind, otherName, action) in person.facts():
+            if otherName in personIds and action in actionIds:
+                (bit, isActor) = factBits[kind]
+                if isActor:
+                    (actorId, targetId) = (personId, personIds[otherName])
+                else:
+                    (actorId, targetId) = (personIds[otherName], personId)
+                # end if
+                keys.append((actorId * len(people) + targetId) *
+                            len(actions) + actionIds[action])
+                bits.append(bit)
+            # end if
+        # end for
+    # end for
+
+    columns = {'people': len(people), 'actions': len(actions)}
+    keyArray = numpy.array(keys, dtype=numpy.int64)
+    bitArray = numpy.array(bits, dtype=numpy.uint8)
+    tripleCount = len(people) * len(people) * len(actions)
+    if dense is None:
+        dense = tripleCount <= dense_consent_column_limit
     # end if
+    if dense:
+        # Hold the facts for every key, to look them up directly.
+        columns['keys'] = None
+        columns['facts'] = numpy.zeros(tripleCount, dtype=numpy.uint8)
+        numpy.bitwise_or.at(columns['facts'], keyArray, bitArray)
+    else:
+        # Hold the facts for the keys any hold for, to search for them.
+        columns['keys'], positions = numpy.unique(keyArray,
+                                                  return_inverse=True)
+        columns['facts'] = numpy.zeros(len(columns['keys']),
+                                       dtype=numpy.uint8)
+        numpy.bitwise_or.at(columns['facts'], positions, bitArray)
+    # end if
+    return columns
+# end def
+
+
+def are_ethical_actions(columns, actors, targets, actions):
+    """Decide whether each of the given actions between the given people (as
+       arrays of ids, see get_consent_columns) is ethical, returning an array
+       of the decisions.
 
-    # If we're here, assume this is an unethical action.
-    return False
+       As for is_ethical_action, the decisions are looked up in
+       ETHICAL_ACTION_TABLE, but for all the actions at once.
+    """
+    # type: (Dict[str, Any], Any, Any, Any) -> Any
+    if numpy is None:
+        raise ImportError("Deciding ethical actions in batches needs NumPy.")
+    # end if
+    actors = numpy.asarray(actors, dtype=numpy.int64)
+    targets = numpy.asarray(targets, dtype=numpy.int64)
+    actions = numpy.asarray(actions, dtype=numpy.int64)
+    keys = (actors * columns['people'] + targets) * columns['actions'] + \
+        actions
+    if columns['keys'] is None:
+        facts = columns['facts'][keys]
+    elif len(columns['keys']) == 0:
+        facts = numpy.zeros(len(keys), dtype=numpy.uint8)
+    else:
+        positions = numpy.minimum(numpy.searchsorted(columns['keys'], keys),
+                                  len(columns['keys']) - 1)
+        facts = numpy.where(columns['keys'][positions] == keys,
+                            columns['facts'][positions], 0)
+    # end if
+    # (The bits of the facts are those of ETHICAL_ACTION_TABLE's index.)
+    index = facts + 8 * (actors == targets).astype(numpy.uint8)
+    return numpy.array(ETHICAL_ACTION_TABLE, dtype=bool)[index]
 # end def
 
 
@@ -634,6 +1181,228 @@ class EthicsTest(unittest.TestCase):
 # end class
 
 
+class PersonModelChecks(object):
+    """ Checks that a model of people (given by make_person) records the same
+        facts, and so makes the same ethical decisions, as Person. Mixed into
+        the test case of each model.
+    """
+
+    def make_person(self, name):
+        """Returns a new person with the given name, of the model checked."""
+        # type: (str) -> Any
+        raise NotImplementedError()
+    # end def
+
+    def record_facts(self, makePerson, mix, same, asked, consent, did):
+        """Returns an actor and a target made by the given function (the same
+           person, if same), named apart by the given number of the mix of
+           facts, with these facts recorded between them: that the target was
+           asked for consent, their consent ('given', 'denied', 'revoked' or
+           None), and that the actor did the action.
+        """
+        # type: (Any, int, bool, bool, Optional[str], bool) -> Tuple[Any, Any]
+        actor = makePerson('Alex %s' % mix)
+        if same:
+            target = actor
+        else:
+            target = makePerson('Bo %s' % mix)
+        # end if
+
+        if asked:
+            target.consent_requested_by(actor.name, 'action')
+        # end if
+        if consent in ('given', 'revoked'):
+            target.give_consent(actor.name, 'action')
+        # end if
+        if consent in ('denied', 'revoked'):
+            target.does_not_consent(actor.name, 'action')
+        # end if
+        if did:
+            actor.do(target.name, 'action')
+        # end if
+        return (actor, target)
+    # end def
+
+    def test_decisions_match_person_decisions(self):
+        "Every mix of facts is recorded and decided as Person would"
+        # type: () -> None
+
+        mix = 0
+        for same in [False, True]:
+            for asked in [False, True]:
+                for consent in [None, 'given', 'denied', 'revoked']:
+                    for did in [False, True]:
+                        mix += 1
+                        (actor, target) = self.record_facts(
+                            self.make_person, mix, same, asked, consent, did)
+                        (person, other) = self.record_facts(
+                            Person, mix, same, asked, consent, did)
+                        self.assertEqual(
+                            (sorted(actor.facts()), sorted(target.facts()),
+                             is_ethical_action(actor, target, 'action')),
+                            (sorted(person.facts()), sorted(other.facts()),
+                             is_ethical_action(person, other, 'action')),
+                            "Every mix of facts is recorded and decided as " +
+                            "Person would")
+                    # end for
+                # end for
+            # end for
+        # end for
+    # end def
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_batch_decisions_match_single_decisions(self):
+        "Deciding ethical actions in a batch matches deciding them singly"
+        # type: () -> None
+
+        people = [self.make_person(name)
+                  for name in ['Alex', 'Bo', 'Cass', 'Dee']]
+        actions = ['action', 'other action']
+
+        # Record facts between random people, for random actions.
+        randomState = random.Random(0)
+        for index in range(40):
+            actor = randomState.choice(people)
+            target = randomState.choice(people)
+            action = randomState.choice(actions)
+            if index % 4 == 0:
+                target.consent_requested_by(actor.name, action)
+            elif index % 4 == 1:
+                target.give_consent(actor.name, action)
+            elif index % 4 == 2:
+                target.does_not_consent(actor.name, action)
+            else:
+                actor.do(target.name, action)
+            # end if
+        # end for
+
+        triples = [(actorId, targetId, actionId)
+                   for actorId in range(len(people))
+                   for targetId in range(len(people))
+                   for actionId in range(len(actions))]
+        for dense in [True, False]:
+            columns = get_consent_columns(people, actions, dense)
+            decisions = are_ethical_actions(columns,
+                                            [triple[0] for triple in triples],
+                                            [triple[1] for triple in triples],
+                                            [triple[2] for triple in triples])
+            self.assertEqual([bool(decision) for decision in decisions],
+                             [is_ethical_action(people[actorId],
+                                                people[targetId],
+                                                actions[actionId])
+                              for (actorId, targetId, actionId) in triples],
+                             "Deciding ethical actions in a batch matches " +
+                             "deciding them singly")
+        # end for
+    # end def
+# end class
+
+
+class PersonTest(PersonModelChecks, unittest.TestCase):
+    "Runs the checks of PersonModelChecks on Person."
+
+    def make_person(self, name):
+        # type: (str) -> Person
+        return Person(name)
+    # end def
+# end class
+
+
+class ConsentLedgerTest(PersonModelChecks, unittest.TestCase):
+    "Runs the checks of PersonModelChecks on people viewed in a ConsentLedger."
+
+    def setUp(self):
+        # type: () -> None
+        self.ledger = ConsentLedger()
+    # end def
+
+    def make_person(self, name):
+        # type: (str) -> LedgerPerson
+        return self.ledger.person(name)
+    # end def
+
+    def test_ledger_matches_people_through_growth_and_removal(self):
+        "The ledger records what people would, as it grows and forgets facts"
+        # type: () -> None
+
+        names = ['person %s' % index for index in range(30)]
+        actions = ['action %s' % index for index in range(5)]
+        people = dict([(name, Person(name)) for name in names])
+
+        # Record facts, and withdraw some of the consents, in a random order.
+        randomState = random.Random(0)
+        for index in range(3000):
+            name = randomState.choice(names)
+            otherName = randomState.choice(names)
+            action = randomState.choice(actions)
+            kind = randomState.randrange(4)
+            for person in [people[name], self.ledger.person(name)]:
+                if kind == 0:
+                    person.consent_requested_by(otherName, action)
+                elif kind == 1:
+                    person.give_consent(otherName, action)
+                elif kind == 2:
+                    person.do(otherName, action)
+                else:
+                    person.does_not_consent(otherName, action)
+                # end if
+            # end for
+        # end for
+
+        for name in names:
+            for otherName in names:
+                for action in actions:
+                    person = people[name]
+                    view = self.ledger.person(name)
+                    self.assertEqual(
+                        (view.was_asked_for_consent(otherName, action),
+                         view.consents(otherName, action),
+                         view.did(otherName, action)),
+                        (person.was_asked_for_consent(otherName, action),
+                         person.consents(otherName, action),
+                         person.did(otherName, action)),
+                        "The ledger records what people would")
+                # end for
+            # end for
+        # end for
+    # end def
+# end class
+
+
+class SlottedPersonTest(PersonModelChecks, unittest.TestCase):
+    "Runs the checks of PersonModelChecks on SlottedPerson."
+
+    def make_person(self, name):
+        # type: (str) -> SlottedPerson
+        return SlottedPerson(name)
+    # end def
+
+    def test_idle_slotted_person_allocates_no_facts(self):
+        "A slotted person only allocates the facts they take part in"
+        # type: () -> None
+
+        alex = SlottedPerson('Alex')
+
+        # Reading facts doesn't allocate anything.
+        self.assertFalse(alex.was_asked_for_consent('Bo', 'action') or
+                         alex.consents('Bo', 'action') or
+                         alex.did('Bo', 'action'),
+                         "An idle slotted person has no facts")
+        self.assertEqual((alex.lazyActions, alex.lazyAskedForConsent,
+                          alex.lazyConsented), (None, None, None),
+                         "An idle slotted person allocates no facts")
+
+        # Recording one kind of fact only allocates that kind.
+        alex.do('Bo', 'action')
+        self.assertEqual((alex.actions, alex.lazyAskedForConsent,
+                          alex.lazyConsented),
+                         ({('Bo', 'action'): True}, None, None),
+                         "A slotted person only allocates the facts they " +
+                         "take part in")
+    # end def
+# end class
+
+
 if __name__ == '__main__':
     # Run the tests built into this module.
     unittest.main()
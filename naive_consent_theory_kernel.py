@@ -0,0 +1,27 @@
+# Generated by compile_consent_theory.py from the definition of an ethical action in naive_consent_theory.tptp.
+#
+# Don't edit this file; edit the definition, and compile it again:
+#
+#     python compile_consent_theory.py naive_consent_theory.tptp
+
+# Whether an action is ethical, for each combination of whether consent for it was asked for, whether
+# consent was given, whether it was done, and whether it was done to the person doing it, indexed by
+# asked + 2 * consents + 4 * did + 8 * same.
+ETHICAL_ACTION_TABLE = (
+    False,  #  0: not asked, no consent, not done, to another person
+    True,   #  1: asked, no consent, not done, to another person
+    False,  #  2: not asked, consents, not done, to another person
+    True,   #  3: asked, consents, not done, to another person
+    False,  #  4: not asked, no consent, done, to another person
+    False,  #  5: asked, no consent, done, to another person
+    False,  #  6: not asked, consents, done, to another person
+    True,   #  7: asked, consents, done, to another person
+    True,   #  8: not asked, no consent, not done, to themself
+    True,   #  9: asked, no consent, not done, to themself
+    True,   # 10: not asked, consents, not done, to themself
+    True,   # 11: asked, consents, not done, to themself
+    True,   # 12: not asked, no consent, done, to themself
+    True,   # 13: asked, no consent, done, to themself
+    True,   # 14: not asked, consents, done, to themself
+    True,   # 15: asked, consents, done, to themself
+)
@@ -1,5 +1,7 @@
 #!/usr/bin/env python
-"""Usage: python run_as_prover9_test_suite.py [-n|--dry-run] [-v|--verbose] <Prover 9 input file to test> [<tests to run>]*
+"""Usage: python run_as_prover9_test_suite.py [-j N|--jobs=N] [-n|--dry-run] [-t SECONDS|--timeout=SECONDS] [--no-cache] [--clear-cache] [--stream] [--pipeline] [--mace4] [-v|--verbose] [--shard=i/n] [--json=FILE] [--junit=FILE] [--benchmark] [--memory-limit=MB] [--memory-budget=MB] [--escalate=SECONDS[:MB],...] [--escalation-budget=SECONDS] [--no-dedupe] [--lemmas] [--select-axioms=DEPTH] <Prover 9 input file to test> [<tests to run>]*
+       python run_as_prover9_test_suite.py [-v|--verbose] merge <shard results file>*
+       python run_as_prover9_test_suite.py [-v|--verbose] [--threshold=PERCENT] compare [<earlier run> [<later run>]]
 
 Processes the given Prover9 input file (e.g. input.in), searching for test case markup that denotes
 separate tests for a central model or theorem.
@@ -16,6 +18,128 @@ Usage examples:
        python run_as_prover9_test_suite.py naive_consent_theory.in asking_and_getting_consent_is_ethical
 
 
+   Run all the tests in that theory file, at most four at a time (by default, as many test cases are run at once
+   as there are CPU cores; the results are always displayed in the order the test cases appear in the file):
+
+       python run_as_prover9_test_suite.py -j 4 naive_consent_theory.in
+
+
+   Show the order the tests in that theory file would be run in, four at a time, and estimate how long the run would
+   take, without running any prover (the run time of each test case is recorded in results/history.json, and when
+   running more than one test case at a time, the longest are started first):
+
+       python run_as_prover9_test_suite.py -n -j 4 naive_consent_theory.in
+
+
+   Run the tests in that theory file across three machines, running the first of three shards on this one (the
+   test cases are shared out so each shard takes about as long as the others, going by results/history.json, which
+   must be the same on every machine, or else in turn), writing its results to results/shard-1-of-3.json:
+
+       python run_as_prover9_test_suite.py --shard=1/3 naive_consent_theory.in
+
+
+   Merge the results of the three shards, displaying them as for a single run (and adding the run times recorded
+   by the shards to results/history.json, for sharing out the test cases next time):
+
+       python run_as_prover9_test_suite.py merge shard-1-of-3.json shard-2-of-3.json shard-3-of-3.json
+
+
+   Run all the tests in that theory file, writing a report on each test case (its result, wall time, CPU time, peak
+   memory use, and the prover's search statistics) to results.jsonl, as JSON lines, and to results.xml, as JUnit
+   XML, as each test case finishes:
+
+       python run_as_prover9_test_suite.py --json=results.jsonl --junit=results.xml naive_consent_theory.in
+
+
+   Run all the tests in that theory file as a benchmark, without using the result cache, or deduping the test cases
+   (see --no-dedupe), recording the time and search effort of each test case in results/benchmarks.db, tagged with
+   the git commit of the theory file (with a '+' appended if it has uncommitted changes):
+
+       python run_as_prover9_test_suite.py --benchmark naive_consent_theory.in
+
+
+   Run all the tests in that theory file, limiting each prover process to 1 GB of memory (by default, 2 GB; 0
+   for no limit), and starting provers only while the limits of those running add up to no more than 4 GB (by
+   default, the machine's physical memory; 0 for no budget), so that running many at once can't exhaust the memory
+   of a shared machine (the largest peak memory use of a prover is shown at the end, for tuning these, as it is
+   with -v):
+
+       python run_as_prover9_test_suite.py -j 8 --memory-limit=1024 --memory-budget=4096 naive_consent_theory.in
+
+
+   Run all the tests in that theory file with a time limit of 10 seconds each, and then run those that were
+   inconclusive, or timed out, again with a time limit of 60 seconds, and those still unsettled with a time limit of
+   300 seconds and a memory limit of 4 GB, spending no more than 10 minutes on these re-runs in all (the limits each
+   test case needed are shown with its details, and totalled at the end):
+
+       python run_as_prover9_test_suite.py --escalate=10,60,300:4096 --escalation-budget=600 naive_consent_theory.in
+
+
+   Run all the tests in that theory file, running the prover on every test case, even those whose goals are the
+   same problem as an earlier test case's (by default, such test cases, i.e. those the same up to the renaming of
+   names not used outside the test case, whether negated or not, take their result from the earlier test case,
+   and the prover runs saved are shown at the end with -v):
+
+       python run_as_prover9_test_suite.py --no-dedupe naive_consent_theory.in
+
+
+   Run all the tests in that theory file, proving the lemmas in it first (those marked up with '% Lemma: '), in
+   order, and adding each one proved to the non-test matter of the test cases after it, as an axiom (the lemmas
+   proved are kept in the result cache, by the theory they were proved in, and aren't proved again while that's
+   unchanged):
+
+       python run_as_prover9_test_suite.py --lemmas naive_consent_theory.in
+
+
+   Run all the tests in that theory file, proving each test case against only the axioms relevant to it at first
+   (those sharing a symbol with the test case, or, to a depth of 2, with those axioms), and running it again against
+   all of the axioms if that doesn't prove it (the number of axioms selected for each test case, and how much
+   faster it was than its last run against all of them, are shown with its details, and summed up at the end):
+
+       python run_as_prover9_test_suite.py --select-axioms=2 naive_consent_theory.in
+
+
+   Compare the latest two benchmark runs, flagging the test cases whose prover CPU time or search statistics (e.g.
+   the number of clauses generated) rose by more than 20%, and exiting with status 1 if any did (runs can also be
+   given, earlier first, by their run numbers, or by their git commits, for the latest run at each):
+
+       python run_as_prover9_test_suite.py --threshold=20 compare
+
+
+   Run all the tests in that theory file through the prover again, without using the result cache (by default,
+   the results of earlier runs are kept in results/cache, and reused while the prover, its options, the test
+   case and the non-test matter are all unchanged, while test cases whose last proofs only used axioms that are
+   unchanged since aren't run again at all, whatever else has changed; --clear-cache empties this cache before the
+   run):
+
+       python run_as_prover9_test_suite.py --no-cache naive_consent_theory.in
+
+
+   Run all the tests in that theory file, reading the prover output straight from a pipe as it is produced, and
+   only writing it out to the results directory for the test cases whose details will be displayed:
+
+       python run_as_prover9_test_suite.py --stream naive_consent_theory.in
+
+
+   Run all the tests in that theory file, stopping the prover on any test case that runs for more than 60 seconds
+   (or for as long as the test case's own '% Timeout:' markup allows), and reporting it as timed out ('T'):
+
+       python run_as_prover9_test_suite.py -t 60 naive_consent_theory.in
+
+
+   Run all the tests in that theory file, starting each test case as soon as it has been split from the file,
+   rather than once the whole file has been split (all of the non-test matter, other than comments, must then
+   come before the first test case):
+
+       python run_as_prover9_test_suite.py --pipeline naive_consent_theory.in
+
+
+   Run all the tests in that theory file, racing Mace4 against Prover 9 on each test case, so that the test
+   cases which have a counter-model are settled as soon as it is found (see below):
+
+       python run_as_prover9_test_suite.py --mace4 naive_consent_theory.in
+
+
 Markup description:
 
  - '% Test runner: begin tests.'         denotes the beginning of the section(s) which will be split into test cases.
@@ -27,6 +151,12 @@ Markup description:
                                          negated/inverted, with successful proof of any conjectures indicating
                                          failure of the test.
  - '% Test case: this_is_the_first_test' denotes a test case with name 'this_is_the_first_test'.
+ - '% Lemma: '                           denotes the beginning of a test case whose goal is a general lemma, which,
+                                         with --lemmas, is proved first, and then given to the test cases after it
+                                         as an assumption.
+ - '% Timeout: 30'                      within a test case, denotes that the prover should be stopped if it runs for
+                                         more than the given number of seconds (of wall-clock time) on that test case,
+                                         overriding any suite-wide time limit given with -t or --timeout=.
 
 
 Prover installation:
@@ -38,24 +168,223 @@ This can be done on Debian/Ubuntu systems with the following command:
 
     sudo aptitude install prover9
 
+which also installs its counter-model finder, Mace4, with binary at /usr/bin/mace4
+
+With the --mace4 option, Mace4 is run alongside Prover 9 on each negated test case, looking for a counter-model
+(i.e. a model of the non-test matter in which the goal is false); as soon as either Prover 9 proves the goal, or
+Mace4 finds a counter-model, the test case is settled and the other is stopped. This settles the test cases which
+aren't provable as soon as a counter-model is found, rather than once Prover 9 has exhausted its search. (Other
+test cases are run through Prover 9 alone, as a goal expected to be proved can't have a counter-model.)
+
 """
 
 import getopt
+import hashlib
 import os
 import os.path
+import Queue
 import re
 import string
 import subprocess
 import sys
 import tempfile
+import threading
+import time
+
+import run_as_test_suite
+from run_as_test_suite import (admit_provers, compare_benchmark_runs, default_jobs, default_memory_budget,
+                               default_memory_limit, default_regression_threshold, feed_prover_input,
+                               get_test_case_text, goal_token_pattern, kill_timed_out_process,
+                               kill_timed_out_processes, limit_prover_resources, merge_shard_results,
+                               parse_escalation_tiers, parse_shard, read_cached_result, release_provers,
+                               split_statement_spans, split_statements, stop_racing_provers, store_streamed_output,
+                               strip_comments, test_case_time_limit, wait_for_prover, write_cached_result)
+
+prover9_bin = "/usr/bin/prover9"
+prover9_options = []
+
+mace4_bin = "/usr/bin/mace4"
+mace4_options = ["-c"]
 
 def usage():
     """ Displays the usage information for this program. """
-    sys.stdout.write("Usage: python run_as_prover9_test_suite.py [-n|--dry-run] ")
+    sys.stdout.write("Usage: python run_as_prover9_test_suite.py [-j <number of tests to run at once>|--jobs=<number>] ")
+    sys.stdout.write("[-n|--dry-run] [--no-cache] [--clear-cache] [--stream] [--pipeline] [--mace4] ")
+    sys.stdout.write("[-t <time limit per test case, in seconds>|--timeout=<seconds>] ")
+    sys.stdout.write("[--shard=<i>/<n>] [--json=<JSON lines report file>] [--junit=<JUnit XML report file>] ")
+    sys.stdout.write("[--benchmark] [--memory-limit=<megabytes per prover>] [--memory-budget=<megabytes in all>] ")
+    sys.stdout.write("[--escalate=<seconds>[:<megabytes>],...] [--escalation-budget=<seconds>] [--no-dedupe] [--lemmas] ")
+    sys.stdout.write("[--select-axioms=<depth>] ")
     sys.stdout.write("[-v|--verbose] <Prover 9 input file to test> [<test to run>]\n")
+    sys.stdout.write("       python run_as_prover9_test_suite.py [-v|--verbose] merge <shard results file>*\n")
+    sys.stdout.write("       python run_as_prover9_test_suite.py [-v|--verbose] [--threshold=<percentage>] ")
+    sys.stdout.write("compare [<earlier run> [<later run>]]\n")
 # end def
 
-def run_test_case(test_case = {}, non_test_matter = "", result_filename = "", dry_run = False, verbosity = 0):
+def prover_version(prover_bin = ""):
+    """ Returns a string identifying the installed version of the given prover binary.
+
+        This is taken from the size and modification time of the binary, which change whenever the prover is
+        rebuilt, upgraded or replaced, without needing to know how each prover reports its version.
+    """
+    try:
+        stat = os.stat(prover_bin)
+        return "%s:%s:%s" % (prover_bin, stat.st_size, int(stat.st_mtime))
+    except OSError:
+        return prover_bin
+    # end try
+# end def
+
+def split_prover9_input(input_filename, dry_run = False, verbosity = 0):
+    """ Splits the Prover 9 input file with the given filename, extracting non-test matter, and
+        collating named (if available) test case portions in a dictionary.
+
+        (See run_as_test_suite.split_input, which does the splitting for both runners.)
+    """
+    return run_as_test_suite.split_input(input_filename, dry_run = dry_run, verbosity = verbosity)
+# end def
+
+def result_cache_key(non_test_matter = "", test_case_text = "", prover_bin = "", prover_options = []):
+    """ Returns the key for the cached result of running the given prover input through the given prover.
+
+        The key is a hash of everything that can change the prover's output: the non-test matter, the test
+        text, the prover binary and version, and the prover options.
+    """
+    key = hashlib.sha1()
+    for part in [non_test_matter, test_case_text, prover_version(prover_bin)] + prover_options:
+        # Prefix each part with its length, so the parts can't run into each other.
+        key.update("%s:" % len(part))
+        key.update(part)
+    # end for
+    return key.hexdigest()
+# end def
+
+def prover_cache_key(non_test_matter = "", test_case_text = "", prover_argv = [], memory_limit = 0, timeout = 0):
+    """ Returns the key for the cached result of running the given prover input through the prover with the given
+        argv (its binary, and the options exactly as passed to it), under the given memory limit (in megabytes) and
+        time limit (in seconds), either of which may be 0 for none. The limits are part of the key, so that a result
+        reached under one set of limits (e.g. a give-up) is never reused for a run under others (e.g. an escalated
+        one).
+    """
+    return result_cache_key(non_test_matter, test_case_text, prover_argv[0],
+                            prover_argv[1:] + ["memory_limit=%s" % memory_limit, "timeout=%s" % timeout])
+# end def
+
+def prover_output_patterns(prover = 'prover9'):
+    """ Returns the regular expressions used to read the output of Prover 9 (or of Mace4, if given), as a tuple of:
+         - a list of (pattern, status) pairs, matching the lines that indicate the status of a run, and
+         - a pattern matching the start of the search section of the output (or the counter-model found by Mace4),
+           which is shown for failed tests.
+    """
+    if prover == 'mace4':
+        status_patterns = [(re.compile('Exiting with [1-9][0-9]* models?'), 'F')]
+        search_section = re.compile('=+\s*MODEL\s*=+', re.IGNORECASE)
+    else:
+        status_patterns = [(re.compile('THEOREM PROVED'), 'S'),
+                           (re.compile('SEARCH FAILED'), 'F')]
+        search_section = re.compile('=+\s*CLAUSES FOR SEARCH\s*=+', re.IGNORECASE)
+    # end if
+    return (status_patterns, search_section)
+# end def
+
+def classify_prover_output(lines = [], output_lines = None, prover = 'prover9'):
+    """ Reads the given lines of prover output (from a list, file, or pipe) in a single pass, returning a tuple
+        of the status they indicate (as returned by run_test_case), and the excerpt of the output from the start
+        of the search section onwards.
+
+        The status is settled as soon as a line indicating success or failure is read. If a list of output lines is given, each line read
+        is appended to it. The output is read as Prover 9's, unless it's given as Mace4's (which only ever indicates
+        failure, i.e. that a counter-model was found).
+    """
+    status_patterns, search_section = prover_output_patterns(prover)
+    status = 'E'
+    excerpt = []
+    in_search_results = False
+    for line in lines:
+        if output_lines != None:
+            output_lines.append(line)
+        # end if
+
+        # Check the line for certain strings that indicate success, failure, or error.
+        if status == 'E':
+            for (status_pattern, line_status) in status_patterns:
+                if status_pattern.match(line) != None:
+                    status = line_status
+                    break
+                # end if
+            # end for
+        # end if
+
+        # Collect the search section, and what follows that.
+        if not in_search_results:
+            if search_section.match(line) != None:
+                in_search_results = True
+            # end if
+        # end if
+        if in_search_results:
+            excerpt.append(line)
+        # end if
+    # end for
+    return (status, string.join(excerpt, ''))
+# end def
+
+def prover_command(prover = 'prover9'):
+    """ Returns a tuple of the binary and options used to run Prover 9 (or Mace4, if given).
+    """
+    if prover == 'mace4':
+        return (mace4_bin, mace4_options)
+    else:
+        return (prover9_bin, prover9_options)
+    # end if
+# end def
+
+def start_prover(prover = 'prover9', non_test_matter = "", test_case_text = "", results_file = None,
+                 memory_limit = 0, timeout = 0):
+    """ Starts Prover 9 (or Mace4, if given) on the given non-test matter and test text in a new process group, with
+        its output (and errors) going to the given results file or pipe, returning the prover process. The prover's
+        memory (in megabytes) and CPU time are limited by the given memory limit and timeout (see
+        limit_prover_resources).
+
+        The input is streamed straight into the prover's stdin pipe from memory (see feed_prover_input).
+    """
+    (prover_bin, prover_options) = prover_command(prover)
+
+    # Run the prover, in a process group of its own, so that it (and anything it starts) can be killed together.
+    # (Other file descriptors are closed, so that no other prover holds on to this one's pipes.)
+    preexec = limit_prover_resources(memory_limit, timeout)
+    process = subprocess.Popen([prover_bin] + prover_options, stdin = subprocess.PIPE, stdout = results_file,
+                               stderr = subprocess.STDOUT, preexec_fn = preexec, close_fds = True)
+    feeder = threading.Thread(target = feed_prover_input, args = [process, [non_test_matter, test_case_text]])
+    feeder.daemon = True
+    feeder.start()
+    return process
+# end def
+
+def prover_statistics_pattern(prover = 'prover9'):
+    """ Returns the regular expression matching the search statistics given in the output of Prover 9 (or Mace4, if
+        given), with groups for the name and (numeric) value of each; e.g. 'Given=5. Generated=13. Kept=10.'
+    """
+    return re.compile(r'(?:^|[ \t,.])([A-Za-z][A-Za-z_]*)=([0-9]+(?:\.[0-9]+)?)', re.MULTILINE)
+# end def
+
+def parse_prover_statistics(output = "", prover = 'prover9'):
+    """ Returns a dictionary of the search statistics in the given output of the given prover (Prover 9, or Mace4), with their names in lower
+        case, with words separated by underscores (e.g. 'processed_clauses'), and their values as numbers.
+    """
+    statistics = {}
+    for (name, value) in prover_statistics_pattern(prover).findall(output):
+        name = re.sub('[^a-z0-9]+', '_', name.lower()).strip('_')
+        if '.' in value:
+            statistics[name] = float(value)
+        else:
+            statistics[name] = int(value)
+        # end if
+    # end for
+    return statistics
+# end def
+
+def run_test_case(test_case = {}, non_test_matter = "", result_filename = "", dry_run = False, verbosity = 0,
+                  cache_path = "", details = None, stream = False, timeout = 0, mace4 = False, memory_limit = 0):
     """ Run the test case specified in the given dictionary structure, putting it at the end of
         given non-test matter for input to Prover 9, and storing the results of the Prover 9 run into
         the given result file.
@@ -64,380 +393,578 @@ def run_test_case(test_case = {}, non_test_matter = "", result_filename = "", dr
         returned as the result of this function.
         This return value is a single character, with the value indicating:
          - 'E' for error
-         - 'F' for failure, and
+         - 'F' for failure,
+         - 'T' for a timeout, and
          - 'S' for success.
+
+        If a positive timeout is given (or set for the test case by its markup), the prover's process group is
+        killed once it has been running for that many seconds; unless the prover had already reached a
+        conclusion by then, the test case has timed out.
+
+        The prover's memory is limited to the given memory limit, in megabytes (if positive), and it only starts
+        once it fits in the memory budget (see admit_provers). The time spent waiting for that is set as
+        'admission_wait' in the details dictionary, if given.
+
+        If a non-empty cache path is given, the status and output of an earlier run of the same prover input are
+        reused from the result cache at that path, if present, and the result of a new run is stored there
+        otherwise. If a details dictionary is given, 'cached' is set in it to show whether the cache was used,
+        'excerpt' to the search section of the output, and 'statistics' to the search statistics in the output (see
+        parse_prover_statistics). For a run of the prover, the CPU time it used and its peak resident set size are
+        also set, as 'cpu_time' and 'peak_rss' (see wait_for_prover).
+
+        If streaming is requested, the prover output is read (and its status assessed) straight from a pipe as
+        it arrives, instead of going through the results file. The output is then only written to the results
+        file if the test case didn't succeed, or the verbosity calls for its details; in that case, it is also
+        kept as 'output' in the details dictionary, so it needn't be read back in again.
+
+        If Mace4 is requested, it is raced against Prover 9 on the test case, if it's negated (see
+        run_mace4_test_case, and test_case_provers).
     """
 
+    # Race Mace4 against Prover 9, if requested, and the test case may have a counter-model for it to find.
+    if test_case_provers(test_case, {'mace4': mace4}) == 'prover9+mace4':
+        return run_mace4_test_case(test_case, non_test_matter, result_filename, verbosity, cache_path, details, stream,
+                                   timeout, memory_limit)
+    # end if
+
+    # Check the result cache for an earlier run of exactly this prover input, under the same limits (taking the time
+    # limit of the test case before any cut at its deadline; see test_case_time_limit).
+    test_case_text = get_test_case_text(test_case)
+    if details == None:
+        details = {}
+    # end if
+    details['cached'] = False
+    details['timed_out'] = False
+    if len(cache_path) > 0:
+        (prover_bin, prover_options) = prover_command('prover9')
+        cache_key = prover_cache_key(non_test_matter, test_case_text, [prover_bin] + prover_options, memory_limit,
+                                     test_case.get('timeout', timeout))
+        cached_result = read_cached_result(cache_path, cache_key)
+        if cached_result != None:
+            # Use the cached result, restoring its output for display.
+            details['cached'] = True
+            (result, output) = cached_result
+            details['excerpt'] = classify_prover_output(output.splitlines(True))[1]
+            details['statistics'] = parse_prover_statistics(output)
+            if stream:
+                store_streamed_output(test_case, result, output, result_filename, verbosity, details)
+            elif len(result_filename) > 0:
+                results_file = open(result_filename, 'w')
+                results_file.write(output)
+                results_file.close()
+            # end if
+            return result
+        # end if
+    # end if
+
     # Open (or create) the results file, if a non-empty string has been given.
-    if len(result_filename) > 0:
-        results_file = open(result_filename, 'w')
+    # (When streaming, the output is read from a pipe instead.)
+    if stream:
+        results_file = subprocess.PIPE
+    elif len(result_filename) > 0:
+        results_file = open(result_filename, 'w+')
     else:
         results_file = tempfile.TemporaryFile(prefix = 'run_as_prover9_test_suite_results')
     # end if
 
-    # Create a file to hold the concatenated non-test matter and test text.
-    test_case_name = test_case.get('name', 'Unknown Test')
-    test_case_text = test_case.get('text', '')
-    input_file = tempfile.SpooledTemporaryFile(prefix = 'run_as_prover9_test_suite_input')
-    input_file.write(non_test_matter)
-    input_file.write(test_case_text)
-    input_file.seek(0)
+    # Wait for the prover to fit in the memory budget, and then take its time limit (see
+    # test_case_time_limit).
+    details['admission_wait'] = admit_provers(1, memory_limit)
+    test_case_timeout = test_case_time_limit(test_case, timeout)
 
-    # Run the test case through Prover 9.
+    # Run the test case (the concatenated non-test matter and test text) through Prover 9.
+    test_case_name = test_case.get('name', 'Unknown Test')
+    timer = None
     try:
-        subprocess.call(["/usr/bin/prover9"], stdin = input_file, stdout = results_file, stderr = results_file)
+        process = start_prover('prover9', non_test_matter, test_case_text, results_file, memory_limit,
+                               test_case_timeout)
+
+        # Kill the prover's process group (i.e. the prover, and anything it started) if it runs past the time limit.
+        if test_case_timeout > 0:
+            timer = threading.Timer(test_case_timeout, kill_timed_out_process, [process, details])
+            timer.daemon = True
+            timer.start()
+        # end if
+
+        # When streaming, assess the output line by line as the prover writes it.
+        if stream:
+            output_lines = []
+            (result, details['excerpt']) = classify_prover_output(iter(process.stdout.readline, ''), output_lines)
+            process.stdout.close()
+        # end if
+        (details['cpu_time'], details['peak_rss']) = wait_for_prover(process)
+        if timer != None:
+            # (Wait for the timer's thread to end, so it can't still be running as the run exits.)
+            timer.cancel()
+            timer.join()
+        # end if
     except Exception, e:
-        input_file.close()
-        results_file.close()
+        if timer != None:
+            timer.cancel()
+            timer.join()
+        # end if
+        if not stream:
+            results_file.close()
+        # end if
         sys.stdout.write("\nERROR: an error '%s' occurred while running test case '%s'.\n" % (str(e), test_case_name))
         sys.stdout.write("Test text:\n")
         sys.stdout.write(test_case_text)
         sys.stdout.write("\nExiting.\n")
         sys.exit(1)
+    finally:
+        release_provers(1, memory_limit)
     # end try
 
-    # Check the output for certain strings that indicate success, failure, or error.
-    results_file = open(result_filename, 'r')
-    result = 'E'
-    success = re.compile('THEOREM PROVED')
-    failure = re.compile('SEARCH FAILED')
-    for line in results_file:
-        if success.match(line) != None:
-            result = 'S'
-        elif failure.match(line) != None:
-            result = 'F'
-        # end if
-    # end for
+    if stream:
+        output = string.join(output_lines, '')
+    else:
+        # Check the output for certain strings that indicate success, failure, or error.
+        results_file.seek(0)
+        output = results_file.read()
+        results_file.close()
+        (result, details['excerpt']) = classify_prover_output(output.splitlines(True))
+    # end if
+    details['statistics'] = parse_prover_statistics(output)
+
+    # A run that was stopped at its time limit without reaching a conclusion timed out.
+    if details['timed_out'] and result not in ('S', 'F'):
+        result = 'T'
+    # end if
+
+    if stream:
+        store_streamed_output(test_case, result, output, result_filename, verbosity, details)
+    # end if
+
+    # Store the result in the cache, unless it was an error (which may well be down to the set up, and not the input),
+    # or a timeout (which may well be down to the load on the machine at the time).
+    if len(cache_path) > 0 and result not in ('E', 'T'):
+        write_cached_result(cache_path, cache_key, result, output)
+    # end if
 
-    # Close the files, and exit.
-    input_file.close()
-    results_file.close()
     return result
 # end def
 
-def run_test_cases(test_cases = {}, tests_to_run = [], test_results_path = os.curdir + os.sep + "results",
-                   non_test_matter = "", dry_run = False, verbosity = 0):
-    """ Run the test cases listed. """
+def read_racing_prover(prover = 'prover9', process = None, start_time = 0, finished = None):
+    """ Reads and classifies the output of the given prover process from its pipe as it arrives, putting a tuple of
+        (prover, status, excerpt, output, latency) on the given finished queue once the prover's output ends, with
+        the latency measured in seconds from the given start time.
+    """
+    output_lines = []
+    try:
+        (status, excerpt) = classify_prover_output(iter(process.stdout.readline, ''), output_lines, prover)
+    except Exception, e:
+        (status, excerpt) = ('E', "ERROR: couldn't read the output of %s: %s\n" % (prover, str(e)))
+    # end try
+    finished.put((prover, status, excerpt, string.join(output_lines, ''), time.time() - start_time))
+# end def
 
-    # Validate the given test case name(s) against the list of discovered test case names.
-    for test_case_name in tests_to_run:
-        if test_case_name not in tests_to_run:
-            sys.stdout.write("\nERROR: given test name '%s' not found in the available tests to run.\n" % test_case_name)
-            sys.stdout.write("Tests found: '%s'\n" % string.join(test_cases.keys(), ', '))
-            sys.stdout.write("\nExiting.\n")
-            sys.exit(1)
-        # end if
-    # end for
+def test_case_provers(test_case = {}, run_arguments = {}):
+    """ Returns the name of the prover(s) run on the given test case with the given run arguments (as run_test_case
+        takes them): 'prover9+mace4' if Mace4 is requested, and the test case is negated (so it's expected not to be
+        provable, and may have a counter-model for Mace4 to find), or 'prover9' otherwise, as a goal expected to be
+        proved can't have a counter-model, and racing Mace4 on it would only take memory and a core from the other
+        test cases.
+    """
+    if run_arguments.get('mace4', False) and test_case.get('negated', False):
+        return 'prover9+mace4'
+    # end if
+    return 'prover9'
+# end def
 
-    # Create the test results path, if it doesn't exist.
-    if os.path.exists(test_results_path):
-        if not os.path.isdir(test_results_path):
-            sys.stdout.write("\nERROR: given test results path '%s' already exists, and isn't a directory. Exiting." % test_results_path)
-            sys.exit(1)
-        # end if
-    else:
-        # Try to create the directory.
-        try:
-            os.makedirs(test_results_path)
-        except Exception, e:
-            sys.stdout.write("\nERROR: couldn't create the test results path '%s'.\n" % test_results_path)
-            sys.stdout.write("Reason: %s\n" % str(e))
-            sys.stdout.write("\nExiting.\n")
-            sys.exit(1)
-        # end try
+def racing_provers(run_arguments = {}):
+    """ Returns the provers raced against each other on test cases with the given run arguments (as run_test_case
+        takes them): Prover 9 and Mace4, if Mace4 is requested, or none.
+    """
+    if run_arguments.get('mace4', False):
+        return ['prover9', 'mace4']
     # end if
+    return []
+# end def
 
-    # Collect a list of test cases we're interested in the details for, storing the status and the names of the files
-    # containing the run result.
-    test_case_details_to_display = []
-    test_results = ""
-
-    # Print a header for the results.
-    sys.stdout.write("Test results:\n\n")
-
-    for test_case_name in tests_to_run:
-        # Generate a file name to store the results of this test case.
-        result_filename = test_results_path + os.sep + test_case_name + ".txt"
-        # FIXME: generate a file name for the results of each test, validate test cases, tests_to_run, etc.
-
-        test_case = test_cases.get(test_case_name, {})
-        negated = test_case.get('negated', False)
-        status = run_test_case(test_case = test_case,
-                               non_test_matter = non_test_matter, result_filename = result_filename,
-                               dry_run = dry_run, verbosity = verbosity)
-
-        # Invert the status if this is a negated test case.
-        if negated:
-            if status == 'S':
-               status = 'F'
-            elif status == 'F':
-               status = 'S'
-            # end if
-        # end if
+def run_mace4_test_case(test_case = {}, non_test_matter = "", result_filename = "", verbosity = 0, cache_path = "",
+                        details = None, stream = False, timeout = 0, memory_limit = 0):
+    """ Run the test case specified in the given dictionary structure through Prover 9 and Mace4 at once, settling
+        it as soon as Prover 9 proves its goal(s) (success), or Mace4 finds a counter-model (failure), and killing
+        the other. The arguments and the returned status are as for run_test_case.
+
+        The prover that settled the test case, and its latency (the time taken to do so, in seconds), are recorded
+        as 'prover' and 'latency' in the given details dictionary. If Mace4 finishes without finding a
+        counter-model, the test case is left to Prover 9.
 
-        # Display a JUnit/unittesting style symbol to indicate whether this test succeed, failed, or was erroneous.
-        if status == 'S':
-            test_results += '.'
-            sys.stdout.write('.')
-            if verbosity > 1:
-                test_case_details_to_display.append((test_case_name, status, result_filename))
+        Results are read from (and stored in) the result cache under each prover's own key, so that Prover 9's
+        results are shared with runs without Mace4.
+    """
+    test_case_text = get_test_case_text(test_case)
+    test_case_name = test_case.get('name', 'Unknown Test')
+    if details == None:
+        details = {}
+    # end if
+    details['cached'] = False
+    details['timed_out'] = False
+    details['prover'] = None
+    details['latency'] = None
+    racing_provers = ['prover9', 'mace4']
+
+    # Check the result cache for a conclusive earlier run of this prover input by either prover, under the same
+    # limits.
+    cache_keys = {}
+    for prover in racing_provers:
+        if len(cache_path) > 0:
+            (prover_bin, prover_options) = prover_command(prover)
+            cache_keys[prover] = prover_cache_key(non_test_matter, test_case_text, [prover_bin] + prover_options,
+                                                  memory_limit, test_case.get('timeout', timeout))
+            cached_result = read_cached_result(cache_path, cache_keys[prover])
+            if cached_result != None and cached_result[0] in ('S', 'F'):
+                # Use the cached result, restoring its output for display.
+                details['cached'] = True
+                details['prover'] = prover
+                (result, output) = cached_result
+                details['excerpt'] = classify_prover_output(output.splitlines(True), None, prover)[1]
+                details['statistics'] = parse_prover_statistics(output, prover)
+                if stream:
+                    store_streamed_output(test_case, result, output, result_filename, verbosity, details)
+                elif len(result_filename) > 0:
+                    results_file = open(result_filename, 'w')
+                    results_file.write(output)
+                    results_file.close()
+                # end if
+                return result
             # end if
-        else:
-            test_results += status
-            sys.stdout.write(status)
-            test_case_details_to_display.append((test_case_name, status, result_filename))
         # end if
     # end for
 
-    sys.stdout.write("\n\n")
-
-    # Now display the details of any recorded test cases.
-    for (test_case_name, status, result_filename) in test_case_details_to_display:
-        # Get the relevant details for this test case.
-        line_count = test_cases[test_case_name]['line']
-        index = test_cases[test_case_name]['index']
-        text = test_cases[test_case_name]['text']
-        negated = test_cases[test_case_name]['negated']
-
-        # If the user wants minimally verbose output, we want to display relevant detail from the test
-        # results according to what status this test case had.
-        results = ""
-        status_message = "had ERRORS"
-        if negated:
-            if status == 'F':
-                status_message = "unintentionally/undesirably succeeded"
-            elif status == 'S':
-                status_message = "failed as intended"
+    # Wait for all of the provers to fit in the memory budget together, and then take its time limit (see
+    # test_case_time_limit).
+    details['admission_wait'] = admit_provers(len(racing_provers), memory_limit)
+    test_case_timeout = test_case_time_limit(test_case, timeout)
+
+    # Start both provers at once, each with a thread reading (and classifying) its output as it arrives.
+    processes = []
+    readers = []
+    finished = Queue.Queue()
+    start_time = time.time()
+    timer = None
+    try:
+        for prover in racing_provers:
+            process = start_prover(prover, non_test_matter, test_case_text, subprocess.PIPE, memory_limit,
+                                   test_case_timeout)
+            processes.append(process)
+            reader = threading.Thread(target = read_racing_prover, args = [prover, process, start_time, finished])
+            reader.daemon = True
+            reader.start()
+            readers.append(reader)
+        # end for
+
+        # Kill both provers if they run past the time limit.
+        if test_case_timeout > 0:
+            timer = threading.Timer(test_case_timeout, kill_timed_out_processes, [processes, details])
+            timer.daemon = True
+            timer.start()
+        # end if
+
+        # Wait for a conclusive result, or for Prover 9 to finish.
+        results = {}
+        while len(results) < len(racing_provers):
+            (prover, status, excerpt, output, latency) = finished.get()
+            results[prover] = (prover, status, excerpt, output, latency)
+            if status in ('S', 'F') or prover == 'prover9':
+                break
             # end if
-        else:
-            if status == 'F':
-                status_message = "FAILED"
-            elif status == 'S':
-                status_message = "succeeded"
+        # end while
+
+        # Stop the loser, and clean up.
+        stop_racing_provers(processes, readers)
+        details['cpu_time'] = 0.0
+        details['peak_rss'] = 0
+        for process in processes:
+            (cpu_time, peak_rss) = wait_for_prover(process)
+            if cpu_time != None:
+                details['cpu_time'] += cpu_time
+                details['peak_rss'] = max(details['peak_rss'], peak_rss)
             # end if
+        # end for
+        if timer != None:
+            # (Wait for the timer's thread to end, so it can't still be running as the run exits.)
+            timer.cancel()
+            timer.join()
         # end if
-        if verbosity > 0:
-            results_file = open(result_filename, 'r')
-            if status == 'E' or verbosity > 2:
-                # If there was an error (or we're being very verbose), the user wants to see the whole file.
-                # Read in everything.
-                results = results_file.read()
-            elif status == 'F' or verbosity > 1:
-                # If this test case failed (or the verbosity is high), the user wants to see the test case text, and
-                # the search results.
-                # Read in the results of the run, skipping everything but the search section, and
-                # what follows that.
-                results += text
-                in_search_results = False
-                search_section = re.compile('=+\s*CLAUSES FOR SEARCH\s*=+', re.IGNORECASE)
-                for line in results_file:
-                    if not in_search_results:
-                        if search_section.match(line) != None:
-                            in_search_results = True
-                        # end if
-                    # end if
-                    if in_search_results:
-                        results += line
-                    # end if
-                # end for
-            # end if
-            results_file.close()
+    except Exception, e:
+        if timer != None:
+            timer.cancel()
+            timer.join()
         # end if
+        stop_racing_provers(processes, readers)
+        sys.stdout.write("\nERROR: an error '%s' occurred while running test case '%s'.\n" % (str(e), test_case_name))
+        sys.stdout.write("Test text:\n")
+        sys.stdout.write(test_case_text)
+        sys.stdout.write("\nExiting.\n")
+        sys.exit(1)
+    finally:
+        release_provers(len(racing_provers), memory_limit)
+    # end try
 
-        # Now format these details.
-        sys.stdout.write("Test case #%s named '%s' at line %s %s.\n" % \
-              (index, test_case_name, line_count, status_message))
+    # Take the conclusive result, if any; otherwise, Prover 9's.
+    (prover, result, excerpt, output, latency) = results.get('mace4', results.get('prover9'))
+    if result not in ('S', 'F'):
+        (prover, result, excerpt, output, latency) = results.get('prover9', results.get('mace4'))
+    # end if
+    if result in ('S', 'F'):
+        details['prover'] = prover
+        details['latency'] = latency
+    # end if
+    details['excerpt'] = excerpt
+    details['statistics'] = parse_prover_statistics(output, prover)
 
-        # If the user wants verbose output, display the test results we retrieved earlier.
-        if verbosity > 0:
-            sys.stdout.write("\nDetails:\n\n")
-            sys.stdout.write(results)
-        # end if
-        sys.stdout.write("\n\n")
-    # end for
+    # A race that was stopped at its time limit without reaching a conclusion timed out.
+    if details['timed_out'] and result not in ('S', 'F'):
+        result = 'T'
+    # end if
 
-    # If there were test cases with problems, summarise the results again for clarity.
-    if len(test_case_details_to_display) > 0:
-        # Print a header for the results.
-        sys.stdout.write("Test results:\n\n")
-        sys.stdout.write(test_results)
+    # Store the output for display: either only if it's going to be displayed, or always, as for run_test_case.
+    if stream:
+        store_streamed_output(test_case, result, output, result_filename, verbosity, details)
+    elif len(result_filename) > 0:
+        results_file = open(result_filename, 'w')
+        results_file.write(output)
+        results_file.close()
     # end if
 
-    sys.stdout.write("\n\nTest run complete.\n\n")
+    # Store a conclusive result in the cache, under the key of the prover that reached it.
+    if len(cache_path) > 0 and result in ('S', 'F'):
+        write_cached_result(cache_path, cache_keys[prover], result, output)
+    # end if
+
+    return result
 # end def
 
-def run_test_suite(input_filename = "", tests_to_run = [], dry_run = False, verbosity = 0):
-    """ Runs the test suite in the given input filename, by splitting the Prover 9 input,
-        then calling out to the test case runner with the split/parsed output,
-        collating the results, and displaying it.
+# The commands of Prover 9 input, whose statements (e.g. formulas(goals), or set(auto)) are never renamed when
+# comparing goals.
+prover9_commands = set(['formulas', 'clauses', 'list', 'terms', 'end_of_list', 'set', 'clear', 'assign', 'op',
+                        'redeclare', 'if', 'end_if', 'lex', 'predicate_order', 'function_order', 'skolem',
+                        'include'])
+
+# The names used in each non-test matter, which aren't renamed when comparing goals (keyed by the non-test matter).
+non_test_matter_names = {}
+non_test_matter_names_lock = threading.Lock()
+
+
+def get_non_test_matter_names(non_test_matter = ""):
+    """ Returns the set of names (i.e. symbols, and keywords) used in the given non-test matter, which is worked out
+        once for each non-test matter.
     """
+    non_test_matter_names_lock.acquire()
+    try:
+        if not non_test_matter_names.has_key(non_test_matter):
+            non_test_matter_names[non_test_matter] = set([token for (comment, token) in goal_token_pattern.findall(non_test_matter)])
+        # end if
+        return non_test_matter_names[non_test_matter]
+    finally:
+        non_test_matter_names_lock.release()
+    # end try
+# end def
 
-    # Split the input file into test_cases, getting a section of non-test matter, and a
-    # dictionary of test case names and text.
-    if verbosity > 1:
-        sys.stdout.write("Splitting %s...\n" % input_filename)
-    # end if
-    non_test_matter, test_case_names, test_cases = split_prover9_input(input_filename, dry_run = dry_run, verbosity = verbosity)
 
-    # Validate the given test case name(s) against the list of discovered test case names.
-    for test_case_name in tests_to_run:
-        if test_case_name not in test_case_names:
-            sys.stdout.write("\nERROR: given test name '%s' not found in the given input file.\n" % test_case_name)
-            sys.stdout.write("Tests found: '%s'\n" % string.join(test_case_names, ', '))
-            sys.stdout.write("\nExiting.\n")
-            sys.exit(1)
+def canonical_goal_key(non_test_matter = "", test_case = {}):
+    """ Returns a key identifying the goal of the given test case against the given non-test matter up to the
+        renaming of its names, so that test cases which are the same problem for the prover (i.e. alpha-equivalent)
+        have the same key, whatever their constants, variables and formulas are called, and whether or not they are
+        negated test cases (which only changes how their result is taken).
+
+        Comments are dropped, and each name that isn't used in the non-test matter (and so is local to the test
+        case) is replaced by a placeholder numbered by its first appearance. This renaming is one-to-one, so it
+        can't change whether the goal follows from the non-test matter. Placeholders keep whether the names they
+        replace begin with a capital, or with a letter from u to z, so that variables stay variables. Test cases
+        with different time limits are never given the same key.
+
+        Only the names in formulas (and in their attributes' values) are renamed: commands (e.g. formulas(goals),
+        or set and assign with their options), quantifiers and attribute names are kept as they are, as they change
+        the problem, and so test cases differing only in those are never given the same key.
+    """
+    names = get_non_test_matter_names(non_test_matter)
+    placeholders = {}
+    tokens = []
+    # (Whether the current token starts a statement, or is in a command, how deeply it's bracketed, and whether it
+    #  follows a '#', i.e. names an attribute.)
+    statement_start = True
+    in_command = False
+    depth = 0
+    attribute_name = False
+    for (comment, token) in goal_token_pattern.findall(get_test_case_text(test_case)):
+        if len(token) == 0:
+            continue
+        # end if
+        if statement_start:
+            in_command = token in prover9_commands
+        # end if
+        renamable = not in_command and not attribute_name and token not in prover9_keywords
+        statement_start = (token == '.' and depth == 0)
+        attribute_name = (token == '#')
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        # end if
+        if renamable and (token[0].isalpha() or token[0] == '_') and token not in names:
+            if not placeholders.has_key(token):
+                if token[0].isupper() or token[0] == '_':
+                    name_class = 'V'
+                elif token[0] in 'uvwxyz':
+                    name_class = 'v'
+                else:
+                    name_class = 'c'
+                # end if
+                placeholders[token] = "#%s%s" % (name_class, len(placeholders))
+            # end if
+            token = placeholders[token]
         # end if
+        tokens.append(token)
     # end for
+    return hashlib.sha1(non_test_matter + "\0" + string.join(tokens, ' ') + "\0" + \
+                        str(test_case.get('timeout'))).hexdigest()
+# end def
 
-    # If there weren't any test given to run, just run the tests in the order they were discovered.
-    if tests_to_run == []:
-        tests_to_run = test_case_names
-    # end if
 
-    # Run the selected test cases.
-    if len(tests_to_run) > 0:
-        if verbosity > 0:
-            sys.stdout.write("Running the following test cases in %s:\n - %s\n\n" % \
-                             (input_filename, string.join(tests_to_run, '\n - ')))
+def get_statement_name(statement = []):
+    """ Returns the name of the given statement (as a list of tokens), i.e. its first label, or None if it has none.
+    """
+    for index in range(len(statement) - 4):
+        if statement[index:index + 3] == ['#', 'label', '('] and statement[index + 4] == ')':
+            return statement[index + 3]
         # end if
-        run_test_cases(test_cases = test_cases, tests_to_run = tests_to_run, non_test_matter = non_test_matter,
-                       dry_run = dry_run, verbosity = verbosity)
-    else:
-        sys.stdout.write("\nERROR: no valid test cases found in the given input file, '%s'.\n" % inputfile_name)
-        sys.stdout.write("\nExiting.\n")
-        sys.exit(1)
-    # end def
+    # end for
+    return None
 # end def
 
-def split_prover9_input(input_filename, dry_run = False, verbosity = 0):
-    """ Splits the Prover 9 input file with the given filename, extracting non-test matter, and
-        collating named (if available) test case portions in a dictionary.
-    """
 
-    # Try to open the file.
-    try:
-        input_file = open(input_filename, 'r')
-    except:
-        sys.stdout.write("\nERROR: Couldn't open file with name '%s'. Exiting.\n" % input_filename)
-        sys.exit(1)
-    # end try
+# The start and end of a proof in Prover 9's output, and its input clauses (i.e. those from the assumptions, or the
+# goals, given to it), with their labels.
+proof_section_pattern = re.compile('=+\s*PROOF\s*=+')
+proof_section_end_pattern = re.compile('=+\s*end of proof\s*=+')
+proof_input_pattern = re.compile('\[(assumption|goal)\]\.\s*$')
+proof_label_pattern = re.compile('#\s*label\(([^)]*)\)')
 
-    # Compile some regular expressions for speed.
-    # (These describe the markup describe earlier.)
-    begin_test_section = re.compile('\s*%\s*Test\s*runner\s*:?\s*begin', re.IGNORECASE)
-    test_case = re.compile('\s*%\s*(?P<negated>Negated)?\s*[tT]est\s*case\s*:?\s*(?P<name>.*)\s*$', re.IGNORECASE)
-    end_test_section = re.compile('\s*%\s*Test\s*runner\s*:?\s*end', re.IGNORECASE)
-
-    # Read the file in, line by line.
-    in_test = False
-    in_non_test_matter = True
-    current_test_count = 0
-    line_count = 0
-    non_test_matter = ""
-    test_case_names = []
-    test_cases = {}
-    for line in input_file:
-        # Increment the line count.
-        line_count += 1
-
-        # Check for markup in the current line.
-        test_case_match = test_case.match(line)
-        disposable_line = False
-        negated = False
-        if test_case_match != None:
-            # We have a new test case.
-
-            # Get the name, if any, or use a safe default.
-            current_test_count += 1
-            current_test_name = "Test-%s" % current_test_count
-            trial_test_name = test_case_match.group('name')
-            if trial_test_name != None and len(trial_test_name.strip()) > 0:
-                current_test_name = trial_test_name.strip()
-            # end if
-            test_case_names.append(current_test_name)
-            if verbosity > 1:
-                sys.stdout.write("Found test case #%s at line %s named '%s'.\n" % \
-                                 (current_test_count, line_count, current_test_name))
-            # end if
 
-            # Check if we've seen a test with this name before.
-            if test_cases.has_key(current_test_name):
-                input_file.close()
-                sys.stdout.write("\nERROR: test with duplicate name '%s' found at line %s. Exiting.\n" % \
-                                 (current_test_name, line_count))
-                sys.exit(1)
+def parse_proof_axioms(excerpt = "", prover = 'prover9'):
+    """ Returns a sorted list of the labels of the input formulas used by the proof in the given excerpt of the output
+        of the given prover (which, if it's proved, can only be Prover 9), or None if it has no proof, or the proof
+        used an assumption without a label (which can't be told apart from the others). The labels added by Prover 9
+        itself, 'non_clause' and 'goal', are left out.
+    """
+    names = set()
+    in_proof = False
+    for line in excerpt.splitlines():
+        if proof_section_pattern.match(line) != None:
+            in_proof = True
+        elif proof_section_end_pattern.match(line) != None:
+            return sorted(names)
+        elif in_proof:
+            input_match = proof_input_pattern.search(line)
+            if input_match != None:
+                labels = [label for label in proof_label_pattern.findall(line) if label not in ('non_clause', 'goal')]
+                if input_match.group(1) == 'assumption' and len(labels) == 0:
+                    return None
+                # end if
+                names.update(labels)
             # end if
+        # end if
+    # end for
+    return None
+# end def
 
-            # Check if this test case is expected to fail.
-            if test_case_match.group('negated') != None:
-                negated = True
-            # end if
 
-            # Store some useful properties in the test case dictionary under the current test name as a key.
-            test_cases[current_test_name] = {}
-            test_cases[current_test_name]['index'] = current_test_count
-            test_cases[current_test_name]['line'] = line_count
-            test_cases[current_test_name]['negated'] = negated
-
-            # Set some blank initial text for this test.
-            test_cases[current_test_name]['text'] = ""
-
-            # Flag that we're in a test.
-            in_test = True
-            in_non_test_matter = False
-        elif begin_test_section.match(line) != None:
-            # We have a beginning of test section marker.
-            # Flag that we're no longer in non-test matter, and this is a disposable line.
-            if verbosity > 1:
-                sys.stdout.write("Found beginning of test section at line %s.\n" % line_count)
-            # end if
-            in_non_test_matter = False
-            disposable_line = True
-        elif end_test_section.match(line) != None:
-            # We have an end of test section marker.
-            # Flag that we're no longer in a test, and back in non-test matter.
-            if verbosity > 1:
-                sys.stdout.write("Found end of test section at line %s.\n" % line_count)
-            # end if
-            in_non_test_matter = True
-            in_test = False
-            disposable_line = True
-        # end if
+def get_lemma_axiom(test_case_name = "", test_case = {}):
+    """ Returns the text of the given lemma test case as an axiom, for adding to the non-test matter of the test cases
+        after it once it's proved, i.e. its goal (without comments) as an assumption, labelled by its answer (if any);
+        or None (with a warning) if it isn't a single goal, as it then can't be used as one (e.g. if it has
+        assumptions of its own, or a number of goals, which are proved if any one of them is).
+    """
+    text = strip_comments(get_test_case_text(test_case))
+    statements = split_statements(text)
+    if len(statements) != 3 or statements[0] != ['formulas', '(', 'goals', ')', '.'] or statements[2] != ['end_of_list', '.']:
+        sys.stdout.write("\nWARNING: lemma '%s' isn't a single goal, so can't be added to the test cases after it.\n" % \
+                         test_case_name)
+        return None
+    # end if
+    text = re.sub(r'\bformulas\s*\(\s*goals\s*\)', 'formulas(assumptions)', text, 1)
+    return "\n" + re.sub(r'#\s*answer\s*\(', '# label(', text.strip()) + "\n"
+# end def
 
-        # Dispatch the text of this line depending on what flags are currently set.
-        if not disposable_line:
-            # This is a non-disposable line.
-            # If we're in a test, add the current line to the text for the test.
-            if in_test:
-                test_cases[current_test_name]['text'] = test_cases[current_test_name]['text'] + line
-            else:
-                # If we're not in a test, we may be in non-test matter.
-                # Otherwise, we're in the disposable sections between the beginning of a test section and
-                # the first test. Just ignore this.
-                if in_non_test_matter:
-                    # We're in non-test matter, so just add the line to the non-test matter we have.
-                    non_test_matter = non_test_matter + line
-                # end if
-            # end if
+
+# The keywords of Prover 9's input, which aren't symbols of the formulas.
+prover9_keywords = set(['all', 'exists', 'formulas', 'clauses', 'end_of_list'])
+
+
+def get_formula_symbols(statement = []):
+    """ Returns the set of symbols (i.e. the names of the constants, functions and predicates) in the given
+        statement (as a list of tokens). Its attributes (e.g. its label) are left out, as are the keywords (e.g.
+        quantifiers), and variables, i.e. those starting with a capital letter (with prolog_style_variables set;
+        without it, the variables starting with u to z are taken as symbols, which can only select more formulas).
+    """
+    symbols = set()
+    for token in statement:
+        if token == '#':
+            # The attributes run to the end of the formula.
+            break
+        # end if
+        if (token[0].islower() or token[0] == '"') and token not in prover9_keywords:
+            symbols.add(token)
         # end if
     # end for
+    return symbols
+# end def
 
-    # Return the non-test matter, the test case names, and the test cases we're collated.
-    return (non_test_matter, test_case_names, test_cases)
+
+def get_formulas(text = ""):
+    """ Returns the formulas in the lists of formulas (or clauses) in the given text, other than the goals, each as
+        a tuple of its start and end in the text, and the set of its symbols (see get_formula_symbols). Anything else
+        (e.g. the commands setting options, and those starting and ending the lists) is left out.
+    """
+    formulas = []
+    list_name = None
+    for (start, end, statement) in split_statement_spans(text):
+        if len(statement) == 5 and statement[0] in ('formulas', 'clauses') and statement[1] == '(':
+            list_name = statement[2]
+        elif statement == ['end_of_list', '.']:
+            list_name = None
+        elif list_name != None and list_name != 'goals':
+            formulas.append((start, end, get_formula_symbols(statement)))
+        # end if
+    # end for
+    return formulas
 # end def
 
+
 def main(argv):
     """ Handles command-line input and dispatches it to the test suite runner.
     """
     # Set defaults for the command line arguments to read in.
+    clear_cache = False
+    dedupe = True
+    lemmas = False
+    selection_depth = 0
     dry_run = False
+    escalation_budget = 0
+    escalation_tiers = []
     input_filename = ""
+    benchmark = False
+    jobs = default_jobs
+    memory_budget = default_memory_budget
+    memory_limit = default_memory_limit
+    json_filename = ""
+    junit_filename = ""
+    mace4 = False
+    stream = False
+    pipeline = False
+    shard = None
     tests_to_run = []
+    timeout = 0
+    threshold = default_regression_threshold
+    use_cache = True
     verbosity = 0
 
     # Try to parse the given command-line options.
     try:
-        options, args = getopt.getopt(sys.argv[1:], 'nv', ['dry-run','verbose'])
+        options, args = getopt.getopt(sys.argv[1:], 'j:nt:v', ['benchmark','clear-cache','jobs=','json=','junit=','lemmas','memory-budget=','memory-limit=','dry-run','escalate=','escalation-budget=','mace4','no-cache','no-dedupe','pipeline','select-axioms=','shard=','stream','threshold=','timeout=','verbose'])
     except getopt.GetoptError:
         # The given options are incorrect.
         usage()
@@ -447,11 +974,190 @@ def main(argv):
 
     # Interpret the parsed command-line options.
     for opt, arg in options:
+        # Did we get the --benchmark option?
+        if opt == '--benchmark':
+            # Yes. Record the run in the benchmark database, running every test case through the prover.
+            benchmark = True
+            use_cache = False
+        # end if
+
+        # Did we get the --clear-cache option?
+        if opt == '--clear-cache':
+            # Yes. Empty the result cache before the run.
+            clear_cache = True
+        # end if
+
+        # Did we get the -j/--jobs option?
+        if opt in ('-j', '--jobs'):
+            # Yes. Change the number of test cases to run at once accordingly.
+            try:
+                jobs = int(arg)
+            except ValueError:
+                jobs = 0
+            # end try
+            if jobs < 1:
+                usage()
+                sys.stdout.write("\nERROR: Invalid number of jobs '" + arg + "' given. This must be a positive whole number. Exiting.\n")
+                sys.exit(2)
+            # end if
+        # end if
+
         # Did we get the -n/--dry-run option?
         if opt in ('-n', '--dry-run'):
             # Yes. Set this accordingly.
             dry_run = True
         # end if
+
+        # Did we get the --escalate option?
+        if opt == '--escalate':
+            # Yes. Run the inconclusive test cases again at each of the given tiers of limits.
+            escalation_tiers = parse_escalation_tiers(arg)
+            if escalation_tiers == None:
+                usage()
+                sys.stdout.write("\nERROR: Invalid escalation tiers '" + arg + "' given. These must be rising numbers of seconds, each optionally followed by a colon and a number of megabytes, separated by commas. Exiting.\n")
+                sys.exit(2)
+            # end if
+        # end if
+
+        # Did we get the --escalation-budget option?
+        if opt == '--escalation-budget':
+            # Yes. Limit the time spent running inconclusive test cases again accordingly.
+            try:
+                escalation_budget = float(arg)
+            except ValueError:
+                escalation_budget = -1
+            # end try
+            if escalation_budget <= 0:
+                usage()
+                sys.stdout.write("\nERROR: Invalid escalation budget '" + arg + "' given. This must be a positive number of seconds. Exiting.\n")
+                sys.exit(2)
+            # end if
+        # end if
+
+        # Did we get the --json option?
+        if opt == '--json':
+            # Yes. Write a report on each test case to the given JSON lines file.
+            json_filename = arg
+        # end if
+
+        # Did we get the --junit option?
+        if opt == '--junit':
+            # Yes. Write a report on each test case to the given JUnit XML file.
+            junit_filename = arg
+        # end if
+
+        # Did we get the --memory-budget or --memory-limit option?
+        if opt in ('--memory-budget', '--memory-limit'):
+            # Yes. Change the memory budget of the provers running at once, or the memory limit of each, accordingly.
+            try:
+                megabytes = int(arg)
+            except ValueError:
+                megabytes = -1
+            # end try
+            if megabytes < 0:
+                usage()
+                sys.stdout.write("\nERROR: Invalid " + opt + " '" + arg + "' given. This must be a whole number of megabytes (or 0 for none). Exiting.\n")
+                sys.exit(2)
+            # end if
+            if opt == '--memory-budget':
+                memory_budget = megabytes
+            else:
+                memory_limit = megabytes
+            # end if
+        # end if
+
+        # Did we get the --no-cache option?
+        if opt == '--no-cache':
+            # Yes. Run every test case through the prover, without using the result cache.
+            use_cache = False
+        # end if
+
+        # Did we get the --select-axioms option?
+        if opt == '--select-axioms':
+            # Yes. Run each test case against the axioms selected for it to the given depth first.
+            try:
+                selection_depth = int(arg)
+            except ValueError:
+                selection_depth = 0
+            # end try
+            if selection_depth < 1:
+                usage()
+                sys.stdout.write("\nERROR: Invalid --select-axioms depth '" + arg + "' given. This must be a positive whole number of rounds of selection. Exiting.\n")
+                sys.exit(2)
+            # end if
+        # end if
+
+        # Did we get the --lemmas option?
+        if opt == '--lemmas':
+            # Yes. Prove the lemmas first, and add those proved to the test cases after them.
+            lemmas = True
+        # end if
+
+        # Did we get the --no-dedupe option?
+        if opt == '--no-dedupe':
+            # Yes. Run every test case through the prover, even those with the same problem as an earlier one.
+            dedupe = False
+        # end if
+
+        # Did we get the --pipeline option?
+        if opt == '--pipeline':
+            # Yes. Run each test case as soon as it's split from the input file.
+            pipeline = True
+        # end if
+
+        # Did we get the --mace4 option?
+        if opt == '--mace4':
+            # Yes. Race Mace4 against Prover 9 on each test case.
+            mace4 = True
+        # end if
+
+        # Did we get the --shard option?
+        if opt == '--shard':
+            # Yes. Run the given shard of the test cases.
+            shard = parse_shard(arg)
+            if shard == None:
+                usage()
+                sys.stdout.write("\nERROR: Invalid shard '" + arg + "' given. This must be given as i/n, for the i'th of n shards. Exiting.\n")
+                sys.exit(2)
+            # end if
+        # end if
+
+        # Did we get the --stream option?
+        if opt == '--stream':
+            # Yes. Read the prover output from a pipe, instead of a results file.
+            stream = True
+        # end if
+
+        # Did we get the --threshold option?
+        if opt == '--threshold':
+            # Yes. Change the percentage rise that's flagged as a regression when comparing benchmark runs.
+            try:
+                threshold = float(arg)
+            except ValueError:
+                threshold = -1
+            # end try
+            if threshold < 0:
+                usage()
+                sys.stdout.write("\nERROR: Invalid threshold '" + arg + "' given. This must be a percentage, of 0 or more. Exiting.\n")
+                sys.exit(2)
+            # end if
+        # end if
+
+        # Did we get the -t/--timeout option?
+        if opt in ('-t', '--timeout'):
+            # Yes. Change the time limit for each test case accordingly.
+            try:
+                timeout = float(arg)
+            except ValueError:
+                timeout = -1
+            # end try
+            if timeout <= 0:
+                usage()
+                sys.stdout.write("\nERROR: Invalid timeout '" + arg + "' given. This must be a positive number of seconds. Exiting.\n")
+                sys.exit(2)
+            # end if
+        # end if
+
         # Did we get the -v/--verbose option?
         if opt in ('-v', '--verbose'):
             # Yes. Increase this accordingly.
@@ -460,10 +1166,52 @@ def main(argv):
     # end for
 
     if verbosity > 1:
-        sys.stdout.write("Got options: dry-run: %s verbosity level: %s\n" % (dry_run, verbosity))
+        sys.stdout.write("Got options: dry-run: %s verbosity level: %s jobs: %s use cache: %s clear cache: %s stream: %s timeout: %s pipeline: %s mace4: %s shard: %s json: %s junit: %s benchmark: %s threshold: %s memory limit: %s memory budget: %s escalate: %s escalation budget: %s dedupe: %s lemmas: %s select axioms: %s\n" % \
+                         (dry_run, verbosity, jobs, use_cache, clear_cache, stream, timeout, pipeline, mace4, shard,
+                          json_filename, junit_filename, benchmark, threshold, memory_limit, memory_budget,
+                          escalation_tiers, escalation_budget, dedupe, lemmas, selection_depth))
         sys.stdout.write("Got arguments: %s\n" % (args))
     # end if
 
+    # The first escalation tier gives the limits of the run itself.
+    if len(escalation_tiers) > 0:
+        if timeout > 0:
+            usage()
+            sys.stdout.write("\nERROR: --escalate can't be used with -t/--timeout, as its first tier gives the time limit of the run. Exiting.\n")
+            sys.exit(2)
+        # end if
+        (timeout, first_memory_limit) = escalation_tiers[0]
+        if first_memory_limit != None:
+            memory_limit = first_memory_limit
+        # end if
+    # end if
+
+    # Were we asked to merge the results of the shards of a test run?
+    if len(args) >= 1 and args[0] == 'merge':
+        merge_shard_results(args[1:], verbosity)
+        return
+    # end if
+
+    # Were we asked to compare two benchmark runs?
+    if len(args) >= 1 and args[0] == 'compare':
+        compare_benchmark_runs(args[1:], threshold, verbosity = verbosity)
+        return
+    # end if
+
+    # Sharding needs all of the test cases to be split before any are run.
+    if shard != None and pipeline:
+        usage()
+        sys.stdout.write("\nERROR: --shard can't be used with --pipeline, as all of the test cases must be known to share them out. Exiting.\n")
+        sys.exit(2)
+    # end if
+
+    # The lemmas must be proved before the test cases after them are run.
+    if lemmas and pipeline:
+        usage()
+        sys.stdout.write("\nERROR: --lemmas can't be used with --pipeline, as the lemmas must be proved before the test cases after them are run. Exiting.\n")
+        sys.exit(2)
+    # end if
+
     # Do we have enough arguments? (i.e. we need a file name, at least)
     if len(args) >= 1:
         input_filename = args[0]
@@ -478,7 +1226,15 @@ def main(argv):
     # end if
 
     # Start the run using the given inputs.
-    run_test_suite(input_filename = input_filename, tests_to_run = tests_to_run, dry_run = dry_run, verbosity = verbosity)
+    run_as_test_suite.run_test_suite(sys.modules[__name__], input_filename = input_filename,
+                                     tests_to_run = tests_to_run, dry_run = dry_run, verbosity = verbosity, jobs = jobs, use_cache = use_cache,
+                                     clear_cache = clear_cache, stream = stream, timeout = timeout, pipeline = pipeline,
+                                     prover_arguments = {'mace4': mace4}, shard = shard,
+                                     json_filename = json_filename, junit_filename = junit_filename,
+                                     benchmark = benchmark, benchmark_prover = ('prover9', 'prover9+mace4')[mace4],
+                                     memory_limit = memory_limit, memory_budget = memory_budget,
+                                     escalation_tiers = escalation_tiers, escalation_budget = escalation_budget,
+                                     dedupe = dedupe, lemmas = lemmas, selection_depth = selection_depth)
 # end def
 
 if __name__ == "__main__":
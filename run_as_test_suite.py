@@ -0,0 +1,2898 @@
+"""The machinery shared by the test runners (run_as_tptp_test_suite.py and run_as_prover9_test_suite.py), which is the
+same whichever prover the test cases are run through: running the test cases (at once, in the order of the runtime
+history, and within the memory budget), the result cache, escalation, deduplication, proof dependencies, lemmas,
+axiom selection, the reports, shards and benchmarks, and splitting the input file into test cases.
+
+Where this needs to know about the prover, or the language of the input, it calls on the module of the runner using
+it, which it's given as 'runner', and which is to define:
+
+ - run_test_case(**test_case_run), to run a test case, given the arguments in a test case run (see
+   collect_test_case_runs), returning its status;
+ - test_case_provers(test_case, run_arguments), returning the prover(s) the given test case is run through with the
+   given run arguments, joined by '+', for the keys of its run times and proof dependencies;
+ - racing_provers(run_arguments), returning the list of provers raced against each other on each test case with
+   the given run arguments (if any), for counting the test cases each settles;
+ - canonical_goal_key(non_test_matter, test_case), for deduping the test cases;
+ - get_statement_name(statement), parse_proof_axioms(excerpt, prover), and (optionally) included_files_text(text),
+   for the proof dependencies of the test cases;
+ - get_lemma_axiom(test_case_name, test_case), for adding the lemmas proved to the test cases after them; and
+ - get_formula_symbols(statement) and get_formulas(text), for selecting the axioms for each test case.
+
+The runners import the names they use from here, so these are used from them as their own.
+"""
+
+import functools
+import errno
+import hashlib
+import heapq
+import itertools
+import json
+import math
+import mmap
+import multiprocessing
+import multiprocessing.pool
+import os
+import os.path
+import re
+import resource
+import shutil
+import signal
+import sqlite3
+import string
+import subprocess
+import sys
+import threading
+import time
+import xml.sax.saxutils
+
+try:
+    default_jobs = multiprocessing.cpu_count()
+except NotImplementedError:
+    default_jobs = 1
+# end try
+
+
+
+# Each prover process is limited to this much memory (address space), in megabytes, and the prover processes
+# running at once are limited to a budget of the physical memory, in total (see admit_provers).
+default_memory_limit = 2048
+try:
+    default_memory_budget = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / (1024 * 1024)
+except (ValueError, OSError, AttributeError):
+    default_memory_budget = 0
+# end try
+
+# The memory budget of the prover processes running at once, and the memory limits of those admitted to run, in
+# megabytes, along with the number running, and the most that have run at once (see admit_provers).
+memory_budget_state = {'budget': 0, 'admitted': 0, 'running': 0, 'most_running': 0}
+memory_budget_condition = threading.Condition()
+
+default_test_results_path = os.curdir + os.sep + "results"
+
+# Benchmark runs are compared for rises of more than this percentage, ignoring rises in time of less than
+# benchmark_time_noise seconds.
+default_regression_threshold = 50
+benchmark_time_noise = 0.01
+
+
+
+def read_cached_result(cache_path = "", cache_key = ""):
+    """ Returns the (status, output) stored in the result cache at the given path under the given key,
+        or None if there is no such result.
+    """
+    try:
+        cache_file = open(cache_path + os.sep + cache_key + ".txt", 'r')
+    except IOError:
+        return None
+    # end try
+    status = cache_file.read(1)
+    output = cache_file.read()
+    cache_file.close()
+    if len(status) == 0:
+        return None
+    # end if
+    return (status, output)
+# end def
+
+
+def write_cached_result(cache_path = "", cache_key = "", status = "E", output = ""):
+    """ Stores the given status and output in the result cache at the given path under the given key.
+
+        The status character is written first, followed by the raw prover output. The entry is written under a
+        temporary name and then renamed, so a concurrent or interrupted run never sees a partial entry.
+    """
+    cache_filename = cache_path + os.sep + cache_key + ".txt"
+    temporary_filename = "%s.%s.%s" % (cache_filename, os.getpid(), id(output))
+    try:
+        cache_file = open(temporary_filename, 'w')
+        cache_file.write(status)
+        cache_file.write(output)
+        cache_file.close()
+        os.rename(temporary_filename, cache_filename)
+    except (IOError, OSError), e:
+        sys.stdout.write("\nWARNING: couldn't store a result in the result cache '%s': %s\n" % (cache_path, str(e)))
+    # end try
+# end def
+
+
+def limit_prover_resources(memory_limit = 0, timeout = 0):
+    """ Returns a function to run in a prover's process before the prover itself starts (i.e. a pre-exec hook),
+        putting it in a new process group, and limiting its address space to the given number of megabytes, and,
+        if a timeout is given, its CPU time to a second more than the timeout (as a backstop to the timer that
+        kills it at the timeout). Limits of zero are left unset, and none is raised above its hard limit.
+    """
+    limits = []
+    if memory_limit > 0:
+        limits.append((resource.RLIMIT_AS, memory_limit * 1024 * 1024))
+    # end if
+    if timeout > 0:
+        limits.append((resource.RLIMIT_CPU, int(math.ceil(timeout)) + 1))
+    # end if
+
+    def preexec():
+        os.setsid()
+        for (limit, value) in limits:
+            (soft_limit, hard_limit) = resource.getrlimit(limit)
+            if hard_limit != resource.RLIM_INFINITY:
+                value = min(value, hard_limit)
+            # end if
+            resource.setrlimit(limit, (value, hard_limit))
+        # end for
+    # end def
+    return preexec
+# end def
+
+
+def set_memory_budget(budget = 0):
+    """ Sets the memory budget of the prover processes running at once, in megabytes (or none, if zero). """
+    memory_budget_condition.acquire()
+    memory_budget_state['budget'] = budget
+    memory_budget_state['most_running'] = 0
+    memory_budget_condition.release()
+# end def
+
+
+def admit_provers(count = 1, memory_limit = 0):
+    """ Waits until the given number of prover processes, each with the given memory limit (in megabytes), fit in
+        the memory budget alongside those already running, and admits them, returning how long that took, in seconds.
+        They are always admitted when no other provers are running, so that provers with limits larger than the
+        whole budget still run, if alone. (Provers racing each other are admitted together, so that no race holds
+        part of the budget while waiting for the rest.) Once they have finished, they must be released (see
+        release_provers).
+    """
+    start_time = time.time()
+    memory_budget_condition.acquire()
+    try:
+        while memory_budget_state['budget'] > 0 and memory_budget_state['running'] > 0 and \
+              memory_budget_state['admitted'] + count * memory_limit > memory_budget_state['budget']:
+            memory_budget_condition.wait()
+        # end while
+        memory_budget_state['admitted'] += count * memory_limit
+        memory_budget_state['running'] += count
+        memory_budget_state['most_running'] = max(memory_budget_state['most_running'], memory_budget_state['running'])
+    finally:
+        memory_budget_condition.release()
+    # end try
+    return time.time() - start_time
+# end def
+
+
+def release_provers(count = 1, memory_limit = 0):
+    """ Releases the given number of prover processes, each with the given memory limit (in megabytes), from the
+        memory budget, once they have finished (see admit_provers), letting any others waiting to run be admitted.
+    """
+    memory_budget_condition.acquire()
+    memory_budget_state['admitted'] -= count * memory_limit
+    memory_budget_state['running'] -= count
+    memory_budget_condition.notify_all()
+    memory_budget_condition.release()
+# end def
+
+
+def feed_prover_input(process = None, prover_input = []):
+    """ Writes each of the given parts of the prover input (i.e. the non-test matter and the test text) to the given
+        prover process's stdin pipe, closing it afterwards, so the input is streamed from memory without another
+        copy being made. Any error writing (e.g. as the prover has already exited) is left to the prover's output.
+    """
+    try:
+        for part in prover_input:
+            process.stdin.write(part)
+        # end for
+        process.stdin.close()
+    except (IOError, OSError):
+        pass
+    # end try
+# end def
+
+
+def wait_for_prover(process = None):
+    """ Waits for the given prover process to finish, returning a tuple of the CPU time it used (user and system), in
+        seconds, and its peak resident set size, in kilobytes, as reported by the OS (or (None, None), if the
+        process has already been waited for).
+    """
+    while True:
+        try:
+            (pid, exit_status, rusage) = os.wait4(process.pid, 0)
+            break
+        except OSError, e:
+            if e.errno == errno.EINTR:
+                continue
+            # end if
+            process.wait()
+            return (None, None)
+        # end try
+    # end while
+
+    # Let the process object know how the process exited, as it wasn't waited for through it.
+    if os.WIFSIGNALED(exit_status):
+        process.returncode = -os.WTERMSIG(exit_status)
+    else:
+        process.returncode = os.WEXITSTATUS(exit_status)
+    # end if
+    return (rusage.ru_utime + rusage.ru_stime, rusage.ru_maxrss)
+# end def
+
+
+def test_case_time_limit(test_case = {}, timeout = 0):
+    """ Returns the time limit to run the given test case with, in seconds (or 0 for none): that set by its markup,
+        or else the given timeout, cut short at its deadline, if it has one (see run_escalated_test_case_job).
+        This is taken once the prover has been admitted to run (see admit_provers), so the deadline isn't overrun
+        by waiting for the memory budget.
+    """
+    time_limit = test_case.get('timeout', timeout)
+    if test_case.get('deadline') != None:
+        remaining_time = max(test_case['deadline'] - time.time(), 0.001)
+        if time_limit <= 0 or time_limit > remaining_time:
+            time_limit = remaining_time
+        # end if
+    # end if
+    return time_limit
+# end def
+
+
+def kill_process_group(process = None):
+    """ Kills the process group led by the given prover process, i.e. the prover, and anything it started.
+    """
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        # The prover has already finished.
+        pass
+    # end try
+# end def
+
+
+def kill_timed_out_process(process = None, details = {}):
+    """ Kills the process group led by the given prover process, as it has run out of time, and notes this in the
+        given details dictionary.
+    """
+    details['timed_out'] = True
+    kill_process_group(process)
+# end def
+
+
+def kill_timed_out_processes(processes = [], details = {}):
+    """ Kills the process groups led by each of the given prover processes, as they have run out of time, and
+        notes this in the given details dictionary.
+    """
+    details['timed_out'] = True
+    for process in processes:
+        kill_process_group(process)
+    # end for
+# end def
+
+
+def stop_racing_provers(processes = [], readers = []):
+    """ Kills the process groups led by each of the given racing prover processes, waits for the given threads
+        reading their output (see read_racing_prover) to finish, and then closes the provers' output pipes, so that
+        no reader thread is left behind once the race is over.
+    """
+    for process in processes:
+        kill_process_group(process)
+    # end for
+    # (With its process group killed, each prover's pipe comes to an end, and so does its reader.)
+    for reader in readers:
+        reader.join()
+    # end for
+    for process in processes:
+        process.stdout.close()
+    # end for
+# end def
+
+
+def store_streamed_output(test_case = {}, status = "E", output = "", result_filename = "", verbosity = 0, details = {}):
+    """ Stores the output of a streamed test case run with the given (uninverted) status, if it's going to be
+        displayed: writing it to the given results file, and keeping it as 'output' in the given details.
+
+        Otherwise, any results file left over from an earlier run is removed, so it can't be mistaken for this one.
+    """
+    # Work out whether the details of this test case will be displayed, as in run_test_cases.
+    succeeded = (status == 'S')
+    if test_case.get('negated', False) and status in ('S', 'F'):
+        succeeded = not succeeded
+    # end if
+    if not succeeded or verbosity > 1:
+        details['output'] = output
+        if len(result_filename) > 0:
+            results_file = open(result_filename, 'w')
+            results_file.write(output)
+            results_file.close()
+        # end if
+    elif len(result_filename) > 0 and os.path.exists(result_filename):
+        os.remove(result_filename)
+    # end if
+# end def
+
+
+def parse_escalation_tiers(tiers = ""):
+    """ Parses the given comma-separated escalation tiers, each a time limit in seconds, optionally followed by a
+        colon and a memory limit in megabytes (e.g. '10,60,300:4096'), returning a list of (time limit, memory
+        limit) tuples, with None for a memory limit not given; or None, if the tiers aren't valid, or their time
+        limits don't rise from one tier to the next.
+    """
+    escalation_tiers = []
+    for tier in tiers.split(','):
+        (time_limit, colon, memory_limit) = tier.partition(':')
+        try:
+            time_limit = float(time_limit)
+            if len(colon) > 0:
+                memory_limit = int(memory_limit)
+            else:
+                memory_limit = None
+            # end if
+        except ValueError:
+            return None
+        # end try
+        if time_limit <= 0 or (memory_limit != None and memory_limit < 0) or \
+           (len(escalation_tiers) > 0 and time_limit <= escalation_tiers[-1][0]):
+            return None
+        # end if
+        escalation_tiers.append((time_limit, memory_limit))
+    # end for
+    return escalation_tiers
+# end def
+
+
+def describe_escalation_tier(escalation_tier = (0, None)):
+    """ Returns a description of the given escalation tier (a tuple of its time and memory limits) for display. """
+    (time_limit, memory_limit) = escalation_tier
+    if memory_limit != None:
+        return "%gs/%sMB" % (time_limit, memory_limit)
+    # end if
+    return "%gs" % time_limit
+# end def
+
+
+def run_test_case_job(runner = None, test_case_run = {}):
+    """ Run a single test case through the given runner, with the run_test_case arguments given in the test case run
+        dictionary, first against the axioms selected for it, if a positive selection depth is given (see
+        run_selected_axioms_test_case).
+
+        This is the unit of work handed to the worker pool by run_test_cases. As run_test_case exits on
+        errors, any SystemExit is returned rather than raised, so the worker thread survives to pass it on.
+        (Likewise, a test case run holding an 'exception' just returns it; see collect_test_case_runs. A duplicate
+        test case isn't run, and returns None; see mark_duplicate_test_case_runs. Nor is a test case unaffected by
+        the changes to the axioms since it last succeeded, which succeeds; see mark_unaffected_test_case_runs. Nor is
+        a lemma proved before the other test cases, which has the status it had then; see settle_lemma_test_case_runs.)
+
+        The time taken by the run (in seconds), less any time spent waiting for the memory budget, is kept as
+        'runtime' in its details dictionary.
+    """
+    if test_case_run.has_key('exception'):
+        return test_case_run['exception']
+    elif test_case_run.has_key('duplicate_of'):
+        return None
+    elif test_case_run.has_key('unaffected'):
+        return 'S'
+    elif test_case_run.has_key('lemma_status'):
+        return test_case_run['lemma_status']
+    # end if
+    start_time = time.time()
+    try:
+        if test_case_run.get('selection_depth', 0) > 0:
+            status = run_selected_axioms_test_case(runner, test_case_run)
+        else:
+            job = dict(test_case_run)
+            job.pop('selection_depth', None)
+            status = runner.run_test_case(**job)
+        # end if
+    except SystemExit, e:
+        return e
+    # end try
+    if test_case_run.get('details') != None:
+        test_case_run['details']['runtime'] = time.time() - start_time - test_case_run['details'].get('admission_wait', 0)
+    # end if
+    return status
+# end def
+
+
+def run_escalated_test_case_job(runner = None, escalated_run = ()):
+    """ Runs a test case again through the given runner at a higher escalation tier, given a tuple of its test case
+        run dictionary, and the time limit, memory limit and deadline (or None) to run it with, returning its
+        status, or None if the deadline had passed before it could start. The time limit is cut short at the
+        deadline (see test_case_time_limit), and the result cache is neither read (as an inconclusive result may
+        well have been cached at a lower tier) nor written. (A lemma is run again too, rather than given the status
+        it was proved with before the other test cases.)
+    """
+    (test_case_run, time_limit, memory_limit, deadline) = escalated_run
+    if deadline != None and time.time() >= deadline:
+        return None
+    # end if
+    job = dict(test_case_run)
+    job['test_case'] = dict(test_case_run['test_case'])
+    job['test_case']['timeout'] = time_limit
+    job['test_case']['deadline'] = deadline
+    job['memory_limit'] = memory_limit
+    job['cache_path'] = ""
+    job.pop('lemma_status', None)
+    return run_test_case_job(runner, job)
+# end def
+
+
+def escalate_test_case_runs(runner = None, statuses = [], test_case_runs = [], escalation_tiers = [],
+                            escalation_budget = 0, memory_limit = 0, map_function = itertools.imap, escalation = {}):
+    """ Passes on the given (test case index, status) pairs of a run of the given test case runs, holding back any
+        that were inconclusive ('?') or timed out ('T'); once they are all in, those held back are run again at each
+        of the given escalation tiers after the first (which the run itself used) in turn, until they are settled,
+        or the escalation budget (in seconds, if positive) is spent. Each is passed on once it has been settled, or
+        the tiers (or the budget) have run out, but never ahead of an earlier test case, so the statuses are still
+        passed on in the order of the test cases (as they are without escalation).
+
+        The test cases of each tier are run through the given runner, by the given map function (e.g. the imap of a
+        worker pool; see run_escalated_test_case_job), with the tier's time limit (or the test case's own, if
+        longer), and its memory limit (or the given memory limit, if it has none). The tier of the last run of each
+        test case is set as 'tier' in its details, and its 'runtime' is the total over all of its tiers. The given
+        escalation dictionary is filled in with the number of test cases settled at each tier ('settled'), those held
+        back ('escalated'), the runs skipped as the budget was spent ('skipped'), and the time the escalation took
+        ('time').
+    """
+    escalation.update({'settled': [0] * len(escalation_tiers), 'escalated': 0, 'skipped': 0, 'time': 0.0})
+    held_back = {}
+    runtimes = {}
+    # (The statuses settled, but waiting on an earlier test case that's held back, and the index of the next test
+    #  case to pass on the status of.)
+    settled = {}
+    next_index = 0
+    for (test_case_index, status) in statuses:
+        if isinstance(status, BaseException):
+            # (An exception is passed on at once, to end the run.)
+            yield (test_case_index, status)
+            continue
+        # end if
+        test_case_runs[test_case_index][1]['details']['tier'] = 0
+        if status in ('?', 'T'):
+            held_back[test_case_index] = status
+            runtimes[test_case_index] = test_case_runs[test_case_index][1]['details'].get('runtime', 0)
+        else:
+            escalation['settled'][0] += 1
+            settled[test_case_index] = status
+        # end if
+
+        # Pass on the statuses settled so far, up to the first test case held back.
+        while settled.has_key(next_index):
+            yield (next_index, settled.pop(next_index))
+            next_index += 1
+        # end while
+    # end for
+    escalation['escalated'] = len(held_back)
+
+    # Run the test cases held back at each tier in turn, passing on those that are settled.
+    start_time = time.time()
+    deadline = None
+    if escalation_budget > 0:
+        deadline = start_time + escalation_budget
+    # end if
+    for tier in range(1, len(escalation_tiers)):
+        if len(held_back) == 0 or (deadline != None and time.time() >= deadline):
+            break
+        # end if
+        (time_limit, tier_memory_limit) = escalation_tiers[tier]
+        if tier_memory_limit == None:
+            tier_memory_limit = memory_limit
+        # end if
+        test_case_indexes = sorted(held_back.keys())
+        escalated_runs = []
+        for test_case_index in test_case_indexes:
+            test_case_run = test_case_runs[test_case_index][1]
+            escalated_runs.append((test_case_run, max(time_limit, test_case_run['test_case'].get('timeout', 0)),
+                                   tier_memory_limit, deadline))
+        # end for
+        escalated_job = functools.partial(run_escalated_test_case_job, runner)
+        for (test_case_index, status) in itertools.izip(test_case_indexes, map_function(escalated_job, escalated_runs)):
+            details = test_case_runs[test_case_index][1]['details']
+            if status == None:
+                escalation['skipped'] += 1
+                continue
+            elif isinstance(status, BaseException):
+                yield (test_case_index, status)
+                continue
+            # end if
+            runtimes[test_case_index] += details.get('runtime', 0)
+            details['runtime'] = runtimes[test_case_index]
+            details['tier'] = tier
+            if status in ('?', 'T'):
+                held_back[test_case_index] = status
+            else:
+                escalation['settled'][tier] += 1
+                del held_back[test_case_index]
+                settled[test_case_index] = status
+            # end if
+
+            # Pass on the statuses settled so far, up to the first test case still held back.
+            while settled.has_key(next_index):
+                yield (next_index, settled.pop(next_index))
+                next_index += 1
+            # end while
+        # end for
+    # end for
+    escalation['time'] = time.time() - start_time
+
+    # Pass on the rest, including those that were never settled, in the order of the test cases.
+    settled.update(held_back)
+    for test_case_index in sorted(settled.keys()):
+        yield (test_case_index, settled[test_case_index])
+    # end for
+# end def
+
+
+def collect_test_case_runs(test_case_stream = [], test_case_runs = [], test_results_path = "", run_arguments = {}):
+    """ Yields the run_test_case arguments for each (non-test matter, test case name, test case) tuple in the given
+        test case stream, made up of the given run arguments, the test case, its non-test matter, and its result
+        file name under the given test results path, appending each (test case name, test case run) to the given
+        list of test case runs before it is yielded.
+
+        Any exception raised while reading the test case stream (e.g. by a splitter exiting on an error in its
+        input) is yielded as a test case run holding the exception, to be raised by run_test_cases, rather than
+        stopping the worker pool reading the stream.
+    """
+    try:
+        for (non_test_matter, test_case_name, test_case) in test_case_stream:
+            # Generate a file name to store the results of this test case.
+            result_filename = test_results_path + os.sep + test_case_name + ".txt"
+            # FIXME: generate a file name for the results of each test, validate test cases, tests_to_run, etc.
+
+            test_case_run = dict(run_arguments)
+            test_case_run.update({'test_case': test_case, 'non_test_matter': non_test_matter,
+                                  'result_filename': result_filename, 'details': {}})
+            test_case_runs.append((test_case_name, test_case_run))
+            yield test_case_run
+        # end for
+    except GeneratorExit:
+        # The stream is being closed (e.g. as the run is exiting), so there's nothing more to pass on.
+        raise
+    except BaseException, e:
+        test_case_run = {'exception': e}
+        test_case_runs.append((None, test_case_run))
+        yield test_case_run
+    # end try
+# end def
+
+
+def select_test_cases(test_case_stream = [], test_cases = {}, tests_to_run = []):
+    """ Yields the (non-test matter, test case name, test case) tuples of the test cases to run (or of all of them,
+        if none are given) from the given test case stream, as yielded by iter_input, adding every test case
+        to the given test cases dictionary as it's seen.
+
+        As each test case is yielded as soon as it's split, it's given the non-test matter found before the first
+        test case. Once the stream ends, any non-test matter found after that (other than comments) is reported as
+        an error, as are any tests to run which weren't found.
+    """
+    first_non_test_matter = None
+    non_test_matter = ""
+    for (non_test_matter, test_case_name, test_case) in test_case_stream:
+        # Is this the end of the stream?
+        if test_case_name == None:
+            break
+        # end if
+        if first_non_test_matter == None:
+            first_non_test_matter = non_test_matter
+        # end if
+        test_cases[test_case_name] = test_case
+        if tests_to_run == [] or test_case_name in tests_to_run:
+            yield (first_non_test_matter, test_case_name, test_case)
+        # end if
+    # end for
+
+    # Check that the test cases run were given all of the non-test matter.
+    if first_non_test_matter != None:
+        for line in non_test_matter[len(first_non_test_matter):].splitlines():
+            if len(line.strip()) > 0 and not line.strip().startswith('%'):
+                sys.stdout.write("\nERROR: non-test matter was found after the first test case: '" + line.strip() + "'\n")
+                sys.stdout.write("This must come before the first test case to be used with --pipeline.\n")
+                sys.stdout.write("\nExiting.\n")
+                sys.exit(1)
+            # end if
+        # end for
+    # end if
+
+    # Validate the given test case name(s) against the test case names found.
+    for test_case_name in tests_to_run:
+        if not test_cases.has_key(test_case_name):
+            sys.stdout.write("\nERROR: given test name '" + test_case_name + "' not found in the given input file.\n")
+            sys.stdout.write("Tests found: '" + string.join(test_cases.keys(), ', ') + "'\n")
+            sys.stdout.write("\nExiting.\n")
+            sys.exit(1)
+        # end if
+    # end for
+    if len(test_cases) == 0:
+        sys.stdout.write("\nERROR: no valid test cases found in the given input file.\n")
+        sys.stdout.write("\nExiting.\n")
+        sys.exit(1)
+    # end if
+# end def
+
+
+# The tokens of a theory, for comparing goals: comments (which are dropped), quoted names and strings, names, numbers,
+# and other characters, one at a time.
+goal_token_pattern = re.compile(r"(%[^\n]*|/\*.*?\*/)|('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|[A-Za-z0-9_$]+|\S)", re.DOTALL)
+
+
+def mark_duplicate_test_case_runs(runner = None, test_case_run_arguments = [], test_case_runs = []):
+    """ Passes on the given test case run arguments (as yielded by collect_test_case_runs, for the given list of
+        test case runs), marking each test case whose goal is the same problem as that of an earlier one (see the
+        given runner's canonical_goal_key) as a duplicate of it, by setting 'duplicate_of' to the earlier one's index
+        in the list, so that it isn't run itself (see run_test_case_job), but takes its result from the earlier one
+        (see settle_duplicate_test_case_runs). (Test cases that won't be run again anyway, as they're unaffected by
+        the changes to the axioms since they last succeeded, or as they're lemmas proved already, are left out.)
+    """
+    first_indexes = {}
+    for (test_case_index, test_case_run) in enumerate(test_case_run_arguments):
+        if not test_case_run.has_key('exception') and not test_case_run.has_key('unaffected') and \
+           not test_case_run.has_key('lemma_status'):
+            key = runner.canonical_goal_key(test_case_run['non_test_matter'], test_case_run['test_case'])
+            if first_indexes.has_key(key):
+                test_case_run['duplicate_of'] = first_indexes[key]
+            else:
+                first_indexes[key] = test_case_index
+            # end if
+        # end if
+        yield test_case_run
+    # end for
+# end def
+
+
+def settle_duplicate_test_case_runs(statuses = [], test_case_runs = []):
+    """ Passes on the given (test case index, status) pairs of a run of the given test case runs, holding back the
+        duplicate test cases (see mark_duplicate_test_case_runs) until the test case they duplicate has been passed
+        on, and then passing them on with its status. Its results file (if any) is copied for each, and its output,
+        excerpt and search statistics are copied into each one's details, along with its name, as 'duplicate_of'.
+    """
+    statuses_by_index = {}
+    held_back = {}
+    for (test_case_index, status) in statuses:
+        test_case_run = test_case_runs[test_case_index][1]
+        if not isinstance(status, BaseException) and test_case_run.has_key('duplicate_of'):
+            first_index = test_case_run['duplicate_of']
+            if statuses_by_index.has_key(first_index):
+                settle_duplicate_test_case_run(test_case_run, test_case_runs[first_index])
+                yield (test_case_index, statuses_by_index[first_index])
+            else:
+                held_back.setdefault(first_index, []).append(test_case_index)
+            # end if
+            continue
+        # end if
+        statuses_by_index[test_case_index] = status
+        yield (test_case_index, status)
+        for duplicate_index in held_back.pop(test_case_index, []):
+            settle_duplicate_test_case_run(test_case_runs[duplicate_index][1], test_case_runs[test_case_index])
+            yield (duplicate_index, status)
+        # end for
+    # end for
+# end def
+
+
+def settle_duplicate_test_case_run(test_case_run = {}, first_test_case_run = ()):
+    """ Settles the given duplicate test case run by the given (test case name, test case run) that it duplicates
+        (see settle_duplicate_test_case_runs).
+    """
+    (first_test_case_name, first_run) = first_test_case_run
+    details = test_case_run['details']
+    for key in ['excerpt', 'output', 'statistics', 'timed_out']:
+        if first_run['details'].has_key(key):
+            details[key] = first_run['details'][key]
+        # end if
+    # end for
+    details['duplicate_of'] = first_test_case_name
+    if os.path.isfile(first_run['result_filename']):
+        shutil.copyfile(first_run['result_filename'], test_case_run['result_filename'])
+    # end if
+# end def
+
+
+# The named axioms in each non-test matter, for telling which a proof depends on (keyed by the name of the runner, and
+# the non-test matter).
+non_test_matter_axioms = {}
+non_test_matter_axioms_lock = threading.Lock()
+
+
+def split_statement_spans(text = ""):
+    """ Returns the statements in the given text (i.e. up to each full stop outside of any brackets), each as a tuple
+        of its start and end in the text, and a list of its tokens, without comments (see goal_token_pattern).
+    """
+    statements = []
+    statement = []
+    start = 0
+    depth = 0
+    for match in goal_token_pattern.finditer(text):
+        token = match.group(2)
+        if not token:
+            continue
+        # end if
+        if len(statement) == 0:
+            start = match.start()
+        # end if
+        statement.append(token)
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif token == '.' and depth == 0:
+            statements.append((start, match.end(), statement))
+            statement = []
+        # end if
+    # end for
+    if len(statement) > 0:
+        statements.append((start, len(text), statement))
+    # end if
+    return statements
+# end def
+
+
+def split_statements(text = ""):
+    """ Returns the statements in the given text, each as a list of its tokens, without comments (see
+        split_statement_spans).
+    """
+    return [statement for (start, end, statement) in split_statement_spans(text)]
+# end def
+
+
+def get_non_test_matter_axioms(runner = None, non_test_matter = ""):
+    """ Returns a dictionary of a hash of each named axiom (as named by the given runner's get_statement_name) in the
+        given non-test matter, by its name, along with a hash of the rest of the non-test matter (e.g. its include
+        directives, or options), which are worked out once for each non-test matter. Comments and layout are ignored,
+        so changing them doesn't change a hash.
+    """
+    cache_key = (runner.__name__, non_test_matter)
+    non_test_matter_axioms_lock.acquire()
+    try:
+        if not non_test_matter_axioms.has_key(cache_key):
+            axioms = {}
+            rest = []
+            for statement in split_statements(non_test_matter):
+                # Hash the statement as an axiom, if it has a name (of its own), and otherwise, keep it with the rest
+                # of the non-test matter.
+                name = runner.get_statement_name(statement)
+                if name != None and not axioms.has_key(name):
+                    axioms[name] = hashlib.sha1(string.join(statement, ' ')).hexdigest()
+                else:
+                    rest.extend(statement)
+                # end if
+            # end for
+            # (The contents of the files included by the non-test matter, if the runner's language has any, are part of
+            #  the rest of it.)
+            if hasattr(runner, 'included_files_text'):
+                included = runner.included_files_text(non_test_matter)
+                if len(included) > 0:
+                    rest.append(included)
+                # end if
+            # end if
+            non_test_matter_axioms[cache_key] = (axioms, hashlib.sha1(string.join(rest, ' ')).hexdigest())
+        # end if
+        return non_test_matter_axioms[cache_key]
+    finally:
+        non_test_matter_axioms_lock.release()
+    # end try
+# end def
+
+
+def get_proof_dependency_key(runner = None, test_case_name = "", test_case_run = {}):
+    """ Returns the key for the proof dependencies of the given test case run: its name, and a hash of its text, and
+        the prover(s) run (see runtime_history_key, and the given runner's test_case_provers), keeping it in the
+        run's details, so it's only worked out once.
+    """
+    details = test_case_run['details']
+    if not details.has_key('dependency_key'):
+        provers = runner.test_case_provers(test_case_run['test_case'], test_case_run)
+        details['dependency_key'] = runtime_history_key(test_case_name, "", get_test_case_text(test_case_run['test_case']),
+                                                        provers)
+    # end if
+    return details['dependency_key']
+# end def
+
+
+def get_proof_dependencies(runner = None, test_case_run = {}):
+    """ Returns the proof dependencies of the given test case run, once it has succeeded: a dictionary of the hashes
+        of the axioms of its non-test matter used by its proof (see the given runner's parse_proof_axioms), by their
+        names, as 'axioms', along with the hash of the rest of the non-test matter, as 'rest' (see
+        get_non_test_matter_axioms).
+
+        None is returned if the proof (or what it used) can't be told from the output, or it used formulas which are
+        neither named axioms of the non-test matter, nor named in the test case itself.
+    """
+    # (The output of a race of provers is that of the prover that settled it.)
+    prover = test_case_run['details'].get('prover')
+    if prover == None:
+        prover = runner.test_case_provers(test_case_run['test_case'], test_case_run)
+    # end if
+    names = runner.parse_proof_axioms(test_case_run['details'].get('excerpt', ""), prover)
+    if names == None:
+        return None
+    # end if
+    (axioms, rest) = get_non_test_matter_axioms(runner, test_case_run['non_test_matter'])
+    test_case_text = get_test_case_text(test_case_run['test_case'])
+    test_case_names = set([token for (comment, token) in goal_token_pattern.findall(test_case_text)])
+    dependencies = {}
+    for name in names:
+        if axioms.has_key(name):
+            dependencies[name] = axioms[name]
+        elif name not in test_case_names:
+            return None
+        # end if
+    # end for
+    return {'axioms': dependencies, 'rest': rest}
+# end def
+
+
+def get_changed_proof_dependencies(runner = None, dependencies = {}, non_test_matter = ""):
+    """ Returns the names of the axioms in the given proof dependencies that have since been changed in (or removed
+        from) the given non-test matter (as read by the given runner), along with "the rest of the non-test matter",
+        if that has changed.
+    """
+    (axioms, rest) = get_non_test_matter_axioms(runner, non_test_matter)
+    changed = [name for (name, digest) in sorted(dependencies['axioms'].items()) if axioms.get(name) != digest]
+    if dependencies['rest'] != rest:
+        changed.append("the rest of the non-test matter")
+    # end if
+    return changed
+# end def
+
+
+def mark_unaffected_test_case_runs(runner = None, test_case_run_arguments = [], test_case_runs = [],
+                                   proof_dependencies = {}, dependency_changes = {}):
+    """ Passes on the given test case run arguments (as yielded by collect_test_case_runs, for the given list of
+        test case runs), marking each test case which last succeeded by a proof that only used axioms that are
+        unchanged since (going by the given proof dependencies; see get_proof_dependencies) as unaffected, by
+        setting 'unaffected', so that it isn't run again (see run_test_case_job), but succeeds as before. Any other
+        test case is run, including those that failed before, or never had a proof to go by (e.g. negated ones).
+        (Lemmas proved already, before the other test cases, are left as they are.)
+
+        The given dependency changes dictionary counts the test cases found 'unaffected', and those 'affected' by a
+        change to an axiom their proof used, along with the names of the changed axioms, as 'axioms'.
+    """
+    dependency_changes.update({'unaffected': 0, 'affected': 0, 'axioms': set()})
+    for (test_case_index, test_case_run) in enumerate(test_case_run_arguments):
+        if not test_case_run.has_key('exception') and not test_case_run.has_key('lemma_status'):
+            dependency_key = get_proof_dependency_key(runner, test_case_runs[test_case_index][0], test_case_run)
+            dependencies = proof_dependencies.get(dependency_key)
+            if dependencies != None:
+                changed = get_changed_proof_dependencies(runner, dependencies, test_case_run['non_test_matter'])
+                if len(changed) == 0:
+                    test_case_run['unaffected'] = True
+                    test_case_run['details']['unaffected'] = True
+                    dependency_changes['unaffected'] += 1
+
+                    # Its output from the earlier run is still in its results file, if that was kept.
+                    if not os.path.isfile(test_case_run['result_filename']):
+                        test_case_run['details']['output'] = "(Not run again; the output of its last run wasn't kept.)\n"
+                    # end if
+                else:
+                    dependency_changes['affected'] += 1
+                    dependency_changes['axioms'].update(changed)
+                # end if
+            # end if
+        # end if
+        yield test_case_run
+    # end for
+# end def
+
+
+def strip_comments(text = ""):
+    """ Returns the given text without its comments (as found by goal_token_pattern). """
+    return goal_token_pattern.sub(lambda token_match: ("", token_match.group(0))[token_match.group(1) == None], text)
+# end def
+
+
+def prove_lemmas(runner = None, test_case_stream = [], test_cases = {}, test_results_path = "", run_arguments = {},
+                 lemma_cache = None):
+    """ Proves the lemmas among the given test cases (i.e. those marked up as such) that come before (or are among)
+        those in the given list of test cases to run, as (non-test matter, test case name, test case) tuples, through
+        the given runner, with the given run_test_case arguments. The lemmas are run one at a time, in the order
+        they're found in the input file, each with the lemmas proved before it added to the non-test matter as axioms
+        (see the runner's get_lemma_axiom).
+
+        A lemma already proved with the same non-test matter (i.e. the same theory, and the same lemmas before it)
+        is taken from the given lemma cache (if any) without being run again, and each lemma proved is added to it.
+
+        Returns a list of the (index, axiom) of each lemma proved, for adding to the non-test matter of the test cases
+        after it (see add_lemmas_to_stream), and a dictionary of the (status, details) of each lemma, by its name, for
+        settling its own test case run (see settle_lemma_test_case_runs).
+    """
+    proved_lemmas = []
+    lemma_results = {}
+    if len(test_case_stream) == 0:
+        return (proved_lemmas, lemma_results)
+    # end if
+    non_test_matter = test_case_stream[0][0]
+    last_index = max([test_case.get('index', 0) for (test_case_non_test_matter, test_case_name, test_case) in test_case_stream])
+    lemma_names = [test_case_name for test_case_name in test_cases.keys() \
+                   if test_cases[test_case_name].get('lemma', False) and test_cases[test_case_name]['index'] <= last_index]
+    lemma_names.sort(key = lambda test_case_name: test_cases[test_case_name]['index'])
+    for lemma_name in lemma_names:
+        lemma = test_cases[lemma_name]
+        axiom = runner.get_lemma_axiom(lemma_name, lemma)
+        if axiom == None:
+            continue
+        # end if
+        lemma_non_test_matter = non_test_matter + string.join([lemma_axiom for (index, lemma_axiom) in proved_lemmas], '')
+        cache_key = runtime_history_key(lemma_name, lemma_non_test_matter, get_test_case_text(lemma), "")
+        if lemma_cache != None and lemma_cache.has_key(cache_key):
+            # Take the lemma as proved already.
+            (status, details) = ('S', {'cached': True})
+        else:
+            # Prove the lemma, passing on any exit requested by the run.
+            test_case_run = dict(run_arguments)
+            test_case_run.update({'test_case': lemma, 'non_test_matter': lemma_non_test_matter,
+                                  'result_filename': test_results_path + os.sep + lemma_name + ".txt", 'details': {}})
+            status = run_test_case_job(runner, test_case_run)
+            if isinstance(status, BaseException):
+                raise status
+            # end if
+            details = test_case_run['details']
+        # end if
+        if status == 'S':
+            details['lemma'] = True
+            proved_lemmas.append((lemma['index'], axiom))
+            if lemma_cache != None:
+                lemma_cache[cache_key] = True
+            # end if
+        else:
+            sys.stdout.write("\nWARNING: lemma '%s' wasn't proved (%s), so isn't added to the test cases after it.\n" % \
+                             (lemma_name, describe_test_status(status)))
+        # end if
+        lemma_results[lemma_name] = (status, details)
+    # end for
+    return (proved_lemmas, lemma_results)
+# end def
+
+
+def add_lemmas_to_stream(test_case_stream = [], proved_lemmas = []):
+    """ Yields the (non-test matter, test case name, test case) tuples in the given test case stream, with the axioms
+        of the given proved lemmas (as returned by prove_lemmas) that come before each test case added to its
+        non-test matter.
+    """
+    for (non_test_matter, test_case_name, test_case) in test_case_stream:
+        lemma_axioms = [axiom for (index, axiom) in proved_lemmas if index < test_case.get('index', 0)]
+        yield (non_test_matter + string.join(lemma_axioms, ''), test_case_name, test_case)
+    # end for
+# end def
+
+
+def settle_lemma_test_case_runs(test_case_run_arguments = [], test_case_runs = [], lemma_results = {}):
+    """ Passes on the given test case run arguments (as yielded by collect_test_case_runs, for the given list of
+        test case runs), settling the run of each lemma with the status and details it had when it was proved before
+        the other test cases (as given by prove_lemmas), by setting 'lemma_status', so that it isn't run again (see
+        run_test_case_job).
+    """
+    for (test_case_index, test_case_run) in enumerate(test_case_run_arguments):
+        if not test_case_run.has_key('exception') and lemma_results.has_key(test_case_runs[test_case_index][0]):
+            (status, details) = lemma_results[test_case_runs[test_case_index][0]]
+            test_case_run['lemma_status'] = status
+            test_case_run['details'].update(details)
+        # end if
+        yield test_case_run
+    # end for
+# end def
+
+
+# The formulas in each non-test matter that axiom selection can leave out, with their symbols (keyed by the name of
+# the runner, and the non-test matter).
+non_test_matter_formulas = {}
+non_test_matter_formulas_lock = threading.Lock()
+
+
+def get_non_test_matter_formulas(runner = None, non_test_matter = ""):
+    """ Returns the formulas in the given non-test matter that axiom selection can leave out (see the given runner's
+        get_formulas), which are worked out once for each non-test matter.
+    """
+    cache_key = (runner.__name__, non_test_matter)
+    non_test_matter_formulas_lock.acquire()
+    try:
+        if not non_test_matter_formulas.has_key(cache_key):
+            non_test_matter_formulas[cache_key] = runner.get_formulas(non_test_matter)
+        # end if
+        return non_test_matter_formulas[cache_key]
+    finally:
+        non_test_matter_formulas_lock.release()
+    # end try
+# end def
+
+
+def select_axioms(runner = None, non_test_matter = "", test_case = {}, depth = 1):
+    """ Returns the given non-test matter with only the formulas relevant to the given test case left in, along with
+        the number of formulas selected, and the number there were in all, as a tuple, reading the formulas (and their
+        symbols) by the given runner's get_formulas and get_formula_symbols.
+
+        In the manner of SInE (the SUMO Inference Engine), formulas are selected by the symbols they share: those
+        sharing a symbol with the test case are selected first, then those sharing a symbol with any formula
+        selected so far, and so on, for the given depth (i.e. number of rounds of selection). Everything else in the
+        non-test matter (e.g. its comments, and its include directives or options) is kept as it is.
+    """
+    formulas = get_non_test_matter_formulas(runner, non_test_matter)
+
+    # Start from the symbols of the test case, and add those of the formulas selected in each round to them.
+    symbols = set()
+    for statement in split_statements(get_test_case_text(test_case)):
+        symbols.update(runner.get_formula_symbols(statement) or [])
+    # end for
+    selected = [False] * len(formulas)
+    for selection_round in range(depth):
+        new_symbols = set()
+        for (index, (start, end, formula_symbols)) in enumerate(formulas):
+            if not selected[index] and not symbols.isdisjoint(formula_symbols):
+                selected[index] = True
+                new_symbols.update(formula_symbols)
+            # end if
+        # end for
+        new_symbols.difference_update(symbols)
+        if len(new_symbols) == 0:
+            # Nothing more can be selected.
+            break
+        # end if
+        symbols.update(new_symbols)
+    # end for
+
+    # Cut the formulas that weren't selected out of the non-test matter.
+    parts = []
+    position = 0
+    for (index, (start, end, formula_symbols)) in enumerate(formulas):
+        if not selected[index]:
+            parts.append(non_test_matter[position:start])
+            position = end
+        # end if
+    # end for
+    parts.append(non_test_matter[position:])
+    return (string.join(parts, ''), selected.count(True), len(formulas))
+# end def
+
+
+def run_selected_axioms_test_case(runner = None, test_case_run = {}):
+    """ Runs the test case of the given test case run through the given runner's run_test_case, with the arguments
+        in the test case run, but first against only the formulas of its non-test matter selected for it to its
+        selection depth (see select_axioms). Unless that settles it as a success, it's run again
+        against all of them, as leaving formulas out can only make a goal harder to prove: a failure (or a timeout)
+        without some of them says nothing of the goal with them all. So a test case run again can take up to twice
+        its time limit in all.
+
+        'selection' is set in the details dictionary of the run, if it has one, to a dictionary of the number of
+        formulas selected ('selected'), the number there are in all ('formulas'), and whether the test case was run
+        again against all of them ('fell_back'), in which case the CPU time set there is that of both runs.
+    """
+    job = dict(test_case_run)
+    selection_depth = job.pop('selection_depth', 1)
+    if job.get('details') == None:
+        job['details'] = {}
+    # end if
+    details = job['details']
+    non_test_matter = job['non_test_matter']
+    (job['non_test_matter'], selected_count, formula_count) = select_axioms(runner, non_test_matter, job['test_case'],
+                                                                            selection_depth)
+    selection = {'selected': selected_count, 'formulas': formula_count, 'fell_back': False}
+    status = runner.run_test_case(**job)
+
+    # Fall back to all of the formulas, unless the test case succeeded, or they were all selected anyway.
+    if status != 'S' and selected_count < formula_count:
+        selection['fell_back'] = True
+        selected_cpu_time = details.pop('cpu_time', None)
+        selected_admission_wait = details.pop('admission_wait', 0)
+        details.pop('output', None)
+        job['non_test_matter'] = non_test_matter
+        status = runner.run_test_case(**job)
+        if selected_cpu_time != None:
+            details['cpu_time'] = details.get('cpu_time', 0) + selected_cpu_time
+        # end if
+        details['admission_wait'] = details.get('admission_wait', 0) + selected_admission_wait
+    # end if
+    details['selection'] = selection
+    return status
+# end def
+
+
+def runtime_history_key(test_case_name = "", non_test_matter = "", test_case_text = "", prover = ""):
+    """ Returns the key for the run time of the given test case in the runtime history: its name, and a hash of
+        everything its run time depends on, i.e. the non-test matter, the test text, and the prover(s) run.
+    """
+    key = hashlib.sha1()
+    for part in [non_test_matter, test_case_text, prover]:
+        # Prefix each part with its length, so the parts can't run into each other.
+        key.update("%s:" % len(part))
+        key.update(part)
+    # end for
+    return test_case_name + ":" + key.hexdigest()
+# end def
+
+
+def get_test_case_run_history_key(runner = None, test_case_name = "", test_case_run = {}, selected = True):
+    """ Returns the runtime history key for the given test case run (or None, if it holds an exception instead), by
+        the prover(s) it's run through (see the given runner's test_case_provers), keeping it in the run's details,
+        so it's only worked out once.
+
+        The run times of test cases run against the axioms selected for them (see run_selected_axioms_test_case)
+        are kept apart from those of test cases run against all of the axioms, by the selection depth; unless
+        selected is unset, for the key of the test case's runs against all of the axioms.
+    """
+    details = test_case_run.get('details')
+    if details == None:
+        return None
+    # end if
+    prover = runner.test_case_provers(test_case_run['test_case'], test_case_run)
+    if not selected:
+        return runtime_history_key(test_case_name, test_case_run['non_test_matter'],
+                                   get_test_case_text(test_case_run['test_case']), prover)
+    # end if
+    if not details.has_key('history_key'):
+        if test_case_run.get('selection_depth', 0) > 0:
+            prover += "+select=%s" % test_case_run['selection_depth']
+        # end if
+        details['history_key'] = runtime_history_key(test_case_name, test_case_run['non_test_matter'],
+                                                     get_test_case_text(test_case_run['test_case']), prover)
+    # end if
+    return details['history_key']
+# end def
+
+
+def read_runtime_history(history_filename = "", description = "runtime history"):
+    """ Returns the runtime history in the given file, as a dictionary of the run time in seconds of each test case
+        (see runtime_history_key) when last run through a prover; this is empty if there's no (readable) history.
+        (Other dictionaries, e.g. the proof dependencies, are read by it too, going by the given description.)
+    """
+    if not os.path.exists(history_filename):
+        return {}
+    # end if
+    try:
+        history_file = open(history_filename, 'r')
+        history = json.load(history_file)
+        history_file.close()
+    except (IOError, ValueError), e:
+        sys.stdout.write("\nWARNING: couldn't read the %s '%s', so starting afresh: %s\n" % (description, history_filename, str(e)))
+        return {}
+    # end try
+    return history
+# end def
+
+
+def write_runtime_history(history_filename = "", history = {}, description = "runtime history"):
+    """ Stores the given runtime history in the given file, under a temporary name first, as for write_cached_result.
+    """
+    temporary_filename = "%s.%s" % (history_filename, os.getpid())
+    try:
+        history_file = open(temporary_filename, 'w')
+        json.dump(history, history_file, indent = 0, sort_keys = True)
+        history_file.close()
+        os.rename(temporary_filename, history_filename)
+    except (IOError, OSError), e:
+        sys.stdout.write("\nWARNING: couldn't store the %s '%s': %s\n" % (description, history_filename, str(e)))
+    # end try
+# end def
+
+
+def estimate_runtimes(history_keys = [], history = {}):
+    """ Returns a list of the estimated run times in seconds for the test cases with the given runtime history keys,
+        and the number of them which had a recorded run time. Test cases without a recorded run time are estimated
+        to take as long as the average of those with one (or no time at all, if none have one).
+    """
+    known_runtimes = [history[key] for key in history_keys if history.has_key(key)]
+    average_runtime = 0.0
+    if len(known_runtimes) > 0:
+        average_runtime = sum(known_runtimes) / len(known_runtimes)
+    # end if
+    return ([history.get(key, average_runtime) for key in history_keys], len(known_runtimes))
+# end def
+
+
+def longest_first(runtimes = []):
+    """ Returns the indices of the given (estimated) run times, from the longest to the shortest, keeping the original
+        order between equal run times. Starting the longest test cases first shortens the total (wall) time taken by a
+        number of jobs at once, as the shortest test cases then fill in the gaps at the end.
+    """
+    return sorted(range(len(runtimes)), key = lambda index: -runtimes[index])
+# end def
+
+
+def estimate_wall_time(runtimes = [], jobs = 1):
+    """ Returns the estimated wall time in seconds taken to run test cases with the given (estimated) run times, in
+        the given order, the given number of jobs at a time, with each taken up by the first job to become free.
+    """
+    job_end_times = [0.0] * max(jobs, 1)
+    for runtime in runtimes:
+        heapq.heappush(job_end_times, heapq.heappop(job_end_times) + runtime)
+    # end for
+    return max(job_end_times)
+# end def
+
+
+def plan_test_cases(runner = None, test_case_stream = [], history = {}, run_arguments = {}, jobs = 1):
+    """ Displays the order the test cases in the given test case stream would be run in, given the runtime history
+        (of the prover(s) each would be run through with the given run arguments; see the given runner's
+        test_case_provers) and the number of jobs to run at once, along with the estimated run time of each, and the
+        estimated wall time of the whole run, without running any of them.
+    """
+    test_case_names = []
+    history_keys = []
+    for (non_test_matter, test_case_name, test_case) in test_case_stream:
+        test_case_names.append(test_case_name)
+        history_keys.append(runtime_history_key(test_case_name, non_test_matter, get_test_case_text(test_case),
+                                                runner.test_case_provers(test_case, run_arguments)))
+    # end for
+    (runtimes, known_count) = estimate_runtimes(history_keys, history)
+
+    # Run the longest test cases first, when running more than one at a time.
+    order = range(len(runtimes))
+    if jobs > 1:
+        order = longest_first(runtimes)
+        sys.stdout.write("Planned test cases (longest first, %s at a time):\n\n" % jobs)
+    else:
+        sys.stdout.write("Planned test cases:\n\n")
+    # end if
+    for index in order:
+        if history.has_key(history_keys[index]):
+            estimate = "%.2fs" % runtimes[index]
+        else:
+            estimate = "no history"
+        # end if
+        sys.stdout.write("%5s. %-60s %12s\n" % (index + 1, test_case_names[index], estimate))
+    # end for
+
+    if known_count == 0:
+        sys.stdout.write("\nEstimated wall time: unknown (no test case has a run time recorded yet)")
+    else:
+        sys.stdout.write("\nEstimated wall time, if every test case is run through the prover: %.2fs" % estimate_wall_time([runtimes[index] for index in order], jobs))
+    # end if
+    if known_count > 0 and known_count < len(runtimes):
+        sys.stdout.write(" (%s of %s test cases have no run time recorded, so are taken to be of average length)" % \
+                         (len(runtimes) - known_count, len(runtimes)))
+    # end if
+    sys.stdout.write(".\n\nDry run complete; no prover was run.\n\n")
+# end def
+
+
+def describe_test_status(status = 'E', negated = False):
+    """ Returns a message describing the given status of a test case (inverted already, if it's a negated test case).
+    """
+    status_message = "had ERRORS"
+    if negated:
+        if status == 'F':
+            status_message = "unintentionally/undesirably succeeded"
+        elif status == 'S':
+            status_message = "failed as intended"
+        # end if
+    else:
+        if status == 'F':
+            status_message = "FAILED"
+        elif status == 'S':
+            status_message = "succeeded"
+        # end if
+    # end if
+    if status == 'T':
+        status_message = "TIMED OUT"
+    elif status == '?':
+        status_message = "was INCONCLUSIVE"
+    # end if
+    return status_message
+# end def
+
+
+def get_test_case_report(test_case_name = "", test_case_run = {}, status = 'E'):
+    """ Returns a dictionary reporting on the given test case run, with the given status (inverted already, if it's a
+        negated test case), for the JSON and JUnit reports: giving its name, index, line number, result, and the
+        wall time, CPU time (in seconds), peak resident set size (in kilobytes), and search statistics of its run,
+        along with the escalation tier it was settled at, if escalating (see escalate_test_case_runs), and whether it
+        was left unaffected by the changes to the axioms since it last succeeded (see mark_unaffected_test_case_runs),
+        and whether it's a lemma, and the axioms selected for it, if selecting them (see run_selected_axioms_test_case).
+    """
+    test_case = test_case_run['test_case']
+    details = test_case_run['details']
+    symbol = status
+    if status == 'S':
+        symbol = '.'
+    # end if
+    return {'name': test_case_name, 'index': test_case.get('index'), 'line': test_case.get('line'),
+            'negated': test_case.get('negated', False), 'status': symbol,
+            'result': describe_test_status(status, test_case.get('negated', False)),
+            'cached': details.get('cached', False), 'timed_out': details.get('timed_out', False),
+            'prover': details.get('prover'), 'wall_time': details.get('runtime'), 'cpu_time': details.get('cpu_time'),
+            'peak_rss_kb': details.get('peak_rss'), 'statistics': details.get('statistics', {}),
+            'tier': details.get('tier'), 'duplicate_of': details.get('duplicate_of'),
+            'unaffected': details.get('unaffected', False), 'lemma': test_case.get('lemma', False),
+            'selection': details.get('selection')}
+# end def
+
+
+def open_report_file(report_filename = "", description = "report"):
+    """ Opens the given report file for writing, exiting with an error if it can't be. """
+    try:
+        return open(report_filename, 'w')
+    except IOError, e:
+        sys.stdout.write("\nERROR: couldn't open the %s file '%s'.\n" % (description, report_filename))
+        sys.stdout.write("Reason: %s\n" % str(e))
+        sys.stdout.write("\nExiting.\n")
+        sys.exit(1)
+    # end try
+# end def
+
+
+def write_json_report(json_file = None, report = {}):
+    """ Writes the given test case report to the given JSON lines file, as a line of its own, so the file can be
+        followed (e.g. with tail -f) as the test cases finish.
+    """
+    json_file.write(json.dumps(report, sort_keys = True) + "\n")
+    json_file.flush()
+# end def
+
+
+def write_junit_test_case(junit_file = None, test_suite_name = "", report = {}):
+    """ Writes the given test case report to the given JUnit XML file, as a testcase element within the test suite
+        with the given name, with its search statistics and resource use as properties, and its result as a failure
+        or error element if it didn't succeed. (The file is flushed, so it can be followed as the test cases finish.)
+    """
+    quote = xml.sax.saxutils.quoteattr
+    junit_file.write('    <testcase classname=%s name=%s time="%.3f">\n' % \
+                     (quote(test_suite_name), quote(report['name']), report['wall_time'] or 0.0))
+    properties = [('cached', report['cached']), ('prover', report['prover']), ('cpu_time', report['cpu_time']),
+                  ('peak_rss_kb', report['peak_rss_kb'])] + sorted(report['statistics'].items())
+    junit_file.write('      <properties>\n')
+    for (name, value) in properties:
+        if value != None:
+            junit_file.write('        <property name=%s value=%s/>\n' % (quote(name), quote(str(value))))
+        # end if
+    # end for
+    junit_file.write('      </properties>\n')
+    if report['status'] == 'F':
+        junit_file.write('      <failure message=%s type="F"/>\n' % quote(report['result']))
+    elif report['status'] != '.':
+        junit_file.write('      <error message=%s type=%s/>\n' % (quote(report['result']), quote(report['status'])))
+    # end if
+    junit_file.write('    </testcase>\n')
+    junit_file.flush()
+# end def
+
+
+def display_test_case_details(index = 0, test_case_name = "", line_count = 0, status_message = "", results = "",
+                              verbosity = 0):
+    """ Displays the details of the test case with the given index, name and line number, with the given status message,
+        and (if the verbosity calls for it) the given results.
+    """
+    sys.stdout.write("Test case #%s named '%s' at line %s %s.\n" % \
+          (index, test_case_name, line_count, status_message))
+
+    # If the user wants verbose output, display the test results we retrieved earlier.
+    if verbosity > 0:
+        sys.stdout.write("\nDetails:\n\n")
+        sys.stdout.write(results)
+    # end if
+    sys.stdout.write("\n\n")
+# end def
+
+
+def display_test_results_summary(test_results = "", details_displayed = False):
+    """ Displays the summary of the given test results (a symbol for each test case, as displayed while running them),
+        repeating the symbols themselves if any details were displayed since.
+    """
+    # If there were test cases with problems, summarise the results again for clarity.
+    if details_displayed:
+        # Print a header for the results.
+        sys.stdout.write("Test results:\n\n")
+        sys.stdout.write(test_results)
+    # end if
+
+    # Count the test cases with each status, so that each kind of problem is reported separately.
+    status_counts = []
+    for (status, description) in [('.', "succeeded"), ('F', "failed"), ('E', "had errors"),
+                                  ('?', "were inconclusive"), ('T', "timed out")]:
+        if test_results.count(status) > 0:
+            status_counts.append("%s %s" % (test_results.count(status), description))
+        # end if
+    # end for
+    if len(status_counts) > 0:
+        sys.stdout.write("\n\nRan %s test cases: %s." % (len(test_results), string.join(status_counts, ', ')))
+    else:
+        sys.stdout.write("\n\nRan 0 test cases.")
+    # end if
+# end def
+
+
+def parse_shard(shard = ""):
+    """ Returns the (shard number, shard count) given as 'i/n' for the i'th of n shards (counting from 1), or None,
+        if it isn't valid.
+    """
+    match = re.match(r'^\s*([0-9]+)\s*/\s*([0-9]+)\s*$', shard)
+    if match == None:
+        return None
+    # end if
+    (shard_number, shard_count) = (int(match.group(1)), int(match.group(2)))
+    if shard_count < 1 or shard_number < 1 or shard_number > shard_count:
+        return None
+    # end if
+    return (shard_number, shard_count)
+# end def
+
+
+def select_shard(test_case_names = [], runtimes = None, shard_number = 1, shard_count = 1):
+    """ Returns the names of the test cases from the given list which make up the given shard of the given number of
+        shards, in their original order.
+
+        If (estimated) run times are given for the test cases, the test cases are shared out longest first, each to
+        the shard with the least run time so far (or the first such shard), so the shards take about as long as
+        each other; otherwise, they're dealt out in turn (round-robin). Either way, the shards depend only on the
+        test case names and run times given, so every machine running a shard of the same test cases (with the same
+        runtime history) agrees on them.
+    """
+    if runtimes == None:
+        shard_indices = [index % shard_count for index in range(len(test_case_names))]
+    else:
+        shard_indices = [0] * len(test_case_names)
+        shard_runtimes = [(0.0, shard_index) for shard_index in range(shard_count)]
+        for index in longest_first(runtimes):
+            (shard_runtime, shard_index) = heapq.heappop(shard_runtimes)
+            shard_indices[index] = shard_index
+            heapq.heappush(shard_runtimes, (shard_runtime + runtimes[index], shard_index))
+        # end for
+    # end if
+    return [test_case_names[index] for index in range(len(test_case_names)) if shard_indices[index] == shard_number - 1]
+# end def
+
+
+def get_shard_results_filename(test_results_path = default_test_results_path, shard = None):
+    """ Returns the name of the file the results of the given shard (a dictionary, as set up by run_test_suite) are
+        written to, under the given test results path.
+    """
+    return test_results_path + os.sep + "shard-%s-of-%s.json" % (shard['number'], shard['count'])
+# end def
+
+
+def write_shard_results(shard_results_filename = "", shard = None, test_results = [], test_case_details = [],
+                        runtimes = {}):
+    """ Writes the results of the given shard of a test run (a dictionary, as set up by run_test_suite) to the given
+        file, for merging with those of the other shards (see merge_shard_results).
+
+        The results are a list of the test cases run, as (index, test case name, result symbol) tuples, and a list
+        of the details displayed, as (index, test case name, line number, status message, results) tuples, along with
+        the run times recorded for the runtime history. They're written as JSON, with any text that isn't valid UTF-8
+        replaced.
+    """
+    shard_results = {'shard': [shard['number'], shard['count']],
+                     'test_case_names': shard['test_case_names'],
+                     'test_results': test_results,
+                     'test_case_details': [(index, test_case_name, line_count, status_message,
+                                            results.decode('utf-8', 'replace')) \
+                                           for (index, test_case_name, line_count, status_message, results) in test_case_details],
+                     'runtimes': runtimes}
+    try:
+        shard_results_file = open(shard_results_filename, 'w')
+        json.dump(shard_results, shard_results_file, indent = 1)
+        shard_results_file.close()
+    except (IOError, OSError), e:
+        sys.stdout.write("\nERROR: couldn't write the shard results file '%s'.\n" % shard_results_filename)
+        sys.stdout.write("Reason: %s\n" % str(e))
+        sys.stdout.write("\nExiting.\n")
+        sys.exit(1)
+    # end try
+# end def
+
+
+def merge_shard_results(shard_results_filenames = [], verbosity = 0):
+    """ Merges the results of the shards of a test run in the given shard results files (see write_shard_results),
+        and displays them as for a single run of all of the test cases.
+
+        The shard results files must all come from the same test run, with every shard present once, and every test
+        case run in exactly one of them. The run times recorded by the shards are added to the runtime history.
+    """
+    if len(shard_results_filenames) == 0:
+        sys.stdout.write("\nERROR: no shard results files were given to merge.\n")
+        sys.stdout.write("\nExiting.\n")
+        sys.exit(1)
+    # end if
+
+    # Read in the results of each shard.
+    shards = {}
+    for shard_results_filename in shard_results_filenames:
+        try:
+            shard_results_file = open(shard_results_filename, 'r')
+            shard_results = json.load(shard_results_file)
+            shard_results_file.close()
+            (shard_number, shard_count) = shard_results['shard']
+            test_case_names = shard_results['test_case_names']
+        except (IOError, ValueError, KeyError, TypeError), e:
+            sys.stdout.write("\nERROR: couldn't read the shard results file '%s'.\n" % shard_results_filename)
+            sys.stdout.write("Reason: %s\n" % str(e))
+            sys.stdout.write("\nExiting.\n")
+            sys.exit(1)
+        # end try
+        if verbosity > 1:
+            sys.stdout.write("Read shard %s/%s from %s.\n" % (shard_number, shard_count, shard_results_filename))
+        # end if
+
+        # Check that it belongs with the shards read so far.
+        if len(shards) > 0:
+            first_shard_results = shards.values()[0]
+            if first_shard_results['shard'][1] != shard_count or first_shard_results['test_case_names'] != test_case_names:
+                sys.stdout.write("\nERROR: the shard results file '%s' isn't from the same test run as the others.\n" % \
+                                 shard_results_filename)
+                sys.stdout.write("\nExiting.\n")
+                sys.exit(1)
+            # end if
+        # end if
+        if shards.has_key(shard_number):
+            sys.stdout.write("\nERROR: shard %s/%s was given more than once.\n" % (shard_number, shard_count))
+            sys.stdout.write("\nExiting.\n")
+            sys.exit(1)
+        # end if
+        shards[shard_number] = shard_results
+    # end for
+
+    # Check that every shard is present, and every test case was run once.
+    missing_shards = [str(shard_number) for shard_number in range(1, shard_count + 1) if not shards.has_key(shard_number)]
+    if len(missing_shards) > 0:
+        sys.stdout.write("\nERROR: the results of shard(s) %s of %s are missing.\n" % (string.join(missing_shards, ', '), shard_count))
+        sys.stdout.write("\nExiting.\n")
+        sys.exit(1)
+    # end if
+    test_results = []
+    test_case_details = []
+    for shard_results in shards.values():
+        test_results += shard_results['test_results']
+        test_case_details += shard_results['test_case_details']
+    # end for
+    test_results.sort()
+    test_case_details.sort()
+    run_test_case_names = [test_case_name for (index, test_case_name, symbol) in test_results]
+    if sorted(run_test_case_names) != sorted(test_case_names):
+        sys.stdout.write("\nERROR: the shards didn't run every test case exactly once; ")
+        sys.stdout.write("the runtime history used to share them out must be the same for every shard.\n")
+        sys.stdout.write("\nExiting.\n")
+        sys.exit(1)
+    # end if
+
+    # Display the merged results, as for a single run.
+    sys.stdout.write("Test results:\n\n")
+    symbols = string.join([symbol for (index, test_case_name, symbol) in test_results], '')
+    sys.stdout.write(symbols)
+    sys.stdout.write("\n\n")
+    for (index, test_case_name, line_count, status_message, results) in test_case_details:
+        display_test_case_details(index, test_case_name, line_count, status_message, results.encode('utf-8'), verbosity)
+    # end for
+    display_test_results_summary(symbols, len(test_case_details) > 0)
+    sys.stdout.write("\n\nMerged the results of %s shards." % shard_count)
+
+    # Add the run times recorded by the shards to the runtime history.
+    runtimes = {}
+    for shard_results in shards.values():
+        runtimes.update(shard_results.get('runtimes', {}))
+    # end for
+    if len(runtimes) > 0 and os.path.isdir(default_test_results_path):
+        history_filename = default_test_results_path + os.sep + "history.json"
+        runtime_history = read_runtime_history(history_filename)
+        runtime_history.update(runtimes)
+        write_runtime_history(history_filename, runtime_history)
+    # end if
+    sys.stdout.write("\n\nTest run complete.\n\n")
+# end def
+
+
+def get_commit_id(filename = ""):
+    """ Returns the ID of the git commit checked out in the working tree holding the given file, with a '+' appended
+        if the file has uncommitted changes, or an empty string if it isn't in a git working tree.
+    """
+    path = os.path.abspath(filename)
+    devnull = open(os.devnull, 'w')
+    try:
+        commit_id = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd = os.path.dirname(path),
+                                            stderr = devnull).strip()
+        changes = subprocess.check_output(['git', 'status', '--porcelain', '--', path], cwd = os.path.dirname(path),
+                                          stderr = devnull).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+    finally:
+        devnull.close()
+    # end try
+    if len(changes) > 0:
+        commit_id += '+'
+    # end if
+    return commit_id
+# end def
+
+
+def open_benchmark_database(benchmark_filename = ""):
+    """ Opens the benchmark database in the given file, creating it if need be, and returns a connection to it.
+
+        The database holds a row for each benchmark run (its ID, git commit, input file, prover and start time), and
+        for each test case run in it (its status, wall time, CPU time, and the prover's search statistics, as JSON).
+    """
+    try:
+        connection = sqlite3.connect(benchmark_filename)
+        connection.execute("CREATE TABLE IF NOT EXISTS runs (run_id INTEGER PRIMARY KEY AUTOINCREMENT, " +
+                           "commit_id TEXT, input_filename TEXT, prover TEXT, started REAL)")
+        connection.execute("CREATE TABLE IF NOT EXISTS test_cases (run_id INTEGER, test_case_name TEXT, status TEXT, " +
+                           "wall_time REAL, cpu_time REAL, statistics TEXT, PRIMARY KEY (run_id, test_case_name))")
+        connection.commit()
+    except sqlite3.Error, e:
+        sys.stdout.write("\nERROR: couldn't open the benchmark database '%s'.\n" % benchmark_filename)
+        sys.stdout.write("Reason: %s\n" % str(e))
+        sys.stdout.write("\nExiting.\n")
+        sys.exit(1)
+    # end try
+    return connection
+# end def
+
+
+def record_benchmark_run(benchmark_filename = "", input_filename = "", prover = "", started = 0, reports = []):
+    """ Records a benchmark run of the test cases in the given input file through the given prover, started at the
+        given time, in the given benchmark database, tagged with the git commit of the input file (see
+        get_commit_id). Each of the given test case reports (see get_test_case_report) is recorded, except for those
+        taken from the result cache, which weren't timed. Returns a tuple of the run's ID and commit ID.
+    """
+    commit_id = get_commit_id(input_filename)
+    connection = open_benchmark_database(benchmark_filename)
+    try:
+        cursor = connection.execute("INSERT INTO runs (commit_id, input_filename, prover, started) VALUES (?, ?, ?, ?)",
+                                    (commit_id, os.path.abspath(input_filename), prover, started))
+        run_id = cursor.lastrowid
+        for report in reports:
+            if report['cached'] or report['wall_time'] == None:
+                continue
+            # end if
+            connection.execute("INSERT OR REPLACE INTO test_cases VALUES (?, ?, ?, ?, ?, ?)",
+                               (run_id, report['name'], report['status'], report['wall_time'], report['cpu_time'],
+                                json.dumps(report['statistics'], sort_keys = True)))
+        # end for
+        connection.commit()
+    except sqlite3.Error, e:
+        sys.stdout.write("\nERROR: couldn't record the benchmark run in '%s'.\n" % benchmark_filename)
+        sys.stdout.write("Reason: %s\n" % str(e))
+        sys.stdout.write("\nExiting.\n")
+        sys.exit(1)
+    # end try
+    connection.close()
+    return (run_id, commit_id)
+# end def
+
+
+def find_benchmark_run(connection = None, run = ""):
+    """ Returns the row of the runs table (run ID, commit ID, input file, prover, start time) for the given benchmark
+        run, given by its run ID, or by (a prefix of) its commit ID, for the latest run at that commit; or None, if
+        there's no such run.
+    """
+    if run.isdigit():
+        row = connection.execute("SELECT * FROM runs WHERE run_id = ?", (int(run),)).fetchone()
+        if row != None:
+            return row
+        # end if
+    # end if
+    return connection.execute("SELECT * FROM runs WHERE substr(commit_id, 1, ?) = ? ORDER BY run_id DESC LIMIT 1",
+                              (len(run), run)).fetchone()
+# end def
+
+
+def describe_benchmark_run(run_row = ()):
+    """ Returns a description of the given benchmark run (a row of the runs table) for display. """
+    (run_id, commit_id, input_filename, prover, started) = run_row
+    return "run %s (commit %s, %s, %s, %s)" % (run_id, commit_id[:12] or "unknown", os.path.basename(input_filename),
+                                               prover, time.strftime("%Y-%m-%d %H:%M", time.localtime(started)))
+# end def
+
+
+def find_benchmark_regressions(earlier = {}, later = {}, threshold = default_regression_threshold):
+    """ Returns a list of the regressions between the given earlier and later results of a test case in a benchmark
+        run (dictionaries of its status, wall time, CPU time and search statistics), as (measure, earlier value,
+        later value) tuples, for each measure that rose by more than the given threshold (a percentage).
+
+        The CPU time of the prover is compared (or its wall time, if either run doesn't have the CPU time), ignoring
+        rises of less than benchmark_time_noise seconds, along with each search statistic recorded in both runs.
+        A test case that timed out in the later run only is always a regression.
+    """
+    regressions = []
+    if later['status'] == 'T' and earlier['status'] != 'T':
+        regressions.append(('status', earlier['status'], later['status']))
+    # end if
+    measures = []
+    if earlier['cpu_time'] != None and later['cpu_time'] != None:
+        measures.append(('cpu_time', earlier['cpu_time'], later['cpu_time']))
+    else:
+        measures.append(('wall_time', earlier['wall_time'], later['wall_time']))
+    # end if
+    for name in sorted(set(earlier['statistics'].keys()) & set(later['statistics'].keys())):
+        measures.append((name, earlier['statistics'][name], later['statistics'][name]))
+    # end for
+    for (name, earlier_value, later_value) in measures:
+        if name.endswith('_time') and later_value - earlier_value < benchmark_time_noise:
+            continue
+        # end if
+        if earlier_value > 0 and later_value > earlier_value * (1 + threshold / 100.0):
+            regressions.append((name, earlier_value, later_value))
+        # end if
+    # end for
+    return regressions
+# end def
+
+
+def compare_benchmark_runs(runs = [], threshold = default_regression_threshold,
+                           test_results_path = default_test_results_path, verbosity = 0):
+    """ Compares two benchmark runs in the benchmark database under the given test results path, given by run ID or
+        commit ID (see find_benchmark_run): the earlier run, then the later one. If only one run is given, it's
+        compared with the latest run other than itself (in the order they were recorded), and if none are, the latest
+        two runs are compared.
+
+        Each test case run in both is checked for regressions (see find_benchmark_regressions), which are displayed.
+        Exits with status 1 if any test case regressed.
+    """
+    benchmark_filename = test_results_path + os.sep + "benchmarks.db"
+    if not os.path.isfile(benchmark_filename):
+        sys.stdout.write("\nERROR: there's no benchmark database '%s'; record some runs with --benchmark first.\n" % \
+                         benchmark_filename)
+        sys.stdout.write("\nExiting.\n")
+        sys.exit(1)
+    # end if
+    if len(runs) > 2:
+        sys.stdout.write("\nERROR: at most two benchmark runs can be compared.\n")
+        sys.stdout.write("\nExiting.\n")
+        sys.exit(1)
+    # end if
+    connection = open_benchmark_database(benchmark_filename)
+
+    # Find the runs to compare.
+    latest_runs = [str(row[0]) for row in connection.execute("SELECT run_id FROM runs ORDER BY run_id DESC LIMIT 2")]
+    if len(runs) == 0:
+        runs = latest_runs[::-1]
+    elif len(runs) == 1:
+        run_row = find_benchmark_run(connection, runs[0])
+        if run_row == None:
+            sys.stdout.write("\nERROR: no benchmark run '%s' was found in '%s'.\n" % (runs[0], benchmark_filename))
+            sys.stdout.write("\nExiting.\n")
+            sys.exit(1)
+        # end if
+        # (Never the run itself, which would find nothing changed.)
+        other_run_ids = [row[0] for row in connection.execute("SELECT run_id FROM runs WHERE run_id != ? " +
+                                                              "ORDER BY run_id DESC LIMIT 1", (run_row[0],))]
+        runs = [str(run_id) for run_id in sorted([run_row[0]] + other_run_ids)]
+    # end if
+    if len(runs) < 2:
+        sys.stdout.write("\nERROR: there must be two benchmark runs in '%s' to compare.\n" % benchmark_filename)
+        sys.stdout.write("\nExiting.\n")
+        sys.exit(1)
+    # end if
+    run_rows = []
+    for run in runs:
+        run_row = find_benchmark_run(connection, run)
+        if run_row == None:
+            sys.stdout.write("\nERROR: no benchmark run '%s' was found in '%s'.\n" % (run, benchmark_filename))
+            sys.stdout.write("\nExiting.\n")
+            sys.exit(1)
+        # end if
+        run_rows.append(run_row)
+    # end for
+    sys.stdout.write("Comparing %s\n     with %s,\nflagging rises of more than %s%%:\n\n" % \
+                     (describe_benchmark_run(run_rows[0]), describe_benchmark_run(run_rows[1]), threshold))
+    if run_rows[0][2:4] != run_rows[1][2:4]:
+        sys.stdout.write("WARNING: these runs are of different input files or provers.\n\n")
+    # end if
+
+    # Read in the results of each test case in each run.
+    results = []
+    for run_row in run_rows:
+        test_case_results = {}
+        for (test_case_name, status, wall_time, cpu_time, statistics) in \
+            connection.execute("SELECT test_case_name, status, wall_time, cpu_time, statistics FROM test_cases " +
+                               "WHERE run_id = ?", (run_row[0],)):
+            test_case_results[test_case_name] = {'status': status, 'wall_time': wall_time, 'cpu_time': cpu_time,
+                                                 'statistics': json.loads(statistics)}
+        # end for
+        results.append(test_case_results)
+    # end for
+    connection.close()
+
+    # Compare the results of the test cases run in both.
+    test_case_names = sorted(set(results[0].keys()) & set(results[1].keys()))
+    regressed_count = 0
+    for test_case_name in test_case_names:
+        regressions = find_benchmark_regressions(results[0][test_case_name], results[1][test_case_name], threshold)
+        if len(regressions) > 0:
+            regressed_count += 1
+            sys.stdout.write(" - %s:\n" % test_case_name)
+            for (name, earlier_value, later_value) in regressions:
+                if name == 'status':
+                    sys.stdout.write("     now TIMES OUT (was '%s')\n" % earlier_value)
+                elif name.endswith('_time'):
+                    sys.stdout.write("     %s: %.3fs -> %.3fs (%+.0f%%)\n" % \
+                                     (name, earlier_value, later_value, (later_value - earlier_value) * 100.0 / earlier_value))
+                else:
+                    sys.stdout.write("     %s: %s -> %s (%+.0f%%)\n" % \
+                                     (name, earlier_value, later_value, (later_value - earlier_value) * 100.0 / earlier_value))
+                # end if
+            # end for
+        elif verbosity > 0:
+            sys.stdout.write(" - %s: OK\n" % test_case_name)
+        # end if
+    # end for
+    unmatched_count = len(set(results[0].keys()) ^ set(results[1].keys()))
+    if unmatched_count > 0:
+        sys.stdout.write("\n%s test case(s) were only run in one of the runs, and weren't compared." % unmatched_count)
+    # end if
+    sys.stdout.write("\n%s of %s test case(s) regressed.\n\n" % (regressed_count, len(test_case_names)))
+    if regressed_count > 0:
+        sys.exit(1)
+    # end if
+# end def
+
+
+def prepare_test_results_path(test_results_path = default_test_results_path, use_cache = True, clear_cache = False):
+    """ Creates the given test results path, if it doesn't exist, and clears out and/or creates the result cache under
+        it, as requested, returning the path of the result cache, or "" if it isn't to be used. Exits with an error if
+        either can't be done.
+    """
+    # Create the test results path, if it doesn't exist.
+    if os.path.exists(test_results_path):
+        if not os.path.isdir(test_results_path):
+            sys.stdout.write("\nERROR: given test results path '%s' already exists, and isn't a directory. Exiting." % test_results_path)
+            sys.exit(1)
+        # end if
+    else:
+        # Try to create the directory.
+        try:
+            os.makedirs(test_results_path)
+        except Exception, e:
+            sys.stdout.write("\nERROR: couldn't create the test results path '%s'.\n" % test_results_path)
+            sys.stdout.write("Reason: %s\n" % str(e))
+            sys.stdout.write("\nExiting.\n")
+            sys.exit(1)
+        # end try
+    # end if
+
+    # Clear out and/or create the result cache, as requested.
+    cache_path = test_results_path + os.sep + "cache"
+    if clear_cache and os.path.isdir(cache_path):
+        try:
+            shutil.rmtree(cache_path)
+        except Exception, e:
+            sys.stdout.write("\nERROR: couldn't clear the result cache '%s'.\n" % cache_path)
+            sys.stdout.write("Reason: %s\n" % str(e))
+            sys.stdout.write("\nExiting.\n")
+            sys.exit(1)
+        # end try
+    # end if
+    if use_cache:
+        if not os.path.isdir(cache_path):
+            try:
+                os.makedirs(cache_path)
+            except Exception, e:
+                sys.stdout.write("\nERROR: couldn't create the result cache '%s'.\n" % cache_path)
+                sys.stdout.write("Reason: %s\n" % str(e))
+                sys.stdout.write("\nExiting.\n")
+                sys.exit(1)
+            # end try
+        # end if
+    else:
+        cache_path = ""
+    # end if
+    return cache_path
+# end def
+
+
+def open_report_files(json_filename = "", junit_filename = "", test_suite_name = ""):
+    """ Opens the JSON lines and JUnit XML report files with the given names, if any, returning them as a tuple (with
+        None for a report not requested), with the JUnit test cases in a test suite with the given name.
+    """
+    json_file = None
+    if len(json_filename) > 0:
+        json_file = open_report_file(json_filename, "JSON report")
+    # end if
+    junit_file = None
+    if len(junit_filename) > 0:
+        junit_file = open_report_file(junit_filename, "JUnit report")
+        junit_file.write('<?xml version="1.0" encoding="UTF-8"?>\n<testsuites>\n')
+        junit_file.write('  <testsuite name=%s>\n' % xml.sax.saxutils.quoteattr(test_suite_name))
+        junit_file.flush()
+    # end if
+    return (json_file, junit_file)
+# end def
+
+
+def close_report_files(json_file = None, junit_file = None):
+    """ Finishes off the given JSON lines and JUnit XML report files, if open (see open_report_files). """
+    if json_file != None:
+        json_file.close()
+    # end if
+    if junit_file != None:
+        junit_file.write('  </testsuite>\n</testsuites>\n')
+        junit_file.close()
+    # end if
+# end def
+
+
+def dispatch_test_case_runs(runner = None, test_case_run_arguments = [], test_case_runs = [], jobs = 1,
+                            runtime_history = None, escalation_tiers = [], escalation_budget = 0, memory_limit = 0,
+                            dedupe = True, escalation = {}):
+    """ Dispatches the given test case runs (as yielded by collect_test_case_runs, for the given list of test case
+        runs) to the given runner, returning a generator of their (test case index, status) pairs, and the pool of
+        worker threads running them (or None), to be closed once they have all been passed on.
+
+        A pool of worker threads is used if more than one job at a time is requested. (Each run spends its time
+        waiting on a prover process, so threads are enough to keep the cores busy.) Either way, the statuses are
+        passed on in the order the runs were given, so the output stays deterministic. If a runtime history is given
+        (i.e. the test cases to run are known up front, rather than run as they're split), the longest are started
+        first, going by it.
+
+        The inconclusive test cases are run again with higher limits, if more than one escalation tier is given,
+        filling in the given escalation dictionary (see escalate_test_case_runs), and the duplicate test cases are
+        settled by the test cases they duplicate, if deduping (see settle_duplicate_test_case_runs).
+    """
+    job = functools.partial(run_test_case_job, runner)
+    pool = None
+    if jobs > 1 and runtime_history != None:
+        pool = multiprocessing.pool.ThreadPool(jobs)
+        test_case_run_arguments = list(test_case_run_arguments)
+        history_keys = [get_test_case_run_history_key(runner, test_case_name, test_case_run) \
+                        for (test_case_name, test_case_run) in test_case_runs]
+        (runtimes, known_count) = estimate_runtimes(history_keys, runtime_history)
+        async_statuses = [None] * len(test_case_run_arguments)
+        for index in longest_first(runtimes):
+            async_statuses[index] = pool.apply_async(job, [test_case_run_arguments[index]])
+        # end for
+        statuses = (async_status.get() for async_status in async_statuses)
+    elif jobs > 1:
+        pool = multiprocessing.pool.ThreadPool(jobs)
+        statuses = pool.imap(job, test_case_run_arguments)
+    else:
+        statuses = itertools.imap(job, test_case_run_arguments)
+    # end if
+
+    # Run the inconclusive test cases again with higher limits, if escalating.
+    statuses = enumerate(statuses)
+    if len(escalation_tiers) > 1:
+        map_function = itertools.imap
+        if pool != None:
+            map_function = pool.imap
+        # end if
+        statuses = escalate_test_case_runs(runner, statuses, test_case_runs, escalation_tiers, escalation_budget,
+                                           memory_limit, map_function, escalation)
+    # end if
+
+    # Settle the duplicate test cases by the test cases they duplicate, if deduping.
+    if dedupe:
+        statuses = settle_duplicate_test_case_runs(statuses, test_case_runs)
+    # end if
+    return (statuses, pool)
+# end def
+
+
+def start_run_tally(runner = None, run_arguments = {}):
+    """ Returns a dictionary for tallying up the results of a run of test cases through the given runner, with the
+        given run arguments, as each comes in (see tally_test_case_run).
+    """
+    racing_provers = runner.racing_provers(run_arguments)
+    return {'new_runtimes': {}, 'peak_rss': (0, ""), 'duplicates': 0, 'saved_runs': 0, 'cache_hits': 0,
+            'cache_misses': 0, 'racing_provers': racing_provers,
+            'race_wins': dict([(prover, 0) for prover in racing_provers]),
+            'axiom_selection': {'test_cases': 0, 'selected': 0, 'formulas': 0, 'fell_back': 0, 'timed': 0,
+                                'runtime': 0.0, 'full_runtime': 0.0},
+            'test_results': "", 'shard_test_results': [], 'details_to_display': []}
+# end def
+
+
+def tally_test_case_run(runner = None, test_case_name = "", test_case_run = {}, status = 'E', run_tally = {},
+                        runtime_history = {}, proof_dependencies = None, verbosity = 0):
+    """ Tallies up the given test case run, with the given status, in the given run tally (see start_run_tally),
+        returning its status, inverted if it's a negated test case: its run time (for the runtime history), the
+        axioms selected for it (compared with its last run against all of them, going by the given runtime history),
+        its peak memory use, its use of the result cache, or of another test case's result, and the prover that
+        settled it, if racing them. The axioms its proof used are kept in the given proof dependencies, if any, and
+        its result is added to the test results, and (if they're to be displayed, going by the given verbosity) to
+        the details to display.
+    """
+    details = test_case_run['details']
+
+    # Record the run time of each test case actually run through the prover (and that got as far as running it).
+    if not details.get('cached', False) and details.has_key('runtime') and status != 'E':
+        history_key = get_test_case_run_history_key(runner, test_case_name, test_case_run)
+        run_tally['new_runtimes'][history_key] = details['runtime']
+    # end if
+
+    # Total up the axioms selected for the test case, and compare its run time with that of its last run against
+    # all of the axioms, if there was one (and neither was taken from the result cache).
+    selection = details.get('selection')
+    if selection != None:
+        axiom_selection = run_tally['axiom_selection']
+        axiom_selection['test_cases'] += 1
+        axiom_selection['selected'] += selection['selected']
+        axiom_selection['formulas'] += selection['formulas']
+        if selection['fell_back']:
+            axiom_selection['fell_back'] += 1
+        # end if
+        full_runtime = runtime_history.get(get_test_case_run_history_key(runner, test_case_name, test_case_run, False))
+        if full_runtime != None and not details.get('cached', False) and details.has_key('runtime'):
+            runtime = max(details['runtime'], benchmark_time_noise)
+            selection['speedup'] = full_runtime / runtime
+            axiom_selection['timed'] += 1
+            axiom_selection['runtime'] += runtime
+            axiom_selection['full_runtime'] += full_runtime
+        # end if
+    # end if
+
+    # Note the largest peak memory use of a prover.
+    if details.get('peak_rss') > run_tally['peak_rss'][0]:
+        run_tally['peak_rss'] = (details['peak_rss'], test_case_name)
+    # end if
+
+    # Count the duplicate test cases, which didn't use the result cache (or a prover) themselves, and the prover
+    # runs they saved.
+    if details.has_key('duplicate_of'):
+        run_tally['duplicates'] += 1
+        run_tally['saved_runs'] += len(runner.test_case_provers(test_case_run['test_case'], test_case_run).split('+'))
+    # end if
+
+    # Count the uses of the result cache (by the test cases run, at least).
+    if len(test_case_run.get('cache_path', "")) > 0 and not details.has_key('duplicate_of') and \
+       not details.get('unaffected', False):
+        if details.get('cached', False):
+            run_tally['cache_hits'] += 1
+        else:
+            run_tally['cache_misses'] += 1
+        # end if
+    # end if
+
+    # Count the test cases settled by each prover, if racing them.
+    if details.get('prover') != None:
+        run_tally['race_wins'][details['prover']] += 1
+    # end if
+
+    # Invert the status if this is a negated test case.
+    negated = test_case_run['test_case'].get('negated', False)
+    if negated:
+        if status == 'S':
+           status = 'F'
+        elif status == 'F':
+           status = 'S'
+        # end if
+    # end if
+
+    # Keep the axioms the proof of a test case that succeeded used, for telling if it's affected by later changes,
+    # or forget those of one that no longer succeeds by a proof (unless it wasn't run again).
+    if proof_dependencies != None and not details.get('unaffected', False):
+        dependency_key = get_proof_dependency_key(runner, test_case_name, test_case_run)
+        dependencies = None
+        if status == 'S' and not negated:
+            dependencies = get_proof_dependencies(runner, test_case_run)
+        # end if
+        if dependencies != None:
+            proof_dependencies[dependency_key] = dependencies
+        elif proof_dependencies.has_key(dependency_key):
+            del proof_dependencies[dependency_key]
+        # end if
+    # end if
+
+    # Add the test case to the test results, and to the details to display, if they're to be displayed.
+    symbol = status
+    if status == 'S':
+        symbol = '.'
+    # end if
+    run_tally['shard_test_results'].append((test_case_run['test_case'].get('index', 0), test_case_name, symbol))
+    run_tally['test_results'] += symbol
+    if status != 'S' or verbosity > 1:
+        run_tally['details_to_display'].append((test_case_name, status, test_case_run['result_filename'], details))
+    # end if
+    return status
+# end def
+
+
+def describe_test_case_run(status = 'E', negated = False, details = {}, escalation_tiers = []):
+    """ Returns a message describing the given status of a test case (inverted already, if it's a negated test case)
+        along with how it was settled, going by the given details of its run: the prover that settled it (if racing
+        them), whether it was a lemma, the axioms selected for it, the test case it was a duplicate of, whether it
+        wasn't run again as its last proof is unaffected, and the escalation tier it was last run at (of those given).
+    """
+    status_message = describe_test_status(status, negated)
+
+    # Note which prover settled the test case, if racing them.
+    if details.get('prover') != None:
+        if details.get('cached', False):
+            status_message += " (as cached from %s)" % details['prover']
+        else:
+            status_message += " (settled by %s in %.2fs)" % (details['prover'], details['latency'])
+        # end if
+    # end if
+
+    # Note that the test case was a lemma given to the test cases after it, if it was.
+    if details.get('lemma', False):
+        status_message += " (as a lemma, added to the test cases after it)"
+    # end if
+
+    # Note the axioms selected for the test case, if they were, and how much faster it was than its last run
+    # against all of them.
+    if details.has_key('selection'):
+        selection = details['selection']
+        status_message += " (against %s of %s axioms" % (selection['selected'], selection['formulas'])
+        if selection['fell_back']:
+            status_message += ", then all of them"
+        # end if
+        if selection.has_key('speedup'):
+            status_message += ", %.1fx as fast as its last run against all of them" % selection['speedup']
+        # end if
+        status_message += ")"
+    # end if
+
+    # Note the test case this one took its result from, if it was a duplicate.
+    if details.has_key('duplicate_of'):
+        status_message += " (as the same problem as test case '%s')" % details['duplicate_of']
+    # end if
+
+    # Note that the test case wasn't run again, if the axioms its last proof used are unchanged.
+    if details.get('unaffected', False):
+        status_message += " (not run again, as the axioms its last proof used are unchanged)"
+    # end if
+
+    # Note the escalation tier the test case was last run at, if it was run again.
+    if details.get('tier', 0) > 0:
+        status_message += " (at escalation tier %s, %s)" % (details['tier'] + 1,
+                                                            describe_escalation_tier(escalation_tiers[details['tier']]))
+    # end if
+    return status_message
+# end def
+
+
+def get_test_case_results(test_case = {}, status = 'E', result_filename = "", details = {}, verbosity = 0):
+    """ Returns the results of the given test case's run to display with its details, going by its status and the
+        given verbosity: none, unless verbose; the whole of its output, if it had errors or timed out (or if very
+        verbose), read from the given results file unless it was kept in its details; or else, if it failed or was
+        inconclusive (or if more verbose), its text, and the excerpt of its output from the search section on (which
+        gives the reason for giving up, for provers that give one).
+    """
+    results = ""
+    if verbosity > 0:
+        if status in ('E', 'T') or verbosity > 2:
+            # If there was an error or a timeout (or we're being very verbose), the user wants to see the whole file.
+            # Use the output kept from a streamed run, or read in everything.
+            if details.has_key('output'):
+                results = details['output']
+            else:
+                results_file = open(result_filename, 'r')
+                results = results_file.read()
+                results_file.close()
+            # end if
+        elif status in ('F', '?') or verbosity > 1:
+            # If this test case failed or was inconclusive (or the verbosity is high), the user wants to see the
+            # test case text, and the search results.
+            results += get_test_case_text(test_case)
+            results += details.get('excerpt', '')
+        # end if
+    # end if
+    return results
+# end def
+
+
+def display_test_case_runs_details(test_cases = {}, test_case_details_to_display = [], verbosity = 0,
+                                   escalation_tiers = []):
+    """ Displays the details of the given test cases' runs, as (test case name, status, results file name, details)
+        tuples, in the order of the test cases (which those settled by escalation are reported out of), returning
+        them as (index, test case name, line, status message, results) tuples, for the results of a shard.
+    """
+    shard_test_case_details = []
+    test_case_details_to_display = sorted(test_case_details_to_display,
+                                          key = lambda test_case_details: test_cases[test_case_details[0]]['index'])
+    for (test_case_name, status, result_filename, details) in test_case_details_to_display:
+        # Get the relevant details for this test case.
+        test_case = test_cases[test_case_name]
+        status_message = describe_test_case_run(status, test_case['negated'], details, escalation_tiers)
+        results = get_test_case_results(test_case, status, result_filename, details, verbosity)
+
+        # Now format these details.
+        display_test_case_details(test_case['index'], test_case_name, test_case['line'], status_message, results,
+                                  verbosity)
+        shard_test_case_details.append((test_case['index'], test_case_name, test_case['line'], status_message, results))
+    # end for
+    return shard_test_case_details
+# end def
+
+
+def display_run_summary(run_tally = {}, lemma_results = {}, proved_lemmas = [], selection_depth = 0,
+                        dependency_changes = {}, escalation = {}, escalation_tiers = [], escalation_budget = 0,
+                        memory_limit = 0, memory_budget = 0, cache_path = "", verbosity = 0):
+    """ Displays a summary of each of the features used by a run, from the given run tally (see start_run_tally):
+        the given lemmas proved, the axioms selected to the given selection depth, the test cases not run again by
+        their given proof dependency changes, the given escalation (with its tiers and budget), and the provers that
+        settled the test cases, if racing them.
+
+        The features used by default are only summarised if the verbosity calls for it: the prover runs saved by
+        deduping the test cases, and the use of the result cache at the given path; likewise the memory use of the
+        provers (against the given memory limit and budget), unless these aren't the defaults.
+    """
+    # Summarise the prover runs saved by deduping the test cases, if any were.
+    if verbosity > 0 and run_tally['duplicates'] > 0:
+        sys.stdout.write("\n\nDeduplication: %s test case(s) took the result of an earlier test case with the same " % \
+                         run_tally['duplicates'])
+        sys.stdout.write("problem, ")
+        sys.stdout.write("saving %s prover run(s)." % run_tally['saved_runs'])
+    # end if
+
+    # Summarise the lemmas proved, if any were looked for.
+    if len(lemma_results) > 0:
+        sys.stdout.write("\n\nLemmas: %s of %s proved, and added to the test cases after them." % \
+                         (len(proved_lemmas), len(lemma_results)))
+    # end if
+
+    # Summarise the selection of the axioms, if they were selected for any test cases.
+    axiom_selection = run_tally['axiom_selection']
+    if axiom_selection['test_cases'] > 0:
+        sys.stdout.write("\n\nAxiom selection: %s test case(s) run against an average of %.1f of %.1f axioms (to a depth of %s), " % \
+                         (axiom_selection['test_cases'], float(axiom_selection['selected']) / axiom_selection['test_cases'],
+                          float(axiom_selection['formulas']) / axiom_selection['test_cases'], selection_depth))
+        sys.stdout.write("%s of them run again against all of the axioms" % axiom_selection['fell_back'])
+        if axiom_selection['timed'] > 0:
+            sys.stdout.write("; %s taking %.2fs, against %.2fs for their last runs against all of the axioms (%.1fx as fast)" % \
+                             (axiom_selection['timed'], axiom_selection['runtime'], axiom_selection['full_runtime'],
+                              axiom_selection['full_runtime'] / axiom_selection['runtime']))
+        # end if
+        sys.stdout.write(".")
+    # end if
+
+    # Summarise the test cases not run again (or run again) by the axioms their last proofs used, if there were any.
+    if dependency_changes.get('unaffected', 0) + dependency_changes.get('affected', 0) > 0:
+        sys.stdout.write("\n\nProof dependencies: %s test case(s) not run again, as the axioms their last proofs used are unchanged; " % \
+                         dependency_changes['unaffected'])
+        sys.stdout.write("%s run again, as their last proofs used changed or removed axioms" % dependency_changes['affected'])
+        if len(dependency_changes['axioms']) > 0:
+            sys.stdout.write(" (%s)" % string.join(sorted(dependency_changes['axioms']), ', '))
+        # end if
+        sys.stdout.write(".")
+    # end if
+
+    # Summarise the escalation of the inconclusive test cases, if any were run again.
+    if escalation.get('escalated', 0) > 0:
+        settled = escalation['settled']
+        sys.stdout.write("\n\nEscalation: %s test case(s) run again; settled at %s; still unsettled: %s" % \
+                         (escalation['escalated'], string.join(["%s %s" % (describe_escalation_tier(escalation_tiers[tier]), settled[tier]) \
+                                                                for tier in range(1, len(escalation_tiers))], ', '),
+                          escalation['escalated'] - sum(settled[1:])))
+        if escalation_budget > 0:
+            sys.stdout.write(" (%.1fs of a %gs budget used" % (escalation['time'], escalation_budget))
+            if escalation['skipped'] > 0:
+                sys.stdout.write(", %s run(s) skipped as it ran out" % escalation['skipped'])
+            # end if
+            sys.stdout.write(")")
+        # end if
+        sys.stdout.write(".")
+    # end if
+
+    # Summarise the memory use of the provers, for tuning the memory limit and budget.
+    peak_rss = run_tally['peak_rss']
+    memory_limits_given = memory_limit != default_memory_limit or memory_budget != default_memory_budget
+    if (verbosity > 0 or memory_limits_given) and peak_rss[0] > 0:
+        sys.stdout.write("\n\nMemory: largest prover peak RSS %.1f MB (%s); limit %s MB per prover, budget %s MB, " % \
+                         (peak_rss[0] / 1024.0, peak_rss[1], memory_limit or "no", memory_budget or "no"))
+        sys.stdout.write("at most %s prover(s) at once." % memory_budget_state['most_running'])
+    # end if
+
+    # Summarise the use of the result cache, if it was used.
+    if verbosity > 0 and len(cache_path) > 0:
+        sys.stdout.write("\n\nResult cache: %s hits, %s misses." % (run_tally['cache_hits'], run_tally['cache_misses']))
+    # end if
+
+    # Summarise which prover settled the test cases, if racing them.
+    if len(run_tally['racing_provers']) > 0:
+        sys.stdout.write("\n\nSettled by: %s." % string.join(["%s %s" % (prover, run_tally['race_wins'][prover]) \
+                                                              for prover in run_tally['racing_provers']], ', '))
+    # end if
+# end def
+
+
+def run_test_cases(runner = None, test_cases = {}, tests_to_run = [], test_results_path = default_test_results_path,
+                   non_test_matter = "", dry_run = False, verbosity = 0, jobs = 1, use_cache = True,
+                   clear_cache = False, stream = False, timeout = 0, test_case_stream = None, prover_arguments = {},
+                   prepare_test_case_stream = None, shard = None, json_filename = "", junit_filename = "",
+                   test_suite_name = "", benchmark = False, benchmark_prover = "", memory_limit = default_memory_limit,
+                   memory_budget = default_memory_budget, escalation_tiers = [], escalation_budget = 0,
+                   dedupe = True, lemmas = False, selection_depth = 0):
+    """ Run the test cases listed through the given runner, with the given prover arguments (e.g. the prover to run,
+        as the runner's run_test_case takes them), running up to the given number of jobs (test cases) at once, and
+        stopping any test case that runs for more than the given timeout in seconds (if positive), unless overridden
+        by its markup.
+
+        Unless told not to use it, results are reused from (and stored in) a result cache kept under the test
+        results path, which is emptied first if clear_cache is set. Along with them, the names and hashes of the
+        axioms used by the proof of each test case that succeeded are kept (see get_proof_dependencies), and a test
+        case is only run again if it didn't succeed by a proof, or the proof used an axiom that has since changed
+        (see mark_unaffected_test_case_runs).
+
+        If streaming is requested, prover output is read from a pipe, and only written to the test results path
+        when it's going to be displayed (see the runner's run_test_case).
+
+        If a test case stream (as yielded by iter_input) is given, each test case is run from it as soon as it has
+        been split, instead of from the given test cases and non-test matter, adding it to the given test cases.
+
+        If a function to prepare the test case stream is given, the test case stream is passed through it, with
+        the result cache path and the verbosity, before the test cases are run (e.g. to clausify their non-test
+        matter once for the whole run).
+
+        The run time of each test case is kept in a runtime history under the test results path. Unless a test case
+        stream is given, this is used to run the longest test cases first when running more than one at a time.
+        If a dry run is requested, the planned order, and the estimated wall time, are displayed instead of running
+        the test cases (see plan_test_cases).
+
+        If a shard of a test run is given (see run_test_suite), its results are also written to a shard results file
+        under the test results path, for merging with those of the other shards (see merge_shard_results).
+
+        If a JSON lines and/or JUnit XML file name is given, a report on each test case (see get_test_case_report)
+        is written to it as the test case's result comes in, with the JUnit test cases in a test suite with the given
+        name.
+
+        If benchmarking is requested, the run is recorded in the benchmark database under the test results path,
+        tagged with the git commit of the input file named by the test suite name, and with the given benchmark
+        prover name (see record_benchmark_run). Every test case is then run through the prover, and so timed, even
+        if told to dedupe them.
+
+        Each prover process is limited to the given memory limit, and they are only started while their limits fit
+        in the given memory budget, in total (both in megabytes; see admit_provers). The largest peak resident set
+        size of a prover in the run is displayed at the end, for tuning these, if either isn't the default, or the
+        verbosity calls for it.
+
+        If more than one escalation tier is given (as by parse_escalation_tiers), the test cases that were
+        inconclusive, or timed out, are run again at each higher tier in turn, within the given escalation budget
+        (see escalate_test_case_runs), and are reported once settled, after the others. (The first tier's limits
+        are those of the run itself, i.e. the timeout and memory limit given.)
+
+        Unless told not to dedupe them, test cases whose goals are the same problem for the prover as an earlier
+        test case's (see the runner's canonical_goal_key) aren't run, but take the earlier test case's result
+        instead (see settle_duplicate_test_case_runs); the prover runs saved are displayed at the end, if the
+        verbosity calls for it.
+
+        If lemmas are requested, the lemmas among the test cases (and those before the test cases to run) are
+        proved first, in order, and each one proved is added to the non-test matter of the test cases after it,
+        as an axiom (see prove_lemmas); the lemmas proved are kept in a lemma cache alongside the result cache.
+
+        If a positive selection depth is given, each test case is run against the axioms selected for it to that
+        depth first, and only run again against all of them if that doesn't prove it (see
+        run_selected_axioms_test_case). The axioms selected, and the speedup over the test case's last run against
+        all of them (going by the runtime history), are displayed with its details, and summed up at the end.
+    """
+
+    # Validate the given test case name(s) against the list of discovered test case names.
+    for test_case_name in tests_to_run:
+        if test_case_name not in tests_to_run:
+            sys.stdout.write("\nERROR: given test name '%s' not found in the available tests to run.\n" % test_case_name)
+            sys.stdout.write("Tests found: '%s'\n" % string.join(test_cases.keys(), ', '))
+            sys.stdout.write("\nExiting.\n")
+            sys.exit(1)
+        # end if
+    # end for
+
+    # Get the test cases to run, as (non-test matter, test case name, test case) tuples.
+    # (Order the test cases to run by the runtime history, unless they're being run as they're split.)
+    schedule = (test_case_stream == None)
+    if test_case_stream != None:
+        test_case_stream = select_test_cases(test_case_stream, test_cases, tests_to_run)
+    else:
+        test_case_stream = [(non_test_matter, test_case_name, test_cases.get(test_case_name, {})) \
+                            for test_case_name in tests_to_run]
+    # end if
+
+    # Read the runtime history, and plan the run from it, if that's all that's wanted.
+    history_filename = test_results_path + os.sep + "history.json"
+    runtime_history = read_runtime_history(history_filename)
+    if dry_run:
+        plan_test_cases(runner, test_case_stream, runtime_history, prover_arguments, jobs)
+        return
+    # end if
+    started = time.time()
+    set_memory_budget(memory_budget)
+    benchmark_reports = []
+    if benchmark:
+        # (A test case that took an earlier one's result wasn't timed, so it couldn't be recorded.)
+        dedupe = False
+    # end if
+    (json_file, junit_file) = open_report_files(json_filename, junit_filename, test_suite_name)
+    cache_path = prepare_test_results_path(test_results_path, use_cache, clear_cache)
+
+    # Read the proof dependencies of the test cases that last succeeded, kept with the result cache.
+    proof_dependencies = None
+    if len(cache_path) > 0:
+        dependencies_filename = cache_path + os.sep + "dependencies.json"
+        proof_dependencies = read_runtime_history(dependencies_filename, "proof dependencies")
+    # end if
+    dependency_changes = {}
+
+    # Collect the arguments shared by each test case run.
+    run_arguments = {'dry_run': dry_run, 'verbosity': verbosity, 'cache_path': cache_path, 'stream': stream,
+                     'timeout': timeout, 'memory_limit': memory_limit,
+                     'selection_depth': selection_depth}
+    run_arguments.update(prover_arguments)
+
+    # Prove the lemmas before the test cases after them are run, adding those proved to their non-test matter, if
+    # asked to. (This needs the whole of the test case stream to find the lemmas in.)
+    lemma_results = {}
+    proved_lemmas = []
+    if lemmas:
+        lemma_cache = None
+        if len(cache_path) > 0:
+            lemma_cache_filename = cache_path + os.sep + "lemmas.json"
+            lemma_cache = read_runtime_history(lemma_cache_filename, "lemma cache")
+        # end if
+        test_case_stream = list(test_case_stream)
+        (proved_lemmas, lemma_results) = prove_lemmas(runner, test_case_stream, test_cases, test_results_path,
+                                                      run_arguments, lemma_cache)
+        if lemma_cache != None:
+            write_runtime_history(lemma_cache_filename, lemma_cache, "lemma cache")
+        # end if
+        test_case_stream = add_lemmas_to_stream(test_case_stream, proved_lemmas)
+    # end if
+
+    # Print a header for the results.
+    sys.stdout.write("Test results:\n\n")
+
+    # Prepare the test case stream for the runner, if it needs to be (e.g. clausifying the non-test matter).
+    if prepare_test_case_stream != None:
+        test_case_stream = prepare_test_case_stream(test_case_stream, cache_path, verbosity)
+    # end if
+
+    # Collect the arguments for each test case run, in the order the test cases are to be reported, as the runs
+    # are dispatched, and dispatch them.
+    test_case_runs = []
+    test_case_run_arguments = collect_test_case_runs(test_case_stream, test_case_runs, test_results_path, run_arguments)
+    if lemmas:
+        test_case_run_arguments = settle_lemma_test_case_runs(test_case_run_arguments, test_case_runs, lemma_results)
+    # end if
+    if proof_dependencies != None:
+        test_case_run_arguments = mark_unaffected_test_case_runs(runner, test_case_run_arguments, test_case_runs,
+                                                                 proof_dependencies, dependency_changes)
+    # end if
+    if dedupe:
+        test_case_run_arguments = mark_duplicate_test_case_runs(runner, test_case_run_arguments, test_case_runs)
+    # end if
+    escalation = {}
+    (statuses, pool) = dispatch_test_case_runs(runner, test_case_run_arguments, test_case_runs, jobs,
+                                               (None, runtime_history)[schedule], escalation_tiers, escalation_budget,
+                                               memory_limit, dedupe, escalation)
+    run_tally = start_run_tally(runner, run_arguments)
+
+    for (test_case_index, status) in statuses:
+        (test_case_name, test_case_run) = test_case_runs[test_case_index]
+
+        # Pass on any exit requested by a test case run (or anything else raised while splitting the input).
+        if isinstance(status, BaseException):
+            if pool != None:
+                pool.terminate()
+            # end if
+            raise status
+        # end if
+        status = tally_test_case_run(runner, test_case_name, test_case_run, status, run_tally, runtime_history,
+                                     proof_dependencies, verbosity)
+
+        # Report on the test case, as requested.
+        if json_file != None or junit_file != None or benchmark:
+            report = get_test_case_report(test_case_name, test_case_run, status)
+            benchmark_reports.append(report)
+            if json_file != None:
+                write_json_report(json_file, report)
+            # end if
+            if junit_file != None:
+                write_junit_test_case(junit_file, test_suite_name, report)
+            # end if
+        # end if
+
+        # Display a JUnit/unittesting style symbol to indicate whether this test succeed, failed, or was erroneous.
+        sys.stdout.write(run_tally['test_results'][-1])
+        sys.stdout.flush()
+    # end for
+
+    if pool != None:
+        pool.close()
+        pool.join()
+    # end if
+    close_report_files(json_file, junit_file)
+
+    # Update the runtime history with the run times of this run. (The run times of a shard are kept with its results
+    # instead, and added to the history when the shards are merged, so that every shard shares out the test cases
+    # by the same history.)
+    if len(run_tally['new_runtimes']) > 0 and shard == None:
+        runtime_history.update(run_tally['new_runtimes'])
+        write_runtime_history(history_filename, runtime_history)
+    # end if
+
+    # Keep the proof dependencies for the next run.
+    if proof_dependencies != None:
+        write_runtime_history(dependencies_filename, proof_dependencies, "proof dependencies")
+    # end if
+
+    # Record the run in the benchmark database, if benchmarking.
+    if benchmark:
+        benchmark_filename = test_results_path + os.sep + "benchmarks.db"
+        (benchmark_run_id, commit_id) = record_benchmark_run(benchmark_filename, test_suite_name, benchmark_prover,
+                                                             started, benchmark_reports)
+    # end if
+
+    sys.stdout.write("\n\n")
+
+    # Now display the details of any recorded test cases.
+    shard_test_case_details = display_test_case_runs_details(test_cases, run_tally['details_to_display'], verbosity,
+                                                             escalation_tiers)
+    display_test_results_summary(run_tally['test_results'], len(run_tally['details_to_display']) > 0)
+
+    # Write out the results of this shard of the test run, if it is one.
+    if shard != None:
+        shard_results_filename = get_shard_results_filename(test_results_path, shard)
+        write_shard_results(shard_results_filename, shard, run_tally['shard_test_results'], shard_test_case_details,
+                            run_tally['new_runtimes'])
+        sys.stdout.write("\n\nShard %s/%s results written to %s." % (shard['number'], shard['count'], shard_results_filename))
+    # end if
+
+    # Note where the benchmark run was recorded, if benchmarking.
+    if benchmark:
+        sys.stdout.write("\n\nBenchmark run %s (commit %s) recorded in %s." % \
+                         (benchmark_run_id, commit_id[:12] or "unknown", benchmark_filename))
+    # end if
+
+    display_run_summary(run_tally, lemma_results, proved_lemmas, selection_depth, dependency_changes, escalation,
+                        escalation_tiers, escalation_budget, memory_limit, memory_budget, cache_path, verbosity)
+
+    sys.stdout.write("\n\nTest run complete.\n\n")
+# end def
+
+
+def run_test_suite(runner = None, input_filename = "", tests_to_run = [], dry_run = False, verbosity = 0, jobs = 1,
+                   use_cache = True, clear_cache = False, stream = False, timeout = 0, pipeline = False,
+                   prover_arguments = {}, prepare_test_case_stream = None, shard = None, json_filename = "",
+                   junit_filename = "", benchmark = False, benchmark_prover = "", memory_limit = default_memory_limit,
+                   memory_budget = default_memory_budget, escalation_tiers = [], escalation_budget = 0, dedupe = True,
+                   lemmas = False, selection_depth = 0):
+    """ Runs the test suite in the given input filename through the given runner, with the given prover arguments, by
+        splitting the input, then calling out to the test case runner with the split/parsed output, collating the
+        results, and displaying it.
+
+        If pipelining is requested, each test case is run as soon as it has been split, so the first test cases are
+        run while the rest of the input file is still being split.
+
+        If a shard is given, as (shard number, shard count), only that shard of the test cases to run is run (see
+        select_shard), sharing them out by their run times in the runtime history, if there are any.
+
+        If a function to prepare the test case stream is given, the test cases are passed through it before they're
+        run (see run_test_cases).
+
+        If a JSON lines and/or JUnit XML file name is given, a report on each test case is written to it as it
+        finishes (see run_test_cases).
+
+        If benchmarking is requested, the run is recorded in the benchmark database, with the given benchmark prover
+        name (see record_benchmark_run).
+
+        Each prover process is limited to the given memory limit, within the given memory budget for the prover
+        processes running at once (both in megabytes; see run_test_cases).
+
+        If escalation tiers are given, the inconclusive test cases are run again with their higher limits, within the
+        given escalation budget (see run_test_cases).
+
+        Unless told not to dedupe them, test cases whose goals are the same problem as an earlier test case's take
+        its result, instead of being run (see run_test_cases).
+
+        If lemmas are requested, the lemmas in the input are proved first, and each one proved is added to the
+        non-test matter of the test cases after it (see run_test_cases).
+
+        If a positive selection depth is given, each test case is run against the axioms selected for it to that
+        depth first, and only run again against all of them if need be (see run_test_cases).
+    """
+    run_test_cases_arguments = {'runner': runner, 'tests_to_run': tests_to_run, 'dry_run': dry_run,
+                                'verbosity': verbosity, 'jobs': jobs, 'use_cache': use_cache,
+                                'clear_cache': clear_cache, 'stream': stream, 'timeout': timeout,
+                                'prover_arguments': prover_arguments,
+                                'prepare_test_case_stream': prepare_test_case_stream,
+                                'json_filename': json_filename, 'junit_filename': junit_filename,
+                                'test_suite_name': input_filename, 'benchmark': benchmark,
+                                'benchmark_prover': benchmark_prover, 'memory_limit': memory_limit,
+                                'memory_budget': memory_budget, 'escalation_tiers': escalation_tiers,
+                                'escalation_budget': escalation_budget, 'dedupe': dedupe, 'lemmas': lemmas,
+                                'selection_depth': selection_depth}
+
+    # If pipelining, hand the test cases to the test case runner as they're split.
+    if pipeline:
+        if verbosity > 1:
+            sys.stdout.write("Splitting %s, and running the test cases as they're found...\n" % input_filename)
+        # end if
+        run_test_cases(test_cases = {}, test_case_stream = iter_input(input_filename, dry_run = dry_run,
+                                                                      verbosity = verbosity),
+                       **run_test_cases_arguments)
+        return
+    # end if
+
+    # Split the input file into test_cases, getting a section of non-test matter, and a
+    # dictionary of test case names and text.
+    if verbosity > 1:
+        sys.stdout.write("Splitting %s...\n" % input_filename)
+    # end if
+    non_test_matter, test_case_names, test_cases = split_input(input_filename, dry_run = dry_run, verbosity = verbosity)
+
+    # Validate the given test case name(s) against the list of discovered test case names.
+    for test_case_name in tests_to_run:
+        if test_case_name not in test_case_names:
+            sys.stdout.write("\nERROR: given test name '%s' not found in the given input file.\n" % test_case_name)
+            sys.stdout.write("Tests found: '%s'\n" % string.join(test_case_names, ', '))
+            sys.stdout.write("\nExiting.\n")
+            sys.exit(1)
+        # end if
+    # end for
+
+    # If there weren't any test given to run, just run the tests in the order they were discovered.
+    if tests_to_run == []:
+        tests_to_run = test_case_names
+    # end if
+
+    # Run the selected test cases.
+    if len(tests_to_run) > 0:
+        # Select the test cases in the given shard, sharing them out by their recorded run times, if there are any.
+        if shard != None:
+            (shard_number, shard_count) = shard
+            runtime_history = read_runtime_history(default_test_results_path + os.sep + "history.json")
+            history_keys = [runtime_history_key(test_case_name, non_test_matter, get_test_case_text(test_cases[test_case_name]),
+                                                runner.test_case_provers(test_cases[test_case_name], prover_arguments))
+                            for test_case_name in tests_to_run]
+            (runtimes, known_count) = estimate_runtimes(history_keys, runtime_history)
+            if known_count == 0:
+                runtimes = None
+            # end if
+            shard = {'number': shard_number, 'count': shard_count, 'test_case_names': tests_to_run}
+            tests_to_run = select_shard(tests_to_run, runtimes, shard_number, shard_count)
+            if verbosity > 0:
+                sys.stdout.write("Running shard %s/%s (%s of %s test cases, shared out %s).\n" % \
+                                 (shard_number, shard_count, len(tests_to_run), len(shard['test_case_names']),
+                                  ("by their run times", "in turn")[runtimes == None]))
+            # end if
+        # end if
+        if verbosity > 0:
+            sys.stdout.write("Running the following test cases in %s:\n - %s\n\n" % \
+                             (input_filename, string.join(tests_to_run, '\n - ')))
+        # end if
+        run_test_cases_arguments['tests_to_run'] = tests_to_run
+        run_test_cases(test_cases = test_cases, non_test_matter = non_test_matter, shard = shard,
+                       **run_test_cases_arguments)
+    else:
+        sys.stdout.write("\nERROR: no valid test cases found in the given input file, '%s'.\n" % input_filename)
+        sys.stdout.write("\nExiting.\n")
+        sys.exit(1)
+    # end def
+# end def
+
+
+def extend_spans(spans = [], start = 0, end = 0):
+    """ Adds the span of text between the given offsets to the given list of (start, end) spans, merging it into
+        the last span in the list if the two are contiguous.
+    """
+    if len(spans) > 0 and spans[-1][1] == start:
+        spans[-1] = (spans[-1][0], end)
+    else:
+        spans.append((start, end))
+    # end if
+# end def
+
+
+def get_test_case_text(test_case = {}):
+    """ Returns the text of the given test case, as given, or as sliced out of the input file it was split from.
+    """
+    if test_case.has_key('text'):
+        return test_case['text']
+    # end if
+    source = test_case.get('source', '')
+    return string.join([source[start:end] for (start, end) in test_case.get('spans', [])], '')
+# end def
+
+
+def iter_input(input_filename, dry_run = False, verbosity = 0):
+    """ Splits the input file (of either runner) with the given filename as a generator, yielding a tuple of
+        (non-test matter, test case name, test case) for each test case as soon as its text is complete,
+        where the non-test matter is all of that seen so far. Once the end of the file is reached, a final
+        tuple of (non-test matter, None, None) is yielded, with all of the non-test matter in the file.
+
+        The file is searched for markup in a single pass over a memory map of it, recording the offsets of the
+        spans of text belonging to each test case (as 'spans' over its 'source') rather than copying the text, so
+        the time taken grows linearly with the size of the file. The text of a test case is sliced out of the
+        memory map when needed, using get_test_case_text.
+
+        Non-test matter after the first test case that's only comments and layout (e.g. the comment ending the
+        tests) is left out of the final non-test matter, as it can't be given to the test cases before it, which
+        is noted if the verbosity calls for it.
+    """
+
+    # Try to open the file.
+    try:
+        input_file = open(input_filename, 'r')
+    except:
+        sys.stdout.write("\nERROR: Couldn't open file with name '%s'. Exiting.\n" % input_filename)
+        sys.exit(1)
+    # end try
+
+    # Map the file into memory, or (if it's empty, and can't be mapped) just read it in.
+    try:
+        source = mmap.mmap(input_file.fileno(), 0, access = mmap.ACCESS_READ)
+    except (ValueError, EnvironmentError):
+        source = input_file.read()
+    # end try
+    input_file.close()
+
+    # Compile a regular expression for speed.
+    # (This describes the markup described earlier, with a named group for each kind of markup line. As it is
+    #  searched for across the whole file, only spaces within a line are allowed around the parts of the markup.)
+    markup = re.compile('^[ \t\r\f\v]*%[ \t\r\f\v]*' +
+                        '(?:(?P<begin>Test[ \t\r\f\v]*runner[ \t\r\f\v]*:?[ \t\r\f\v]*begin)|' +
+                        '(?P<end>Test[ \t\r\f\v]*runner[ \t\r\f\v]*:?[ \t\r\f\v]*end)|' +
+                        '(?P<test_case>(?:(?P<negated>Negated)?[ \t\r\f\v]*[tT]est[ \t\r\f\v]*case[ \t\r\f\v]*:?|' +
+                        '(?P<lemma>Lemma)[ \t\r\f\v]*:)' +
+                        '[ \t\r\f\v]*(?P<name>.*)[ \t\r\f\v]*$)|' +
+                        '(?P<timeout>Timeout[ \t\r\f\v]*:?[ \t\r\f\v]*(?P<seconds>[0-9]+(\.[0-9]*)?)))',
+                        re.IGNORECASE | re.MULTILINE)
+
+    # Search through the file for markup lines, in a single pass.
+    # The text between markup lines is dispatched by its offsets, according to the flags set by the markup before
+    # it, without being copied or looked at line by line.
+    in_test = False
+    in_non_test_matter = True
+    current_test_count = 0
+    line_count = 1
+    non_test_matter_parts = []
+    non_test_matter = ""
+    joined_part_count = 0
+    leading_part_count = None
+    test_cases = {}
+    undispatched_offset = 0
+    counted_offset = 0
+    for markup_match in markup.finditer(source):
+        # Find the start and end of the markup line, and count the lines up to it.
+        line_start = markup_match.start()
+        line_end = source.find('\n', line_start) + 1
+        if line_end == 0:
+            line_end = len(source)
+        # end if
+        line_count += source[counted_offset:line_start].count('\n')
+        counted_offset = line_start
+
+        # Dispatch the text since the last markup line, depending on what flags are currently set.
+        if in_test:
+            extend_spans(test_cases[current_test_name]['spans'], undispatched_offset, line_start)
+        elif in_non_test_matter and undispatched_offset < line_start:
+            non_test_matter_parts.append(source[undispatched_offset:line_start])
+        # end if
+        undispatched_offset = line_start
+
+        # If this line starts a new test case, or ends the test section, the current test case (if any) is complete.
+        if in_test and (markup_match.group('test_case') != None or markup_match.group('end') != None):
+            if joined_part_count < len(non_test_matter_parts):
+                non_test_matter = string.join(non_test_matter_parts, '')
+                joined_part_count = len(non_test_matter_parts)
+            # end if
+            yield (non_test_matter, current_test_name, test_cases[current_test_name])
+        # end if
+
+        # Check for markup in the current line.
+        disposable_line = False
+        negated = False
+        if markup_match.group('test_case') != None:
+            # We have a new test case.
+
+            # Note how much of the non-test matter comes before the first test case.
+            if leading_part_count == None:
+                leading_part_count = len(non_test_matter_parts)
+            # end if
+
+            # Get the name, if any, or use a safe default.
+            current_test_count += 1
+            current_test_name = "Test-%s" % current_test_count
+            trial_test_name = markup_match.group('name')
+            if trial_test_name != None and len(trial_test_name.strip()) > 0:
+                current_test_name = trial_test_name.strip()
+            # end if
+            if verbosity > 1:
+                sys.stdout.write("Found test case #%s at line %s named '%s'.\n" % \
+                                 (current_test_count, line_count, current_test_name))
+            # end if
+
+            # Check if we've seen a test with this name before.
+            if test_cases.has_key(current_test_name):
+                sys.stdout.write("\nERROR: test with duplicate name '%s' found at line %s. Exiting.\n" % \
+                                 (current_test_name, line_count))
+                sys.exit(1)
+            # end if
+
+            # Check if this test case is expected to fail.
+            if markup_match.group('negated') != None:
+                negated = True
+            # end if
+
+            # Store some useful properties in the test case dictionary under the current test name as a key.
+            test_cases[current_test_name] = {}
+            test_cases[current_test_name]['index'] = current_test_count
+            test_cases[current_test_name]['line'] = line_count
+            test_cases[current_test_name]['negated'] = negated
+            test_cases[current_test_name]['lemma'] = (markup_match.group('lemma') != None)
+
+            # Set an empty initial list of spans of text for this test, in the source text.
+            test_cases[current_test_name]['source'] = source
+            test_cases[current_test_name]['spans'] = []
+
+            # Flag that we're in a test.
+            in_test = True
+            in_non_test_matter = False
+        elif markup_match.group('timeout') != None:
+            # We may have a time limit for the current test case.
+            # (This line is otherwise an ordinary comment, so it is kept in the test text.)
+            if in_test:
+                test_cases[current_test_name]['timeout'] = float(markup_match.group('seconds'))
+                if verbosity > 1:
+                    sys.stdout.write("Found a timeout of %s seconds for test case '%s' at line %s.\n" % \
+                                     (test_cases[current_test_name]['timeout'], current_test_name, line_count))
+                # end if
+            # end if
+        elif markup_match.group('begin') != None:
+            # We have a beginning of test section marker.
+            # Flag that we're no longer in non-test matter, and this is a disposable line.
+            if verbosity > 1:
+                sys.stdout.write("Found beginning of test section at line %s.\n" % line_count)
+            # end if
+            in_non_test_matter = False
+            disposable_line = True
+        elif markup_match.group('end') != None:
+            # We have an end of test section marker.
+            # Flag that we're no longer in a test, and back in non-test matter.
+            if verbosity > 1:
+                sys.stdout.write("Found end of test section at line %s.\n" % line_count)
+            # end if
+            in_non_test_matter = True
+            in_test = False
+            disposable_line = True
+        # end if
+
+        # Skip over a disposable line; any other markup line is dispatched along with the text that follows it.
+        if disposable_line:
+            undispatched_offset = line_end
+        # end if
+    # end for
+
+    # Dispatch the text after the last markup line.
+    if in_test:
+        extend_spans(test_cases[current_test_name]['spans'], undispatched_offset, len(source))
+    elif in_non_test_matter and undispatched_offset < len(source):
+        non_test_matter_parts.append(source[undispatched_offset:])
+    # end if
+
+    # Yield the last test case (if the file ended in one), then all of the non-test matter.
+    # (The non-test matter after the first test case is left out if it's only comments and layout, e.g. the rest of
+    #  the comment block ending the tests, so that it's the same, byte for byte, as that the test cases are given as
+    #  they're split (see select_test_cases), and they share cached results whether the run is pipelined or not.)
+    non_test_matter = string.join(non_test_matter_parts, '')
+    if leading_part_count != None:
+        trailing_lines = string.join(non_test_matter_parts[leading_part_count:], '').splitlines()
+        if len([line for line in trailing_lines if len(line.strip()) > 0 and not line.strip().startswith('%')]) == 0:
+            non_test_matter = string.join(non_test_matter_parts[:leading_part_count], '')
+            if verbosity > 1 and len(trailing_lines) > 0:
+                sys.stdout.write("Left the %s line(s) of comments after the first test case " % len(trailing_lines))
+                sys.stdout.write("out of the non-test matter.\n")
+            # end if
+        # end if
+    # end if
+    if in_test:
+        yield (non_test_matter, current_test_name, test_cases[current_test_name])
+    # end if
+    yield (non_test_matter, None, None)
+# end def
+
+
+def split_input(input_filename, dry_run = False, verbosity = 0):
+    """ Splits the input file (of either runner) with the given filename, extracting non-test matter, and
+        collating named (if available) test case portions in a dictionary.
+
+        (See iter_input, which does the splitting.)
+    """
+    non_test_matter = ""
+    test_case_names = []
+    test_cases = {}
+    for (non_test_matter, test_case_name, test_case) in iter_input(input_filename, dry_run = dry_run,
+                                                                   verbosity = verbosity):
+        if test_case_name != None:
+            test_case_names.append(test_case_name)
+            test_cases[test_case_name] = test_case
+        # end if
+    # end for
+
+    # Return the non-test matter, the test case names, and the test cases we're collated.
+    return (non_test_matter, test_case_names, test_cases)
+# end def
@@ -1,5 +1,7 @@
 #!/usr/bin/env python
-"""Usage: python run_as_tptp_test_suite.py [-n|--dry-run] [-v|--verbose] <TPTP input file to test> [<tests to run>]*
+"""Usage: python run_as_tptp_test_suite.py [-j N|--jobs=N] [-n|--dry-run] [-t SECONDS|--timeout=SECONDS] [--no-cache] [--clear-cache] [--stream] [--pipeline] [--portfolio] [--clausify] [-v|--verbose] [--shard=i/n] [--json=FILE] [--junit=FILE] [--benchmark] [--memory-limit=MB] [--memory-budget=MB] [--escalate=SECONDS[:MB],...] [--escalation-budget=SECONDS] [--no-dedupe] [--lemmas] [--select-axioms=DEPTH] <TPTP input file to test> [<tests to run>]*
+       python run_as_tptp_test_suite.py [-v|--verbose] merge <shard results file>*
+       python run_as_tptp_test_suite.py [-v|--verbose] [--threshold=PERCENT] compare [<earlier run> [<later run>]]
 
 Processes the given TPTP input file (e.g. input.tptp), searching for test case markup that denotes
 separate tests for a central model or theorem.
@@ -16,6 +18,129 @@ Usage examples:
        python run_as_tptp_test_suite.py naive_consent_theory.tptp asking_and_getting_consent_is_ethical
 
 
+   Run all the tests in that theory file, at most four at a time (by default, as many test cases are run at once
+   as there are CPU cores; the results are always displayed in the order the test cases appear in the file):
+
+       python run_as_tptp_test_suite.py -j 4 naive_consent_theory.tptp
+
+
+   Show the order the tests in that theory file would be run in, four at a time, and estimate how long the run would
+   take, without running any prover (the run time of each test case is recorded in results/history.json, and when
+   running more than one test case at a time, the longest are started first):
+
+       python run_as_tptp_test_suite.py -n -j 4 naive_consent_theory.tptp
+
+
+   Run the tests in that theory file across three machines, running the first of three shards on this one (the
+   test cases are shared out so each shard takes about as long as the others, going by results/history.json, which
+   must be the same on every machine, or else in turn), writing its results to results/shard-1-of-3.json:
+
+       python run_as_tptp_test_suite.py --shard=1/3 naive_consent_theory.tptp
+
+
+   Merge the results of the three shards, displaying them as for a single run (and adding the run times recorded
+   by the shards to results/history.json, for sharing out the test cases next time):
+
+       python run_as_tptp_test_suite.py merge shard-1-of-3.json shard-2-of-3.json shard-3-of-3.json
+
+
+   Run all the tests in that theory file, writing a report on each test case (its result, wall time, CPU time, peak
+   memory use, and the prover's search statistics) to results.jsonl, as JSON lines, and to results.xml, as JUnit
+   XML, as each test case finishes:
+
+       python run_as_tptp_test_suite.py --json=results.jsonl --junit=results.xml naive_consent_theory.tptp
+
+
+   Run all the tests in that theory file as a benchmark, without using the result cache, or deduping the test cases
+   (see --no-dedupe), recording the time and search effort of each test case in results/benchmarks.db, tagged with
+   the git commit of the theory file (with a '+' appended if it has uncommitted changes):
+
+       python run_as_tptp_test_suite.py --benchmark naive_consent_theory.tptp
+
+
+   Run all the tests in that theory file, limiting each prover process to 1 GB of memory (by default, 2 GB; 0
+   for no limit), and starting provers only while the limits of those running add up to no more than 4 GB (by
+   default, the machine's physical memory; 0 for no budget), so that running many at once can't exhaust the memory
+   of a shared machine (the largest peak memory use of a prover is shown at the end, for tuning these, as it is
+   with -v):
+
+       python run_as_tptp_test_suite.py -j 8 --memory-limit=1024 --memory-budget=4096 naive_consent_theory.tptp
+
+
+   Run all the tests in that theory file with a time limit of 10 seconds each, and then run those that were
+   inconclusive, or timed out, again with a time limit of 60 seconds, and those still unsettled with a time limit of
+   300 seconds and a memory limit of 4 GB, spending no more than 10 minutes on these re-runs in all (the limits each
+   test case needed are shown with its details, and totalled at the end):
+
+       python run_as_tptp_test_suite.py --escalate=10,60,300:4096 --escalation-budget=600 naive_consent_theory.tptp
+
+
+   Run all the tests in that theory file, running the prover on every test case, even those whose goals are the
+   same problem as an earlier test case's (by default, such test cases, i.e. those the same up to the renaming of
+   names not used outside the test case, whether negated or not, take their result from the earlier test case,
+   and the prover runs saved are shown at the end with -v):
+
+       python run_as_tptp_test_suite.py --no-dedupe naive_consent_theory.tptp
+
+
+   Run all the tests in that theory file, proving the lemmas in it first (those marked up with '% Lemma: '), in
+   order, and adding each one proved to the non-test matter of the test cases after it, as an axiom (the lemmas
+   proved are kept in the result cache, by the theory they were proved in, and aren't proved again while that's
+   unchanged):
+
+       python run_as_tptp_test_suite.py --lemmas naive_consent_theory.tptp
+
+
+   Run all the tests in that theory file, proving each test case against only the axioms relevant to it at first
+   (those sharing a symbol with the test case, or, to a depth of 2, with those axioms), and running it again against
+   all of the axioms if that doesn't prove it (the number of axioms selected for each test case, and how much
+   faster it was than its last run against all of them, are shown with its details, and summed up at the end):
+
+       python run_as_tptp_test_suite.py --select-axioms=2 naive_consent_theory.tptp
+
+
+   Compare the latest two benchmark runs, flagging the test cases whose prover CPU time or search statistics (e.g.
+   the number of clauses generated) rose by more than 20%, and exiting with status 1 if any did (runs can also be
+   given, earlier first, by their run numbers, or by their git commits, for the latest run at each):
+
+       python run_as_tptp_test_suite.py --threshold=20 compare
+
+
+   Run all the tests in that theory file through the prover again, without using the result cache (by default,
+   the results of earlier runs are kept in results/cache, and reused while the prover, its options, the test
+   case and the non-test matter are all unchanged, while test cases whose last proofs only used axioms that are
+   unchanged since aren't run again at all, whatever else has changed; --clear-cache empties this cache before the
+   run):
+
+       python run_as_tptp_test_suite.py --no-cache naive_consent_theory.tptp
+
+
+   Run all the tests in that theory file, reading the prover output straight from a pipe as it is produced, and
+   only writing it out to the results directory for the test cases whose details will be displayed:
+
+       python run_as_tptp_test_suite.py --stream naive_consent_theory.tptp
+
+
+   Run all the tests in that theory file, stopping the prover on any test case that runs for more than 60 seconds
+   (or for as long as the test case's own '% Timeout:' markup allows), and reporting it as timed out ('T'):
+
+       python run_as_tptp_test_suite.py -t 60 naive_consent_theory.tptp
+
+
+   Run all the tests in that theory file, starting each test case as soon as it has been split from the file,
+   rather than once the whole file has been split (all of the non-test matter, other than comments, must then
+   come before the first test case):
+
+       python run_as_tptp_test_suite.py --pipeline naive_consent_theory.tptp
+
+
+   Run all the tests in that theory file, having the E prover convert the non-test matter (i.e. the axioms shared
+   by every test case) to clause normal form once, rather than for each test case (the clauses are kept in the
+   result cache, and reused while the non-test matter and E are unchanged):
+
+       python run_as_tptp_test_suite.py --clausify naive_consent_theory.tptp
+
+
 Markup description:
 
  - '% Test runner: begin tests.'         denotes the beginning of the section(s) which will be split into test cases.
@@ -27,6 +152,12 @@ Markup description:
                                          negated/inverted, with successful proof of any conjectures indicating
                                          failure of the test.
  - '% Test case: this_is_the_first_test' denotes a test case with name 'this_is_the_first_test'.
+ - '% Lemma: '                           denotes the beginning of a test case whose conjecture is a general lemma,
+                                         which, with --lemmas, is proved first, and then given to the test cases
+                                         after it as an axiom.
+ - '% Timeout: 30'                      within a test case, denotes that the prover should be stopped if it runs for
+                                         more than the given number of seconds (of wall-clock time) on that test case,
+                                         overriding any suite-wide time limit given with -t or --timeout=.
 
 
 Prover installation:
@@ -43,444 +174,1847 @@ compiled (using 'make examples') and binary installed at /usr/bin/z3_tptp
  however, success and failure detection in this script is customised for the output of these two provers.)
 
 
-You can select which prover you'd like to use with this script by using the -p or --prover= option
-i.e. -p z3 or --prover=eprover
+There is also a built-in 'sat' prover, which needs nothing installed: it grounds each problem over the constants in
+it, and decides the grounding with a propositional (DPLL) solver, in the process running this script, saving the
+start up of a prover for each test case. This decides problems without function symbols once Skolemized (like the
+consent theory's), and gives up on any others (see decide_sat_problem).
+
+You can select which prover you'd like to use with this script by using the -p or --prover= option
+i.e. -p z3, --prover=eprover or -p sat
+
+Alternatively, the --portfolio option races both provers against each other on each test case, taking the result
+of whichever first proves the conjecture or finds it counter-satisfiable, and stopping the other; the winner of
+each race (and how long it took) is shown with the test case's details, and the wins are totalled at the end.
+
+"""
+
+import atexit
+import getopt
+import hashlib
+import itertools
+import math
+import os
+import os.path
+import Queue
+import re
+import string
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import run_as_test_suite
+from run_as_test_suite import (admit_provers, compare_benchmark_runs, default_jobs, default_memory_budget,
+                               default_memory_limit, default_regression_threshold, feed_prover_input,
+                               get_test_case_text, goal_token_pattern, kill_timed_out_process,
+                               kill_timed_out_processes, limit_prover_resources, merge_shard_results,
+                               parse_escalation_tiers, parse_shard, read_cached_result, release_provers,
+                               split_statement_spans, split_statements, stop_racing_provers, store_streamed_output,
+                               strip_comments, test_case_time_limit, wait_for_prover, write_cached_result)
+
+eprover_bin = "/home/E/PROVER/eprover"
+eprover_options = ["--auto-schedule", "--tstp-format", "-s", "-l 1", "--proof-object", "--memory-limit=2048", "--cpu-limit=10",
+                   "--print-statistics"]
+eprover_cnf_options = ["--cnf", "--tstp-format", "-s"]
+
+z3_bin = "/usr/bin/z3_tptp"
+z3_options = ["-c", "-m", "-p"]
+
+default_prover="eprover"
+
+# The files holding the non-test matter given to provers which need their input in a named file (keyed by the
+# non-test matter), which are written once per run, and included by each test case's input file.
+preamble_files = {}
+preamble_files_lock = threading.Lock()
+
+# The provers raced against each other on each test case by --portfolio.
+portfolio_provers = ["eprover", "z3"]
+
+
+def usage():
+    """ Displays the usage information for this program. """
+    sys.stdout.write("Usage: python run_as_tptp_test_suite.py [-j <number of tests to run at once>|--jobs=<number>] ")
+    sys.stdout.write("[-n|--dry-run] [--no-cache] [--clear-cache] [--stream] [--pipeline] [--clausify] ")
+    sys.stdout.write("[-t <time limit per test case, in seconds>|--timeout=<seconds>] ")
+    sys.stdout.write("[-p <prover name i.e. 'eprover', 'z3' or 'sat'>|--prover=<prover name>] [--portfolio] ")
+    sys.stdout.write("[--shard=<i>/<n>] [--json=<JSON lines report file>] [--junit=<JUnit XML report file>] ")
+    sys.stdout.write("[--benchmark] [--memory-limit=<megabytes per prover>] [--memory-budget=<megabytes in all>] ")
+    sys.stdout.write("[--escalate=<seconds>[:<megabytes>],...] [--escalation-budget=<seconds>] [--no-dedupe] [--lemmas] ")
+    sys.stdout.write("[--select-axioms=<depth>] ")
+    sys.stdout.write("[-v|--verbose] <TPTP input file to test> [<test to run>]\n")
+    sys.stdout.write("       python run_as_tptp_test_suite.py [-v|--verbose] merge <shard results file>*\n")
+    sys.stdout.write("       python run_as_tptp_test_suite.py [-v|--verbose] [--threshold=<percentage>] ")
+    sys.stdout.write("compare [<earlier run> [<later run>]]\n")
+# end def
+
+
+def prover_version(prover_bin = ""):
+    """ Returns a string identifying the installed version of the given prover binary.
+
+        This is taken from the size and modification time of the binary, which change whenever the prover is
+        rebuilt, upgraded or replaced, without needing to know how each prover reports its version.
+    """
+    try:
+        stat = os.stat(prover_bin)
+        return "%s:%s:%s" % (prover_bin, stat.st_size, int(stat.st_mtime))
+    except OSError:
+        return prover_bin
+    # end try
+# end def
+
+
+# The include directives of TPTP text (other than in comments), with the name of the file each one includes.
+include_pattern = re.compile(r"^\s*include\(\s*'((?:[^'\\]|\\.)*)'", re.MULTILINE)
+
+
+def read_included_files(text = "", included = None):
+    """ Returns a list of the (file name, contents) of the files included by the include directives in the given
+        TPTP text, and of those that they include in turn (each following the file including it), with the contents
+        None for a file that can't be read (which is left to the prover to report).
+
+        An included file is looked for as the E prover does: relative to the current directory, and then to the
+        $TPTP directory.
+    """
+    if included == None:
+        included = set()
+    # end if
+    included_files = []
+    for filename in include_pattern.findall(text):
+        if filename in included:
+            continue
+        # end if
+        included.add(filename)
+        contents = None
+        for path in [filename, os.path.join(os.environ.get('TPTP', os.curdir), filename)]:
+            try:
+                included_file = open(path, 'r')
+                contents = included_file.read()
+                included_file.close()
+                break
+            except IOError:
+                pass
+            # end try
+        # end for
+        included_files.append((filename, contents))
+        if contents != None:
+            included_files.extend(read_included_files(contents, included))
+        # end if
+    # end for
+    return included_files
+# end def
+
+
+def included_files_text(text = ""):
+    """ Returns the contents of the files included by the given TPTP text (see read_included_files), each prefixed
+        with its name (or noted as missing, if it can't be read), or "" if there are none, so that a change to an
+        included file changes what's keyed by the text (e.g. cached results).
+    """
+    parts = []
+    for (filename, contents) in read_included_files(text):
+        if contents == None:
+            parts.append("%s:missing\n" % filename)
+        else:
+            parts.append("%s:%s:%s" % (filename, len(contents), contents))
+        # end if
+    # end for
+    return string.join(parts, '')
+# end def
+
+
+def split_tptp_input(input_filename, dry_run = False, verbosity = 0):
+    """ Splits the TPTP input file with the given filename, extracting non-test matter, and
+        collating named (if available) test case portions in a dictionary.
+
+        (See run_as_test_suite.split_input, which does the splitting for both runners.)
+    """
+    return run_as_test_suite.split_input(input_filename, dry_run = dry_run, verbosity = verbosity)
+# end def
+
+
+def result_cache_key(non_test_matter = "", test_case_text = "", prover_bin = "", prover_options = []):
+    """ Returns the key for the cached result of running the given prover input through the given prover.
+
+        The key is a hash of everything that can change the prover's output: the non-test matter, the test
+        text, the contents of any files they include (see included_files_text), the prover binary and version, and
+        the prover options.
+    """
+    parts = [non_test_matter, test_case_text]
+    # (Input without include directives is keyed as it always was, so the entries already cached stay valid.)
+    included = included_files_text(non_test_matter + "\n" + test_case_text)
+    if len(included) > 0:
+        parts.append(included)
+    # end if
+    key = hashlib.sha1()
+    for part in parts + [prover_version(prover_bin)] + prover_options:
+        # Prefix each part with its length, so the parts can't run into each other.
+        key.update("%s:" % len(part))
+        key.update(part)
+    # end for
+    return key.hexdigest()
+# end def
+
+
+def prover_cache_key(non_test_matter = "", test_case_text = "", prover_argv = [], memory_limit = 0, timeout = 0):
+    """ Returns the key for the cached result of running the given prover input through the prover with the given
+        argv (its binary, and the options exactly as passed to it), under the given memory limit (in megabytes) and
+        time limit (in seconds), either of which may be 0 for none. The limits are part of the key, so that a result
+        reached under one set of limits (e.g. a give-up) is never reused for a run under others (e.g. an escalated
+        one).
+    """
+    return result_cache_key(non_test_matter, test_case_text, prover_argv[0],
+                            prover_argv[1:] + ["memory_limit=%s" % memory_limit, "timeout=%s" % timeout])
+# end def
+
+
+def prover_output_patterns(prover = default_prover):
+    """ Returns the regular expressions used to read the output of the given prover, as a tuple of:
+         - a list of (pattern, status) pairs, matching the lines that indicate the status of a run, and
+         - a pattern matching the start of the search section of the output, which is shown for failed tests.
+    """
+    if prover == 'z3':
+        status_patterns = [(re.compile('SZS status Theorem'), 'S'),
+                           (re.compile('SZS status CounterSatisfiable'), 'F'),
+                           (re.compile('SZS status GaveUp'), '?')]
+        search_section = re.compile('.*SZS status', re.IGNORECASE)
+    elif prover == 'sat':
+        status_patterns = [(re.compile('SZS status (Theorem|Unsatisfiable)'), 'S'),
+                           (re.compile('SZS status (CounterSatisfiable|Satisfiable)'), 'F'),
+                           (re.compile('SZS status (GaveUp|Timeout)'), '?')]
+        search_section = re.compile('SZS status')
+    else:
+        status_patterns = [(re.compile('# Proof found'), 'S'),
+                           (re.compile('# No proof found'), 'F'),
+                           (re.compile('# Failure:'), '?')]
+        search_section = re.compile('#.*proof found', re.IGNORECASE)
+    # end if
+    return (status_patterns, search_section)
+# end def
+
+
+def classify_prover_output(lines = [], prover = default_prover, output_lines = None):
+    """ Reads the given lines of prover output (from a list, file, or pipe) in a single pass, returning a tuple
+        of the status they indicate (as returned by run_test_case), and the excerpt of the output from the start
+        of the search section onwards.
+
+        A line indicating success or failure settles the status as soon as it is read, while a line indicating a
+        likely failure only stands if no such line follows it. If a list of output lines is given, each line read
+        is appended to it.
+    """
+    status_patterns, search_section = prover_output_patterns(prover)
+    status = 'E'
+    excerpt = []
+    in_search_results = False
+    for line in lines:
+        if output_lines != None:
+            output_lines.append(line)
+        # end if
+
+        # Check the line for certain strings that indicate success, failure, or error.
+        if status in ('E', '?'):
+            for (status_pattern, line_status) in status_patterns:
+                if status_pattern.match(line) != None:
+                    status = line_status
+                    break
+                # end if
+            # end for
+        # end if
+
+        # Collect the search section, and what follows that.
+        if not in_search_results:
+            if search_section.match(line) != None:
+                in_search_results = True
+            # end if
+        # end if
+        if in_search_results:
+            excerpt.append(line)
+        # end if
+    # end for
+    return (status, string.join(excerpt, ''))
+# end def
+
+
+def prover_command(prover = default_prover, timeout = 0):
+    """ Returns a tuple of the binary and options used to run the given prover, and the option used to give it the
+        name of its input file (which is empty for provers that read their input from stdin). If a timeout is given
+        that's longer than E's own CPU time limit, the limit is raised to match it.
+    """
+    if (prover == 'z3'):
+        return (z3_bin, z3_options, '-file:')
+    else:
+        options = list(eprover_options)
+        for (index, option) in enumerate(options):
+            if option.startswith('--cpu-limit=') and timeout > int(option[len('--cpu-limit='):]):
+                options[index] = '--cpu-limit=%s' % int(math.ceil(timeout))
+            # end if
+        # end for
+        return (eprover_bin, options, '')
+    # end if
+# end def
+
+
+def start_prover(prover = default_prover, non_test_matter = "", test_case_text = "", results_file = None,
+                 memory_limit = 0, timeout = 0):
+    """ Starts the given prover on the given non-test matter and test text in a new process group, with its output
+        (and errors) going to the given results file or pipe, returning a tuple of the prover process and its input
+        file (if any), which is to be closed once the prover has finished. The prover's memory (in megabytes) and
+        CPU time are limited by the given memory limit and timeout (see limit_prover_resources).
+
+        Provers that read their input from stdin have it streamed straight into a pipe from memory (see
+        feed_prover_input). Those that need a named input file are given one holding just the test text, which
+        includes the non-test matter from a file written once per run (see get_preamble_filename).
+    """
+    (prover_bin, prover_options, named_file_option) = prover_command(prover, timeout)
+
+    # Run the prover, in a process group of its own, so that it (and anything it starts) can be killed together.
+    # (Other file descriptors are closed, so that no other prover holds on to this one's pipes.)
+    preexec = limit_prover_resources(memory_limit, timeout)
+    input_file = None
+    try:
+        if len(named_file_option) > 0:
+            input_file = tempfile.NamedTemporaryFile(prefix = 'run_as_tptp_test_suite_input')
+            input_file.write("include('%s').\n" % get_preamble_filename(non_test_matter))
+            input_file.write(test_case_text)
+            input_file.flush()
+            input_file_option = named_file_option + input_file.name
+            process = subprocess.Popen([prover_bin] + prover_options + [input_file_option], stdout = results_file,
+                                       stderr = subprocess.STDOUT, preexec_fn = preexec, close_fds = True)
+        else:
+            process = subprocess.Popen([prover_bin] + prover_options, stdin = subprocess.PIPE, stdout = results_file,
+                                       stderr = subprocess.STDOUT, preexec_fn = preexec, close_fds = True)
+            feeder = threading.Thread(target = feed_prover_input, args = [process, [non_test_matter, test_case_text]])
+            feeder.daemon = True
+            feeder.start()
+        # end if
+    except Exception:
+        if input_file != None:
+            input_file.close()
+        # end if
+        raise
+    # end try
+    return (process, input_file)
+# end def
+
+
+def get_preamble_filename(non_test_matter = ""):
+    """ Returns the name of a file holding the given non-test matter, to be included by the input files of provers
+        that need a named input file. The file is written the first time the non-test matter is given in this run,
+        and removed when the run exits.
+    """
+    preamble_files_lock.acquire()
+    try:
+        if not preamble_files.has_key(non_test_matter):
+            (handle, preamble_filename) = tempfile.mkstemp(prefix = 'run_as_tptp_test_suite_preamble', suffix = '.p')
+            preamble_file = os.fdopen(handle, 'w')
+            preamble_file.write(non_test_matter)
+            preamble_file.close()
+            preamble_files[non_test_matter] = preamble_filename
+        # end if
+        return preamble_files[non_test_matter]
+    finally:
+        preamble_files_lock.release()
+    # end try
+# end def
+
+
+def remove_preamble_files():
+    """ Removes the files holding the non-test matter written during this run (see get_preamble_filename). """
+    for preamble_filename in preamble_files.values():
+        try:
+            os.remove(preamble_filename)
+        except OSError:
+            pass
+        # end try
+    # end for
+# end def
+
+atexit.register(remove_preamble_files)
+
+
+def prover_statistics_pattern(prover = default_prover):
+    """ Returns the regular expression matching the lines of the given prover's output which give its search statistics,
+        with groups for the name and (numeric) value of each; e.g. E's '# Processed clauses : 17', or Z3's
+        ':conflicts 3'.
+    """
+    if prover == 'z3':
+        return re.compile(r'^[ \t(]*:([A-Za-z][\w.-]*)[ \t]+([0-9]+(?:\.[0-9]+)?)\)?[ \t]*$', re.MULTILINE)
+    else:
+        return re.compile(r'^#[ \t]*([A-Za-z][^:\n]*?)[ \t]*:[ \t]*([0-9]+(?:\.[0-9]+)?)[ \t]*$', re.MULTILINE)
+    # end if
+# end def
+
+
+def parse_prover_statistics(output = "", prover = default_prover):
+    """ Returns a dictionary of the search statistics in the given output of the given prover, with their names in lower
+        case, with words separated by underscores (e.g. 'processed_clauses'), and their values as numbers.
+    """
+    statistics = {}
+    for (name, value) in prover_statistics_pattern(prover).findall(output):
+        name = re.sub('[^a-z0-9]+', '_', name.lower()).strip('_')
+        if '.' in value:
+            statistics[name] = float(value)
+        else:
+            statistics[name] = int(value)
+        # end if
+    # end for
+    return statistics
+# end def
+
+
+def run_test_case(test_case = {}, non_test_matter = "", result_filename = "", dry_run = False, prover = default_prover, verbosity = 0,
+                  cache_path = "", details = None, stream = False, timeout = 0, memory_limit = 0):
+    """ Run the test case specified in the given dictionary structure, putting it at the end of
+        given non-test matter for input to TPTP, and storing the results of the TPTP run into
+        the given result file.
+
+        The results file is scanned to assess the status of the test, and a status value is calculated and
+        returned as the result of this function.
+        This return value is a single character, with the value indicating:
+         - 'E' for error
+         - 'F' for failure,
+         - '?' for an inconclusive result (i.e. the prover gave up),
+         - 'T' for a timeout, and
+         - 'S' for success.
+
+        If a positive timeout is given (or set for the test case by its markup), the prover's process group is
+        killed once it has been running for that many seconds; unless the prover had already reached a
+        conclusion by then, the test case has timed out.
+
+        The prover's memory is limited to the given memory limit, in megabytes (if positive), and it only starts
+        once it fits in the memory budget (see admit_provers). The time spent waiting for that is set as
+        'admission_wait' in the details dictionary, if given.
+
+        If a non-empty cache path is given, the status and output of an earlier run of the same prover input are
+        reused from the result cache at that path, if present, and the result of a new run is stored there
+        otherwise. If a details dictionary is given, 'cached' is set in it to show whether the cache was used,
+        'excerpt' to the search section of the output, and 'statistics' to the search statistics in the output (see
+        parse_prover_statistics). For a run of the prover, the CPU time it used and its peak resident set size are
+        also set, as 'cpu_time' and 'peak_rss' (see wait_for_prover).
+
+        If streaming is requested, the prover output is read (and its status assessed) straight from a pipe as
+        it arrives, instead of going through the results file. The output is then only written to the results
+        file if the test case didn't succeed, or the verbosity calls for its details; in that case, it is also
+        kept as 'output' in the details dictionary, so it needn't be read back in again.
+
+        If the prover is 'portfolio', the test case is raced through each of the portfolio provers at once instead
+        (see run_portfolio_test_case); if it's 'sat', the test case is decided in this process (see
+        run_sat_test_case).
+    """
+
+    # Race the portfolio provers against each other, if requested.
+    if prover == 'portfolio':
+        return run_portfolio_test_case(test_case, non_test_matter, result_filename, dry_run, verbosity, cache_path,
+                                       details, stream, timeout, memory_limit)
+    # end if
+
+    # Decide the test case in this process, if the SAT prover is requested.
+    if prover == 'sat':
+        return run_sat_test_case(test_case, non_test_matter, result_filename, verbosity, cache_path, details, stream,
+                                 timeout, memory_limit)
+    # end if
+
+    # Set up for the desired prover, with the time limit of the test case (before any cut at its deadline; see
+    # test_case_time_limit).
+    time_limit = test_case.get('timeout', timeout)
+    (prover_bin, prover_options, named_file_option) = prover_command(prover, time_limit)
+
+    # Check the result cache for an earlier run of exactly this prover input, under the same limits.
+    test_case_text = get_test_case_text(test_case)
+    if details == None:
+        details = {}
+    # end if
+    details['cached'] = False
+    details['timed_out'] = False
+    if len(cache_path) > 0:
+        cache_key = prover_cache_key(non_test_matter, test_case_text, [prover_bin] + prover_options, memory_limit,
+                                     time_limit)
+        cached_result = read_cached_result(cache_path, cache_key)
+        if cached_result != None:
+            # Use the cached result, restoring its output for display.
+            details['cached'] = True
+            (result, output) = cached_result
+            details['excerpt'] = classify_prover_output(output.splitlines(True), prover)[1]
+            details['statistics'] = parse_prover_statistics(output, prover)
+            if stream:
+                store_streamed_output(test_case, result, output, result_filename, verbosity, details)
+            elif len(result_filename) > 0:
+                results_file = open(result_filename, 'w')
+                results_file.write(output)
+                results_file.close()
+            # end if
+            return result
+        # end if
+    # end if
+
+    # Open (or create) the results file, if a non-empty string has been given.
+    # (When streaming, the output is read from a pipe instead.)
+    if stream:
+        results_file = subprocess.PIPE
+    elif len(result_filename) > 0:
+        results_file = open(result_filename, 'w+')
+    else:
+        results_file = tempfile.TemporaryFile(prefix = 'run_as_tptp_test_suite_results')
+    # end if
+
+    # Wait for the prover to fit in the memory budget, and then take its time limit (see
+    # test_case_time_limit).
+    details['admission_wait'] = admit_provers(1, memory_limit)
+    test_case_timeout = test_case_time_limit(test_case, timeout)
+
+    # Run the test case (the concatenated non-test matter and test text) through the desired TPTP-compatible prover.
+    test_case_name = test_case.get('name', 'Unknown Test')
+    input_file = None
+    timer = None
+    try:
+        (process, input_file) = start_prover(prover, non_test_matter, test_case_text, results_file, memory_limit,
+                                             test_case_timeout)
+
+        # Kill the prover's process group (i.e. the prover, and anything it started) if it runs past the time limit.
+        if test_case_timeout > 0:
+            timer = threading.Timer(test_case_timeout, kill_timed_out_process, [process, details])
+            timer.daemon = True
+            timer.start()
+        # end if
+
+        # When streaming, assess the output line by line as the prover writes it.
+        if stream:
+            output_lines = []
+            (result, details['excerpt']) = classify_prover_output(iter(process.stdout.readline, ''), prover, output_lines)
+            process.stdout.close()
+        # end if
+        (details['cpu_time'], details['peak_rss']) = wait_for_prover(process)
+        if timer != None:
+            # (Wait for the timer's thread to end, so it can't still be running as the run exits.)
+            timer.cancel()
+            timer.join()
+        # end if
+    except Exception, e:
+        if timer != None:
+            timer.cancel()
+            timer.join()
+        # end if
+        if input_file != None:
+            input_file.close()
+        # end if
+        if not stream:
+            results_file.close()
+        # end if
+        sys.stdout.write("\nERROR: an error '%s' occurred while running test case '%s'.\n" % (str(e), test_case_name))
+        sys.stdout.write("Test text:\n")
+        sys.stdout.write(test_case_text)
+        sys.stdout.write("\nExiting.\n")
+        sys.exit(1)
+    finally:
+        release_provers(1, memory_limit)
+    # end try
+    if input_file != None:
+        input_file.close()
+    # end if
+
+    if stream:
+        output = string.join(output_lines, '')
+    else:
+        # Check the output for certain strings that indicate success, failure, or error.
+        results_file.seek(0)
+        output = results_file.read()
+        results_file.close()
+        (result, details['excerpt']) = classify_prover_output(output.splitlines(True), prover)
+    # end if
+    details['statistics'] = parse_prover_statistics(output, prover)
+
+    # A run that was stopped at its time limit without reaching a conclusion timed out.
+    if details['timed_out'] and result not in ('S', 'F'):
+        result = 'T'
+    # end if
+
+    if stream:
+        store_streamed_output(test_case, result, output, result_filename, verbosity, details)
+    # end if
+
+    # Store the result in the cache, unless it was an error (which may well be down to the set up, and not the input),
+    # or a timeout (which may well be down to the load on the machine at the time).
+    if len(cache_path) > 0 and result not in ('E', 'T'):
+        write_cached_result(cache_path, cache_key, result, output)
+    # end if
+
+    return result
+# end def
+
+
+def test_case_provers(test_case = {}, run_arguments = {}):
+    """ Returns the prover(s) the given test case is run through with the given run arguments (as run_test_case
+        takes them), joined by '+': the prover given, or each of the portfolio provers, if racing them.
+    """
+    prover = run_arguments.get('prover', default_prover)
+    if prover == 'portfolio':
+        return string.join(portfolio_provers, '+')
+    # end if
+    return prover
+# end def
+
+
+def racing_provers(run_arguments = {}):
+    """ Returns the provers raced against each other on each test case with the given run arguments (as
+        run_test_case takes them): the portfolio provers, if racing them, or none.
+    """
+    if run_arguments.get('prover') == 'portfolio':
+        return portfolio_provers
+    # end if
+    return []
+# end def
+
+
+def clausify_non_test_matter(non_test_matter = "", cache_path = "", verbosity = 0):
+    """ Returns the given non-test matter converted to clause normal form by the E prover, so that the prover needn't
+        clausify it again for every test case.
+
+        The clauses are reused from (and stored in) the result cache at the given path (if not empty), keyed as the
+        results of test cases are (see prover_cache_key), by the non-test matter, and E's argv and version. The
+        Skolem symbols and definitions introduced by E are renamed apart (from 'esk1_0' to 'axiom_esk1_0', and so on),
+        so they can't clash with those introduced when a test case's conjecture is clausified alongside them.
+
+        If the non-test matter can't be clausified, a warning is given, and it is returned unchanged.
+    """
+    # Check the cache for the clauses of this non-test matter.
+    cache_filename = ""
+    if len(cache_path) > 0:
+        cache_key = prover_cache_key(non_test_matter, "", [eprover_bin] + eprover_cnf_options)
+        cache_filename = cache_path + os.sep + cache_key + ".cnf.p"
+        try:
+            cache_file = open(cache_filename, 'r')
+            clauses = cache_file.read()
+            cache_file.close()
+            return clauses
+        except IOError:
+            pass
+        # end try
+    # end if
+
+    # Run the non-test matter through E, keeping only the clauses (and not E's comments) from its output.
+    if verbosity > 1:
+        sys.stdout.write("Clausifying the non-test matter...\n")
+    # end if
+    try:
+        process = subprocess.Popen([eprover_bin] + eprover_cnf_options, stdin = subprocess.PIPE, stdout = subprocess.PIPE,
+                                   stderr = subprocess.STDOUT, close_fds = True)
+        output = process.communicate(non_test_matter)[0]
+    except Exception, e:
+        sys.stdout.write("\nWARNING: couldn't clausify the non-test matter, so using it as it is: %s\n" % str(e))
+        return non_test_matter
+    # end try
+    clause_lines = [line for line in output.splitlines(True) if not line.startswith('#')]
+    clauses = re.sub(r'\b(esk|epred)([0-9]+_[0-9]+)\b', r'axiom_\1\2', string.join(clause_lines, ''))
+    if process.returncode != 0 or re.search(r'^\s*cnf\(', clauses, re.MULTILINE) == None:
+        sys.stdout.write("\nWARNING: couldn't clausify the non-test matter, so using it as it is.\n")
+        if verbosity > 0:
+            sys.stdout.write("E prover output:\n%s\n" % output)
+        # end if
+        return non_test_matter
+    # end if
+
+    # Store the clauses in the cache, under a temporary name first, as for write_cached_result.
+    if len(cache_filename) > 0:
+        temporary_filename = "%s.%s.%s" % (cache_filename, os.getpid(), id(clauses))
+        try:
+            cache_file = open(temporary_filename, 'w')
+            cache_file.write(clauses)
+            cache_file.close()
+            os.rename(temporary_filename, cache_filename)
+        except (IOError, OSError), e:
+            sys.stdout.write("\nWARNING: couldn't store the clauses in the result cache '%s': %s\n" % (cache_path, str(e)))
+        # end try
+    # end if
+    return clauses
+# end def
+
+
+def clausify_test_case_stream(test_case_stream = [], cache_path = "", verbosity = 0):
+    """ Yields the (non-test matter, test case name, test case) tuples from the given test case stream, with their
+        non-test matter clausified (see clausify_non_test_matter), clausifying each distinct non-test matter once.
+    """
+    clausified = {}
+    for (non_test_matter, test_case_name, test_case) in test_case_stream:
+        if not clausified.has_key(non_test_matter):
+            clausified[non_test_matter] = clausify_non_test_matter(non_test_matter, cache_path, verbosity)
+        # end if
+        yield (clausified[non_test_matter], test_case_name, test_case)
+    # end for
+# end def
+
+
+def read_racing_prover(prover = default_prover, process = None, start_time = 0, finished = None):
+    """ Reads and classifies the output of the given prover process from its pipe as it arrives, putting a tuple of
+        (prover, status, excerpt, output, latency) on the given finished queue once the prover's output ends, with
+        the latency measured in seconds from the given start time.
+    """
+    output_lines = []
+    try:
+        (status, excerpt) = classify_prover_output(iter(process.stdout.readline, ''), prover, output_lines)
+    except Exception, e:
+        (status, excerpt) = ('E', "ERROR: couldn't read the output of %s: %s\n" % (prover, str(e)))
+    # end try
+    finished.put((prover, status, excerpt, string.join(output_lines, ''), time.time() - start_time))
+# end def
+
+
+def run_portfolio_test_case(test_case = {}, non_test_matter = "", result_filename = "", dry_run = False, verbosity = 0,
+                            cache_path = "", details = None, stream = False, timeout = 0, memory_limit = 0):
+    """ Run the test case specified in the given dictionary structure through each of the portfolio provers at
+        once, taking the status of the first to reach a conclusion (i.e. success or failure), and killing the rest.
+        The arguments and the returned status are as for run_test_case.
+
+        The winning prover, and its latency (the time taken to reach its conclusion, in seconds), are recorded as
+        'prover' and 'latency' in the given details dictionary; if no prover reaches a conclusion, the best of their
+        statuses is returned, along with all of their output.
+
+        Results are read from (and stored in) the result cache under each prover's own key, so that they're shared
+        with runs of the individual provers; only conclusive results are taken from the cache, though.
+    """
+    test_case_text = get_test_case_text(test_case)
+    test_case_name = test_case.get('name', 'Unknown Test')
+    if details == None:
+        details = {}
+    # end if
+    details['cached'] = False
+    details['timed_out'] = False
+    details['prover'] = None
+    details['latency'] = None
+
+    # Check the result cache for a conclusive earlier run of this prover input by any of the portfolio provers,
+    # under the same limits.
+    time_limit = test_case.get('timeout', timeout)
+    cache_keys = {}
+    for prover in portfolio_provers:
+        if len(cache_path) > 0:
+            (prover_bin, prover_options, named_file_option) = prover_command(prover, time_limit)
+            cache_keys[prover] = prover_cache_key(non_test_matter, test_case_text, [prover_bin] + prover_options,
+                                                  memory_limit, time_limit)
+            cached_result = read_cached_result(cache_path, cache_keys[prover])
+            if cached_result != None and cached_result[0] in ('S', 'F'):
+                # Use the cached result, restoring its output for display.
+                details['cached'] = True
+                details['prover'] = prover
+                (result, output) = cached_result
+                details['excerpt'] = classify_prover_output(output.splitlines(True), prover)[1]
+                details['statistics'] = parse_prover_statistics(output, prover)
+                if stream:
+                    store_streamed_output(test_case, result, output, result_filename, verbosity, details)
+                elif len(result_filename) > 0:
+                    results_file = open(result_filename, 'w')
+                    results_file.write(output)
+                    results_file.close()
+                # end if
+                return result
+            # end if
+        # end if
+    # end for
+
+    # Wait for all of the provers to fit in the memory budget together, and then take its time limit (see
+    # test_case_time_limit).
+    details['admission_wait'] = admit_provers(len(portfolio_provers), memory_limit)
+    test_case_timeout = test_case_time_limit(test_case, timeout)
+
+    # Start all of the provers at once, each with a thread reading (and classifying) its output as it arrives.
+    processes = []
+    readers = []
+    input_files = []
+    finished = Queue.Queue()
+    start_time = time.time()
+    timer = None
+    try:
+        for prover in portfolio_provers:
+            (process, input_file) = start_prover(prover, non_test_matter, test_case_text, subprocess.PIPE, memory_limit,
+                                                 test_case_timeout)
+            processes.append(process)
+            if input_file != None:
+                input_files.append(input_file)
+            # end if
+            reader = threading.Thread(target = read_racing_prover, args = [prover, process, start_time, finished])
+            reader.daemon = True
+            reader.start()
+            readers.append(reader)
+        # end for
+
+        # Kill all of the provers if they run past the time limit.
+        if test_case_timeout > 0:
+            timer = threading.Timer(test_case_timeout, kill_timed_out_processes, [processes, details])
+            timer.daemon = True
+            timer.start()
+        # end if
+
+        # Wait for the first conclusive result, or for every prover to give up.
+        results = []
+        while len(results) < len(portfolio_provers):
+            (prover, status, excerpt, output, latency) = finished.get()
+            results.append((prover, status, excerpt, output, latency))
+            if status in ('S', 'F'):
+                break
+            # end if
+        # end while
+
+        # Stop the losers, and clean up.
+        stop_racing_provers(processes, readers)
+        details['cpu_time'] = 0.0
+        details['peak_rss'] = 0
+        for process in processes:
+            (cpu_time, peak_rss) = wait_for_prover(process)
+            if cpu_time != None:
+                details['cpu_time'] += cpu_time
+                details['peak_rss'] = max(details['peak_rss'], peak_rss)
+            # end if
+        # end for
+        if timer != None:
+            # (Wait for the timer's thread to end, so it can't still be running as the run exits.)
+            timer.cancel()
+            timer.join()
+        # end if
+    except Exception, e:
+        if timer != None:
+            timer.cancel()
+            timer.join()
+        # end if
+        stop_racing_provers(processes, readers)
+        for input_file in input_files:
+            input_file.close()
+        # end for
+        sys.stdout.write("\nERROR: an error '%s' occurred while running test case '%s'.\n" % (str(e), test_case_name))
+        sys.stdout.write("Test text:\n")
+        sys.stdout.write(test_case_text)
+        sys.stdout.write("\nExiting.\n")
+        sys.exit(1)
+    finally:
+        release_provers(len(portfolio_provers), memory_limit)
+    # end try
+    for input_file in input_files:
+        input_file.close()
+    # end for
+
+    # Take the conclusive result, if any; otherwise, the best of the inconclusive ones, with everyone's output.
+    (prover, result, excerpt, output, latency) = results[-1]
+    if result in ('S', 'F'):
+        details['prover'] = prover
+        details['latency'] = latency
+    else:
+        if '?' in [status for (prover, status, excerpt, output, latency) in results]:
+            result = '?'
+        # end if
+        excerpt = string.join(["%% Output of %s:\n%s" % (prover, excerpt) for (prover, status, excerpt, output, latency) in results], '')
+        output = string.join(["%% Output of %s:\n%s" % (prover, output) for (prover, status, excerpt, output, latency) in results], '')
+    # end if
+    details['excerpt'] = excerpt
+    details['statistics'] = {}
+    if result in ('S', 'F'):
+        details['statistics'] = parse_prover_statistics(output, prover)
+    # end if
+
+    # A race that was stopped at its time limit without reaching a conclusion timed out.
+    if details['timed_out'] and result not in ('S', 'F'):
+        result = 'T'
+    # end if
+
+    # Store the output for display: either only if it's going to be displayed, or always, as for run_test_case.
+    if stream:
+        store_streamed_output(test_case, result, output, result_filename, verbosity, details)
+    elif len(result_filename) > 0:
+        results_file = open(result_filename, 'w')
+        results_file.write(output)
+        results_file.close()
+    # end if
+
+    # Store a conclusive result in the cache, under the key of the prover that reached it.
+    if len(cache_path) > 0 and result in ('S', 'F'):
+        write_cached_result(cache_path, cache_keys[prover], result, output)
+    # end if
+
+    return result
+# end def
+
+
+# The tokens of TPTP formulas, for the SAT prover: the connectives, quoted names and distinct objects, names
+# (including variables, and defined names such as '$true'), and any other single character. Comments and layout
+# match without a token, and are skipped.
+sat_token_pattern = re.compile(r"\s+|%[^\n]*|/\*.*?\*/|" +
+                               r"(<=>|<~>|=>|<=|~\||~&|!=|'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|[A-Za-z0-9_$]+|\S)",
+                               re.DOTALL)
+
+# A quoted name whose text is a lower word (e.g. 'p'), which names the same symbol as the word does unquoted.
+sat_quoted_lower_word_pattern = re.compile(r"^'([a-z][A-Za-z0-9_]*)'$")
+
+# The roles of the annotated formulas the SAT prover takes as given (the conjectures are negated instead).
+sat_axiom_roles = ['axiom', 'hypothesis', 'definition', 'assumption', 'lemma', 'theorem', 'corollary', 'plain',
+                   'negated_conjecture']
+
+# The binary connectives of TPTP formulas, other than the associative '&' and '|', as the formulas they stand for
+# (in terms of the two formulas they connect, 'A' and 'B').
+sat_binary_connectives = {'=>': ('implies', ['A', 'B']), '<=': ('implies', ['B', 'A']), '<=>': ('iff', ['A', 'B']),
+                          '<~>': ('not', [('iff', ['A', 'B'])]), '~|': ('not', [('or', ['A', 'B'])]),
+                          '~&': ('not', [('and', ['A', 'B'])])}
+
+# The non-test matter parsed for the SAT prover (keyed by the non-test matter), and its grounding over each domain
+# of constants (keyed by the non-test matter and the domain).
+sat_non_test_matter_formulas = {}
+sat_ground_non_test_matter = {}
+sat_non_test_matter_lock = threading.Lock()
+
+
+
+class SatUnsupportedError(Exception):
+    """ Raised when the SAT prover meets input it doesn't support (e.g. function symbols), which it gives up on,
+        with a description of that input (e.g. "function symbols (e.g. f)").
+    """
+    pass
+# end class
+
+
+def parse_sat_term(tokens = [], position = 0):
+    """ Parses a term (i.e. a variable or a constant) from the given TPTP tokens at the given position, returning it
+        as a ('var', name) or ('const', name) tuple, along with the position after it. Function terms, numbers and
+        distinct objects aren't supported, as they would need a larger domain than the constants to ground over.
+    """
+    token = tokens[position]
+    if token[0].isupper() or token[0] == '_':
+        return (('var', token), position + 1)
+    elif token[0].isdigit() or token[0] == '"':
+        raise SatUnsupportedError("numbers or distinct objects (e.g. %s)" % token)
+    elif not (token[0].isalpha() or token[0] == "'"):
+        raise ValueError("a term was expected, but '%s' was found" % token)
+    elif tokens[position + 1] == '(':
+        raise SatUnsupportedError("function symbols (e.g. %s)" % token)
+    # end if
+    return (('const', token), position + 1)
+# end def
+
+
+def expect_sat_token(tokens = [], position = 0, expected = ""):
+    """ Checks that the given TPTP token is at the given position, returning the position after it. """
+    if tokens[position] != expected:
+        raise ValueError("'%s' was expected, but '%s' was found" % (expected, tokens[position]))
+    # end if
+    return position + 1
+# end def
+
+
+def parse_sat_unitary_formula(tokens = [], position = 0):
+    """ Parses a unitary formula (i.e. one in brackets, a negation, a quantified formula, or an atom) from the given
+        TPTP tokens at the given position, returning it, along with the position after it (see parse_sat_formula).
+    """
+    token = tokens[position]
+    if token == '(':
+        (formula, position) = parse_sat_formula(tokens, position + 1)
+        return (formula, expect_sat_token(tokens, position, ')'))
+    elif token == '~':
+        (formula, position) = parse_sat_unitary_formula(tokens, position + 1)
+        return (('not', [formula]), position)
+    elif token in ('!', '?'):
+        # A quantified formula, over the variables listed in square brackets.
+        position = expect_sat_token(tokens, position + 1, '[')
+        variables = []
+        while True:
+            (variable, position) = parse_sat_term(tokens, position)
+            if variable[0] != 'var':
+                raise ValueError("a variable was expected, but '%s' was found" % variable[1])
+            # end if
+            variables.append(variable[1])
+            if tokens[position] != ',':
+                break
+            # end if
+            position += 1
+        # end while
+        position = expect_sat_token(tokens, position, ']')
+        position = expect_sat_token(tokens, position, ':')
+        (formula, position) = parse_sat_unitary_formula(tokens, position)
+        return ((('forall', 'exists')[token == '?'], variables, formula), position)
+    elif token in ('$true', '$false'):
+        return ((token[1:], []), position + 1)
+    elif token[0] == '$':
+        raise SatUnsupportedError("defined predicates (e.g. %s)" % token)
+    # end if
+
+    # An atom, or an (in)equation between two terms.
+    if (token[0].isalpha() or token[0] == "'") and not token[0].isupper() and tokens[position + 1] == '(':
+        # An atom with arguments.
+        predicate = token
+        arguments = []
+        position += 2
+        while True:
+            (argument, position) = parse_sat_term(tokens, position)
+            arguments.append(argument)
+            if tokens[position] != ',':
+                break
+            # end if
+            position += 1
+        # end while
+        position = expect_sat_token(tokens, position, ')')
+        if tokens[position] in ('=', '!='):
+            raise SatUnsupportedError("function symbols (e.g. %s)" % predicate)
+        # end if
+        return (('atom', predicate, tuple(arguments)), position)
+    # end if
+    (term, position) = parse_sat_term(tokens, position)
+    if tokens[position] in ('=', '!='):
+        (other_term, next_position) = parse_sat_term(tokens, position + 1)
+        equation = ('atom', '=', (term, other_term))
+        if tokens[position] == '!=':
+            equation = ('not', [equation])
+        # end if
+        return (equation, next_position)
+    elif term[0] == 'var':
+        raise ValueError("'=' or '!=' was expected after the variable %s, but '%s' was found" % (term[1], tokens[position]))
+    # end if
+    # A propositional atom.
+    return (('atom', term[1], ()), position)
+# end def
+
+
+def parse_sat_formula(tokens = [], position = 0):
+    """ Parses a TPTP (first-order) formula from the given TPTP tokens at the given position, returning it, along
+        with the position after it. Formulas are tuples: ('atom', predicate, arguments) (with '=' as the predicate
+        of equations, and terms as returned by parse_sat_term); ('forall', variables, formula) and ('exists',
+        variables, formula); and (connective, formulas) for the connectives 'not', 'and', 'or', 'implies', 'iff',
+        'true' and 'false'.
+    """
+    (formula, position) = parse_sat_unitary_formula(tokens, position)
+    connective = tokens[position]
+    if connective in ('&', '|'):
+        # The associative connectives may be chained, but not mixed with others without brackets.
+        formulas = [formula]
+        while tokens[position] == connective:
+            (formula, position) = parse_sat_unitary_formula(tokens, position + 1)
+            formulas.append(formula)
+        # end while
+        formula = ((connective == '&') and 'and' or 'or', formulas)
+    elif sat_binary_connectives.has_key(connective):
+        (other_formula, position) = parse_sat_unitary_formula(tokens, position + 1)
+        formula = substitute_sat_connective(sat_binary_connectives[connective], formula, other_formula)
+    else:
+        return (formula, position)
+    # end if
+    if tokens[position] in ('&', '|') or sat_binary_connectives.has_key(tokens[position]):
+        raise ValueError("connectives can't be mixed without brackets (at '%s')" % tokens[position])
+    # end if
+    return (formula, position)
+# end def
+
+
+def substitute_sat_connective(template = (), formula = (), other_formula = ()):
+    """ Returns the formula given by the given template from sat_binary_connectives, for the given two formulas. """
+    if template == 'A':
+        return formula
+    elif template == 'B':
+        return other_formula
+    # end if
+    return (template[0], [substitute_sat_connective(part, formula, other_formula) for part in template[1]])
+# end def
+
+
+def parse_sat_problem(text = ""):
+    """ Parses the annotated formulas (fof or cnf) of the given TPTP text for the SAT prover, returning a tuple of
+        the formulas it takes as given, and the conjectures, with each formula closed by universally quantifying
+        its free variables (as they are in cnf formulas). Include directives, and typed (tff or thf) formulas,
+        aren't supported.
+    """
+    # (Quoted names that are lower words are unquoted, so they're grounded as the same symbols as the words.)
+    tokens = [sat_quoted_lower_word_pattern.sub(r'\1', token) for token in sat_token_pattern.findall(text)
+              if len(token) > 0] + ['']
+    axioms = []
+    conjectures = []
+    position = 0
+    while len(tokens[position]) > 0:
+        language = tokens[position]
+        if language not in ('fof', 'cnf'):
+            if language in ('include', 'tff', 'thf', 'tcf'):
+                raise SatUnsupportedError("%s statements" % language)
+            # end if
+            raise ValueError("an annotated formula was expected, but '%s' was found" % language)
+        # end if
+        position = expect_sat_token(tokens, position + 1, '(')
+        name = tokens[position]
+        position = expect_sat_token(tokens, position + 1, ',')
+        role = tokens[position]
+        position = expect_sat_token(tokens, position + 1, ',')
+        (formula, position) = parse_sat_formula(tokens, position)
+
+        # Skip any annotations (e.g. the source of the formula).
+        depth = 0
+        while depth > 0 or tokens[position] != ')':
+            if len(tokens[position]) == 0:
+                raise ValueError("the formula '%s' isn't closed" % name)
+            elif tokens[position] in ('(', '['):
+                depth += 1
+            elif tokens[position] in (')', ']'):
+                depth -= 1
+            # end if
+            position += 1
+        # end while
+        position = expect_sat_token(tokens, position + 1, '.')
+
+        free_variables = sorted(get_sat_free_variables(formula))
+        if len(free_variables) > 0:
+            formula = ('forall', free_variables, formula)
+        # end if
+        if role == 'conjecture':
+            conjectures.append(formula)
+        elif role in sat_axiom_roles:
+            axioms.append(formula)
+        else:
+            raise SatUnsupportedError("formulas with the role '%s'" % role)
+        # end if
+    # end while
+    return (axioms, conjectures)
+# end def
+
+
+def get_sat_free_variables(formula = ()):
+    """ Returns the set of the names of the free variables of the given formula (see parse_sat_formula). """
+    if formula[0] == 'atom':
+        return set([term[1] for term in formula[2] if term[0] == 'var'])
+    elif formula[0] in ('forall', 'exists'):
+        return get_sat_free_variables(formula[2]) - set(formula[1])
+    # end if
+    free_variables = set()
+    for subformula in formula[1]:
+        free_variables.update(get_sat_free_variables(subformula))
+    # end for
+    return free_variables
+# end def
+
+
+def skolemize_sat_formula(formula = (), positive = True, bindings = {}, numbers = None, skolem_prefix = "$sk"):
+    """ Returns the given formula (see parse_sat_formula), or its negation, if not positive, in negation normal
+        form, with its existential quantifiers replaced by Skolem constants. The formula returned is made up of
+        ('lit', positive, predicate, arguments), ('forall', variables, formula), ('and', formulas), ('or', formulas),
+        ('true', []) and ('false', []), with its variables renamed apart, as given by the bindings of the variables
+        in scope (to variables, or Skolem constants). The variables, and the Skolem constants (named with the
+        given prefix), are numbered by the given iterator of numbers.
+
+        An existential quantifier in the scope of a universal quantifier of a variable it uses would need a Skolem
+        function, and so a larger domain than the constants to ground over; such formulas aren't supported.
+    """
+    kind = formula[0]
+    if kind == 'atom':
+        arguments = tuple([(term[0] == 'var') and bindings[term[1]] or term for term in formula[2]])
+        return ('lit', positive, formula[1], arguments)
+    elif kind == 'not':
+        return skolemize_sat_formula(formula[1][0], not positive, bindings, numbers, skolem_prefix)
+    elif kind in ('and', 'or'):
+        if not positive:
+            kind = ('and', 'or')[kind == 'and']
+        # end if
+        return (kind, [skolemize_sat_formula(subformula, positive, bindings, numbers, skolem_prefix) \
+                       for subformula in formula[1]])
+    elif kind == 'implies':
+        return skolemize_sat_formula(('or', [('not', [formula[1][0]]), formula[1][1]]), positive, bindings, numbers,
+                                     skolem_prefix)
+    elif kind == 'iff':
+        (first, second) = formula[1]
+        if positive:
+            expansion = ('and', [('or', [('not', [first]), second]), ('or', [first, ('not', [second])])])
+        else:
+            expansion = ('or', [('and', [first, ('not', [second])]), ('and', [('not', [first]), second])])
+        # end if
+        return skolemize_sat_formula(expansion, True, bindings, numbers, skolem_prefix)
+    elif kind in ('true', 'false'):
+        return ((kind == 'true') == positive and 'true' or 'false', [])
+    # end if
+
+    # A quantified formula: universal ones keep their (renamed) variables, and existential ones are Skolemized.
+    bindings = dict(bindings)
+    if (kind == 'forall') == positive:
+        variables = []
+        for variable in formula[1]:
+            bindings[variable] = ('var', numbers.next())
+            variables.append(bindings[variable][1])
+        # end for
+        return ('forall', variables, skolemize_sat_formula(formula[2], positive, bindings, numbers, skolem_prefix))
+    # end if
+    for variable in get_sat_free_variables(formula):
+        if bindings[variable][0] == 'var':
+            raise SatUnsupportedError("an existential quantifier within the scope of a universal one, which needs a Skolem function")
+        # end if
+    # end for
+    for variable in formula[1]:
+        bindings[variable] = ('const', "%s%s" % (skolem_prefix, numbers.next()))
+    # end for
+    return skolemize_sat_formula(formula[2], positive, bindings, numbers, skolem_prefix)
+# end def
+
+
+def get_sat_constants(formula = (), constants = None):
+    """ Adds the constants in the given formula (as returned by skolemize_sat_formula) to the given set. """
+    if formula[0] == 'lit':
+        constants.update([term[1] for term in formula[3] if term[0] == 'const'])
+    elif formula[0] == 'forall':
+        get_sat_constants(formula[2], constants)
+    else:
+        for subformula in formula[1]:
+            get_sat_constants(subformula, constants)
+        # end for
+    # end if
+    return constants
+# end def
+
+
+def sat_grounding_timed_out(grounding = {}):
+    """ Returns whether the deadline of the given grounding (see ground_sat_formula) has passed, noting it in the
+        grounding as 'timed_out' if so, so that the grounding can be abandoned (as it can take as long as deciding
+        it does).
+    """
+    if not grounding.get('timed_out') and grounding.get('deadline') != None and time.time() > grounding['deadline']:
+        grounding['timed_out'] = True
+    # end if
+    return grounding.get('timed_out', False)
+# end def
+
+
+def ground_sat_formula(formula = (), assignment = {}, grounding = {}):
+    """ Returns the clauses (as lists of literals, i.e. signed variable numbers) that the given formula (as
+        returned by skolemize_sat_formula) holds by, with its variables given the constants in the given assignment,
+        and its universal quantifiers grounded over the domain of constants in the given grounding dictionary.
+
+        The grounding dictionary holds the 'domain', the variable number of each ground atom ('atoms'), and the
+        'clauses' defining the variables introduced (as in the Plaisted-Greenbaum encoding) to stand for the
+        conjunctions within disjunctions, so that the clauses don't blow up. A formula that always holds has no
+        clauses, and one that never holds has an empty clause.
+
+        If the grounding has a 'deadline' (a time), the grounding stops once it has passed, with 'timed_out' set in
+        it (see sat_grounding_timed_out), and the clauses returned are then incomplete.
+    """
+    kind = formula[0]
+    if kind == 'lit':
+        arguments = tuple([(term[0] == 'var') and assignment[term[1]] or term[1] for term in formula[3]])
+        if formula[2] == '=':
+            if arguments[0] == arguments[1]:
+                return ([[]], [])[formula[1]]
+            # end if
+            atom = ('=', min(arguments), max(arguments))
+        else:
+            atom = (formula[2], arguments)
+        # end if
+        if not grounding['atoms'].has_key(atom):
+            grounding['atoms'][atom] = len(grounding['atoms']) + 1
+        # end if
+        return [[(-1, 1)[formula[1]] * grounding['atoms'][atom]]]
+    elif kind in ('true', 'false'):
+        return ([[]], [])[kind == 'true']
+    elif kind == 'forall':
+        clauses = []
+        for constants in itertools.product(grounding['domain'], repeat = len(formula[1])):
+            if sat_grounding_timed_out(grounding):
+                return []
+            # end if
+            instance_assignment = dict(assignment)
+            instance_assignment.update(zip(formula[1], constants))
+            instance_clauses = ground_sat_formula(formula[2], instance_assignment, grounding)
+            if [] in instance_clauses:
+                return [[]]
+            # end if
+            clauses.extend(instance_clauses)
+        # end for
+        return clauses
+    elif kind == 'and':
+        clauses = []
+        for subformula in formula[1]:
+            subformula_clauses = ground_sat_formula(subformula, assignment, grounding)
+            if [] in subformula_clauses:
+                return [[]]
+            # end if
+            clauses.extend(subformula_clauses)
+        # end for
+        return clauses
+    # end if
+
+    # A disjunction: a clause of the literals of its disjuncts, with a new variable standing for each disjunct that
+    # takes more than one clause.
+    disjunction = []
+    for subformula in formula[1]:
+        subformula_clauses = ground_sat_formula(subformula, assignment, grounding)
+        if len(subformula_clauses) == 0:
+            return []
+        elif [] in subformula_clauses:
+            continue
+        elif len(subformula_clauses) == 1:
+            disjunction.extend(subformula_clauses[0])
+        else:
+            grounding['atoms'][('', len(grounding['atoms']))] = len(grounding['atoms']) + 1
+            variable = len(grounding['atoms'])
+            for clause in subformula_clauses:
+                grounding['clauses'].append([-variable] + clause)
+            # end for
+            disjunction.append(variable)
+        # end if
+    # end for
+    return [disjunction]
+# end def
+
+
+def ground_sat_equality(grounding = {}):
+    """ Returns the clauses giving equality (between the constants in the domain of the given grounding) its
+        meaning: transitivity (as each equation is grounded in one direction, reflexivity and symmetry need no
+        clauses), and congruence, i.e. substituting equal constants in each argument of each predicate. As for
+        ground_sat_formula, this stops once the deadline of the grounding (if any) has passed.
+    """
+    domain = grounding['domain']
+    atoms = grounding['atoms']
+    def get_atom(atom):
+        if not atoms.has_key(atom):
+            atoms[atom] = len(atoms) + 1
+        # end if
+        return atoms[atom]
+    # end def
+    def equation(first, second):
+        return get_atom(('=', min(first, second), max(first, second)))
+    # end def
+    clauses = []
+    for (first, second, third) in itertools.permutations(domain, 3):
+        if first < third:
+            clauses.append([-equation(first, second), -equation(second, third), equation(first, third)])
+        # end if
+    # end for
+    predicates = set([(atom[0], len(atom[1])) for atom in atoms.keys() if atom[0] not in ('=', '') and len(atom[1]) > 0])
+    for (predicate, arity) in sorted(predicates):
+        for arguments in itertools.product(domain, repeat = arity):
+            if sat_grounding_timed_out(grounding):
+                return clauses
+            # end if
+            for index in range(arity):
+                for constant in domain:
+                    if constant != arguments[index]:
+                        substituted = arguments[:index] + (constant,) + arguments[index + 1:]
+                        clauses.append([-get_atom((predicate, arguments)), -equation(arguments[index], constant),
+                                        get_atom((predicate, substituted))])
+                    # end if
+                # end for
+            # end for
+        # end for
+    # end for
+    return clauses
+# end def
+
+
+def solve_sat_clauses(clauses = [], variable_count = 0, deadline = None, statistics = None):
+    """ Decides whether the given clauses (lists of literals, i.e. signed variable numbers, from 1 to the given
+        variable count) can all be satisfied together, by the DPLL procedure: deciding the value of a variable at a
+        time, propagating the values of the literals left alone in a clause (by watching two literals of each
+        clause), and backtracking to the last decision not yet tried both ways when a clause can't be satisfied.
+
+        Returns a list of the value of each variable (by number, with the first item unused) that satisfies the
+        clauses, if there is one, False if there isn't, or None if the given deadline (a time, if not None) passed
+        first. The 'decisions', 'propagations' and 'conflicts' are counted in the given statistics dictionary.
+    """
+    if statistics == None:
+        statistics = {}
+    # end if
+    statistics.update({'decisions': 0, 'propagations': 0, 'conflicts': 0})
+    values = [None] * (variable_count + 1)
+    trail = []
+    watches = {}
+    occurrences = [0] * (variable_count + 1)
+    units = []
+    for clause in clauses:
+        clause = list(set(clause))
+        if len([literal for literal in clause if -literal in clause]) > 0:
+            # This clause always holds.
+            continue
+        elif len(clause) == 0:
+            return False
+        elif len(clause) == 1:
+            units.append(clause[0])
+        else:
+            watches.setdefault(clause[0], []).append(clause)
+            watches.setdefault(clause[1], []).append(clause)
+        # end if
+        for literal in clause:
+            occurrences[abs(literal)] += 1
+        # end for
+    # end for
+    order = sorted(range(1, variable_count + 1), key = lambda variable: -occurrences[variable])
+
+    def value(literal):
+        variable_value = values[abs(literal)]
+        if variable_value == None or literal > 0:
+            return variable_value
+        # end if
+        return not variable_value
+    # end def
+
+    def assign(literal):
+        values[abs(literal)] = (literal > 0)
+        trail.append(literal)
+    # end def
 
-"""
+    def propagate(head):
+        # Visit the clauses watching each literal made false since the given position in the trail, moving their
+        # watch to another literal that isn't false, or, failing that, making the other literal watched true.
+        while head < len(trail):
+            false_literal = -trail[head]
+            head += 1
+            watching = watches.get(false_literal, [])
+            still_watching = []
+            for (index, clause) in enumerate(watching):
+                if clause[0] == false_literal:
+                    clause[0] = clause[1]
+                    clause[1] = false_literal
+                # end if
+                other_value = value(clause[0])
+                if other_value == True:
+                    still_watching.append(clause)
+                    continue
+                # end if
+                for position in range(2, len(clause)):
+                    if value(clause[position]) != False:
+                        (clause[1], clause[position]) = (clause[position], clause[1])
+                        watches.setdefault(clause[1], []).append(clause)
+                        break
+                    # end if
+                else:
+                    still_watching.append(clause)
+                    if other_value == False:
+                        # No literal of this clause can be made true.
+                        still_watching.extend(watching[index + 1:])
+                        watches[false_literal] = still_watching
+                        return False
+                    # end if
+                    assign(clause[0])
+                    statistics['propagations'] += 1
+                # end for
+            # end for
+            watches[false_literal] = still_watching
+        # end while
+        return True
+    # end def
 
-import getopt
-import os
-import os.path
-import re
-import string
-import subprocess
-import sys
-import tempfile
+    for literal in units:
+        if value(literal) == False:
+            return False
+        elif value(literal) == None:
+            assign(literal)
+        # end if
+    # end for
+    decisions = []
+    head = 0
+    while True:
+        if not propagate(head):
+            # Backtrack to the last decision not yet tried both ways, and try it the other way.
+            statistics['conflicts'] += 1
+            while len(decisions) > 0:
+                (head, literal, flipped) = decisions.pop()
+                for undone_literal in trail[head:]:
+                    values[abs(undone_literal)] = None
+                # end for
+                del trail[head:]
+                if not flipped:
+                    decisions.append((head, -literal, True))
+                    assign(-literal)
+                    break
+                # end if
+            else:
+                return False
+            # end while
+            continue
+        # end if
+        head = len(trail)
 
-eprover_bin = "/home/E/PROVER/eprover"
-eprover_options = ["--auto-schedule", "--tstp-format", "-s", "-l 1", "--proof-object", "--memory-limit=2048", "--cpu-limit=10"]
+        # Decide the value of the next variable, trying false first.
+        undecided = [variable for variable in order if values[variable] == None][:1]
+        if len(undecided) == 0:
+            return values
+        # end if
+        statistics['decisions'] += 1
+        if deadline != None and statistics['decisions'] % 64 == 0 and time.time() > deadline:
+            return None
+        # end if
+        decisions.append((head, -undecided[0], False))
+        assign(-undecided[0])
+    # end while
+# end def
 
-z3_bin = "/usr/bin/z3_tptp"
-z3_options = ["-c", "-m", "-p"]
 
-default_prover="eprover"
+def get_sat_non_test_matter(non_test_matter = "", domain = (), deadline = None):
+    """ Returns the non-test matter parsed for the SAT prover, as a tuple of the formulas it takes as given
+        (Skolemized, see skolemize_sat_formula), and the set of its constants; or, if a domain (of constants) is
+        given, its grounding over that domain (see ground_sat_formula), with the clauses of its formulas added to
+        those of the grounding. Each of these is worked out once, and kept for the test cases after.
+
+        The grounding stops at the given deadline (a time, if not None), with 'timed_out' set in it; a grounding
+        cut short isn't kept, so that a later test case grounds it again.
+    """
+    sat_non_test_matter_lock.acquire()
+    try:
+        if not sat_non_test_matter_formulas.has_key(non_test_matter):
+            (axioms, conjectures) = parse_sat_problem(non_test_matter)
+            if len(conjectures) > 0:
+                raise SatUnsupportedError("conjectures in the non-test matter")
+            # end if
+            numbers = itertools.count(1)
+            formulas = [skolemize_sat_formula(axiom, True, {}, numbers, "$sk_non_test_matter_") for axiom in axioms]
+            constants = set()
+            for formula in formulas:
+                get_sat_constants(formula, constants)
+            # end for
+            sat_non_test_matter_formulas[non_test_matter] = (formulas, constants)
+        # end if
+        if len(domain) == 0:
+            return sat_non_test_matter_formulas[non_test_matter]
+        # end if
+        if not sat_ground_non_test_matter.has_key((non_test_matter, domain)):
+            grounding = {'domain': domain, 'atoms': {}, 'clauses': [], 'deadline': deadline}
+            for formula in sat_non_test_matter_formulas[non_test_matter][0]:
+                grounding['clauses'].extend(ground_sat_formula(formula, {}, grounding))
+            # end for
+            if sat_grounding_timed_out(grounding):
+                return grounding
+            # end if
+            del grounding['deadline']
+            sat_ground_non_test_matter[(non_test_matter, domain)] = grounding
+        # end if
+        return sat_ground_non_test_matter[(non_test_matter, domain)]
+    finally:
+        sat_non_test_matter_lock.release()
+    # end try
+# end def
 
 
-def usage():
-    """ Displays the usage information for this program. """
-    sys.stdout.write("Usage: python run_as_tptp_test_suite.py [-n|--dry-run] ")
-    sys.stdout.write("[-p <prover name i.e. 'eprover' or 'z3'>|--prover=<prover name>] ")
-    sys.stdout.write("[-v|--verbose] <TPTP input file to test> [<test to run>]\n")
+def describe_sat_atom(atom = ()):
+    """ Returns the given ground atom (as a key of the atoms of a grounding) as it would be written in TPTP. """
+    if atom[0] == '=':
+        return "%s = %s" % (atom[1], atom[2])
+    elif len(atom[1]) == 0:
+        return atom[0]
+    # end if
+    return "%s(%s)" % (atom[0], string.join(atom[1], ', '))
 # end def
 
 
-def run_test_case(test_case = {}, non_test_matter = "", result_filename = "", dry_run = False, prover = default_prover, verbosity = 0):
-    """ Run the test case specified in the given dictionary structure, putting it at the end of
-        given non-test matter for input to TPTP, and storing the results of the TPTP run into
-        the given result file.
+def decide_sat_problem(non_test_matter = "", test_case_text = "", deadline = None):
+    """ Decides the given test case against the given non-test matter with the SAT prover, returning a tuple of its
+        status (as returned by run_test_case), and its output, in the manner of a TPTP prover's.
 
-        The results file is scanned to assess the status of the test, and a status value is calculated and
-        returned as the result of this function.
-        This return value is a single character, with the value indicating:
-         - 'E' for error
-         - 'F' for failure, and
-         - 'S' for success.
+        The problem is grounded over the constants in it, and the grounding is decided by solve_sat_clauses. This is
+        complete for TPTP problems whose Skolem form has no functions (i.e. whose formulas, with their conjectures
+        negated, only have existential quantifiers outside of universal ones), such as the consent theory's: by
+        Herbrand's theorem, such a problem has a model if and only if its grounding over its constants does. Other
+        problems are given up on, without being grounded.
+
+        The given deadline (a time, if not None) is checked while the problem is grounded, as well as while the
+        grounding is decided; the problem has timed out if it passes before either is done.
     """
+    output = "% SAT prover: grounding the problem over its constants, and deciding it by DPLL.\n"
+    statistics = {'decisions': 0, 'propagations': 0, 'conflicts': 0}
+    try:
+        (formulas, constants) = get_sat_non_test_matter(non_test_matter)
+        (axioms, conjectures) = parse_sat_problem(test_case_text)
+        numbers = itertools.count(1)
+        goal_formulas = [skolemize_sat_formula(axiom, True, {}, numbers) for axiom in axioms]
+        if len(conjectures) > 0:
+            goal_formulas.append(skolemize_sat_formula(('and', conjectures), False, {}, numbers))
+        # end if
+        goal_constants = set(constants)
+        for formula in goal_formulas:
+            get_sat_constants(formula, goal_constants)
+        # end for
+        domain = tuple(sorted(goal_constants)) or ('$sk_element',)
+        shared_grounding = get_sat_non_test_matter(non_test_matter, domain, deadline)
+    except SatUnsupportedError, e:
+        return ('?', output + "SZS status GaveUp\n%% The SAT prover doesn't support %s.\n" % str(e))
+    except (ValueError, IndexError), e:
+        return ('E', output + "SZS status SyntaxError\n%% %s.\n" % (str(e) or "the input ended too soon"))
+    # end try
 
-    # Set up for the desired prover.
-    needs_named_file = False
-    named_file_option = ''
-    if (prover == 'z3'):
-        prover_bin = z3_bin
-        prover_options = z3_options
-        needs_named_file = True
-        named_file_option = '-file:'
-    else:
-        prover_bin = eprover_bin
-        prover_options = eprover_options
+    # Ground the test case alongside the shared non-test matter, and decide the grounding (unless the deadline
+    # passed while grounding, which leaves it unfinished).
+    grounding = {'domain': domain, 'atoms': dict(shared_grounding['atoms']), 'clauses': [], 'deadline': deadline}
+    clauses = list(shared_grounding['clauses'])
+    if not sat_grounding_timed_out(shared_grounding):
+        for formula in goal_formulas:
+            clauses.extend(ground_sat_formula(formula, {}, grounding))
+        # end for
+        clauses.extend(grounding['clauses'])
+        if len([atom for atom in grounding['atoms'].keys() if atom[0] == '=']) > 0:
+            clauses.extend(ground_sat_equality(grounding))
+        # end if
     # end if
-
-    # Open (or create) the results file, if a non-empty string has been given.
-    if len(result_filename) > 0:
-        results_file = open(result_filename, 'w')
+    if sat_grounding_timed_out(shared_grounding) or sat_grounding_timed_out(grounding):
+        values = None
     else:
-        results_file = tempfile.TemporaryFile(prefix = 'run_as_tptp_test_suite_results')
+        values = solve_sat_clauses(clauses, len(grounding['atoms']), deadline, statistics)
     # end if
 
-    # Create a file to hold the concatenated non-test matter and test text.
-    test_case_name = test_case.get('name', 'Unknown Test')
-    test_case_text = test_case.get('text', '')
-    if needs_named_file:
-        input_file = tempfile.NamedTemporaryFile(prefix = 'run_as_tptp_test_suite_input')
+    if values == None:
+        output += "SZS status Timeout\n"
+        status = 'T'
+    elif values == False:
+        output += "SZS status %s\n" % ('Unsatisfiable', 'Theorem')[len(conjectures) > 0]
+        status = 'S'
     else:
-        input_file = tempfile.SpooledTemporaryFile(prefix = 'run_as_tptp_test_suite_input')
+        output += "SZS status %s\n" % ('Satisfiable', 'CounterSatisfiable')[len(conjectures) > 0]
+        output += "%% A model, over the constants %s, in which just these ground atoms are true:\n" % string.join(domain, ', ')
+        for atom in sorted([atom for (atom, variable) in grounding['atoms'].items() if atom[0] != '' and values[variable]]):
+            output += "%%   %s\n" % describe_sat_atom(atom)
+        # end for
+        status = 'F'
     # end if
-    input_file.write(non_test_matter)
-    input_file.write(test_case_text)
-    input_file.seek(0)
+    output += "# Constants            : %s\n" % len(domain)
+    output += "# Ground atoms         : %s\n" % len([atom for atom in grounding['atoms'].keys() if atom[0] != ''])
+    output += "# Ground clauses       : %s\n" % len(clauses)
+    output += "# Decisions            : %s\n" % statistics['decisions']
+    output += "# Propagations         : %s\n" % statistics['propagations']
+    output += "# Conflicts            : %s\n" % statistics['conflicts']
+    return (status, output)
+# end def
 
-    # Run the test case through the desired TPTP-compatible prover.
-    try:
-        if needs_named_file:
-          input_file_option = named_file_option + input_file.name
-          subprocess.call([prover_bin] + prover_options + [input_file_option], stdout = results_file, stderr = results_file)
-        else:
-          subprocess.call([prover_bin] + prover_options, stdin = input_file, stdout = results_file, stderr = results_file)
-        # end if
-    except Exception, e:
-        input_file.close()
-        results_file.close()
-        sys.stdout.write("\nERROR: an error '%s' occurred while running test case '%s'.\n" % (str(e), test_case_name))
-        sys.stdout.write("Test text:\n")
-        sys.stdout.write(test_case_text)
-        sys.stdout.write("\nExiting.\n")
-        sys.exit(1)
-    # end try
 
-    # Check the output for certain strings that indicate success, failure, or error.
-    results_file = open(result_filename, 'r')
-    result = 'E'
-    if prover == 'z3':
-        success = re.compile('SZS status Theorem')
-        failure = re.compile('SZS status CounterSatisfiable')
-        likely_failure = re.compile('SZS status GaveUp')
+def run_sat_test_case(test_case = {}, non_test_matter = "", result_filename = "", verbosity = 0, cache_path = "",
+                      details = None, stream = False, timeout = 0, memory_limit = 0):
+    """ Runs the given test case against the given non-test matter through the SAT prover, in this process (see
+        decide_sat_problem), as run_test_case does for the other provers, storing its output into the given result
+        file (or keeping it, if streaming), and returning its status.
+
+        As no prover process is started, the test case doesn't wait for the memory budget, and isn't limited in
+        memory; its time limit is checked as the problem is grounded and decided. The time taken is set as its CPU
+        time in the details dictionary (as it's spent in this process, and the SAT prover is CPU bound), with no
+        peak resident set size.
+
+        The result cache is keyed by the given memory limit and the test case's time limit, as for the other provers
+        (see prover_cache_key), so that a give-up under one escalation tier isn't reused under another.
+    """
+    test_case_text = get_test_case_text(test_case)
+    if details == None:
+        details = {}
+    # end if
+    details['cached'] = False
+    details['timed_out'] = False
+
+    # Check the result cache for an earlier run of exactly this prover input (by this version of the SAT prover),
+    # under the same limits.
+    cached_result = None
+    if len(cache_path) > 0:
+        cache_key = prover_cache_key(non_test_matter, test_case_text, [os.path.abspath(__file__), 'sat'], memory_limit,
+                                     test_case.get('timeout', timeout))
+        cached_result = read_cached_result(cache_path, cache_key)
+    # end if
+    if cached_result != None:
+        details['cached'] = True
+        (result, output) = cached_result
     else:
-        success = re.compile('# Proof found')
-        failure = re.compile('# No proof found')
-        likely_failure = re.compile('# Failure:')
-    # end if
-    for line in results_file:
-        if success.match(line) != None:
-            result = 'S'
-        elif failure.match(line) != None:
-            result = 'F'
-        elif likely_failure.match(line) != None:
-            result = '?'
+        start_time = time.time()
+        test_case_timeout = test_case_time_limit(test_case, timeout)
+        deadline = None
+        if test_case_timeout > 0:
+            deadline = start_time + test_case_timeout
         # end if
-    # end for
+        (result, output) = decide_sat_problem(non_test_matter, test_case_text, deadline)
+        details['cpu_time'] = time.time() - start_time
+        details['peak_rss'] = None
+        details['timed_out'] = (result == 'T')
+    # end if
+    details['excerpt'] = classify_prover_output(output.splitlines(True), 'sat')[1]
+    details['statistics'] = parse_prover_statistics(output, 'sat')
+
+    if stream:
+        store_streamed_output(test_case, result, output, result_filename, verbosity, details)
+    elif len(result_filename) > 0:
+        results_file = open(result_filename, 'w')
+        results_file.write(output)
+        results_file.close()
+    # end if
 
-    # Close the files, and exit.
-    input_file.close()
-    results_file.close()
+    # Store the result in the cache, unless it was an error or a timeout (as for the other provers).
+    if len(cache_path) > 0 and cached_result == None and result not in ('E', 'T'):
+        write_cached_result(cache_path, cache_key, result, output)
+    # end if
     return result
 # end def
 
 
-def run_test_cases(test_cases = {}, tests_to_run = [], test_results_path = os.curdir + os.sep + "results",
-                   non_test_matter = "", dry_run = False, prover = default_prover, verbosity = 0):
-    """ Run the test cases listed. """
+# The names used in each non-test matter, which aren't renamed when comparing goals (keyed by the non-test matter).
+non_test_matter_names = {}
+non_test_matter_names_lock = threading.Lock()
 
-    # Validate the given test case name(s) against the list of discovered test case names.
-    for test_case_name in tests_to_run:
-        if test_case_name not in tests_to_run:
-            sys.stdout.write("\nERROR: given test name '%s' not found in the available tests to run.\n" % test_case_name)
-            sys.stdout.write("Tests found: '%s'\n" % string.join(test_cases.keys(), ', '))
-            sys.stdout.write("\nExiting.\n")
-            sys.exit(1)
+
+def get_included_names(text = ""):
+    """ Returns the set of names used in the files included by the given TPTP text (see read_included_files), or
+        None if any of them can't be read, and so the names used in it aren't known.
+    """
+    names = set()
+    for (filename, contents) in read_included_files(text):
+        if contents == None:
+            return None
         # end if
+        names.update([token for (comment, token) in goal_token_pattern.findall(contents)])
     # end for
+    return names
+# end def
 
-    # Create the test results path, if it doesn't exist.
-    if os.path.exists(test_results_path):
-        if not os.path.isdir(test_results_path):
-            sys.stdout.write("\nERROR: given test results path '%s' already exists, and isn't a directory. Exiting." % test_results_path)
-            sys.exit(1)
-        # end if
-    else:
-        # Try to create the directory.
-        try:
-            os.makedirs(test_results_path)
-        except Exception, e:
-            sys.stdout.write("\nERROR: couldn't create the test results path '%s'.\n" % test_results_path)
-            sys.stdout.write("Reason: %s\n" % str(e))
-            sys.stdout.write("\nExiting.\n")
-            sys.exit(1)
-        # end try
-    # end if
 
-    # Collect a list of test cases we're interested in the details for, storing the status and the names of the files
-    # containing the run result.
-    test_case_details_to_display = []
-    test_results = ""
+def get_non_test_matter_names(non_test_matter = ""):
+    """ Returns the set of names (i.e. symbols, and keywords) used in the given non-test matter, and in the files
+        it includes (see get_included_names), or None if they aren't all known, which is worked out once for each
+        non-test matter.
+    """
+    non_test_matter_names_lock.acquire()
+    try:
+        if not non_test_matter_names.has_key(non_test_matter):
+            names = get_included_names(non_test_matter)
+            if names != None:
+                names.update([token for (comment, token) in goal_token_pattern.findall(non_test_matter)])
+            # end if
+            non_test_matter_names[non_test_matter] = names
+        # end if
+        return non_test_matter_names[non_test_matter]
+    finally:
+        non_test_matter_names_lock.release()
+    # end try
+# end def
 
-    # Print a header for the results.
-    sys.stdout.write("Test results:\n\n")
 
-    for test_case_name in tests_to_run:
-        # Generate a file name to store the results of this test case.
-        result_filename = test_results_path + os.sep + test_case_name + ".txt"
-        # FIXME: generate a file name for the results of each test, validate test cases, tests_to_run, etc.
+def canonical_goal_key(non_test_matter = "", test_case = {}):
+    """ Returns a key identifying the goal of the given test case against the given non-test matter up to the
+        renaming of its names, so that test cases which are the same problem for the prover (i.e. alpha-equivalent)
+        have the same key, whatever their constants, variables and formulas are called, and whether or not they are
+        negated test cases (which only changes how their result is taken).
 
-        test_case = test_cases.get(test_case_name, {})
-        negated = test_case.get('negated', False)
-        status = run_test_case(test_case = test_case,
-                               non_test_matter = non_test_matter, result_filename = result_filename,
-                               dry_run = dry_run, prover = prover, verbosity = verbosity)
+        Comments are dropped, and each name that isn't used in the non-test matter (and so is local to the test
+        case) is replaced by a placeholder numbered by its first appearance. This renaming is one-to-one, so it
+        can't change whether the goal follows from the non-test matter. Placeholders keep whether the names they
+        replace begin with a capital, or with a letter from u to z, so that variables stay variables. Test cases
+        with different time limits are never given the same key.
 
-        # Invert the status if this is a negated test case.
-        if negated:
-            if status == 'S':
-               status = 'F'
-            elif status == 'F':
-               status = 'S'
-            # end if
-        # end if
+        Only the names in statements' formulas (and the statements' own names) are renamed: the statements'
+        keywords (e.g. fof), roles (e.g. conjecture or hypothesis) and annotations are kept as they are, as they
+        change the problem, and so test cases differing only in those are never given the same key.
 
-        # Display a JUnit/unittesting style symbol to indicate whether this test succeed, failed, or was erroneous.
-        if status == 'S':
-            test_results += '.'
-            sys.stdout.write('.')
-            if verbosity > 1:
-                test_case_details_to_display.append((test_case_name, status, result_filename))
-            # end if
-        else:
-            test_results += status
-            sys.stdout.write(status)
-            test_case_details_to_display.append((test_case_name, status, result_filename))
+        The names used in the files included by the non-test matter, or by the test case, aren't local to the test
+        case either. If any of those files can't be read, nothing is renamed, as no name can be known to be local.
+    """
+    test_case_text = get_test_case_text(test_case)
+    names = get_non_test_matter_names(non_test_matter)
+    included_names = get_included_names(test_case_text)
+    if names != None and included_names != None:
+        names = names | included_names
+    else:
+        names = None
+    # end if
+    placeholders = {}
+    tokens = []
+    # (How deeply bracketed the current token is in its statement, and which of the statement's arguments it's in:
+    #  its name, role, formula, or annotations.)
+    depth = 0
+    argument_index = 0
+    for (comment, token) in goal_token_pattern.findall(test_case_text):
+        if len(token) == 0:
+            continue
         # end if
-    # end for
-
-    sys.stdout.write("\n\n")
-
-    # Now display the details of any recorded test cases.
-    for (test_case_name, status, result_filename) in test_case_details_to_display:
-        # Get the relevant details for this test case.
-        line_count = test_cases[test_case_name]['line']
-        index = test_cases[test_case_name]['index']
-        text = test_cases[test_case_name]['text']
-        negated = test_cases[test_case_name]['negated']
-
-        # If the user wants minimally verbose output, we want to display relevant detail from the test
-        # results according to what status this test case had.
-        results = ""
-        status_message = "had ERRORS"
-        if negated:
-            if status == 'F':
-                status_message = "unintentionally/undesirably succeeded"
-            elif status == 'S':
-                status_message = "failed as intended"
-            # end if
-        else:
-            if status == 'F':
-                status_message = "FAILED"
-            elif status == 'S':
-                status_message = "succeeded"
-            # end if
+        renamable = names != None and depth > 0 and argument_index in [0, 2]
+        if token in ['(', '[']:
+            depth += 1
+        elif token in [')', ']']:
+            depth -= 1
+        elif token == ',' and depth == 1:
+            argument_index += 1
+        elif token == '.' and depth == 0:
+            argument_index = 0
         # end if
-        if verbosity > 0:
-            results_file = open(result_filename, 'r')
-            if status == 'E' or verbosity > 2:
-                # If there was an error (or we're being very verbose), the user wants to see the whole file.
-                # Read in everything.
-                results = results_file.read()
-            elif status == 'F' or verbosity > 1:
-                # If this test case failed (or the verbosity is high), the user wants to see the test case text, and
-                # the search results.
-                # Read in the results of the run, skipping everything but the search section, and
-                # what follows that.
-                results += text
-                in_search_results = False
-                if (prover == 'eprover'):
-                    search_section = re.compile('#.*proof found', re.IGNORECASE)
+        if renamable and (token[0].isalpha() or token[0] == '_') and token not in names:
+            if not placeholders.has_key(token):
+                if token[0].isupper() or token[0] == '_':
+                    name_class = 'V'
+                elif token[0] in 'uvwxyz':
+                    name_class = 'v'
                 else:
-                    search_section = re.compile('.*SZS status', re.IGNORECASE)
+                    name_class = 'c'
                 # end if
-                for line in results_file:
-                    if not in_search_results:
-                        if search_section.match(line) != None:
-                            in_search_results = True
-                        # end if
-                    # end if
-                    if in_search_results:
-                        results += line
-                    # end if
-                # end for
+                placeholders[token] = "#%s%s" % (name_class, len(placeholders))
             # end if
-            results_file.close()
-        # end if
-
-        # Now format these details.
-        sys.stdout.write("Test case #%s named '%s' at line %s %s.\n" % \
-              (index, test_case_name, line_count, status_message))
-
-        # If the user wants verbose output, display the test results we retrieved earlier.
-        if verbosity > 0:
-            sys.stdout.write("\nDetails:\n\n")
-            sys.stdout.write(results)
+            token = placeholders[token]
         # end if
-        sys.stdout.write("\n\n")
+        tokens.append(token)
     # end for
+    return hashlib.sha1(non_test_matter + "\0" + string.join(tokens, ' ') + "\0" + \
+                        str(test_case.get('timeout'))).hexdigest()
+# end def
 
-    # If there were test cases with problems, summarise the results again for clarity.
-    if len(test_case_details_to_display) > 0:
-        # Print a header for the results.
-        sys.stdout.write("Test results:\n\n")
-        sys.stdout.write(test_results)
-    # end if
 
-    sys.stdout.write("\n\nTest run complete.\n\n")
+def get_statement_name(statement = []):
+    """ Returns the name of the given statement (as a list of tokens), if it's an annotated formula, or None. """
+    if len(statement) > 3 and statement[0] in ('fof', 'cnf', 'tff', 'thf') and statement[1] == '(':
+        return statement[2]
+    # end if
+    return None
 # end def
 
 
-def run_test_suite(input_filename = "", tests_to_run = [], dry_run = False, prover = default_prover, verbosity = 0):
-    """ Runs the test suite in the given input filename, by splitting the TPTP input,
-        then calling out to the test case runner with the split/parsed output,
-        collating the results, and displaying it.
-    """
-
-    # Split the input file into test_cases, getting a section of non-test matter, and a
-    # dictionary of test case names and text.
-    if verbosity > 1:
-        sys.stdout.write("Splitting %s...\n" % input_filename)
-    # end if
-    non_test_matter, test_case_names, test_cases = split_tptp_input(input_filename, dry_run = dry_run, verbosity = verbosity)
+# The names of the input formulas in an E proof object, as annotated with the input they came from.
+proof_input_pattern = re.compile(r"\bfile\(\s*'[^']*'\s*,\s*([^)\s]+)\s*\)")
 
-    # Validate the given test case name(s) against the list of discovered test case names.
-    for test_case_name in tests_to_run:
-        if test_case_name not in test_case_names:
-            sys.stdout.write("\nERROR: given test name '%s' not found in the given input file.\n" % test_case_name)
-            sys.stdout.write("Tests found: '%s'\n" % string.join(test_case_names, ', '))
-            sys.stdout.write("\nExiting.\n")
-            sys.exit(1)
-        # end if
-    # end for
 
-    # If there weren't any test given to run, just run the tests in the order they were discovered.
-    if tests_to_run == []:
-        tests_to_run = test_case_names
+def parse_proof_axioms(excerpt = "", prover = default_prover):
+    """ Returns a sorted list of the names of the input formulas used by the proof in the given excerpt of the given
+        prover's output, or None if it has no proof to go by (as only the E prover's proof objects name them).
+    """
+    if prover != 'eprover' or excerpt.find("SZS output start") < 0:
+        return None
     # end if
-
-    # Run the selected test cases.
-    if len(tests_to_run) > 0:
-        if verbosity > 0:
-            sys.stdout.write("Running the following test cases in %s:\n - %s\n\n" % \
-                             (input_filename, string.join(tests_to_run, '\n - ')))
-        # end if
-        run_test_cases(test_cases = test_cases, tests_to_run = tests_to_run, non_test_matter = non_test_matter,
-                       dry_run = dry_run, prover = prover, verbosity = verbosity)
-    else:
-        sys.stdout.write("\nERROR: no valid test cases found in the given input file, '%s'.\n" % inputfile_name)
-        sys.stdout.write("\nExiting.\n")
-        sys.exit(1)
-    # end def
+    return sorted(set(proof_input_pattern.findall(excerpt)))
 # end def
 
 
-def split_tptp_input(input_filename, dry_run = False, verbosity = 0):
-    """ Splits the TPTP input file with the given filename, extracting non-test matter, and
-        collating named (if available) test case portions in a dictionary.
+def get_lemma_axiom(test_case_name = "", test_case = {}):
+    """ Returns the text of the given lemma test case as an axiom, for adding to the non-test matter of the test cases
+        after it once it's proved, i.e. its conjecture (without comments) with the role of a lemma instead; or None
+        (with a warning) if it isn't a single conjecture, as it then can't be used as one (e.g. if it has hypotheses).
     """
+    text = strip_comments(get_test_case_text(test_case))
+    statements = split_statements(text)
+    if len(statements) != 1 or get_statement_name(statements[0]) == None or statements[0][3:5] != [',', 'conjecture']:
+        sys.stdout.write("\nWARNING: lemma '%s' isn't a single conjecture, so can't be added to the test cases after it.\n" % \
+                         test_case_name)
+        return None
+    # end if
+    return "\n" + re.sub(r'^(\w+\s*\(\s*[^,]+,\s*)conjecture\b', r'\1lemma', text.strip(), 1) + "\n"
+# end def
 
-    # Try to open the file.
-    try:
-        input_file = open(input_filename, 'r')
-    except:
-        sys.stdout.write("\nERROR: Couldn't open file with name '%s'. Exiting.\n" % input_filename)
-        sys.exit(1)
-    # end try
-
-    # Compile some regular expressions for speed.
-    # (These describe the markup describe earlier.)
-    begin_test_section = re.compile('\s*%\s*Test\s*runner\s*:?\s*begin', re.IGNORECASE)
-    test_case = re.compile('\s*%\s*(?P<negated>Negated)?\s*[tT]est\s*case\s*:?\s*(?P<name>.*)\s*$', re.IGNORECASE)
-    end_test_section = re.compile('\s*%\s*Test\s*runner\s*:?\s*end', re.IGNORECASE)
-
-    # Read the file in, line by line.
-    in_test = False
-    in_non_test_matter = True
-    current_test_count = 0
-    line_count = 0
-    non_test_matter = ""
-    test_case_names = []
-    test_cases = {}
-    for line in input_file:
-        # Increment the line count.
-        line_count += 1
-
-        # Check for markup in the current line.
-        test_case_match = test_case.match(line)
-        disposable_line = False
-        negated = False
-        if test_case_match != None:
-            # We have a new test case.
-
-            # Get the name, if any, or use a safe default.
-            current_test_count += 1
-            current_test_name = "Test-%s" % current_test_count
-            trial_test_name = test_case_match.group('name')
-            if trial_test_name != None and len(trial_test_name.strip()) > 0:
-                current_test_name = trial_test_name.strip()
-            # end if
-            test_case_names.append(current_test_name)
-            if verbosity > 1:
-                sys.stdout.write("Found test case #%s at line %s named '%s'.\n" % \
-                                 (current_test_count, line_count, current_test_name))
-            # end if
-
-            # Check if we've seen a test with this name before.
-            if test_cases.has_key(current_test_name):
-                input_file.close()
-                sys.stdout.write("\nERROR: test with duplicate name '%s' found at line %s. Exiting.\n" % \
-                                 (current_test_name, line_count))
-                sys.exit(1)
-            # end if
-
-            # Check if this test case is expected to fail.
-            if test_case_match.group('negated') != None:
-                negated = True
-            # end if
 
-            # Store some useful properties in the test case dictionary under the current test name as a key.
-            test_cases[current_test_name] = {}
-            test_cases[current_test_name]['index'] = current_test_count
-            test_cases[current_test_name]['line'] = line_count
-            test_cases[current_test_name]['negated'] = negated
-
-            # Set some blank initial text for this test.
-            test_cases[current_test_name]['text'] = ""
-
-            # Flag that we're in a test.
-            in_test = True
-            in_non_test_matter = False
-        elif begin_test_section.match(line) != None:
-            # We have a beginning of test section marker.
-            # Flag that we're no longer in non-test matter, and this is a disposable line.
-            if verbosity > 1:
-                sys.stdout.write("Found beginning of test section at line %s.\n" % line_count)
-            # end if
-            in_non_test_matter = False
-            disposable_line = True
-        elif end_test_section.match(line) != None:
-            # We have an end of test section marker.
-            # Flag that we're no longer in a test, and back in non-test matter.
-            if verbosity > 1:
-                sys.stdout.write("Found end of test section at line %s.\n" % line_count)
-            # end if
-            in_non_test_matter = True
-            in_test = False
-            disposable_line = True
+def get_formula_symbols(statement = []):
+    """ Returns the set of symbols (i.e. the names of the constants, functions and predicates) in the formula of
+        the given statement (as a list of tokens), if it's an annotated formula, or None. Its name, role and
+        annotations are left out, as are variables (which start with a capital letter) and defined symbols (which
+        start with a '$', e.g. '$true').
+    """
+    if get_statement_name(statement) == None:
+        return None
+    # end if
+    symbols = set()
+    depth = 1
+    for token in statement[6:]:
+        if token in ('(', '['):
+            depth += 1
+        elif token in (')', ']'):
+            depth -= 1
         # end if
-
-        # Dispatch the text of this line depending on what flags are currently set.
-        if not disposable_line:
-            # This is a non-disposable line.
-            # If we're in a test, add the current line to the text for the test.
-            if in_test:
-                test_cases[current_test_name]['text'] = test_cases[current_test_name]['text'] + line
-            else:
-                # If we're not in a test, we may be in non-test matter.
-                # Otherwise, we're in the disposable sections between the beginning of a test section and
-                # the first test. Just ignore this.
-                if in_non_test_matter:
-                    # We're in non-test matter, so just add the line to the non-test matter we have.
-                    non_test_matter = non_test_matter + line
-                # end if
-            # end if
+        if depth == 0 or (depth == 1 and token == ','):
+            # This is the end of the formula.
+            break
+        # end if
+        if token[0].islower() or token[0] == "'":
+            symbols.add(token)
         # end if
     # end for
+    return symbols
+# end def
+
 
-    # Return the non-test matter, the test case names, and the test cases we're collated.
-    return (non_test_matter, test_case_names, test_cases)
+def get_formulas(text = ""):
+    """ Returns the annotated formulas in the given text, each as a tuple of its start and end in the text, and the
+        set of its symbols (see get_formula_symbols). Anything else (e.g. include directives) is left out.
+    """
+    formulas = []
+    for (start, end, statement) in split_statement_spans(text):
+        symbols = get_formula_symbols(statement)
+        if symbols != None:
+            formulas.append((start, end, symbols))
+        # end if
+    # end for
+    return formulas
 # end def
 
 
@@ -488,15 +2022,34 @@ def main(argv):
     """ Handles command-line input and dispatches it to the test suite runner.
     """
     # Set defaults for the command line arguments to read in.
+    clausify = False
+    clear_cache = False
+    dedupe = True
+    lemmas = False
+    selection_depth = 0
     dry_run = False
+    escalation_budget = 0
+    escalation_tiers = []
     input_filename = ""
+    benchmark = False
+    jobs = default_jobs
+    memory_budget = default_memory_budget
+    memory_limit = default_memory_limit
+    json_filename = ""
+    junit_filename = ""
     prover = default_prover
+    stream = False
+    pipeline = False
+    shard = None
     tests_to_run = []
+    timeout = 0
+    threshold = default_regression_threshold
+    use_cache = True
     verbosity = 0
 
     # Try to parse the given command-line options.
     try:
-        options, args = getopt.getopt(sys.argv[1:], 'np:v', ['dry-run','prover=','verbose'])
+        options, args = getopt.getopt(sys.argv[1:], 'j:np:t:v', ['benchmark','clausify','clear-cache','jobs=','json=','junit=','lemmas','memory-budget=','memory-limit=','dry-run','escalate=','escalation-budget=','no-cache','no-dedupe','pipeline','select-axioms=','shard=','portfolio','stream','threshold=','timeout=','prover=','verbose'])
     except getopt.GetoptError:
         # The given options are incorrect.
         usage()
@@ -506,6 +2059,34 @@ def main(argv):
 
     # Interpret the parsed command-line options.
     for opt, arg in options:
+        # Did we get the --benchmark option?
+        if opt == '--benchmark':
+            # Yes. Record the run in the benchmark database, running every test case through the prover.
+            benchmark = True
+            use_cache = False
+        # end if
+
+        # Did we get the --clear-cache option?
+        if opt == '--clear-cache':
+            # Yes. Empty the result cache before the run.
+            clear_cache = True
+        # end if
+
+        # Did we get the -j/--jobs option?
+        if opt in ('-j', '--jobs'):
+            # Yes. Change the number of test cases to run at once accordingly.
+            try:
+                jobs = int(arg)
+            except ValueError:
+                jobs = 0
+            # end try
+            if jobs < 1:
+                usage()
+                sys.stdout.write("\nERROR: Invalid number of jobs '" + arg + "' given. This must be a positive whole number. Exiting.\n")
+                sys.exit(2)
+            # end if
+        # end if
+
         # Did we get the -n/--dry-run option?
         if opt in ('-n', '--dry-run'):
             # Yes. Set this accordingly.
@@ -516,11 +2097,167 @@ def main(argv):
         if opt in ('-p', '--prover'):
             # Yes. Change the prover to be used accordingly.
             arg = arg.lower();
-            if arg in ('eprover', 'z3'):
+            if arg in ('eprover', 'z3', 'sat'):
                 prover = arg
             else:
                 usage()
-                sys.stdout.write("\nERROR: Invalid prover name '" + arg + "' given. Only 'eprover' and 'z3' are currently supported. Exiting.\n")
+                sys.stdout.write("\nERROR: Invalid prover name '" + arg + "' given. Only 'eprover', 'z3' and 'sat' are currently supported. Exiting.\n")
+                sys.exit(2)
+            # end if
+        # end if
+
+        # Did we get the --escalate option?
+        if opt == '--escalate':
+            # Yes. Run the inconclusive test cases again at each of the given tiers of limits.
+            escalation_tiers = parse_escalation_tiers(arg)
+            if escalation_tiers == None:
+                usage()
+                sys.stdout.write("\nERROR: Invalid escalation tiers '" + arg + "' given. These must be rising numbers of seconds, each optionally followed by a colon and a number of megabytes, separated by commas. Exiting.\n")
+                sys.exit(2)
+            # end if
+        # end if
+
+        # Did we get the --escalation-budget option?
+        if opt == '--escalation-budget':
+            # Yes. Limit the time spent running inconclusive test cases again accordingly.
+            try:
+                escalation_budget = float(arg)
+            except ValueError:
+                escalation_budget = -1
+            # end try
+            if escalation_budget <= 0:
+                usage()
+                sys.stdout.write("\nERROR: Invalid escalation budget '" + arg + "' given. This must be a positive number of seconds. Exiting.\n")
+                sys.exit(2)
+            # end if
+        # end if
+
+        # Did we get the --json option?
+        if opt == '--json':
+            # Yes. Write a report on each test case to the given JSON lines file.
+            json_filename = arg
+        # end if
+
+        # Did we get the --junit option?
+        if opt == '--junit':
+            # Yes. Write a report on each test case to the given JUnit XML file.
+            junit_filename = arg
+        # end if
+
+        # Did we get the --memory-budget or --memory-limit option?
+        if opt in ('--memory-budget', '--memory-limit'):
+            # Yes. Change the memory budget of the provers running at once, or the memory limit of each, accordingly.
+            try:
+                megabytes = int(arg)
+            except ValueError:
+                megabytes = -1
+            # end try
+            if megabytes < 0:
+                usage()
+                sys.stdout.write("\nERROR: Invalid " + opt + " '" + arg + "' given. This must be a whole number of megabytes (or 0 for none). Exiting.\n")
+                sys.exit(2)
+            # end if
+            if opt == '--memory-budget':
+                memory_budget = megabytes
+            else:
+                memory_limit = megabytes
+            # end if
+        # end if
+
+        # Did we get the --no-cache option?
+        if opt == '--no-cache':
+            # Yes. Run every test case through the prover, without using the result cache.
+            use_cache = False
+        # end if
+
+        # Did we get the --select-axioms option?
+        if opt == '--select-axioms':
+            # Yes. Run each test case against the axioms selected for it to the given depth first.
+            try:
+                selection_depth = int(arg)
+            except ValueError:
+                selection_depth = 0
+            # end try
+            if selection_depth < 1:
+                usage()
+                sys.stdout.write("\nERROR: Invalid --select-axioms depth '" + arg + "' given. This must be a positive whole number of rounds of selection. Exiting.\n")
+                sys.exit(2)
+            # end if
+        # end if
+
+        # Did we get the --lemmas option?
+        if opt == '--lemmas':
+            # Yes. Prove the lemmas first, and add those proved to the test cases after them.
+            lemmas = True
+        # end if
+
+        # Did we get the --no-dedupe option?
+        if opt == '--no-dedupe':
+            # Yes. Run every test case through the prover, even those with the same problem as an earlier one.
+            dedupe = False
+        # end if
+
+        # Did we get the --pipeline option?
+        if opt == '--pipeline':
+            # Yes. Run each test case as soon as it's split from the input file.
+            pipeline = True
+        # end if
+
+        # Did we get the --clausify option?
+        if opt == '--clausify':
+            # Yes. Clausify the non-test matter once for the whole run.
+            clausify = True
+        # end if
+
+        # Did we get the --portfolio option?
+        if opt == '--portfolio':
+            # Yes. Race the portfolio provers against each other on each test case.
+            prover = 'portfolio'
+        # end if
+
+        # Did we get the --shard option?
+        if opt == '--shard':
+            # Yes. Run the given shard of the test cases.
+            shard = parse_shard(arg)
+            if shard == None:
+                usage()
+                sys.stdout.write("\nERROR: Invalid shard '" + arg + "' given. This must be given as i/n, for the i'th of n shards. Exiting.\n")
+                sys.exit(2)
+            # end if
+        # end if
+
+        # Did we get the --stream option?
+        if opt == '--stream':
+            # Yes. Read the prover output from a pipe, instead of a results file.
+            stream = True
+        # end if
+
+        # Did we get the --threshold option?
+        if opt == '--threshold':
+            # Yes. Change the percentage rise that's flagged as a regression when comparing benchmark runs.
+            try:
+                threshold = float(arg)
+            except ValueError:
+                threshold = -1
+            # end try
+            if threshold < 0:
+                usage()
+                sys.stdout.write("\nERROR: Invalid threshold '" + arg + "' given. This must be a percentage, of 0 or more. Exiting.\n")
+                sys.exit(2)
+            # end if
+        # end if
+
+        # Did we get the -t/--timeout option?
+        if opt in ('-t', '--timeout'):
+            # Yes. Change the time limit for each test case accordingly.
+            try:
+                timeout = float(arg)
+            except ValueError:
+                timeout = -1
+            # end try
+            if timeout <= 0:
+                usage()
+                sys.stdout.write("\nERROR: Invalid timeout '" + arg + "' given. This must be a positive number of seconds. Exiting.\n")
                 sys.exit(2)
             # end if
         # end if
@@ -533,10 +2270,52 @@ def main(argv):
     # end for
 
     if verbosity > 1:
-        sys.stdout.write("Got options: dry-run: %s verbosity level: %s\n" % (dry_run, verbosity))
+        sys.stdout.write("Got options: dry-run: %s verbosity level: %s jobs: %s use cache: %s clear cache: %s stream: %s timeout: %s pipeline: %s clausify: %s shard: %s json: %s junit: %s benchmark: %s threshold: %s memory limit: %s memory budget: %s escalate: %s escalation budget: %s dedupe: %s lemmas: %s select axioms: %s\n" % \
+                         (dry_run, verbosity, jobs, use_cache, clear_cache, stream, timeout, pipeline, clausify, shard,
+                          json_filename, junit_filename, benchmark, threshold, memory_limit, memory_budget,
+                          escalation_tiers, escalation_budget, dedupe, lemmas, selection_depth))
         sys.stdout.write("Got arguments: %s\n" % (args))
     # end if
 
+    # The first escalation tier gives the limits of the run itself.
+    if len(escalation_tiers) > 0:
+        if timeout > 0:
+            usage()
+            sys.stdout.write("\nERROR: --escalate can't be used with -t/--timeout, as its first tier gives the time limit of the run. Exiting.\n")
+            sys.exit(2)
+        # end if
+        (timeout, first_memory_limit) = escalation_tiers[0]
+        if first_memory_limit != None:
+            memory_limit = first_memory_limit
+        # end if
+    # end if
+
+    # Were we asked to merge the results of the shards of a test run?
+    if len(args) >= 1 and args[0] == 'merge':
+        merge_shard_results(args[1:], verbosity)
+        return
+    # end if
+
+    # Were we asked to compare two benchmark runs?
+    if len(args) >= 1 and args[0] == 'compare':
+        compare_benchmark_runs(args[1:], threshold, verbosity = verbosity)
+        return
+    # end if
+
+    # Sharding needs all of the test cases to be split before any are run.
+    if shard != None and pipeline:
+        usage()
+        sys.stdout.write("\nERROR: --shard can't be used with --pipeline, as all of the test cases must be known to share them out. Exiting.\n")
+        sys.exit(2)
+    # end if
+
+    # The lemmas must be proved before the test cases after them are run.
+    if lemmas and pipeline:
+        usage()
+        sys.stdout.write("\nERROR: --lemmas can't be used with --pipeline, as the lemmas must be proved before the test cases after them are run. Exiting.\n")
+        sys.exit(2)
+    # end if
+
     # Do we have enough arguments? (i.e. we need a file name, at least)
     if len(args) >= 1:
         input_filename = args[0]
@@ -550,8 +2329,21 @@ def main(argv):
         sys.exit(2)
     # end if
 
-    # Start the run using the given inputs.
-    run_test_suite(input_filename = input_filename, tests_to_run = tests_to_run, dry_run = dry_run, prover = prover, verbosity = verbosity)
+    # Start the run using the given inputs, clausifying the non-test matter first, if asked to.
+    prepare_test_case_stream = None
+    if clausify:
+        prepare_test_case_stream = clausify_test_case_stream
+    # end if
+    run_as_test_suite.run_test_suite(sys.modules[__name__], input_filename = input_filename,
+                                     tests_to_run = tests_to_run, dry_run = dry_run, verbosity = verbosity, jobs = jobs, use_cache = use_cache,
+                                     clear_cache = clear_cache, stream = stream, timeout = timeout, pipeline = pipeline,
+                                     prover_arguments = {'prover': prover},
+                                     prepare_test_case_stream = prepare_test_case_stream, shard = shard,
+                                     json_filename = json_filename, junit_filename = junit_filename,
+                                     benchmark = benchmark, benchmark_prover = prover + ('', '+clausify')[clausify],
+                                     memory_limit = memory_limit, memory_budget = memory_budget,
+                                     escalation_tiers = escalation_tiers, escalation_budget = escalation_budget,
+                                     dedupe = dedupe, lemmas = lemmas, selection_depth = selection_depth)
 # end def
 
 if __name__ == "__main__":
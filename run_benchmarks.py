@@ -0,0 +1,547 @@
+#!/usr/bin/env python
+"""Usage: python run_benchmarks.py [-s <sizes>|--sizes=<sizes>] [<benchmarks to run>]*
+
+Runs benchmarks of the test runners and the Python implementation in this repository, displaying how long each
+takes at each of a number of problem sizes.
+
+Usage examples:
+
+   Run all the benchmarks:
+
+       python run_benchmarks.py
+
+
+   Run the benchmark of the test runners' input splitters, for 1000, 10000 and 100000 test cases:
+
+       python run_benchmarks.py --sizes=1000,10000,100000 split
+
+
+   Run the benchmark of clausifying the non-test matter once, for theories with 10, 100 and 1000 axioms:
+
+       python run_benchmarks.py --sizes=10,100,1000 clausify
+
+
+   Run the benchmark of proving the lemmas in the existing test suites first, and adding them to later test cases:
+
+       python run_benchmarks.py lemmas
+
+
+   Run the benchmark of the built-in SAT prover's latency per test case, against the E prover's and Z3's:
+
+       python run_benchmarks.py sat
+
+
+   Run the benchmark of deciding ethical actions in batches, for 10^6 and 10^7 actions:
+
+       python run_benchmarks.py --sizes=1000000,10000000 batch
+
+
+   Run the benchmark of the memory taken per consent fact, for 10^4, 10^5 and 10^6 facts:
+
+       python run_benchmarks.py --sizes=10000,100000,1000000 memory
+
+
+   Run the benchmark of the memory taken by a million mostly-idle people:
+
+       python run_benchmarks.py --sizes=1000000 people
+
+
+Benchmarks:
+
+ - 'split'                               times run_as_test_suite.split_input (the splitter of both test runners) on
+                                         generated TPTP and Prover 9 theory files with the given numbers of test
+                                         cases, showing the time taken per test case, which should stay flat as the
+                                         number of test cases grows.
+ - 'clausify'                            times the E prover on the test cases of generated theory files with the
+                                         given numbers of axioms, with the non-test matter as it is, and clausified
+                                         once beforehand (as by run_as_tptp_test_suite.py --clausify), showing the
+                                         time taken per test case each way. (This needs the E prover installed.)
+ - 'lemmas'                              runs the existing test suites (naive_consent_theory.tptp through the E
+                                         prover, and naive_consent_theory.in through Prover 9) with and without
+                                         proving their lemmas first, and adding them to the test cases after them
+                                         (as by --lemmas), showing the total wall time, prover CPU time, and search
+                                         effort (the provers' search statistics, summed over the test cases) each
+                                         way. (This needs the provers installed; the sizes given don't apply.)
+ - 'sat'                                 runs each test case of naive_consent_theory.tptp through the built-in SAT
+                                         prover (as by run_as_tptp_test_suite.py -p sat), the E prover and Z3, in
+                                         turn, showing the mean, median and longest latency per test case for each,
+                                         and how many of the test cases each agrees with the SAT prover on. (The E
+                                         prover and Z3 are skipped unless installed; the sizes given don't apply.)
+ - 'batch'                               decides the given numbers of random actions between 100 people (with
+                                         random consent facts between them) with naive_consent_theory.py's
+                                         is_ethical_action, one at a time, and with are_ethical_actions, all at once
+                                         (after gathering the consent state into columns), showing the throughput
+                                         each way, and how many of the decisions agree. (This needs NumPy installed.)
+ - 'memory'                              records the given numbers of random consent facts (between a tenth as many
+                                         people, about 100 actions) in naive_consent_theory.py's Person objects, and
+                                         in a ConsentLedger, showing the bytes taken per fact each way (counting the
+                                         objects each refers to, including the people's and actions' names).
+ - 'people'                              makes the given numbers of naive_consent_theory.py's Person objects, and
+                                         of its SlottedPerson objects, each in a new Python process, with one in ten
+                                         of them doing one action, showing how much each process's peak resident
+                                         memory grew by, in total and per person.
+"""
+
+import getopt
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+default_sizes = [1000, 10000, 100000]
+
+
+def usage():
+    """ Displays the usage information for this program. """
+    sys.stdout.write("Usage: python run_benchmarks.py [-s <comma-separated problem sizes>|--sizes=<sizes>] ")
+    sys.stdout.write("[<benchmark to run>]\n")
+# end def
+
+
+def generate_theory_file(test_case_count = 1000, tptp = True, axiom_count = 0):
+    """ Writes a theory file with the given number of test cases (in TPTP format, or otherwise Prover 9's) into a
+        temporary file, modelled on naive_consent_theory.tptp and naive_consent_theory.in, returning its name.
+        The given number of further (TPTP) axioms are generated alongside the definition of an ethical action.
+    """
+    if tptp:
+        suffix = '.tptp'
+        axioms = "fof(ethical_action_definition, axiom,\n    ! [A, B, X]: (ethical(A, B, X) <=> (A = B))\n).\n"
+        for index in range(axiom_count):
+            axioms += "fof(generated_axiom_%s, axiom,\n    ! [A, B, X]: ((generated_%s(A, B, X) & consents(B, A, X)) =>\n" \
+                      "                   ? [Y]: (generated_%s(B, Y, X) | ethical(A, B, X)))\n).\n" % \
+                      (index, index, index + 1)
+        # end for
+        goal = "fof(%s, conjecture,\n    (\n     (\n      ask_for_consent(alex, bo, action) &\n" + \
+               "      consents(bo, alex, action) &\n      alex != bo\n     ) =>\n     ethical(alex, bo, action)\n    )\n).\n"
+    else:
+        suffix = '.in'
+        axioms = "formulas(usable).\n(ethical(A, B, X) <-> (A = B)) # label(ethical_action_definition).\nend_of_list.\n"
+        goal = "formulas(goals).\n(\n (\n  ask_for_consent(alex, bo, action) &\n  consents(bo, alex, action) &\n" + \
+               "  alex != bo\n ) ->\n ethical(alex, bo, action)\n)\n# answer(%s).\nend_of_list.\n"
+    # end if
+
+    (handle, theory_filename) = tempfile.mkstemp(prefix = 'run_benchmarks_theory', suffix = suffix)
+    theory_file = os.fdopen(handle, 'w')
+    theory_file.write("% Generated theory for benchmarking.\n\n" + axioms + "\n% Test runner: begin tests.\n\n")
+    for index in range(test_case_count):
+        name = "generated_test_case_%s" % index
+        if index % 2 == 0:
+            theory_file.write("% Test case: " + name + "\n%\n% A generated test case.\n\n")
+        else:
+            theory_file.write("% Negated test case: " + name + "\n%\n% A generated negated test case.\n\n")
+        # end if
+        theory_file.write((goal % name) + "\n")
+    # end for
+    theory_file.write("%\n% Test runner: end tests.\n%\n")
+    theory_file.close()
+    return theory_filename
+# end def
+
+
+def benchmark_split(sizes = default_sizes):
+    """ Times the test runners' input splitter on generated TPTP and Prover 9 theory files of the given sizes (in
+        test cases).
+    """
+    import run_as_test_suite
+
+    sys.stdout.write("%-10s %12s %14s %14s %18s\n" % ("Input", "Test cases", "File size (kB)", "Time (s)",
+                                                       "Per test case (us)"))
+    for (input_name, tptp) in [('TPTP', True), ('Prover 9', False)]:
+        for size in sizes:
+            theory_filename = generate_theory_file(size, tptp)
+            start_time = time.time()
+            non_test_matter, test_case_names, test_cases = run_as_test_suite.split_input(theory_filename)
+            elapsed_time = time.time() - start_time
+            sys.stdout.write("%-10s %12s %14.0f %14.3f %18.2f\n" % \
+                             (input_name, len(test_case_names), os.path.getsize(theory_filename) / 1024.0,
+                              elapsed_time, elapsed_time * 1000000.0 / max(len(test_case_names), 1)))
+            os.remove(theory_filename)
+        # end for
+    # end for
+# end def
+
+
+def benchmark_clausify(sizes = default_sizes, test_case_count = 10):
+    """ Times the E prover on the given number of test cases from generated theory files of the given sizes (in
+        axioms), with and without clausifying their non-test matter once beforehand.
+    """
+    import run_as_test_suite
+    import run_as_tptp_test_suite
+
+    if not os.path.exists(run_as_tptp_test_suite.eprover_bin):
+        sys.stdout.write("Skipped: the E prover isn't installed at %s.\n" % run_as_tptp_test_suite.eprover_bin)
+        return
+    # end if
+
+    sys.stdout.write("%12s %16s %20s %20s\n" % ("Axioms", "Clausify (s)", "Per test case (ms)", "Clausified (ms)"))
+    for size in sizes:
+        theory_filename = generate_theory_file(test_case_count, True, size)
+        non_test_matter, test_case_names, test_cases = run_as_test_suite.split_input(theory_filename)
+
+        # Clausify the non-test matter once, as for a whole run.
+        start_time = time.time()
+        clauses = run_as_tptp_test_suite.clausify_non_test_matter(non_test_matter)
+        clausify_time = time.time() - start_time
+
+        # Run each test case through E against the non-test matter as it is, and then against its clauses.
+        per_test_case_times = []
+        for prover_non_test_matter in [non_test_matter, clauses]:
+            start_time = time.time()
+            for test_case_name in test_case_names:
+                run_as_tptp_test_suite.run_test_case(test_cases[test_case_name], prover_non_test_matter)
+            # end for
+            per_test_case_times.append((time.time() - start_time) * 1000.0 / max(len(test_case_names), 1))
+        # end for
+        sys.stdout.write("%12s %16.3f %20.2f %20.2f\n" % (size, clausify_time, per_test_case_times[0], per_test_case_times[1]))
+        os.remove(theory_filename)
+    # end for
+# end def
+
+
+def benchmark_lemmas(sizes = default_sizes):
+    """ Times the test runners on the existing test suites, with and without proving their lemmas first and adding
+        them to the test cases after them, totalling the prover CPU time and search statistics from the test
+        runners' JSON reports. (The given sizes don't apply, as the test suites are as they are.)
+    """
+    import run_as_prover9_test_suite
+    import run_as_tptp_test_suite
+
+    directory = os.path.dirname(os.path.abspath(__file__))
+    suites = [('naive_consent_theory.tptp', 'run_as_tptp_test_suite.py', run_as_tptp_test_suite.eprover_bin),
+              ('naive_consent_theory.in', 'run_as_prover9_test_suite.py', run_as_prover9_test_suite.prover9_bin)]
+    sys.stdout.write("%-28s %-8s %14s %16s  %s\n" % ("Test suite", "Lemmas", "Wall time (s)", "Prover CPU (s)", "Search effort"))
+    for (suite_filename, runner_filename, prover_bin) in suites:
+        if not os.path.exists(prover_bin):
+            sys.stdout.write("%-28s Skipped: the prover isn't installed at %s.\n" % (suite_filename, prover_bin))
+            continue
+        # end if
+        for lemmas in [False, True]:
+            # Run the test suite without the result cache (so every test case is run), reporting on it as JSON lines.
+            (handle, report_filename) = tempfile.mkstemp(prefix = 'run_benchmarks_report', suffix = '.jsonl')
+            os.close(handle)
+            command = [sys.executable, os.path.join(directory, runner_filename), '--no-cache', '--json=' + report_filename]
+            if lemmas:
+                command.append('--lemmas')
+            # end if
+            command.append(os.path.join(directory, suite_filename))
+            devnull = open(os.devnull, 'w')
+            start_time = time.time()
+            subprocess.call(command, stdout = devnull)
+            elapsed_time = time.time() - start_time
+            devnull.close()
+
+            # Total the prover CPU time and search statistics of the test cases.
+            cpu_time = 0.0
+            effort = {}
+            report_file = open(report_filename, 'r')
+            for line in report_file:
+                report = json.loads(line)
+                cpu_time += report['cpu_time'] or 0.0
+                for (name, value) in report['statistics'].items():
+                    effort[name] = effort.get(name, 0) + value
+                # end for
+            # end for
+            report_file.close()
+            os.remove(report_filename)
+            sys.stdout.write("%-28s %-8s %14.3f %16.3f  %s\n" % \
+                             (suite_filename, ('no', 'yes')[lemmas], elapsed_time, cpu_time,
+                              ', '.join(["%s %s" % (name, effort[name]) for name in sorted(effort.keys())])))
+        # end for
+    # end for
+# end def
+
+
+def benchmark_sat(sizes = default_sizes):
+    """ Times the built-in SAT prover, the E prover and Z3 on each test case of naive_consent_theory.tptp, one at a
+        time and without the result cache, showing the latency per test case for each, and how many test cases each
+        agrees with the SAT prover on. (The given sizes don't apply, as the test suite is as it is.)
+    """
+    import run_as_test_suite
+    import run_as_tptp_test_suite
+
+    directory = os.path.dirname(os.path.abspath(__file__))
+    non_test_matter, test_case_names, test_cases = \
+        run_as_test_suite.split_input(os.path.join(directory, 'naive_consent_theory.tptp'))
+    sys.stdout.write("%-10s %12s %16s %18s %18s %14s\n" % ("Prover", "Test cases", "Mean (ms)", "Median (ms)", "Longest (ms)",
+                                                           "Agree with SAT"))
+    sat_statuses = {}
+    for (prover, prover_bin) in [('sat', None), ('eprover', run_as_tptp_test_suite.eprover_bin),
+                                 ('z3', run_as_tptp_test_suite.z3_bin)]:
+        if prover_bin != None and not os.path.exists(prover_bin):
+            sys.stdout.write("%-10s Skipped: the prover isn't installed at %s.\n" % (prover, prover_bin))
+            continue
+        # end if
+        latencies = []
+        agreements = 0
+        for test_case_name in test_case_names:
+            start_time = time.time()
+            status = run_as_tptp_test_suite.run_test_case(test_cases[test_case_name], non_test_matter, prover = prover)
+            latencies.append((time.time() - start_time) * 1000.0)
+            if prover == 'sat':
+                sat_statuses[test_case_name] = status
+            # end if
+            if status == sat_statuses[test_case_name]:
+                agreements += 1
+            # end if
+        # end for
+        latencies.sort()
+        sys.stdout.write("%-10s %12s %16.2f %18.2f %18.2f %14s\n" % \
+                         (prover, len(latencies), sum(latencies) / max(len(latencies), 1),
+                          latencies[len(latencies) / 2], latencies[-1], agreements))
+    # end for
+# end def
+
+
+def benchmark_batch(sizes = default_sizes, person_count = 100, action_count = 10, fact_count = 30000):
+    """ Times deciding the given numbers of random actions (among the given numbers of people and actions, with the
+        given number of random facts of each kind between them) with naive_consent_theory.is_ethical_action, one at a
+        time, and with naive_consent_theory.are_ethical_actions, all at once, showing the throughput of each.
+    """
+    import naive_consent_theory
+
+    if naive_consent_theory.numpy is None:
+        sys.stdout.write("Skipped: NumPy isn't installed.\n")
+        return
+    # end if
+    numpy = naive_consent_theory.numpy
+    random_state = numpy.random.RandomState(0)
+
+    # Make up the people, and the facts between them.
+    people = [naive_consent_theory.Person("person %s" % index) for index in range(person_count)]
+    actions = ["action %s" % index for index in range(action_count)]
+    for fact in ['asked', 'consents', 'did']:
+        for (actor_id, target_id, action_id) in random_state.randint(0, [person_count, person_count, action_count],
+                                                                     size = (fact_count, 3)).tolist():
+            actor = people[actor_id]
+            target = people[target_id]
+            if fact == 'asked':
+                target.consent_requested_by(actor.name, actions[action_id])
+            elif fact == 'consents':
+                target.give_consent(actor.name, actions[action_id])
+            else:
+                actor.do(target.name, actions[action_id])
+            # end if
+        # end for
+    # end for
+
+    sys.stdout.write("%12s %12s %12s %12s %16s %16s %10s %12s\n" % ("Actions", "Single (s)", "Columns (s)", "Batch (s)",
+                                                                   "Single (per s)", "Batch (per s)", "Speedup",
+                                                                   "Agree"))
+    for size in sizes:
+        actors = random_state.randint(0, person_count, size)
+        targets = random_state.randint(0, person_count, size)
+        action_ids = random_state.randint(0, action_count, size)
+
+        # Decide the actions one at a time.
+        start_time = time.time()
+        single_decisions = [naive_consent_theory.is_ethical_action(people[actor_id], people[target_id],
+                                                                   actions[action_id])
+                            for (actor_id, target_id, action_id) in zip(actors.tolist(), targets.tolist(),
+                                                                        action_ids.tolist())]
+        single_time = time.time() - start_time
+
+        # Decide them all at once, gathering the consent state into columns first.
+        start_time = time.time()
+        columns = naive_consent_theory.get_consent_columns(people, actions)
+        columns_time = time.time() - start_time
+        start_time = time.time()
+        batch_decisions = naive_consent_theory.are_ethical_actions(columns, actors, targets, action_ids)
+        batch_time = time.time() - start_time
+
+        agreements = int(numpy.sum(batch_decisions == numpy.array(single_decisions, dtype = bool)))
+        sys.stdout.write("%12s %12.3f %12.3f %12.3f %16.0f %16.0f %9.1fx %12s\n" % \
+                         (size, single_time, columns_time, batch_time, size / max(single_time, 1e-9),
+                          size / max(columns_time + batch_time, 1e-9),
+                          single_time / max(columns_time + batch_time, 1e-9), agreements))
+    # end for
+# end def
+
+
+def get_deep_size(value):
+    """ Returns the size in bytes of the given value, and of every object it refers to (through containers, arrays,
+        and the attributes of instances), counting each object once, and leaving out classes and modules.
+    """
+    seen = set()
+    size = 0
+    values = [value]
+    while len(values) > 0:
+        value = values.pop()
+        if id(value) in seen or isinstance(value, type) or type(value) == type(sys):
+            continue
+        # end if
+        seen.add(id(value))
+        size += sys.getsizeof(value)
+        if isinstance(value, dict):
+            values.extend(value.keys())
+            values.extend(value.values())
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            values.extend(value)
+        # end if
+        if hasattr(value, '__dict__'):
+            values.append(value.__dict__)
+        # end if
+        for slot in getattr(type(value), '__slots__', []):
+            if hasattr(value, slot):
+                values.append(getattr(value, slot))
+            # end if
+        # end for
+    # end while
+    return size
+# end def
+
+
+def benchmark_memory(sizes = default_sizes, action_count = 100):
+    """ Records the given numbers of random consent facts (between a tenth as many people, and the given number of
+        actions) in naive_consent_theory.Person objects, and in a naive_consent_theory.ConsentLedger, showing the
+        bytes taken per fact each way. The names in each fact are made afresh, as they would be read from input.
+    """
+    import random
+    import naive_consent_theory
+
+    sys.stdout.write("%12s %12s %20s %20s %10s\n" % ("Facts", "People", "Person (bytes/fact)",
+                                                    "Ledger (bytes/fact)", "Saving"))
+    for size in sizes:
+        person_count = max(size // 10, 2)
+        random_state = random.Random(0)
+        facts = [(random_state.randrange(3), random_state.randrange(person_count),
+                  random_state.randrange(person_count), random_state.randrange(action_count))
+                 for index in range(size)]
+
+        # Record the facts in Person objects, and in a ledger, each with their own copies of the names.
+        sizes_per_fact = []
+        for model in ['person', 'ledger']:
+            if model == 'person':
+                people = [naive_consent_theory.Person("person %s" % index) for index in range(person_count)]
+                get_person = lambda person_id: people[person_id]
+                recorded = people
+            else:
+                ledger = naive_consent_theory.ConsentLedger()
+                get_person = lambda person_id: ledger.person("person %s" % person_id)
+                recorded = ledger
+            # end if
+            for (kind, person_id, other_id, action_id) in facts:
+                person = get_person(person_id)
+                if kind == 0:
+                    person.consent_requested_by("person %s" % other_id, "action %s" % action_id)
+                elif kind == 1:
+                    person.give_consent("person %s" % other_id, "action %s" % action_id)
+                else:
+                    person.do("person %s" % other_id, "action %s" % action_id)
+                # end if
+            # end for
+            sizes_per_fact.append(get_deep_size(recorded) / float(size))
+        # end for
+        sys.stdout.write("%12s %12s %20.1f %20.1f %9.1fx\n" % \
+                         (size, person_count, sizes_per_fact[0], sizes_per_fact[1],
+                          sizes_per_fact[0] / sizes_per_fact[1]))
+    # end for
+# end def
+
+
+# The program to measure the memory taken by people with (given the directory of naive_consent_theory.py, the
+# name of the class of people, and how many to make), printing how much the peak resident memory grew by, in kB.
+people_memory_program = """
+import resource
+import sys
+sys.path.insert(0, %r)
+import naive_consent_theory
+
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+people = [getattr(naive_consent_theory, %r)('person %%s' %% index) for index in range(%d)]
+for index in range(0, len(people) - 1, 10):
+    people[index].do(people[index + 1].name, 'action')
+sys.stdout.write('%%s\\n' %% (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before))
+"""
+
+
+def benchmark_people(sizes = default_sizes):
+    """ Makes the given numbers of naive_consent_theory.Person objects, and of naive_consent_theory.SlottedPerson
+        objects, each in a new Python process, with one in ten of them doing one action, showing how much each
+        process's peak resident memory grew by.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    sys.stdout.write("%12s %18s %22s %18s %22s %10s\n" % ("People", "Person (MB)", "Person (bytes each)",
+                                                         "Slotted (MB)", "Slotted (bytes each)", "Saving"))
+    for size in sizes:
+        growths = []
+        for class_name in ['Person', 'SlottedPerson']:
+            output = subprocess.check_output([sys.executable, '-c',
+                                              people_memory_program % (directory, class_name, size)])
+            growths.append(int(output.strip()) * 1024.0)
+        # end for
+        sys.stdout.write("%12s %18.1f %22.1f %18.1f %22.1f %9.1fx\n" % \
+                         (size, growths[0] / 1048576.0, growths[0] / size, growths[1] / 1048576.0,
+                          growths[1] / size, growths[0] / max(growths[1], 1.0)))
+    # end for
+# end def
+
+
+benchmarks = [('split', benchmark_split), ('clausify', benchmark_clausify), ('lemmas', benchmark_lemmas),
+              ('sat', benchmark_sat), ('batch', benchmark_batch), ('memory', benchmark_memory),
+              ('people', benchmark_people)]
+
+
+def main(argv):
+    """ Handles command-line input and runs the requested benchmarks.
+    """
+    # Set defaults for the command line arguments to read in.
+    benchmarks_to_run = []
+    sizes = default_sizes
+
+    # Try to parse the given command-line options.
+    try:
+        options, args = getopt.getopt(argv, 's:', ['sizes='])
+    except getopt.GetoptError:
+        # The given options are incorrect.
+        usage()
+        sys.stdout.write("\nERROR: Invalid command line options given. Exiting.\n")
+        sys.exit(2)
+    # end try
+
+    # Interpret the parsed command-line options.
+    for opt, arg in options:
+        # Did we get the -s/--sizes option?
+        if opt in ('-s', '--sizes'):
+            # Yes. Change the problem sizes accordingly.
+            try:
+                sizes = [int(size) for size in arg.split(',')]
+            except ValueError:
+                usage()
+                sys.stdout.write("\nERROR: Invalid sizes '" + arg + "' given. Exiting.\n")
+                sys.exit(2)
+            # end try
+        # end if
+    # end for
+
+    # Check the names of the benchmarks to run, if any were given; otherwise, run them all.
+    benchmark_names = [name for (name, benchmark) in benchmarks]
+    for name in args:
+        if name not in benchmark_names:
+            usage()
+            sys.stdout.write("\nERROR: Unknown benchmark '%s' given. Benchmarks available: %s. Exiting.\n" % \
+                             (name, ', '.join(benchmark_names)))
+            sys.exit(2)
+        # end if
+    # end for
+    if len(args) > 0:
+        benchmarks_to_run = args
+    else:
+        benchmarks_to_run = benchmark_names
+    # end if
+
+    # Run the benchmarks.
+    for (name, benchmark) in benchmarks:
+        if name in benchmarks_to_run:
+            sys.stdout.write("Benchmark '%s':\n\n" % name)
+            benchmark(sizes)
+            sys.stdout.write("\n")
+        # end if
+    # end for
+# end def
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
+# end if
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+#
+# Tests of the compiler of the definition of an ethical action (compile_consent_theory.py).
+#
+# Run them with:
+#
+#     python test_compile_consent_theory.py
+
+import os
+import unittest
+
+import compile_consent_theory
+from naive_consent_theory_kernel import ETHICAL_ACTION_TABLE
+
+theory_directory = os.path.dirname(os.path.abspath(__file__))
+
+
+class KernelTest(unittest.TestCase):
+    """ Checks that the decision table in naive_consent_theory_kernel.py is up to date with the definitions of an
+        ethical action in both of the theory files.
+    """
+
+    def test_tptp_definition_compiles_to_the_kernel_table(self):
+        table = compile_consent_theory.compile_theory_file(os.path.join(theory_directory, 'naive_consent_theory.tptp'))
+        self.assertEqual(table, ETHICAL_ACTION_TABLE)
+    # end def
+
+    def test_prover9_definition_compiles_to_the_kernel_table(self):
+        table = compile_consent_theory.compile_theory_file(os.path.join(theory_directory, 'naive_consent_theory.in'))
+        self.assertEqual(table, ETHICAL_ACTION_TABLE)
+    # end def
+# end class
+
+
+class DefinitionTest(unittest.TestCase):
+    """ Checks the compiling of small definitions, and the errors given for those that can't be compiled. """
+
+    def tptp_definition(self, label, variables, formula):
+        return "fof(%s, axiom, ! [%s]: (ethical(%s) <=> %s))." % (label, variables, variables, formula)
+    # end def
+
+    def assertCompileError(self, text, message):
+        try:
+            compile_consent_theory.compile_definition(text)
+        except ValueError as e:
+            self.assertTrue(message in str(e), "'%s' isn't in the error '%s'." % (message, e))
+            return
+        # end try
+        self.fail("The definition compiled, but shouldn't have.")
+    # end def
+
+    def test_prover9_definition_compiles(self):
+        # (Ethical only when done to themself, i.e. the highest bit of the index.)
+        text = "formulas(usable).\n" + \
+               "ethical(A, B, X) <-> (A = B) # label(ethical_action_definition).\n" + \
+               "end_of_list.\n"
+        self.assertEqual(compile_consent_theory.compile_definition(text, tptp = False),
+                         tuple([index >= 8 for index in range(16)]))
+    # end def
+
+    def test_tptp_definition_compiles(self):
+        # (Ethical only when asked for consent, and given it, i.e. the lowest two bits of the index.)
+        text = self.tptp_definition('ethical_action_definition', "A, B, X",
+                                    "(ask_for_consent(A, B, X) & consents(B, A, X))")
+        self.assertEqual(compile_consent_theory.compile_definition(text),
+                         tuple([index & 3 == 3 for index in range(16)]))
+    # end def
+
+    def test_missing_definition_is_an_error(self):
+        self.assertCompileError(self.tptp_definition('another_definition', "A, B, X", "do(A, B, X)"),
+                                "No formula labelled ethical_action_definition")
+    # end def
+
+    def test_unclosed_bracket_is_an_error(self):
+        self.assertCompileError("fof(ethical_action_definition, axiom, " + \
+                                "! [A, B, X]: (ethical(A, B, X) <=> do(A, B, X)).",
+                                "Expected ')', but got the end of the formula.")
+    # end def
+
+    def test_missing_connective_is_an_error(self):
+        self.assertCompileError(self.tptp_definition('ethical_action_definition', "A, B, X",
+                                                     "do(A, B, X) do(B, A, X)"),
+                                "Expected ')', but got 'do'.")
+    # end def
+
+    def test_definition_not_an_equivalence_is_an_error(self):
+        self.assertCompileError("fof(ethical_action_definition, axiom, " + \
+                                "! [A, B, X]: (ethical(A, B, X) => do(A, B, X))).",
+                                "The definition isn't of the form")
+    # end def
+
+    def test_defined_atom_with_repeated_variables_is_an_error(self):
+        self.assertCompileError(self.tptp_definition('ethical_action_definition', "A, A, X", "do(A, A, X)"),
+                                "The defined atom's arguments aren't three different variables.")
+    # end def
+
+    def test_quantifier_inside_the_definition_is_an_error(self):
+        self.assertCompileError(self.tptp_definition('ethical_action_definition', "A, B, X", "? [Y]: do(A, Y, X)"),
+                                "Quantifiers inside the definition can't be compiled.")
+    # end def
+
+    def test_atom_that_is_not_an_input_is_an_error(self):
+        self.assertCompileError(self.tptp_definition('ethical_action_definition', "A, B, X", "likes(A, B)"),
+                                "The atom likes(A, B) isn't one of the decision table's inputs.")
+    # end def
+# end class
+
+
+if __name__ == '__main__':
+    # Run the tests in this module.
+    unittest.main()
+# end if
@@ -0,0 +1,1144 @@
+#!/usr/bin/env python
+#
+# Tests of the test runners (run_as_tptp_test_suite.py and run_as_prover9_test_suite.py).
+#
+# Run them with:
+#
+#     python test_runners.py
+
+import os
+import re
+import shutil
+import sqlite3
+import string
+import StringIO
+import sys
+import tempfile
+import time
+import unittest
+
+import run_as_prover9_test_suite
+import run_as_tptp_test_suite
+import run_as_test_suite
+
+theory_directory = os.path.dirname(os.path.abspath(__file__))
+
+
+class CanonicalGoalKeyTest(unittest.TestCase):
+    """ Checks which test cases are taken to be the same problem (and so only one of them is run), by their canonical
+        goal keys.
+    """
+
+    tptp_non_test_matter = "fof(ethical_action_definition, axiom,\n" + \
+                           "    ! [A, B, X]: (ethical(A, B, X) <=> (A = B))\n).\n"
+    prover9_non_test_matter = "formulas(usable).\n" + \
+                              "(ethical(A, B, X) <-> (A = B)) # label(ethical_action_definition).\n" + \
+                              "end_of_list.\n"
+
+    def tptp_key(self, text):
+        return run_as_tptp_test_suite.canonical_goal_key(self.tptp_non_test_matter, {'text': text})
+    # end def
+
+    def prover9_key(self, text):
+        return run_as_prover9_test_suite.canonical_goal_key(self.prover9_non_test_matter, {'text': text})
+    # end def
+
+    def test_tptp_renamed_goals_are_the_same(self):
+        self.assertEqual(self.tptp_key("fof(alex_to_alex, conjecture, ethical(alex, alex, action)).\n"),
+                         self.tptp_key("fof(bo_to_bo, conjecture, ethical(bo, bo, other_action)).\n"))
+    # end def
+
+    def test_tptp_goals_differing_in_role_are_not_the_same(self):
+        self.assertNotEqual(self.tptp_key("fof(alex_to_alex, conjecture, ethical(alex, alex, action)).\n"),
+                            self.tptp_key("fof(alex_to_alex, hypothesis, ethical(alex, alex, action)).\n"))
+    # end def
+
+    def test_tptp_goals_differing_in_statement_keyword_are_not_the_same(self):
+        self.assertNotEqual(self.tptp_key("fof(alex_to_alex, conjecture, ethical(alex, alex, action)).\n"),
+                            self.tptp_key("cnf(alex_to_alex, conjecture, ethical(alex, alex, action)).\n"))
+    # end def
+
+    def test_tptp_goals_using_names_from_included_axioms_are_not_the_same(self):
+        # (An included file is found relative to the current directory.)
+        directory = tempfile.mkdtemp()
+        current_directory = os.getcwd()
+        try:
+            os.chdir(directory)
+            axioms_file = open('axioms.ax', 'w')
+            axioms_file.write("fof(alex_q, axiom, q(alex)).\n")
+            axioms_file.close()
+            non_test_matter = "include('axioms.ax').\n"
+            alex_key = run_as_tptp_test_suite.canonical_goal_key(non_test_matter,
+                                                                 {'text': "fof(goal, conjecture, q(alex)).\n"})
+            bo_key = run_as_tptp_test_suite.canonical_goal_key(non_test_matter,
+                                                               {'text': "fof(goal, conjecture, q(bo)).\n"})
+        finally:
+            os.chdir(current_directory)
+            shutil.rmtree(directory)
+        # end try
+        self.assertNotEqual(alex_key, bo_key)
+    # end def
+
+    def test_tptp_goals_are_not_renamed_when_included_axioms_are_missing(self):
+        non_test_matter = "include('no_such_axioms.ax').\n"
+        self.assertNotEqual(run_as_tptp_test_suite.canonical_goal_key(non_test_matter,
+                                                                      {'text': "fof(goal, conjecture, q(alex)).\n"}),
+                            run_as_tptp_test_suite.canonical_goal_key(non_test_matter,
+                                                                      {'text': "fof(goal, conjecture, q(bo)).\n"}))
+    # end def
+
+    def test_prover9_renamed_goals_are_the_same(self):
+        self.assertEqual(self.prover9_key("formulas(goals).\nethical(alex, alex, action) # answer(alex).\n" + \
+                                          "end_of_list.\n"),
+                         self.prover9_key("formulas(goals).\nethical(bo, bo, other_action) # answer(bo).\n" + \
+                                          "end_of_list.\n"))
+    # end def
+
+    def test_prover9_goals_differing_in_list_are_not_the_same(self):
+        self.assertNotEqual(self.prover9_key("formulas(goals).\nethical(alex, alex, action).\nend_of_list.\n"),
+                            self.prover9_key("formulas(sos).\nethical(alex, alex, action).\nend_of_list.\n"))
+    # end def
+
+    def test_prover9_goals_differing_in_options_are_not_the_same(self):
+        self.assertNotEqual(self.prover9_key("set(auto).\nformulas(goals).\nethical(alex, alex, action).\n" + \
+                                             "end_of_list.\n"),
+                            self.prover9_key("clear(auto).\nformulas(goals).\nethical(alex, alex, action).\n" + \
+                                             "end_of_list.\n"))
+    # end def
+
+    def test_prover9_goals_differing_in_quantifier_are_not_the_same(self):
+        self.assertNotEqual(self.prover9_key("formulas(goals).\n(all Y ethical(Y, Y, action)).\nend_of_list.\n"),
+                            self.prover9_key("formulas(goals).\n(exists Y ethical(Y, Y, action)).\nend_of_list.\n"))
+    # end def
+# end class
+
+
+class ProverCacheKeyTest(unittest.TestCase):
+    """ Checks that cached prover results are only shared between runs of the same prover input, with the same
+        prover argv, under the same limits.
+    """
+
+    def test_cache_keys_differ_by_time_limit(self):
+        for runner in [run_as_tptp_test_suite, run_as_prover9_test_suite]:
+            self.assertNotEqual(runner.prover_cache_key("axioms", "goal", ['prover'], 0, 5),
+                                runner.prover_cache_key("axioms", "goal", ['prover'], 0, 60))
+        # end for
+    # end def
+
+    def test_cache_keys_differ_by_memory_limit(self):
+        for runner in [run_as_tptp_test_suite, run_as_prover9_test_suite]:
+            self.assertNotEqual(runner.prover_cache_key("axioms", "goal", ['prover'], 0, 5),
+                                runner.prover_cache_key("axioms", "goal", ['prover'], 512, 5))
+        # end for
+    # end def
+
+    def test_cache_keys_differ_by_escalated_e_time_limit(self):
+        # (A time limit past E's own CPU limit raises it, changing E's argv.)
+        (prover_bin, short_options, named_file_option) = run_as_tptp_test_suite.prover_command('eprover', 5)
+        (prover_bin, long_options, named_file_option) = run_as_tptp_test_suite.prover_command('eprover', 6000)
+        self.assertNotEqual(short_options, long_options)
+    # end def
+
+    def test_cache_keys_differ_by_included_file_contents(self):
+        # (An included file is found relative to the current directory.)
+        directory = tempfile.mkdtemp()
+        current_directory = os.getcwd()
+        try:
+            os.chdir(directory)
+            non_test_matter = "include('axioms.ax').\n"
+            keys = []
+            for axioms in ["fof(a, axiom, q(alex)).\n", "fof(a, axiom, q(bo)).\n"]:
+                axioms_file = open('axioms.ax', 'w')
+                axioms_file.write(axioms)
+                axioms_file.close()
+                keys.append(run_as_tptp_test_suite.prover_cache_key(non_test_matter, "goal", ['prover'], 0, 5))
+                keys.append(run_as_test_suite.get_non_test_matter_axioms(run_as_tptp_test_suite,
+                                                                         non_test_matter + "% " + axioms)[1])
+            # end for
+        finally:
+            os.chdir(current_directory)
+            shutil.rmtree(directory)
+        # end try
+        self.assertNotEqual(keys[0], keys[2])
+        self.assertNotEqual(keys[1], keys[3])
+    # end def
+
+    def test_cache_keys_of_the_same_run_are_the_same(self):
+        for runner in [run_as_tptp_test_suite, run_as_prover9_test_suite]:
+            self.assertEqual(runner.prover_cache_key("axioms", "goal", ['prover', '-x'], 512, 5),
+                             runner.prover_cache_key("axioms", "goal", ['prover', '-x'], 512, 5))
+        # end for
+    # end def
+# end class
+
+
+class SatProverTest(unittest.TestCase):
+    """ Checks the SAT prover's results, its reading of TPTP names, the problems it gives up on, its time limit, and
+        its cached results.
+    """
+
+    def assertGivesUp(self, non_test_matter, test_case_text, reason):
+        (status, output) = run_as_tptp_test_suite.decide_sat_problem(non_test_matter, test_case_text)
+        self.assertEqual(status, '?')
+        self.assertTrue("SZS status GaveUp" in output)
+        self.assertTrue("doesn't support %s" % reason in output, output)
+    # end def
+
+    def test_proved_conjecture_is_a_theorem(self):
+        (status, output) = run_as_tptp_test_suite.decide_sat_problem("fof(everyone_does, axiom, ! [X]: do(X)).\n",
+                                                                     "fof(goal, conjecture, do(alex)).\n")
+        self.assertEqual(status, 'S')
+        self.assertTrue("SZS status Theorem" in output)
+    # end def
+
+    def test_unproved_conjecture_is_counter_satisfiable_with_a_model(self):
+        (status, output) = run_as_tptp_test_suite.decide_sat_problem("fof(alex_does, axiom, do(alex)).\n",
+                                                                     "fof(goal, conjecture, do(bo)).\n")
+        self.assertEqual(status, 'F')
+        self.assertTrue("SZS status CounterSatisfiable" in output)
+        self.assertTrue("%   do(alex)\n" in output)
+        self.assertFalse("%   do(bo)\n" in output)
+    # end def
+
+    def test_function_symbols_are_given_up_on(self):
+        self.assertGivesUp("", "fof(goal, conjecture, do(f(alex))).\n", "function symbols (e.g. f)")
+    # end def
+
+    def test_existential_quantifier_under_universal_one_is_given_up_on(self):
+        self.assertGivesUp("fof(everyone_has_one, axiom, ! [X]: ? [Y]: has(X, Y)).\n",
+                           "fof(goal, conjecture, has(alex, bo)).\n",
+                           "an existential quantifier within the scope of a universal one")
+    # end def
+
+    def test_numbers_are_given_up_on(self):
+        self.assertGivesUp("", "fof(goal, conjecture, do(alex, 1)).\n", "numbers or distinct objects (e.g. 1)")
+    # end def
+
+    def test_unsupported_input_raises_its_own_error(self):
+        self.assertRaises(run_as_tptp_test_suite.SatUnsupportedError, run_as_tptp_test_suite.parse_sat_problem,
+                          "fof(goal, conjecture, do(f(alex))).\n")
+    # end def
+
+    def test_other_errors_are_not_given_up_on(self):
+        # (Only unsupported input is given up on; any other error inside the prover is passed on.)
+        def parse_sat_problem(text = ""):
+            raise NotImplementedError("a method")
+        # end def
+        original_parse_sat_problem = run_as_tptp_test_suite.parse_sat_problem
+        run_as_tptp_test_suite.parse_sat_problem = parse_sat_problem
+        try:
+            self.assertRaises(NotImplementedError, run_as_tptp_test_suite.decide_sat_problem, "",
+                              "fof(goal, conjecture, do(alex)).\n")
+        finally:
+            run_as_tptp_test_suite.parse_sat_problem = original_parse_sat_problem
+        # end try
+    # end def
+
+    def test_include_directives_are_given_up_on(self):
+        self.assertGivesUp("include('axioms.ax').\n", "fof(goal, conjecture, do(alex)).\n", "include statements")
+    # end def
+
+    def test_typed_formulas_are_given_up_on(self):
+        self.assertGivesUp("", "tff(goal, conjecture, do(alex)).\n", "tff statements")
+    # end def
+
+    def test_quoted_lower_words_are_the_same_symbols_as_unquoted_ones(self):
+        (status, output) = run_as_tptp_test_suite.decide_sat_problem("fof(alex_did, axiom, 'do'(alex, 'bo')).\n",
+                                                                     "fof(goal, conjecture, do('alex', bo)).\n")
+        self.assertEqual(status, 'S')
+    # end def
+
+    def test_quoted_other_names_are_not_the_same_symbols_as_unquoted_ones(self):
+        # ('Alex' is a constant, but Alex a variable.)
+        (status, output) = run_as_tptp_test_suite.decide_sat_problem("fof(alex_did, axiom, do('Alex', bo)).\n",
+                                                                     "fof(goal, conjecture, ! [Alex]: do(Alex, bo)).\n")
+        self.assertEqual(status, 'F')
+    # end def
+
+    def test_grounding_stops_at_the_deadline(self):
+        non_test_matter = "fof(everyone_does, axiom, ! [X, Y]: do(X, Y)).\n"
+        test_case_text = "fof(goal, conjecture, do(alex, bo)).\n"
+        (status, output) = run_as_tptp_test_suite.decide_sat_problem(non_test_matter, test_case_text, time.time() - 1)
+        self.assertEqual(status, 'T')
+        # (The grounding cut short isn't kept for the next test case.)
+        (status, output) = run_as_tptp_test_suite.decide_sat_problem(non_test_matter, test_case_text)
+        self.assertEqual(status, 'S')
+    # end def
+
+    def test_solving_stops_at_the_deadline(self):
+        # (Without clauses, each variable is decided in turn, with the deadline checked every 64 decisions.)
+        self.assertEqual(run_as_tptp_test_suite.solve_sat_clauses([], 100, time.time() - 1), None)
+        self.assertEqual(len(run_as_tptp_test_suite.solve_sat_clauses([], 100)), 101)
+    # end def
+
+    def test_test_case_past_its_deadline_times_out_and_is_not_cached(self):
+        directory = tempfile.mkdtemp()
+        try:
+            # (The grounding of the non-test matter over the 30 constants has 27,000 clauses, which can't be done
+            # in the millisecond left before the deadline.)
+            non_test_matter = "fof(some_do, axiom, ! [X, Y, Z]: (do(X, Y) | do(Y, Z) | do(Z, X))).\n"
+            test_case_text = "fof(goal, conjecture, %s).\n" % \
+                             string.join(["do(c%s, c%s)" % (index, index + 1) for index in range(30)], ' & ')
+            cached = []
+            for run in range(2):
+                details = {}
+                status = run_as_tptp_test_suite.run_sat_test_case({'text': test_case_text, 'deadline': time.time() - 1},
+                                                                  non_test_matter, cache_path = directory,
+                                                                  details = details, timeout = 5)
+                self.assertEqual(status, 'T')
+                self.assertTrue(details['timed_out'])
+                cached.append(details['cached'])
+            # end for
+        finally:
+            shutil.rmtree(directory)
+        # end try
+        self.assertEqual(cached, [False, False])
+    # end def
+
+    def test_inconclusive_results_give_the_reason_in_the_excerpt(self):
+        details = {}
+        status = run_as_tptp_test_suite.run_sat_test_case({'text': "fof(goal, conjecture, do(f(alex))).\n"}, "",
+                                                          details = details)
+        self.assertEqual(status, '?')
+        self.assertTrue("function symbols" in details['excerpt'])
+    # end def
+
+    def test_cached_results_are_kept_apart_by_limits(self):
+        directory = tempfile.mkdtemp()
+        try:
+            test_case = {'text': "fof(goal, conjecture, do(f(alex))).\n"}
+            cached = []
+            for (timeout, memory_limit) in [(5, 0), (5, 0), (60, 0), (5, 512)]:
+                details = {}
+                run_as_tptp_test_suite.run_sat_test_case(test_case, "", cache_path = directory, details = details,
+                                                         timeout = timeout, memory_limit = memory_limit)
+                cached.append(details['cached'])
+            # end for
+        finally:
+            shutil.rmtree(directory)
+        # end try
+        self.assertEqual(cached, [False, True, False, False])
+    # end def
+# end class
+
+
+class EscalationTest(unittest.TestCase):
+    """ Checks that escalating the limits of inconclusive test cases keeps their statuses in the order of the test
+        cases.
+    """
+
+    def test_escalated_statuses_are_passed_on_in_order(self):
+        for runner in [run_as_tptp_test_suite, run_as_prover9_test_suite]:
+            test_case_runs = [("test-%s" % index, {'test_case': {}, 'details': {}}) for index in range(4)]
+            # (The inconclusive test cases are settled at the second tier.)
+            escalated_map = lambda function, runs: ['S' for run in runs]
+            statuses = run_as_test_suite.escalate_test_case_runs(runner, enumerate(['S', '?', 'F', 'T']),
+                                                                 test_case_runs, [(5, None), (60, None)], 0, 0,
+                                                                 escalated_map, {})
+            self.assertEqual(list(statuses), [(0, 'S'), (1, 'S'), (2, 'F'), (3, 'S')])
+        # end for
+    # end def
+# end class
+
+
+
+def capture_output(function, *arguments, **keyword_arguments):
+    """ Calls the given function with the given arguments, returning what it wrote to stdout, and the status it exited
+        with, if it did (or else None).
+    """
+    stdout = sys.stdout
+    sys.stdout = StringIO.StringIO()
+    try:
+        function(*arguments, **keyword_arguments)
+        return (sys.stdout.getvalue(), None)
+    except SystemExit, e:
+        return (sys.stdout.getvalue(), e.code)
+    finally:
+        sys.stdout = stdout
+    # end try
+# end def
+
+
+def split_input_line_by_line(input_filename):
+    """ Splits the given input file as the runners did before splitting it in a single pass (see iter_input), line
+        by line, returning the non-test matter, the test case names, and the test cases, with their text. (Lemmas
+        and time limits weren't known then, so the lemmas before the test cases are left out with the other text
+        between the beginning of the tests and the first test case.)
+    """
+    begin_test_section = re.compile('\s*%\s*Test\s*runner\s*:?\s*begin', re.IGNORECASE)
+    test_case = re.compile('\s*%\s*(?P<negated>Negated)?\s*[tT]est\s*case\s*:?\s*(?P<name>.*)\s*$', re.IGNORECASE)
+    end_test_section = re.compile('\s*%\s*Test\s*runner\s*:?\s*end', re.IGNORECASE)
+    in_test = False
+    in_non_test_matter = True
+    non_test_matter = ""
+    test_case_names = []
+    test_cases = {}
+    input_file = open(input_filename, 'r')
+    for (line_count, line) in enumerate(input_file):
+        test_case_match = test_case.match(line)
+        disposable_line = False
+        if test_case_match != None:
+            current_test_name = test_case_match.group('name').strip() or "Test-%s" % (len(test_case_names) + 1)
+            test_case_names.append(current_test_name)
+            test_cases[current_test_name] = {'index': len(test_case_names), 'line': line_count + 1,
+                                             'negated': test_case_match.group('negated') != None, 'text': ""}
+            in_test = True
+            in_non_test_matter = False
+        elif begin_test_section.match(line) != None:
+            in_non_test_matter = False
+            disposable_line = True
+        elif end_test_section.match(line) != None:
+            in_non_test_matter = True
+            in_test = False
+            disposable_line = True
+        # end if
+        if not disposable_line:
+            if in_test:
+                test_cases[current_test_name]['text'] += line
+            elif in_non_test_matter:
+                non_test_matter += line
+            # end if
+        # end if
+    # end for
+    input_file.close()
+    return (non_test_matter, test_case_names, test_cases)
+# end def
+
+
+class SplitInputTest(unittest.TestCase):
+    """ Checks that the input files of both runners are split into the same test cases as they were when split line
+        by line, and the edge cases of splitting.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+    # end def
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    # end def
+
+    def write_input(self, text):
+        input_filename = os.path.join(self.directory, 'input.tptp')
+        input_file = open(input_filename, 'w')
+        input_file.write(text)
+        input_file.close()
+        return input_filename
+    # end def
+
+    def assertSplitLineByLine(self, input_filename):
+        """ Checks that the given input file is split into the test cases it was split into line by line (leaving out
+            the lemmas), with the same non-test matter, but for the comments after the tests (see iter_input).
+        """
+        (non_test_matter, test_case_names, test_cases) = run_as_test_suite.split_input(input_filename)
+        (expected_non_test_matter, expected_test_case_names, expected_test_cases) = \
+            split_input_line_by_line(input_filename)
+        test_case_names = [name for name in test_case_names if not test_cases[name]['lemma']]
+        self.assertEqual(test_case_names, expected_test_case_names)
+        for name in test_case_names:
+            self.assertEqual(run_as_test_suite.get_test_case_text(test_cases[name]), expected_test_cases[name]['text'])
+            self.assertEqual(test_cases[name]['line'], expected_test_cases[name]['line'])
+            self.assertEqual(test_cases[name]['negated'], expected_test_cases[name]['negated'])
+        # end for
+        self.assertTrue(expected_non_test_matter.startswith(non_test_matter))
+        trailing_lines = expected_non_test_matter[len(non_test_matter):].splitlines()
+        self.assertEqual([line for line in trailing_lines if not line.strip().startswith('%')], [])
+        return (non_test_matter, test_case_names, test_cases)
+    # end def
+
+    def test_tptp_theory_is_split_as_it_was_line_by_line(self):
+        self.assertSplitLineByLine(os.path.join(theory_directory, 'naive_consent_theory.tptp'))
+    # end def
+
+    def test_prover9_theory_is_split_as_it_was_line_by_line(self):
+        self.assertSplitLineByLine(os.path.join(theory_directory, 'naive_consent_theory.in'))
+    # end def
+
+    def test_iterated_test_cases_are_those_split(self):
+        input_filename = os.path.join(theory_directory, 'naive_consent_theory.in')
+        (non_test_matter, test_case_names, test_cases) = run_as_test_suite.split_input(input_filename)
+        iterated = list(run_as_test_suite.iter_input(input_filename))
+        self.assertEqual([name for (part, name, test_case) in iterated[:-1]], test_case_names)
+        self.assertEqual(iterated[-1], (non_test_matter, None, None))
+        # (The non-test matter each test case is given is the same as that of the whole file.)
+        self.assertEqual(set([part for (part, name, test_case) in iterated]), set([non_test_matter]))
+    # end def
+
+    def test_test_case_markup_after_a_formula_is_a_comment(self):
+        (non_test_matter, test_case_names, test_cases) = \
+            self.assertSplitLineByLine(self.write_input("fof(a, axiom, p). % Test case: not_a_test_case\n" +
+                                                        "% Test runner: begin tests.\n" +
+                                                        "% Test case: goal\n" +
+                                                        "fof(goal, conjecture, p). % Test case: not_a_test_case\n" +
+                                                        "% Test runner: end tests.\n"))
+        self.assertEqual(test_case_names, ['goal'])
+    # end def
+
+    def test_file_without_a_final_newline_is_split(self):
+        (non_test_matter, test_case_names, test_cases) = \
+            self.assertSplitLineByLine(self.write_input("fof(a, axiom, p).\n" +
+                                                        "% Test runner: begin tests.\n" +
+                                                        "% Negated test case: goal\n" +
+                                                        "fof(goal, conjecture, q)."))
+        self.assertEqual(non_test_matter, "fof(a, axiom, p).\n")
+        self.assertEqual(run_as_test_suite.get_test_case_text(test_cases['goal']), "% Negated test case: goal\n" +
+                                                                                   "fof(goal, conjecture, q).")
+    # end def
+
+    def test_empty_file_has_no_test_cases(self):
+        self.assertEqual(run_as_test_suite.split_input(self.write_input("")), ("", [], {}))
+        self.assertEqual(list(run_as_test_suite.iter_input(self.write_input(""))), [("", None, None)])
+    # end def
+
+    def test_comments_after_the_tests_are_left_out_of_the_non_test_matter(self):
+        (non_test_matter, test_case_names, test_cases) = \
+            self.assertSplitLineByLine(self.write_input("fof(a, axiom, p).\n" +
+                                                        "% Test runner: begin tests.\n" +
+                                                        "% Test case: goal\n" +
+                                                        "fof(goal, conjecture, p).\n" +
+                                                        "% Test runner: end tests.\n" +
+                                                        "% The end.\n"))
+        self.assertEqual(non_test_matter, "fof(a, axiom, p).\n")
+    # end def
+
+    def test_formulas_after_the_tests_are_kept_in_the_non_test_matter(self):
+        (non_test_matter, test_case_names, test_cases) = \
+            self.assertSplitLineByLine(self.write_input("fof(a, axiom, p).\n" +
+                                                        "% Test runner: begin tests.\n" +
+                                                        "% Test case: goal\n" +
+                                                        "fof(goal, conjecture, p).\n" +
+                                                        "% Test runner: end tests.\n" +
+                                                        "fof(b, axiom, q).\n"))
+        self.assertEqual(non_test_matter, "fof(a, axiom, p).\nfof(b, axiom, q).\n")
+    # end def
+# end class
+
+
+class ShardTest(unittest.TestCase):
+    """ Checks the sharing out of the test cases between shards, and the merging of the shards' results, in a
+        temporary directory.
+    """
+
+    test_case_names = ["test-%s" % index for index in range(10)]
+    runtimes = [3.0, 1.0, 4.0, 1.0, 5.0, 9.0, 2.0, 6.0, 5.0, 3.0]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.current_directory = os.getcwd()
+        os.chdir(self.directory)
+    # end def
+
+    def tearDown(self):
+        os.chdir(self.current_directory)
+        shutil.rmtree(self.directory)
+    # end def
+
+    def get_shards(self, runtimes, shard_count):
+        return [run_as_test_suite.select_shard(list(self.test_case_names), runtimes and list(runtimes), shard_number,
+                                               shard_count) for shard_number in range(1, shard_count + 1)]
+    # end def
+
+    def write_shard(self, shard_number, shard_count, test_case_names):
+        """ Writes the results of the given shard, in which each of the given test cases succeeded. """
+        shard = {'number': shard_number, 'count': shard_count, 'test_case_names': self.test_case_names}
+        shard_results_filename = "shard-%s-of-%s.json" % (shard_number, shard_count)
+        test_results = [(self.test_case_names.index(name), name, '.') for name in test_case_names]
+        run_as_test_suite.write_shard_results(shard_results_filename, shard, test_results, [], {})
+        return shard_results_filename
+    # end def
+
+    def test_every_test_case_is_in_exactly_one_shard(self):
+        for runtimes in [None, self.runtimes]:
+            for shard_count in range(1, 5):
+                shards = self.get_shards(runtimes, shard_count)
+                test_case_names = sum(shards, [])
+                self.assertEqual(sorted(test_case_names), sorted(self.test_case_names))
+                # (Each shard keeps the test cases in their original order.)
+                for shard in shards:
+                    self.assertEqual(shard, [name for name in self.test_case_names if name in shard])
+                # end for
+            # end for
+        # end for
+    # end def
+
+    def test_shards_are_the_same_every_run(self):
+        for runtimes in [None, self.runtimes]:
+            self.assertEqual(self.get_shards(runtimes, 3), self.get_shards(runtimes, 3))
+        # end for
+    # end def
+
+    def test_shards_share_out_the_run_time(self):
+        # (The longest test cases are shared out first, each to the shard with the least run time so far.)
+        shards = self.get_shards(self.runtimes, 2)
+        shard_runtimes = [sum([self.runtimes[self.test_case_names.index(name)] for name in shard]) for shard in shards]
+        self.assertEqual(shard_runtimes, [20.0, 19.0])
+    # end def
+
+    def test_shard_results_are_merged_in_order(self):
+        shard_results_filenames = [self.write_shard(shard_number, 2, shard)
+                                   for (shard_number, shard) in enumerate(self.get_shards(None, 2), 1)]
+        (output, exit_status) = capture_output(run_as_test_suite.merge_shard_results, shard_results_filenames)
+        self.assertEqual(exit_status, None, output)
+        self.assertTrue(output.startswith("Test results:\n\n..........\n\n"))
+        self.assertTrue("Ran 10 test cases: 10 succeeded." in output)
+        self.assertTrue("Merged the results of 2 shards." in output)
+    # end def
+
+    def test_missing_shard_is_an_error(self):
+        shards = self.get_shards(None, 3)
+        shard_results_filenames = [self.write_shard(1, 3, shards[0]), self.write_shard(3, 3, shards[2])]
+        (output, exit_status) = capture_output(run_as_test_suite.merge_shard_results, shard_results_filenames)
+        self.assertEqual(exit_status, 1)
+        self.assertTrue("ERROR: the results of shard(s) 2 of 3 are missing." in output)
+    # end def
+
+    def test_test_case_in_two_shards_is_an_error(self):
+        shards = self.get_shards(None, 2)
+        shard_results_filenames = [self.write_shard(1, 2, shards[0] + shards[1][:1]), self.write_shard(2, 2, shards[1])]
+        (output, exit_status) = capture_output(run_as_test_suite.merge_shard_results, shard_results_filenames)
+        self.assertEqual(exit_status, 1)
+        self.assertTrue("ERROR: the shards didn't run every test case exactly once" in output)
+    # end def
+# end class
+
+
+class ProofDependencyTest(unittest.TestCase):
+    """ Checks the keeping of the axioms used by the proofs of the test cases that succeeded, and that test cases are
+        only left unrun when every axiom their last proof used is unchanged (with the Prover 9 runner).
+    """
+
+    non_test_matter = "formulas(usable).\n" + \
+                      "p(x) # label(alex_does_p).\n" + \
+                      "q(x) # label(alex_does_q).\n" + \
+                      "r(x) # label(alex_does_r).\n" + \
+                      "end_of_list.\n"
+    test_case_text = "% Test case: alex_does_both\n" + \
+                     "formulas(goals).\n" + \
+                     "p(alex) & q(alex) # label(goal).\n" + \
+                     "end_of_list.\n"
+    proof_excerpt = "============================== PROOF =================================\n" + \
+                    "1 p(alex) & q(alex) # label(goal) # label(non_clause) # label(goal).  [goal].\n" + \
+                    "2 p(x) # label(alex_does_p).  [assumption].\n" + \
+                    "3 q(x) # label(alex_does_q).  [assumption].\n" + \
+                    "4 $F.  [resolve(1,a,2,a)].\n" + \
+                    "============================== end of proof ==========================\n"
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+    # end def
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    # end def
+
+    def make_run(self, non_test_matter, excerpt = "", negated = False):
+        return {'test_case': {'text': self.test_case_text, 'negated': negated}, 'non_test_matter': non_test_matter,
+                'result_filename': os.path.join(self.directory, 'alex_does_both.txt'), 'details': {'excerpt': excerpt},
+                'mace4': False}
+    # end def
+
+    def tally_run(self, test_case_run, status, proof_dependencies):
+        run_tally = run_as_test_suite.start_run_tally(run_as_prover9_test_suite, test_case_run)
+        return run_as_test_suite.tally_test_case_run(run_as_prover9_test_suite, 'alex_does_both', test_case_run, status,
+                                                     run_tally, {}, proof_dependencies)
+    # end def
+
+    def get_proof_dependencies(self):
+        proof_dependencies = {}
+        self.tally_run(self.make_run(self.non_test_matter, self.proof_excerpt), 'S', proof_dependencies)
+        return proof_dependencies
+    # end def
+
+    def mark_run(self, non_test_matter, proof_dependencies):
+        """ Returns whether the test case is found unaffected against the given non-test matter, along with the
+            dependency changes found.
+        """
+        test_case_run = self.make_run(non_test_matter)
+        dependency_changes = {}
+        list(run_as_test_suite.mark_unaffected_test_case_runs(run_as_prover9_test_suite, [test_case_run],
+                                                              [('alex_does_both', test_case_run)], proof_dependencies,
+                                                              dependency_changes))
+        return (test_case_run.get('unaffected', False), dependency_changes)
+    # end def
+
+    def test_axioms_used_by_a_proof_are_kept(self):
+        proof_dependencies = self.get_proof_dependencies()
+        self.assertEqual(len(proof_dependencies), 1)
+        self.assertEqual(sorted(proof_dependencies.values()[0]['axioms'].keys()), ['alex_does_p', 'alex_does_q'])
+    # end def
+
+    def test_axioms_are_forgotten_once_a_test_case_fails(self):
+        proof_dependencies = self.get_proof_dependencies()
+        self.tally_run(self.make_run(self.non_test_matter), 'F', proof_dependencies)
+        self.assertEqual(proof_dependencies, {})
+    # end def
+
+    def test_axioms_are_not_kept_for_negated_test_cases(self):
+        # (A negated test case succeeds when its goal isn't proved, so there's no proof to go by.)
+        proof_dependencies = {}
+        self.tally_run(self.make_run(self.non_test_matter, self.proof_excerpt, True), 'F', proof_dependencies)
+        self.assertEqual(proof_dependencies, {})
+    # end def
+
+    def test_test_case_is_not_run_again_if_its_axioms_are_unchanged(self):
+        proof_dependencies = self.get_proof_dependencies()
+        # (Changing an axiom the proof didn't use, or the comments and layout of one it did, doesn't affect it.)
+        for non_test_matter in [self.non_test_matter,
+                                self.non_test_matter.replace("r(x)", "r(y) | s(y)"),
+                                self.non_test_matter.replace("p(x) # label", "% Alex does p.\np(x)   # label")]:
+            (unaffected, dependency_changes) = self.mark_run(non_test_matter, proof_dependencies)
+            self.assertTrue(unaffected, non_test_matter)
+            self.assertEqual(dependency_changes, {'unaffected': 1, 'affected': 0, 'axioms': set()})
+        # end for
+    # end def
+
+    def test_test_case_is_run_again_if_an_axiom_it_used_changes(self):
+        proof_dependencies = self.get_proof_dependencies()
+        for (non_test_matter, changed) in [(self.non_test_matter.replace("q(x)", "q(bo)"), 'alex_does_q'),
+                                           (self.non_test_matter.replace("p(x) # label(alex_does_p).\n", ""),
+                                            'alex_does_p')]:
+            (unaffected, dependency_changes) = self.mark_run(non_test_matter, proof_dependencies)
+            self.assertFalse(unaffected, non_test_matter)
+            self.assertEqual(dependency_changes, {'unaffected': 0, 'affected': 1, 'axioms': set([changed])})
+        # end for
+    # end def
+
+    def test_test_case_is_run_again_if_the_rest_of_the_non_test_matter_changes(self):
+        proof_dependencies = self.get_proof_dependencies()
+        (unaffected, dependency_changes) = self.mark_run("assign(max_seconds, 5).\n" + self.non_test_matter,
+                                                         proof_dependencies)
+        self.assertFalse(unaffected)
+        self.assertEqual(dependency_changes['axioms'], set(["the rest of the non-test matter"]))
+    # end def
+
+    def test_test_case_without_a_kept_proof_is_run(self):
+        (unaffected, dependency_changes) = self.mark_run(self.non_test_matter, {})
+        self.assertFalse(unaffected)
+        self.assertEqual(dependency_changes, {'unaffected': 0, 'affected': 0, 'axioms': set()})
+    # end def
+# end class
+
+
+class RecordingRunner(object):
+    """ Stands in for the given runner, giving each test case run the status given for it by name (or the next of
+        them, if given a list), and recording the test case name and non-test matter of each run, while taking
+        everything else (e.g. the lemma axioms) from the runner.
+    """
+
+    def __init__(self, runner, statuses):
+        self.runner = runner
+        self.statuses = statuses
+        self.runs = []
+    # end def
+
+    def __getattr__(self, name):
+        return getattr(self.runner, name)
+    # end def
+
+    def run_test_case(self, test_case = {}, non_test_matter = "", details = None, **arguments):
+        self.runs.append((test_case['name'], non_test_matter))
+        if details != None:
+            details['cpu_time'] = details.get('cpu_time', 0) + 1.0
+        # end if
+        status = self.statuses[test_case['name']]
+        if isinstance(status, list):
+            status = status.pop(0)
+        # end if
+        return status
+    # end def
+# end class
+
+
+class LemmaTest(unittest.TestCase):
+    """ Checks that a lemma is only added as an axiom to the test cases after it once it's been proved, and never
+        when it isn't, with both runners.
+    """
+
+    tptp_non_test_matter = "fof(p_then_q, axiom, ! [X]: (p(X) => q(X))).\n" + \
+                           "fof(q_then_r, axiom, ! [X]: (q(X) => r(X))).\n" + \
+                           "fof(alex_does_p, axiom, p(alex)).\n"
+    prover9_non_test_matter = "formulas(usable).\n" + \
+                              "p(x) -> q(x) # label(p_then_q).\n" + \
+                              "q(x) -> r(x) # label(q_then_r).\n" + \
+                              "p(alex) # label(alex_does_p).\n" + \
+                              "end_of_list.\n"
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+    # end def
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    # end def
+
+    def tptp_test_cases(self):
+        return self.make_test_cases("fof(%(name)s, conjecture, %(formula)s).\n")
+    # end def
+
+    def prover9_test_cases(self):
+        return self.make_test_cases("formulas(goals).\n%(formula)s # answer(%(name)s).\nend_of_list.\n")
+    # end def
+
+    def make_test_cases(self, template):
+        """ Returns the test cases alex_does_p, then the lemmas alex_does_r, bo_does_r and alex_does_q, then
+            bo_does_p, by name, written out with the given template.
+        """
+        test_cases = {}
+        formulas = [('alex_does_p', "p(alex)"), ('alex_does_r', "r(alex)"), ('bo_does_r', "r(bo)"),
+                    ('alex_does_q', "q(alex)"), ('bo_does_p', "p(bo)")]
+        for (index, (name, formula)) in enumerate(formulas):
+            lemma = index not in [0, len(formulas) - 1]
+            marker = lemma and "% Lemma: " or "% Test case: "
+            test_cases[name] = {'name': name, 'index': index, 'lemma': lemma,
+                                'text': marker + name + "\n" + template % {'name': name, 'formula': formula}}
+        # end for
+        return test_cases
+    # end def
+
+    def prove_lemmas(self, runner, non_test_matter, test_cases, run_arguments = {}):
+        """ Returns the lemmas proved, the non-test matter of each test case with them added, and the output. """
+        names = test_cases.keys()
+        names.sort(key = lambda name: test_cases[name]['index'])
+        test_case_stream = [(non_test_matter, name, test_cases[name]) for name in names]
+        results = []
+        (output, exit_status) = capture_output(lambda: results.append(run_as_test_suite.prove_lemmas(
+            runner, test_case_stream, test_cases, self.directory, run_arguments)))
+        self.assertEqual(exit_status, None, output)
+        (proved_lemmas, lemma_results) = results[0]
+        lemma_stream = run_as_test_suite.add_lemmas_to_stream(test_case_stream, proved_lemmas)
+        non_test_matters = dict([(name, test_case_non_test_matter) for (test_case_non_test_matter, name, test_case) \
+                                 in lemma_stream])
+        return (proved_lemmas, non_test_matters, output)
+    # end def
+
+    def check_lemmas(self, runner, non_test_matter, test_cases):
+        """ Checks the lemmas (alex_does_r and alex_does_q proved, bo_does_r not) through a recording runner. """
+        recording_runner = RecordingRunner(runner, {'alex_does_r': 'S', 'bo_does_r': 'F', 'alex_does_q': 'S'})
+        (proved_lemmas, non_test_matters, output) = self.prove_lemmas(recording_runner, non_test_matter, test_cases)
+        alex_does_r = runner.get_lemma_axiom('alex_does_r', test_cases['alex_does_r'])
+        alex_does_q = runner.get_lemma_axiom('alex_does_q', test_cases['alex_does_q'])
+        self.assertEqual(proved_lemmas, [(1, alex_does_r), (3, alex_does_q)])
+        self.assertTrue("WARNING: lemma 'bo_does_r' wasn't proved" in output, output)
+        # Each lemma is proved with only the lemmas proved before it.
+        self.assertEqual(recording_runner.runs, [('alex_does_r', non_test_matter),
+                                                 ('bo_does_r', non_test_matter + alex_does_r),
+                                                 ('alex_does_q', non_test_matter + alex_does_r)])
+        # Each test case is run with only the lemmas proved before it.
+        self.assertEqual(non_test_matters, {'alex_does_p': non_test_matter,
+                                            'alex_does_r': non_test_matter,
+                                            'bo_does_r': non_test_matter + alex_does_r,
+                                            'alex_does_q': non_test_matter + alex_does_r,
+                                            'bo_does_p': non_test_matter + alex_does_r + alex_does_q})
+    # end def
+
+    def test_tptp_lemmas_are_only_used_once_proved(self):
+        self.check_lemmas(run_as_tptp_test_suite, self.tptp_non_test_matter, self.tptp_test_cases())
+    # end def
+
+    def test_prover9_lemmas_are_only_used_once_proved(self):
+        self.check_lemmas(run_as_prover9_test_suite, self.prover9_non_test_matter, self.prover9_test_cases())
+    # end def
+
+    def test_lemma_axioms(self):
+        self.assertEqual(run_as_tptp_test_suite.get_lemma_axiom('alex_does_r', self.tptp_test_cases()['alex_does_r']),
+                         "\nfof(alex_does_r, lemma, r(alex)).\n")
+        self.assertEqual(run_as_prover9_test_suite.get_lemma_axiom('alex_does_r',
+                                                                   self.prover9_test_cases()['alex_does_r']),
+                         "\nformulas(assumptions).\nr(alex) # label(alex_does_r).\nend_of_list.\n")
+    # end def
+
+    def test_failed_tptp_lemma_is_not_used(self):
+        # (Proved for real, with the SAT prover, which can't prove that bo does r.)
+        run_arguments = {'prover': 'sat', 'dry_run': False, 'verbosity': 0, 'cache_path': "", 'stream': False,
+                         'timeout': 0, 'memory_limit': 0}
+        (proved_lemmas, non_test_matters, output) = self.prove_lemmas(run_as_tptp_test_suite, self.tptp_non_test_matter,
+                                                                      self.tptp_test_cases(), run_arguments)
+        self.assertEqual([index for (index, axiom) in proved_lemmas], [1, 3])
+        self.assertTrue("WARNING: lemma 'bo_does_r' wasn't proved" in output, output)
+        self.assertFalse("bo_does_r" in non_test_matters['bo_does_p'])
+    # end def
+# end class
+
+
+class AxiomSelectionTest(unittest.TestCase):
+    """ Checks the selecting of the axioms relevant to a test case, to a given depth, with both runners, and the
+        falling back to all of them when a test case isn't proved against those selected.
+    """
+
+    tptp_non_test_matter = "% The theory.\n" + \
+                           "include('Axioms/SET001-0.ax').\n" + \
+                           "fof(alex_does_p, axiom, p(alex)).\n" + \
+                           "fof(p_then_q, axiom, ! [X]: (p(X) => q(X))).\n" + \
+                           "fof(q_then_r, axiom, ! [X]: (q(X) => r(X))).\n" + \
+                           "fof(bo_does_s, axiom, s(bo)).\n"
+    tptp_test_case = {'name': 'alex_does_r',
+                      'text': "% Test case: alex_does_r\nfof(alex_does_r, conjecture, r(alex)).\n"}
+    prover9_non_test_matter = "set(prolog_style_variables).\n" + \
+                              "formulas(assumptions).\n" + \
+                              "p(alex) # label(alex_does_p).\n" + \
+                              "p(X) -> q(X) # label(p_then_q).\n" + \
+                              "q(X) -> r(X) # label(q_then_r).\n" + \
+                              "s(bo) # label(bo_does_s).\n" + \
+                              "end_of_list.\n"
+    prover9_test_case = {'name': 'alex_does_r',
+                         'text': "% Test case: alex_does_r\n" + \
+                                 "formulas(goals).\nr(alex) # answer(alex_does_r).\nend_of_list.\n"}
+
+    def test_tptp_selection(self):
+        # (Those sharing a symbol with the goal first, then those sharing one with them; never bo_does_s.)
+        self.assertEqual(run_as_test_suite.select_axioms(run_as_tptp_test_suite, self.tptp_non_test_matter,
+                                                         self.tptp_test_case, 1),
+                         ("% The theory.\n" +
+                          "include('Axioms/SET001-0.ax').\n" +
+                          "fof(alex_does_p, axiom, p(alex)).\n" +
+                          "\n" +
+                          "fof(q_then_r, axiom, ! [X]: (q(X) => r(X))).\n" +
+                          "\n", 2, 4))
+        for depth in [2, 3]:
+            self.assertEqual(run_as_test_suite.select_axioms(run_as_tptp_test_suite, self.tptp_non_test_matter,
+                                                             self.tptp_test_case, depth),
+                             ("% The theory.\n" +
+                              "include('Axioms/SET001-0.ax').\n" +
+                              "fof(alex_does_p, axiom, p(alex)).\n" +
+                              "fof(p_then_q, axiom, ! [X]: (p(X) => q(X))).\n" +
+                              "fof(q_then_r, axiom, ! [X]: (q(X) => r(X))).\n" +
+                              "\n", 3, 4))
+        # end for
+    # end def
+
+    def test_prover9_selection(self):
+        self.assertEqual(run_as_test_suite.select_axioms(run_as_prover9_test_suite, self.prover9_non_test_matter,
+                                                         self.prover9_test_case, 1),
+                         ("set(prolog_style_variables).\n" +
+                          "formulas(assumptions).\n" +
+                          "p(alex) # label(alex_does_p).\n" +
+                          "\n" +
+                          "q(X) -> r(X) # label(q_then_r).\n" +
+                          "\n" +
+                          "end_of_list.\n", 2, 4))
+        for depth in [2, 3]:
+            self.assertEqual(run_as_test_suite.select_axioms(run_as_prover9_test_suite, self.prover9_non_test_matter,
+                                                             self.prover9_test_case, depth),
+                             ("set(prolog_style_variables).\n" +
+                              "formulas(assumptions).\n" +
+                              "p(alex) # label(alex_does_p).\n" +
+                              "p(X) -> q(X) # label(p_then_q).\n" +
+                              "q(X) -> r(X) # label(q_then_r).\n" +
+                              "\n" +
+                              "end_of_list.\n", 3, 4))
+        # end for
+    # end def
+
+    def test_everything_but_the_formulas_is_kept(self):
+        # (Nothing shares a symbol with the goal, so no formula is selected.)
+        test_case = {'text': "% Test case: cy_does_t\nfof(cy_does_t, conjecture, t(cy)).\n"}
+        self.assertEqual(run_as_test_suite.select_axioms(run_as_tptp_test_suite, self.tptp_non_test_matter,
+                                                         test_case, 2),
+                         ("% The theory.\ninclude('Axioms/SET001-0.ax').\n\n\n\n\n", 0, 4))
+        # (Nor are the goals in the non-test matter left out.)
+        goals = "formulas(goals).\ns(bo) # label(bo_does_s).\nend_of_list.\n"
+        (selected_non_test_matter, selected_count, formula_count) = \
+            run_as_test_suite.select_axioms(run_as_prover9_test_suite, self.prover9_non_test_matter + goals,
+                                            self.prover9_test_case, 1)
+        self.assertTrue(selected_non_test_matter.endswith(goals), selected_non_test_matter)
+        self.assertEqual((selected_count, formula_count), (2, 4))
+    # end def
+
+    def run_selected(self, statuses):
+        """ Runs the TPTP test case to depth 1 through a recording runner giving it the given statuses, returning
+            its status, details, and the runs made.
+        """
+        runner = RecordingRunner(run_as_tptp_test_suite, {'alex_does_r': statuses})
+        test_case_run = {'test_case': self.tptp_test_case, 'non_test_matter': self.tptp_non_test_matter,
+                         'details': {}, 'selection_depth': 1}
+        status = run_as_test_suite.run_test_case_job(runner, test_case_run)
+        return (status, test_case_run['details'], runner.runs)
+    # end def
+
+    def test_success_against_the_selected_axioms_is_kept(self):
+        (status, details, runs) = self.run_selected(['S'])
+        self.assertEqual(status, 'S')
+        self.assertEqual(details['selection'], {'selected': 2, 'formulas': 4, 'fell_back': False})
+        self.assertEqual(len(runs), 1)
+        self.assertFalse("p_then_q" in runs[0][1])
+    # end def
+
+    def test_failure_against_the_selected_axioms_falls_back_to_them_all(self):
+        for first_status in ['F', 'T']:
+            (status, details, runs) = self.run_selected([first_status, 'S'])
+            self.assertEqual(status, 'S')
+            self.assertEqual(details['selection'], {'selected': 2, 'formulas': 4, 'fell_back': True})
+            self.assertEqual([non_test_matter == self.tptp_non_test_matter for (name, non_test_matter) in runs],
+                             [False, True])
+            # (The CPU time is that of both runs.)
+            self.assertEqual(details['cpu_time'], 2.0)
+        # end for
+    # end def
+
+    def test_no_fall_back_when_every_axiom_was_selected(self):
+        runner = RecordingRunner(run_as_tptp_test_suite, {'alex_does_r': ['F', 'S']})
+        non_test_matter = "fof(q_then_r, axiom, ! [X]: (q(X) => r(X))).\n"
+        test_case_run = {'test_case': self.tptp_test_case, 'non_test_matter': non_test_matter, 'details': {},
+                         'selection_depth': 1}
+        self.assertEqual(run_as_test_suite.run_test_case_job(runner, test_case_run), 'F')
+        self.assertEqual(runner.runs, [('alex_does_r', non_test_matter)])
+        self.assertEqual(test_case_run['details']['selection'], {'selected': 1, 'formulas': 1, 'fell_back': False})
+    # end def
+# end class
+
+
+class BenchmarkComparisonTest(unittest.TestCase):
+    """ Checks the regressions found by comparing benchmark runs, recorded in a temporary benchmark database. """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.benchmark_filename = os.path.join(self.directory, 'benchmarks.db')
+    # end def
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    # end def
+
+    def record_run(self, test_cases):
+        """ Records a benchmark run of the given test cases, as (name, CPU time, processed clauses, cached) tuples,
+            returning its run ID.
+        """
+        reports = [{'name': name, 'status': 'S', 'wall_time': cpu_time + 0.1, 'cpu_time': cpu_time,
+                    'statistics': {'processed_clauses': processed_clauses}, 'cached': cached}
+                   for (name, cpu_time, processed_clauses, cached) in test_cases]
+        (run_id, commit_id) = run_as_test_suite.record_benchmark_run(self.benchmark_filename, 'theory.tptp', 'sat',
+                                                                     time.time(), reports)
+        return str(run_id)
+    # end def
+
+    def compare_runs(self, earlier_test_cases, later_test_cases):
+        runs = [self.record_run(earlier_test_cases), self.record_run(later_test_cases)]
+        return capture_output(run_as_test_suite.compare_benchmark_runs, runs, 50,
+                              test_results_path = self.directory)
+    # end def
+
+    def test_cpu_time_rise_just_above_the_threshold_is_a_regression(self):
+        (output, exit_status) = self.compare_runs([('goal', 1.0, 100, False)], [('goal', 1.51, 100, False)])
+        self.assertEqual(exit_status, 1)
+        self.assertTrue(" - goal:\n     cpu_time: 1.000s -> 1.510s (+51%)\n" in output, output)
+        self.assertTrue("1 of 1 test case(s) regressed." in output)
+    # end def
+
+    def test_cpu_time_rise_just_below_the_threshold_is_not_a_regression(self):
+        (output, exit_status) = self.compare_runs([('goal', 1.0, 100, False)], [('goal', 1.49, 100, False)])
+        self.assertEqual(exit_status, None, output)
+        self.assertTrue("0 of 1 test case(s) regressed." in output)
+    # end def
+
+    def test_statistic_rise_just_above_the_threshold_is_a_regression(self):
+        (output, exit_status) = self.compare_runs([('goal', 1.0, 100, False)], [('goal', 1.0, 151, False)])
+        self.assertEqual(exit_status, 1)
+        self.assertTrue("     processed_clauses: 100 -> 151 (+51%)\n" in output, output)
+    # end def
+
+    def test_statistic_rise_at_the_threshold_is_not_a_regression(self):
+        (output, exit_status) = self.compare_runs([('goal', 1.0, 100, False)], [('goal', 1.0, 150, False)])
+        self.assertEqual(exit_status, None, output)
+    # end def
+
+    def test_test_cases_in_only_one_run_are_not_compared(self):
+        (output, exit_status) = self.compare_runs([('goal', 1.0, 100, False), ('old_goal', 1.0, 100, False)],
+                                                  [('goal', 1.0, 100, False), ('new_goal', 9.0, 900, False)])
+        self.assertEqual(exit_status, None, output)
+        self.assertTrue("2 test case(s) were only run in one of the runs, and weren't compared." in output)
+        self.assertTrue("0 of 1 test case(s) regressed." in output)
+    # end def
+
+    def test_cached_test_cases_are_not_recorded_or_compared(self):
+        (output, exit_status) = self.compare_runs([('goal', 1.0, 100, False), ('cached_goal', 0.0, 0, True)],
+                                                  [('goal', 1.0, 100, False), ('cached_goal', 9.0, 900, False)])
+        self.assertEqual(exit_status, None, output)
+        connection = sqlite3.connect(self.benchmark_filename)
+        try:
+            rows = list(connection.execute("SELECT run_id, test_case_name FROM test_cases ORDER BY run_id, " +
+                                           "test_case_name"))
+        finally:
+            connection.close()
+        # end try
+        self.assertEqual(rows, [(1, 'goal'), (2, 'cached_goal'), (2, 'goal')])
+        self.assertTrue("1 test case(s) were only run in one of the runs" in output)
+    # end def
+
+    def test_one_run_is_compared_with_the_latest_other_run(self):
+        first_run = self.record_run([('goal', 1.0, 100, False)])
+        self.record_run([('goal', 2.0, 100, False)])
+        third_run = self.record_run([('goal', 4.0, 100, False)])
+        # (The latest run is compared with the one before it, not with itself.)
+        (output, exit_status) = capture_output(run_as_test_suite.compare_benchmark_runs, [third_run], 50,
+                                               test_results_path = self.directory)
+        self.assertEqual(exit_status, 1)
+        self.assertTrue("     cpu_time: 2.000s -> 4.000s (+100%)\n" in output, output)
+        # (An earlier run is compared with the latest one.)
+        (output, exit_status) = capture_output(run_as_test_suite.compare_benchmark_runs, [first_run], 50,
+                                               test_results_path = self.directory)
+        self.assertEqual(exit_status, 1)
+        self.assertTrue("     cpu_time: 1.000s -> 4.000s (+300%)\n" in output, output)
+    # end def
+
+    def test_one_run_alone_is_not_compared(self):
+        run = self.record_run([('goal', 1.0, 100, False)])
+        (output, exit_status) = capture_output(run_as_test_suite.compare_benchmark_runs, [run], 50,
+                                               test_results_path = self.directory)
+        self.assertEqual(exit_status, 1)
+        self.assertTrue("ERROR: there must be two benchmark runs" in output, output)
+        self.assertFalse("regressed" in output, output)
+    # end def
+# end class
+
+
+class BenchmarkTest(unittest.TestCase):
+    """ Checks the test cases recorded by a benchmark run, in a temporary directory. """
+
+    theory = "fof(everyone_does, axiom, ! [X]: do(X)).\n" + \
+             "% Test runner: begin tests.\n" + \
+             "% Test case: alex_does\n" + \
+             "fof(alex_does, conjecture, do(alex)).\n" + \
+             "% Test case: bo_does\n" + \
+             "fof(bo_does, conjecture, do(bo)).\n"
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.current_directory = os.getcwd()
+        os.chdir(self.directory)
+        theory_file = open('theory.tptp', 'w')
+        theory_file.write(self.theory)
+        theory_file.close()
+    # end def
+
+    def tearDown(self):
+        os.chdir(self.current_directory)
+        shutil.rmtree(self.directory)
+    # end def
+
+    def run_test_suite(self, **arguments):
+        (output, exit_status) = capture_output(run_as_test_suite.run_test_suite, run_as_tptp_test_suite,
+                                               input_filename = 'theory.tptp', prover_arguments = {'prover': 'sat'},
+                                               benchmark_prover = 'sat', **arguments)
+        self.assertEqual(exit_status, None, output)
+        return output
+    # end def
+
+    def test_duplicate_test_cases_are_recorded(self):
+        # (The test cases are the same problem, so one would take the other's result, if deduped.)
+        self.run_test_suite(benchmark = True, use_cache = False)
+        connection = sqlite3.connect(os.path.join('results', 'benchmarks.db'))
+        try:
+            names = [name for (name,) in connection.execute("SELECT test_case_name FROM test_cases " +
+                                                            "ORDER BY test_case_name")]
+        finally:
+            connection.close()
+        # end try
+        self.assertEqual(names, ['alex_does', 'bo_does'])
+    # end def
+# end class
+
+
+if __name__ == '__main__':
+    # Run the tests in this module.
+    unittest.main()
+# end if